@@ -0,0 +1,41 @@
+"""
+Add the job_history table backing the persistent prompt history.
+
+Revision ID: 0005_job_history
+Revises: 0004_drop_tag_type
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_job_history"
+down_revision = "0004_drop_tag_type"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "job_history",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("prompt_id", sa.String(length=128), nullable=False),
+        sa.Column("status", sa.String(length=32), nullable=False),
+        sa.Column("create_time", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("execution_duration", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("workflow_id", sa.String(length=128), nullable=True),
+        sa.Column("job", sa.Text(), nullable=False),
+        sa.Column("entry", sa.Text(), nullable=False),
+    )
+    op.create_index("uq_job_history_prompt_id", "job_history", ["prompt_id"], unique=True)
+    op.create_index("ix_job_history_status_create_time", "job_history", ["status", "create_time"])
+    op.create_index("ix_job_history_create_time", "job_history", ["create_time"])
+    op.create_index("ix_job_history_workflow_id", "job_history", ["workflow_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_job_history_workflow_id", table_name="job_history")
+    op.drop_index("ix_job_history_create_time", table_name="job_history")
+    op.drop_index("ix_job_history_status_create_time", table_name="job_history")
+    op.drop_index("uq_job_history_prompt_id", table_name="job_history")
+    op.drop_table("job_history")
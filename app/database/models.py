@@ -1,7 +1,7 @@
 from typing import Any
 from datetime import datetime
-from sqlalchemy import MetaData
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy import BigInteger, Index, Integer, MetaData, String, Text
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 NAMING_CONVENTION = {
     "ix": "ix_%(table_name)s_%(column_0_N_name)s",
@@ -27,4 +27,31 @@ def to_dict(obj: Any, include_none: bool = False) -> dict[str, Any]:
             out[field] = val
     return out
 
-# TODO: Define models here
+
+class JobHistory(Base):
+    """A finished prompt.
+
+    job is the JSON job summary served by /api/jobs listings and entry the JSON
+    /history item with the full prompt and outputs, only loaded for single jobs.
+    """
+
+    __tablename__ = "job_history"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    prompt_id: Mapped[str] = mapped_column(String(128), nullable=False)
+    status: Mapped[str] = mapped_column(String(32), nullable=False)
+    create_time: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    execution_duration: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    workflow_id: Mapped[str | None] = mapped_column(String(128), nullable=True)
+    job: Mapped[str] = mapped_column(Text, nullable=False)
+    entry: Mapped[str] = mapped_column(Text, nullable=False)
+
+    __table_args__ = (
+        Index("uq_job_history_prompt_id", "prompt_id", unique=True),
+        Index("ix_job_history_status_create_time", "status", "create_time"),
+        Index("ix_job_history_create_time", "create_time"),
+        Index("ix_job_history_workflow_id", "workflow_id"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<JobHistory id={self.id} prompt_id={self.prompt_id} status={self.status}>"
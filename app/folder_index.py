@@ -0,0 +1,300 @@
+"""
+In-memory index of the files in the model folders, kept up to date by watching them.
+
+Without it, every folder_paths.get_filename_list call stats every directory of
+a model folder to check its cached listing, and walks the whole folder again
+when one changed. On big model trees, especially on network storage, that can
+take seconds. With --folder-index, folder_paths reads listings and full paths
+from a FolderIndex instead:
+
+* the first time a folder is needed its directories are scanned into a tree,
+* a watcher updates that tree as files are added, removed or moved: inotify on
+  Linux, or a thread that checks the modification time of the indexed
+  directories every few seconds (needed on network storage, where inotify does
+  not see changes made by other machines),
+* file lists and full paths of a folder are computed once from the tree and
+  kept until something changes.
+"""
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+from typing import Optional
+
+EXCLUDED_DIR_NAMES = {".git"}
+
+
+class _Directory:
+    __slots__ = ("files", "dirs", "mtime")
+
+    def __init__(self):
+        self.files: set[str] = set()
+        self.dirs: dict[str, "_Directory"] = {}
+        self.mtime: Optional[float] = None
+
+
+def _list_directory(path: str) -> tuple[set[str], set[str], float]:
+    """(files, subdirectories, mtime) of path, following symlinks like os.walk(followlinks=True)."""
+    mtime = os.path.getmtime(path)
+    files = set()
+    dirs = set()
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                if entry.name not in EXCLUDED_DIR_NAMES:
+                    dirs.add(entry.name)
+            else:
+                files.add(entry.name)
+    return files, dirs, mtime
+
+
+def _walk_files(node: _Directory, prefix: str, out: list, visiting: set):
+    if id(node) in visiting:
+        return
+    visiting.add(id(node))
+    for name in node.files:
+        out.append(prefix + name)
+    for name, child in node.dirs.items():
+        _walk_files(child, prefix + name + os.sep, out, visiting)
+    visiting.discard(id(node))
+
+
+class _InotifyWatcher:
+    """Marks the directories that got entries created, deleted or moved as dirty, using inotify."""
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_MOVE_SELF = 0x800
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_ONLYDIR = 0x01000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    MASK = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self, index: "FolderIndex"):
+        self.index = index
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.paths: dict[int, set[str]] = {}
+        self.watches: dict[str, int] = {}
+        self.warned = False
+
+    def watch(self, path: str) -> bool:
+        if path in self.watches:
+            return True
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC and not self.warned:
+                self.warned = True
+                logging.warning("folder index: out of inotify watches, raise fs.inotify.max_user_watches. Changes in unwatched folders are found by polling.")
+            return False
+        self.watches[path] = wd
+        self.paths.setdefault(wd, set()).add(path)
+        return True
+
+    def unwatch(self, path: str):
+        wd = self.watches.pop(path, None)
+        if wd is None:
+            return
+        paths = self.paths.get(wd)
+        if paths is not None:
+            paths.discard(path)
+            if len(paths) == 0:
+                del self.paths[wd]
+                self.libc.inotify_rm_watch(self.fd, wd)
+
+    def run(self):
+        while True:
+            select.select([self.fd], [], [])
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                continue
+            dirty = set()
+            rescan = False
+            offset = 0
+            with self.index.lock:
+                while offset < len(data):
+                    wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+                    offset += self.EVENT.size + length
+                    if mask & self.IN_Q_OVERFLOW:
+                        rescan = True
+                        continue
+                    paths = self.paths.get(wd, ())
+                    if mask & self.IN_IGNORED:
+                        for path in list(paths):
+                            self.watches.pop(path, None)
+                        self.paths.pop(wd, None)
+                        continue
+                    for path in paths:
+                        if mask & (self.IN_DELETE_SELF | self.IN_MOVE_SELF):
+                            dirty.add(os.path.dirname(path))
+                        dirty.add(path)
+            if rescan:
+                dirty = None
+            self.index.sync(dirty)
+
+
+class FolderIndex:
+    def __init__(self, watcher: str = "auto", poll_interval: float = 10.0):
+        """watcher: "inotify", "poll" or "auto" (inotify when available)."""
+        self.lock = threading.RLock()
+        self.generation = 0
+        self.poll_interval = poll_interval
+        self.directories: dict[str, _Directory] = {}
+        self.folders: dict[str, tuple] = {}
+        self.inotify = None
+        if watcher in ("auto", "inotify") and sys.platform.startswith("linux"):
+            try:
+                self.inotify = _InotifyWatcher(self)
+            except (OSError, AttributeError) as e:
+                logging.warning("folder index: inotify is not available ({}), polling for changes instead.".format(e))
+        elif watcher == "inotify":
+            logging.warning("folder index: inotify is only available on Linux, polling for changes instead.")
+        if self.inotify is not None:
+            threading.Thread(target=self.inotify.run, name="folder-index-inotify", daemon=True).start()
+        # Polling also catches what inotify can't: directories it ran out of watches for.
+        threading.Thread(target=self._poll, name="folder-index-poll", daemon=True).start()
+
+    def _scan(self, path: str, visiting: set) -> Optional[_Directory]:
+        node = self.directories.get(path)
+        if node is not None:
+            return node
+        try:
+            real_path = os.path.realpath(path)
+            if real_path in visiting:
+                # Symlink loop.
+                return None
+            # Watch before listing so nothing created in between is missed.
+            watched = self.inotify is not None and self.inotify.watch(path)
+            files, dirs, mtime = _list_directory(path)
+        except OSError:
+            return None
+        node = _Directory()
+        node.files = files
+        node.mtime = mtime if not watched else None
+        self.directories[path] = node
+        visiting.add(real_path)
+        for name in dirs:
+            child = self._scan(os.path.join(path, name), visiting)
+            if child is not None:
+                node.dirs[name] = child
+        visiting.discard(real_path)
+        return node
+
+    def _remove(self, path: str):
+        node = self.directories.pop(path, None)
+        if node is None:
+            return
+        if self.inotify is not None:
+            self.inotify.unwatch(path)
+        for name in node.dirs:
+            self._remove(os.path.join(path, name))
+
+    def _sync_directory(self, path: str) -> bool:
+        """Update the indexed entries of path from the filesystem, returns whether they changed."""
+        node = self.directories.get(path)
+        if node is None:
+            return False
+        try:
+            files, dirs, mtime = _list_directory(path)
+        except OSError:
+            self._remove(path)
+            return True
+        if node.mtime is not None:
+            node.mtime = mtime
+        changed = files != node.files
+        node.files = files
+        for name in list(node.dirs):
+            if name not in dirs:
+                del node.dirs[name]
+                self._remove(os.path.join(path, name))
+                changed = True
+        for name in dirs:
+            if name not in node.dirs:
+                child = self._scan(os.path.join(path, name), set())
+                if child is not None:
+                    node.dirs[name] = child
+                    changed = True
+        return changed
+
+    def sync(self, paths=None):
+        """Update the given indexed directories, or all of them, after they may have changed."""
+        with self.lock:
+            if paths is None:
+                paths = list(self.directories)
+            changed = False
+            for path in paths:
+                changed = self._sync_directory(path) or changed
+            if changed:
+                self.generation += 1
+
+    def _poll(self):
+        event = threading.Event()
+        while not event.wait(self.poll_interval):
+            with self.lock:
+                candidates = [(path, node.mtime) for path, node in self.directories.items() if node.mtime is not None]
+            dirty = []
+            for path, mtime in candidates:
+                try:
+                    if os.path.getmtime(path) != mtime:
+                        dirty.append(path)
+                except OSError:
+                    dirty.append(path)
+            if len(dirty) > 0:
+                self.sync(dirty)
+
+    def _get_folder(self, folder_name: str, paths: list[str]) -> dict:
+        """{relative path: full path} of every file in the folder, the first folder path wins like get_full_path."""
+        paths = tuple(paths)
+        with self.lock:
+            for path in paths:
+                if path not in self.directories and os.path.isdir(path):
+                    if self._scan(path, set()) is not None:
+                        self.generation += 1
+            cached = self.folders.get(folder_name)
+            if cached is not None and cached[0] == self.generation and cached[1] == paths:
+                return cached[2]
+            files = {}
+            for path in paths:
+                node = self.directories.get(path)
+                if node is None:
+                    continue
+                relative_paths = []
+                _walk_files(node, "", relative_paths, set())
+                for relative_path in relative_paths:
+                    if relative_path not in files:
+                        files[relative_path] = os.path.join(path, relative_path)
+            self.folders[folder_name] = (self.generation, paths, files, {})
+            return files
+
+    def get_filename_list(self, folder_name: str, paths: list[str], extensions) -> list[str]:
+        """Sorted relative paths of the files in the folder with one of the extensions, or all files when there are none."""
+        extensions = frozenset(extensions)
+        with self.lock:
+            self._get_folder(folder_name, paths)
+            _, _, files, lists = self.folders[folder_name]
+            filenames = lists.get(extensions)
+            if filenames is None:
+                filenames = sorted(f for f in files if len(extensions) == 0 or os.path.splitext(f)[-1].lower() in extensions)
+                lists[extensions] = filenames
+            return filenames
+
+    def get_full_path(self, folder_name: str, paths: list[str], filename: str) -> Optional[str]:
+        return self._get_folder(folder_name, paths).get(filename)
@@ -0,0 +1,110 @@
+"""
+Prompt history persisted in the ComfyUI database.
+
+Every finished prompt is one job_history row holding the job summary used by
+/api/jobs listings and the full /history entry. Listings filter, sort and page
+with indexed SQL queries, and only the rows of the requested page are loaded,
+so server memory does not grow with the number of jobs that have run.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from typing import Optional
+
+from sqlalchemy import and_, delete, func, or_, select
+
+from app.database.db import create_session
+from app.database.models import JobHistory
+from comfy_execution.history import HistoryStore
+from comfy_execution.jobs import job_sort_key, normalize_history_item
+
+
+def _dumps(value) -> str:
+    # Node UI outputs are meant to be JSON, don't lose a whole history entry over a stray object.
+    return json.dumps(value, default=str)
+
+
+class DatabaseHistoryStore(HistoryStore):
+    """History stored in the job_history table, keeping the max_items most recent entries."""
+
+    def add(self, prompt_id: str, entry: dict):
+        try:
+            job = normalize_history_item(prompt_id, entry)
+            row = JobHistory(
+                prompt_id=prompt_id,
+                status=job["status"],
+                create_time=job_sort_key(job, "created_at")[0],
+                execution_duration=job_sort_key(job, "execution_duration")[0],
+                workflow_id=job.get("workflow_id"),
+                job=_dumps(job),
+                entry=_dumps(entry),
+            )
+            with create_session() as session:
+                session.execute(delete(JobHistory).where(JobHistory.prompt_id == prompt_id))
+                session.add(row)
+                session.flush()
+                session.execute(delete(JobHistory).where(JobHistory.id <= row.id - self.max_items))
+                session.commit()
+        except Exception as e:
+            logging.warning("Failed to store the history of prompt {}: {}".format(prompt_id, e))
+
+    def get(self, prompt_id: str) -> Optional[dict]:
+        with create_session() as session:
+            entry = session.scalar(select(JobHistory.entry).where(JobHistory.prompt_id == prompt_id))
+        return json.loads(entry) if entry is not None else None
+
+    def list(self, max_items: Optional[int] = None, offset: int = -1, before: Optional[str] = None) -> dict:
+        query = select(JobHistory.prompt_id, JobHistory.entry)
+        with create_session() as session:
+            if before is not None:
+                before_id = session.scalar(select(JobHistory.id).where(JobHistory.prompt_id == before))
+                if before_id is None:
+                    return {}
+                query = query.where(JobHistory.id < before_id)
+            if offset < 0 and max_items is not None:
+                # The last max_items entries.
+                rows = session.execute(query.order_by(JobHistory.id.desc()).limit(max_items)).all()
+                rows.reverse()
+            else:
+                query = query.order_by(JobHistory.id).offset(max(offset, 0))
+                if max_items is not None:
+                    query = query.limit(max_items)
+                rows = session.execute(query).all()
+        return {prompt_id: json.loads(entry) for prompt_id, entry in rows}
+
+    def delete(self, prompt_id: str):
+        with create_session() as session:
+            session.execute(delete(JobHistory).where(JobHistory.prompt_id == prompt_id))
+            session.commit()
+
+    def clear(self):
+        with create_session() as session:
+            session.execute(delete(JobHistory))
+            session.commit()
+
+    def query_jobs(self, statuses: list[str], workflow_id: Optional[str] = None, sort_by: str = "created_at",
+                   sort_order: str = "desc", limit: Optional[int] = None, after: Optional[tuple] = None) -> tuple[list[dict], int]:
+        sort_column = JobHistory.execution_duration if sort_by == "execution_duration" else JobHistory.create_time
+        conditions = [JobHistory.status.in_(statuses)]
+        if workflow_id:
+            conditions.append(JobHistory.workflow_id == workflow_id)
+
+        query = select(JobHistory.job).where(*conditions)
+        if after is not None:
+            value, prompt_id = after
+            if sort_order == "desc":
+                query = query.where(or_(sort_column < value, and_(sort_column == value, JobHistory.prompt_id < prompt_id)))
+            else:
+                query = query.where(or_(sort_column > value, and_(sort_column == value, JobHistory.prompt_id > prompt_id)))
+        if sort_order == "desc":
+            query = query.order_by(sort_column.desc(), JobHistory.prompt_id.desc())
+        else:
+            query = query.order_by(sort_column, JobHistory.prompt_id)
+        if limit is not None:
+            query = query.limit(limit)
+
+        with create_session() as session:
+            total = session.scalar(select(func.count()).select_from(JobHistory).where(*conditions))
+            jobs = [json.loads(job) for job in session.scalars(query)]
+        return jobs, total
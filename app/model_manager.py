@@ -1,3 +1,4 @@
+import asyncio
 import os
 import base64
 import json
@@ -5,6 +6,7 @@ import time
 import logging
 import folder_paths
 import glob
+import comfy.model_detection
 import comfy.utils
 from aiohttp import web
 from PIL import Image
@@ -49,33 +51,9 @@ class ModelFileManager:
 
         @routes.get("/experiment/models/preview/{folder}/{path_index}/{filename:.*}")
         async def get_model_preview(request):
-            folder_name = request.match_info.get("folder", None)
-            filename = request.match_info.get("filename", None)
-
-            if folder_name not in folder_paths.folder_names_and_paths:
-                return web.Response(status=404)
-
-            # The "{filename:.*}" capture also matches the empty string, which
-            # would resolve to the folder itself; reject it explicitly.
-            if not filename:
-                return web.Response(status=400)
-
-            try:
-                path_index = int(request.match_info.get("path_index", None))
-            except (TypeError, ValueError):
-                return web.Response(status=400)
-
-            folders = folder_paths.folder_names_and_paths[folder_name]
-            if path_index < 0 or path_index >= len(folders[0]):
-                return web.Response(status=404)
-            folder = folders[0][path_index]
-            full_filename = os.path.normpath(os.path.join(folder, filename))
-
-            # Prevent path traversal: the requested file must stay within the
-            # configured model folder. `filename` is an unrestricted ".*" capture,
-            # so values like "../../../../etc/passwd" would otherwise escape it.
-            if not folder_paths.is_within_directory(folder, full_filename):
-                return web.Response(status=403)
+            folder, full_filename = self.resolve_model_path(request)
+            if folder is None:
+                return full_filename
 
             previews = self.get_model_previews(full_filename)
             default_preview = previews[0] if len(previews) > 0 else None
@@ -98,6 +76,59 @@ class ModelFileManager:
             except:
                 return web.Response(status=404)
 
+        @routes.get("/experiment/models/metadata/{folder}/{path_index}/{filename:.*}")
+        async def get_model_metadata(request):
+            folder, full_filename = self.resolve_model_path(request)
+            if folder is None:
+                return full_filename
+            if not os.path.isfile(full_filename):
+                return web.Response(status=404)
+            return web.json_response(await asyncio.to_thread(self.get_model_metadata, full_filename))
+
+    def resolve_model_path(self, request) -> tuple[str, str] | tuple[None, web.Response]:
+        """Returns the model folder and file a request's folder, path_index and filename refer to, or None and the error response."""
+        folder_name = request.match_info.get("folder", None)
+        filename = request.match_info.get("filename", None)
+
+        if folder_name not in folder_paths.folder_names_and_paths:
+            return None, web.Response(status=404)
+
+        # The "{filename:.*}" capture also matches the empty string, which
+        # would resolve to the folder itself; reject it explicitly.
+        if not filename:
+            return None, web.Response(status=400)
+
+        try:
+            path_index = int(request.match_info.get("path_index", None))
+        except (TypeError, ValueError):
+            return None, web.Response(status=400)
+
+        folders = folder_paths.folder_names_and_paths[folder_name]
+        if path_index < 0 or path_index >= len(folders[0]):
+            return None, web.Response(status=404)
+        folder = folders[0][path_index]
+        full_filename = os.path.normpath(os.path.join(folder, filename))
+
+        # Prevent path traversal: the requested file must stay within the
+        # configured model folder. `filename` is an unrestricted ".*" capture,
+        # so values like "../../../../etc/passwd" would otherwise escape it.
+        if not folder_paths.is_within_directory(folder, full_filename):
+            return None, web.Response(status=403)
+        return folder, full_filename
+
+    def get_model_metadata(self, filepath: str) -> dict:
+        """The safetensors metadata of a model file and the model type detected from its header, through the model config cache."""
+        result = {"metadata": {}, "model_type": None}
+        if not filepath.lower().endswith((".safetensors", ".sft")):
+            return result
+        header = comfy.utils.safetensors_header(filepath, max_size=8*1024*1024)
+        if header:
+            result["metadata"] = json.loads(header).get("__metadata__", {})
+        model_config = comfy.model_detection.model_config_from_safetensors_header(filepath)
+        if model_config is not None:
+            result["model_type"] = type(model_config).__name__
+        return result
+
     def get_model_file_list(self, folder_name: str):
         folder_name = map_legacy(folder_name)
         folders = folder_paths.folder_names_and_paths[folder_name]
@@ -0,0 +1,114 @@
+"""
+Cached /object_info responses.
+
+Building the node definitions calls INPUT_TYPES() of every node class, which
+lists model folders for loader nodes, and serializes several megabytes of JSON.
+The JSON of each class is kept until the filesystem generation changes (see
+folder_paths.get_filesystem_generation) or the class, or its display name, is
+replaced in nodes.NODE_CLASS_MAPPINGS, for example by a custom node that is
+loaded later. The full response is only rebuilt when one of them changes, is
+served with an ETag so clients can revalidate it without downloading it again,
+and is gzip compressed once per version instead of on every request.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import traceback
+from typing import Callable, Optional
+
+from aiohttp import web
+
+import folder_paths
+import nodes
+
+
+class ObjectInfoPayload:
+    """One version of the /object_info response."""
+    __slots__ = ("body", "etag", "gzip_body")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"{}"'.format(hashlib.blake2b(body, digest_size=16).hexdigest())
+        self.gzip_body: Optional[bytes] = None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ObjectInfoCache:
+    def __init__(self, node_info: Callable[[str, int], dict]):
+        """node_info(node_class, filesystem_generation) returns the definition of a node class."""
+        self.node_info = node_info
+        self.generation = None
+        self.node_classes = None
+        # node class name: (class, display name, JSON or None if node_info failed)
+        self.entries: dict[str, tuple[type, Optional[str], Optional[bytes]]] = {}
+        self.payload: Optional[ObjectInfoPayload] = None
+
+    def _check_generations(self):
+        generation = folder_paths.get_filesystem_generation()
+        if generation != self.generation:
+            self.generation = generation
+            self.entries = {}
+            self.payload = None
+        node_classes = (tuple(nodes.NODE_CLASS_MAPPINGS.items()), tuple(nodes.NODE_DISPLAY_NAME_MAPPINGS.items()))
+        if node_classes != self.node_classes:
+            self.node_classes = node_classes
+            self.payload = None
+
+    def _get_node_json(self, node_class: str) -> Optional[bytes]:
+        obj_class = nodes.NODE_CLASS_MAPPINGS[node_class]
+        display_name = nodes.NODE_DISPLAY_NAME_MAPPINGS.get(node_class)
+        entry = self.entries.get(node_class)
+        if entry is not None and entry[0] is obj_class and entry[1] == display_name:
+            return entry[2]
+        try:
+            node_json = json.dumps(self.node_info(node_class, self.generation)).encode()
+        except Exception:
+            logging.error(f"[ERROR] An error occurred while retrieving information for the '{node_class}' node.")
+            logging.error(traceback.format_exc())
+            node_json = None
+        self.entries[node_class] = (obj_class, display_name, node_json)
+        return node_json
+
+    def get_node_json(self, node_class: str) -> Optional[bytes]:
+        """The JSON definition of one node class, None if it doesn't exist or failed."""
+        self._check_generations()
+        if node_class not in nodes.NODE_CLASS_MAPPINGS:
+            return None
+        return self._get_node_json(node_class)
+
+    def get_payload(self) -> ObjectInfoPayload:
+        self._check_generations()
+        if self.payload is None:
+            parts = []
+            for node_class in list(nodes.NODE_CLASS_MAPPINGS):
+                node_json = self._get_node_json(node_class)
+                if node_json is not None:
+                    parts.append(json.dumps(node_class).encode() + b": " + node_json)
+            for node_class in set(self.entries).difference(nodes.NODE_CLASS_MAPPINGS):
+                del self.entries[node_class]
+            self.payload = ObjectInfoPayload(b"{" + b", ".join(parts) + b"}")
+        return self.payload
+
+    async def response(self, request: web.Request) -> web.Response:
+        payload = self.get_payload()
+        headers = {"ETag": payload.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("If-None-Match"), payload.etag):
+            return web.Response(status=304, headers=headers)
+        body = payload.body
+        if "gzip" in request.headers.get("Accept-Encoding", "").lower():
+            if payload.gzip_body is None:
+                payload.gzip_body = await asyncio.to_thread(gzip.compress, payload.body, 6)
+            body = payload.gzip_body
+            headers["Content-Encoding"] = "gzip"
+        return web.Response(body=body, content_type="application/json", headers=headers)
@@ -0,0 +1,166 @@
+"""
+Outgoing websocket messages of one client.
+
+Every client gets a WebSocketStream with its own sender task, so a slow client
+no longer holds up the messages of the others. Messages that carry the latest
+value of some state (queue status, progress, progress_state and previews)
+replace the unsent message for the same state: a client that cannot keep up,
+or is limited by --websocket-update-interval, skips intermediate updates
+instead of backing up. Every other message is sent, in order.
+
+Clients that set supports_progress_state_delta in their feature flags get
+progress_state_delta messages instead of progress_state. They hold only the
+nodes and fields that changed since the last one sent to the client; the first
+one of a prompt holds every active node.
+"""
+import asyncio
+import collections
+import logging
+from typing import Any, Optional
+
+import aiohttp
+
+from protocol import BinaryEventTypes
+
+# A client with more messages than this waiting to be sent is disconnected.
+MAX_PENDING_MESSAGES = 10000
+
+
+async def send_socket_catch_exception(function, message):
+    try:
+        await function(message)
+    except (aiohttp.ClientError, aiohttp.ClientPayloadError, ConnectionResetError, BrokenPipeError, ConnectionError) as err:
+        logging.warning("send error: {}".format(err))
+
+
+def get_update_key(event, data=None) -> Optional[tuple]:
+    """The state a message is the latest value of, None for messages that must all be sent."""
+    if event == "status":
+        return ("status",)
+    if event == "progress_state" and isinstance(data, dict):
+        return ("progress_state", data.get("prompt_id"))
+    if event == "progress" and isinstance(data, dict):
+        return ("progress", data.get("prompt_id"), data.get("node"))
+    if event == BinaryEventTypes.PREVIEW_IMAGE:
+        return ("preview", event)
+    if event == BinaryEventTypes.PREVIEW_IMAGE_WITH_METADATA:
+        # Previews of different nodes don't replace each other.
+        metadata = data if isinstance(data, dict) else {}
+        return ("preview", event, metadata.get("prompt_id"), metadata.get("node_id"))
+    return None
+
+
+def get_progress_state_delta(previous: Optional[dict], nodes: dict) -> dict:
+    """The nodes of a progress_state that are new or changed since previous, with only their changed fields."""
+    if not previous:
+        return nodes
+    delta = {}
+    for node_id, node in nodes.items():
+        old = previous.get(node_id)
+        if old is None:
+            delta[node_id] = node
+            continue
+        fields = {key: value for key, value in node.items() if old.get(key) != value}
+        if fields:
+            delta[node_id] = fields
+    return delta
+
+
+class _Message:
+    __slots__ = ("binary", "event", "data", "key", "superseded")
+
+    def __init__(self, binary: bool, event, data, key):
+        self.binary = binary
+        self.event = event
+        self.data = data
+        self.key = key
+        self.superseded = False
+
+
+class WebSocketStream:
+    def __init__(self, ws, interval: float = 0.0):
+        """interval: minimum seconds between two rounds of sending, so updates in between replace each other."""
+        self.ws = ws
+        self.interval = interval
+        self.delta = False
+        self.messages = collections.deque()
+        self.latest = {}
+        self.pending = 0
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.closed = False
+        # Last progress_state (prompt_id, nodes) and status sent, for delta clients.
+        self.sent_progress_state = None
+        self.sent_status = None
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    def close(self):
+        self.closed = True
+        if self.task is not None:
+            self.task.cancel()
+
+    def put_json(self, event, data: Any):
+        self._put(_Message(False, event, data, get_update_key(event, data)))
+
+    def put_bytes(self, event, message: bytes, metadata: Optional[dict] = None):
+        self._put(_Message(True, event, message, get_update_key(event, metadata)))
+
+    def _put(self, message: _Message):
+        if self.closed:
+            return
+        if message.key is not None:
+            previous = self.latest.get(message.key)
+            if previous is not None:
+                previous.superseded = True
+                self.pending -= 1
+            self.latest[message.key] = message
+        self.messages.append(message)
+        self.pending += 1
+        if self.pending > MAX_PENDING_MESSAGES:
+            logging.warning("websocket client is not receiving its messages, disconnecting it")
+            self.close()
+            asyncio.ensure_future(self.ws.close())
+            return
+        if len(self.messages) > 2 * self.pending + 64:
+            self.messages = collections.deque(m for m in self.messages if not m.superseded)
+        self.wakeup.set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            started = loop.time()
+            while self.messages:
+                message = self.messages.popleft()
+                if message.superseded:
+                    continue
+                self.pending -= 1
+                if message.key is not None:
+                    del self.latest[message.key]
+                await self.send(message)
+            if self.interval > 0:
+                await asyncio.sleep(max(0.0, started + self.interval - loop.time()))
+
+    async def send(self, message: _Message):
+        if message.binary:
+            await send_socket_catch_exception(self.ws.send_bytes, message.data)
+            return
+        event, data = message.event, message.data
+        if self.delta:
+            if event == "progress_state":
+                previous = None
+                if self.sent_progress_state is not None and self.sent_progress_state[0] == data["prompt_id"]:
+                    previous = self.sent_progress_state[1]
+                nodes = get_progress_state_delta(previous, data["nodes"])
+                self.sent_progress_state = (data["prompt_id"], data["nodes"])
+                if previous is not None and len(nodes) == 0:
+                    return
+                event, data = "progress_state_delta", {"prompt_id": data["prompt_id"], "nodes": nodes}
+            elif event == "status":
+                if data == self.sent_status:
+                    return
+                self.sent_status = data
+        await send_socket_catch_exception(self.ws.send_json, {"type": event, "data": data})
@@ -0,0 +1,72 @@
+"""
+Microbenchmark for output cache key generation on large synthetic graphs.
+
+Usage: python -m benchmarks.cache_key_signatures [--nodes 100 600 2000] [--fan-in 3]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from comfy.cli_args import args
+args.cpu = True
+
+import nodes
+from comfy_execution import caching
+from comfy_execution.caching import CacheKeySetInputSignature
+from comfy_execution.graph import DynamicPrompt
+
+
+class BenchmarkNode:
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {"required": {}}
+
+
+class NoIsChanged:
+    async def get(self, node_id):
+        return False
+
+
+def make_graph(num_nodes, fan_in, seed=0):
+    rng = random.Random(seed)
+    prompt = {}
+    for i in range(num_nodes):
+        inputs = {"seed": i, "text": "node {}".format(i), "strength": 1.0}
+        for j in range(min(i, fan_in)):
+            inputs["in_{}".format(j)] = [str(rng.randrange(max(0, i - 32), i)), 0]
+        prompt[str(i)] = {"class_type": "BenchmarkNode", "inputs": inputs}
+    return prompt
+
+
+async def build_keys(prompt):
+    key_set = CacheKeySetInputSignature(DynamicPrompt(prompt), list(prompt.keys()), NoIsChanged())
+    await key_set.add_keys(list(prompt.keys()))
+    return key_set
+
+
+def run(sizes, fan_in, repeats):
+    nodes.NODE_CLASS_MAPPINGS["BenchmarkNode"] = BenchmarkNode
+    print("{:>8} {:>12} {:>12}".format("nodes", "cold (ms)", "warm (ms)"))  # noqa: T201
+    for size in sizes:
+        prompt = make_graph(size, fan_in)
+        cold = []
+        warm = []
+        for _ in range(repeats):
+            caching._signature_digest_cache.clear()
+            start = time.perf_counter()
+            asyncio.run(build_keys(prompt))
+            cold.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            asyncio.run(build_keys(prompt))
+            warm.append(time.perf_counter() - start)
+        print("{:>8} {:>12.2f} {:>12.2f}".format(size, min(cold) * 1000, min(warm) * 1000))  # noqa: T201
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[100, 600, 2000, 5000])
+    parser.add_argument("--fan-in", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=3)
+    cli = parser.parse_args()
+    run(cli.nodes, cli.fan_in, cli.repeats)
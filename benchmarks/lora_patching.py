@@ -0,0 +1,81 @@
+"""
+Microbenchmark for applying several LoRAs to the weights of a model.
+
+Compares applying the LoRAs one by one, one rank stacked matmul per weight
+(comfy.lora.calculate_weight) and the same shaped weights batched together
+(comfy.lora.calculate_weights).
+
+Usage: python -m benchmarks.lora_patching [--layers 64] [--shape 1280 1280] [--loras 1 2 4] [--rank 32]
+"""
+import argparse
+import time
+
+from comfy.cli_args import args
+args.cpu = True
+
+import torch
+
+import comfy.lora
+import comfy.weight_adapter as weight_adapter
+
+
+def make_items(layers, shape, loras, rank):
+    out_dim, in_dim = shape
+    items = []
+    for i in range(layers):
+        patches = []
+        for _ in range(loras):
+            weights = (torch.randn(out_dim, rank), torch.randn(rank, in_dim), float(rank), None, None, None)
+            patches.append((0.8, weight_adapter.LoRAAdapter(set(), weights), 1.0, None, None))
+        items.append((patches, torch.randn(out_dim, in_dim), "layer.{}.weight".format(i)))
+    return items
+
+
+def one_by_one(items, device):
+    for patches, weight, key in items:
+        weight = weight.to(device, copy=True)
+        for p in patches:
+            weight = comfy.lora.calculate_weight([p], weight, key)
+
+
+def stacked(items, device):
+    for patches, weight, key in items:
+        comfy.lora.calculate_weight(patches, weight.to(device, copy=True), key)
+
+
+def batched(items, device):
+    comfy.lora.LOW_RANK_BATCH_CPU = True
+    comfy.lora.calculate_weights([(patches, weight.to(device, copy=True), key) for patches, weight, key in items])
+
+
+def measure(function, items, device, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(items, device)
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run(layers, shape, lora_counts, rank, repeats, device):
+    print("{:>6} {:>16} {:>13} {:>13} {:>9}".format("loras", "one by one (ms)", "stacked (ms)", "batched (ms)", "speedup"))  # noqa: T201
+    for loras in lora_counts:
+        items = make_items(layers, shape, loras, rank)
+        base = measure(one_by_one, items, device, repeats)
+        results = [measure(f, items, device, repeats) for f in (stacked, batched)]
+        print("{:>6} {:>16.1f} {:>13.1f} {:>13.1f} {:>8.2f}x".format(loras, base * 1000, results[0] * 1000, results[1] * 1000, base / min(results)))  # noqa: T201
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--layers", type=int, default=64)
+    parser.add_argument("--shape", type=int, nargs=2, default=[1280, 1280])
+    parser.add_argument("--loras", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--rank", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--device", default="cpu")
+    cli = parser.parse_args()
+    torch.manual_seed(0)
+    run(cli.layers, cli.shape, cli.loras, cli.rank, cli.repeats, torch.device(cli.device))
@@ -0,0 +1,91 @@
+"""
+Benchmark for reading a safetensors file with load_torch_file.
+
+Compares safetensors.safe_open (memory mapped, one tensor at a time) with
+comfy.utils.load_safetensors_parallel at several thread counts and reports
+GB/s with a cold and a warm page cache. The page cache of the file is dropped
+with posix_fadvise(POSIX_FADV_DONTNEED) before every cold run, which only
+works for pages that aren't dirty or mapped elsewhere, so run `sync` after
+creating the file.
+
+Usage: python -m benchmarks.safetensors_loading path/to/model.safetensors [--threads 1 4 8 16] [--chunk-mb 64]
+       python -m benchmarks.safetensors_loading --create 4 path/to/new.safetensors
+"""
+import argparse
+import os
+import time
+
+from comfy.cli_args import args
+args.cpu = True
+
+import safetensors
+import safetensors.torch
+import torch
+
+import comfy.utils
+
+
+def create_file(path, gigabytes):
+    count = max(1, int(gigabytes * 1024 / 64))
+    sd = {"layer.{}.weight".format(i): torch.randn(4096, 4096) for i in range(count)}
+    safetensors.torch.save_file(sd, path)
+
+
+def drop_page_cache(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def load_safe_open(path, device):
+    with safetensors.safe_open(path, framework="pt", device=device.type) as f:
+        return {k: f.get_tensor(k).to(device, copy=True) for k in f.keys()}
+
+
+def load_parallel(threads, chunk_size):
+    def load(path, device):
+        return comfy.utils.load_safetensors_parallel(path, device=device, threads=threads, chunk_size=chunk_size)[0]
+    return load
+
+
+def measure(function, path, device, cold, repeats):
+    times = []
+    for _ in range(repeats):
+        if cold:
+            drop_page_cache(path)
+        start = time.perf_counter()
+        sd = function(path, device)
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+        times.append(time.perf_counter() - start)
+        del sd
+    return min(times)
+
+
+def run(path, thread_counts, chunk_size, repeats, device):
+    size = os.path.getsize(path) / 1e9
+    loaders = [("safe_open", load_safe_open)] + [("parallel x{}".format(t), load_parallel(t, chunk_size)) for t in thread_counts]
+    print("{:.2f} GB, {} MB chunks".format(size, chunk_size // (1024 * 1024)))  # noqa: T201
+    print("{:>14} {:>12} {:>12}".format("loader", "cold (GB/s)", "warm (GB/s)"))  # noqa: T201
+    for name, function in loaders:
+        cold = measure(function, path, device, True, repeats)
+        warm = measure(function, path, device, False, repeats)
+        print("{:>14} {:>12.2f} {:>12.2f}".format(name, size / cold, size / warm))  # noqa: T201
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--create", type=float, default=None, metavar="GB", help="Write a file of random weights of this size to path and exit.")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--chunk-mb", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--device", default="cpu")
+    cli = parser.parse_args()
+    if cli.create is not None:
+        create_file(cli.path, cli.create)
+    else:
+        run(cli.path, cli.threads, cli.chunk_mb * 1024 * 1024, cli.repeats, torch.device(cli.device))
@@ -0,0 +1,67 @@
+"""
+Benchmark for comfy.utils.tiled_scale_multidim with and without batched tiles.
+
+The tiled function is a small stack of convolutions standing in for a VAE
+decoder or upscale model, run on 2D images and 3D videos. Each tile batch size
+is timed against running the tiles one at a time.
+
+Usage: python -m benchmarks.tiled_scale [--size 1024] [--frames 17] [--tile 64] [--batches 1 4 16] [--device cuda]
+"""
+import argparse
+import time
+
+from comfy.cli_args import args
+args.cpu = True
+
+import torch
+
+import comfy.utils
+
+
+def make_function(dims, channels, device):
+    conv = torch.nn.Conv2d if dims == 2 else torch.nn.Conv3d
+    model = torch.nn.Sequential(conv(4, channels, 3, padding=1), torch.nn.SiLU(), conv(channels, 3, 3, padding=1)).to(device)
+    scale = 2 if dims == 2 else (1, 2, 2)
+    return lambda x: model(torch.nn.functional.interpolate(x, scale_factor=scale, mode="nearest"))
+
+
+def measure(samples, function, tile, overlap, tile_batch_size, device, repeats):
+    upscale_amount = 2 if len(tile) == 2 else [1, 2, 2]
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        comfy.utils.tiled_scale_multidim(samples, function, tile=tile, overlap=overlap, upscale_amount=upscale_amount, out_channels=3, output_device=device, tile_batch_size=tile_batch_size)
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run(size, frames, tile, batches, channels, repeats, device):
+    cases = [
+        ("2d", torch.randn(1, 4, size // 8, size // 8, device=device), (tile, tile), 8),
+        ("3d", torch.randn(1, 4, frames, size // 16, size // 16, device=device), (frames, tile // 2, tile // 2), (1, 4, 4)),
+    ]
+    print("{:>4} {:>8} {:>10} {:>9}".format("dims", "batch", "time (ms)", "speedup"))  # noqa: T201
+    with torch.inference_mode():
+        for name, samples, tile_shape, overlap in cases:
+            function = make_function(len(tile_shape), channels, device)
+            base = None
+            for tile_batch_size in batches:
+                t = measure(samples, function, tile_shape, overlap, tile_batch_size, device, repeats)
+                base = t if base is None else base
+                print("{:>4} {:>8} {:>10.1f} {:>8.2f}x".format(name, tile_batch_size, t * 1000, base / t))  # noqa: T201
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1024, help="Output image size in pixels, latents are 1/8 (2D) or 1/16 (3D) of it.")
+    parser.add_argument("--frames", type=int, default=17)
+    parser.add_argument("--tile", type=int, default=64)
+    parser.add_argument("--batches", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--channels", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--device", default="cpu")
+    cli = parser.parse_args()
+    torch.manual_seed(0)
+    run(cli.size, cli.frames, cli.tile, cli.batches, cli.channels, cli.repeats, torch.device(cli.device))
@@ -0,0 +1,98 @@
+"""
+Benchmark for validating a burst of API prompt submissions.
+
+Validates an img2img workflow (checkpoint loader, LoadImage, KSampler, SaveImage)
+against folders holding --models checkpoints and --images input images:
+
+  uncached: INPUT_TYPES() called for every node of every prompt, as before the schema cache
+  cached:   one validate_prompt call per prompt, as POST /prompt does
+  batched:  all prompts in one validate_prompts call
+
+Usage: python -m benchmarks.validate_prompts [--prompts 1000] [--models 500] [--images 2000]
+"""
+import argparse
+import asyncio
+import copy
+import os
+import tempfile
+import time
+
+from comfy.cli_args import args
+args.cpu = True
+
+import folder_paths
+import execution
+from comfy_execution.validation import input_schema_cache
+
+
+def make_prompt(seed):
+    return {
+        "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "model_0007.safetensors"}},
+        "6": {"class_type": "CLIPTextEncode", "inputs": {"text": "a photo of a cat", "clip": ["4", 1]}},
+        "7": {"class_type": "CLIPTextEncode", "inputs": {"text": "blurry", "clip": ["4", 1]}},
+        "10": {"class_type": "LoadImage", "inputs": {"image": "image_0042.png"}},
+        "11": {"class_type": "VAEEncode", "inputs": {"pixels": ["10", 0], "vae": ["4", 2]}},
+        "3": {"class_type": "KSampler", "inputs": {
+            "seed": seed, "steps": 20, "cfg": 7.0, "sampler_name": "euler", "scheduler": "normal", "denoise": 0.6,
+            "model": ["4", 0], "positive": ["6", 0], "negative": ["7", 0], "latent_image": ["11", 0]}},
+        "8": {"class_type": "VAEDecode", "inputs": {"samples": ["3", 0], "vae": ["4", 2]}},
+        "9": {"class_type": "SaveImage", "inputs": {"filename_prefix": "ComfyUI", "images": ["8", 0]}},
+    }
+
+
+def make_folders(root, num_models, num_images):
+    checkpoints = os.path.join(root, "checkpoints")
+    inputs = os.path.join(root, "input")
+    os.makedirs(checkpoints)
+    os.makedirs(inputs)
+    for i in range(num_models):
+        open(os.path.join(checkpoints, "model_{:04}.safetensors".format(i)), "wb").close()
+    for i in range(num_images):
+        open(os.path.join(inputs, "image_{:04}.png".format(i)), "wb").close()
+    folder_paths.folder_names_and_paths["checkpoints"] = ([checkpoints], folder_paths.supported_pt_extensions)
+    folder_paths.set_input_directory(inputs)
+
+
+async def uncached(prompts):
+    results = []
+    for i, prompt in enumerate(prompts):
+        input_schema_cache.invalidate()
+        results.append(await execution.validate_prompt(str(i), prompt, None))
+    return results
+
+
+async def cached(prompts):
+    return [await execution.validate_prompt(str(i), prompt, None) for i, prompt in enumerate(prompts)]
+
+
+async def batched(prompts):
+    return await execution.validate_prompts([(str(i), prompt, None) for i, prompt in enumerate(prompts)])
+
+
+def run(num_prompts, num_models, num_images, repeats):
+    with tempfile.TemporaryDirectory() as root:
+        make_folders(root, num_models, num_images)
+        template = [make_prompt(seed) for seed in range(num_prompts)]
+        print("{} prompts, {} checkpoints, {} input images".format(num_prompts, num_models, num_images))  # noqa: T201
+        print("{:>10} {:>12} {:>14}".format("mode", "total (ms)", "prompts/s"))  # noqa: T201
+        for name, validate in (("uncached", uncached), ("cached", cached), ("batched", batched)):
+            times = []
+            for _ in range(repeats):
+                input_schema_cache.invalidate()
+                prompts = copy.deepcopy(template)
+                start = time.perf_counter()
+                results = asyncio.run(validate(prompts))
+                times.append(time.perf_counter() - start)
+                assert all(r[0] for r in results), results[0]
+            best = min(times)
+            print("{:>10} {:>12.1f} {:>14.0f}".format(name, best * 1000, num_prompts / best))  # noqa: T201
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prompts", type=int, default=1000)
+    parser.add_argument("--models", type=int, default=500)
+    parser.add_argument("--images", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=3)
+    cli = parser.parse_args()
+    run(cli.prompts, cli.models, cli.images, cli.repeats)
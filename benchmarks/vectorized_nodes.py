@@ -0,0 +1,73 @@
+"""
+Benchmark for running a node on list inputs per item and VECTORIZED.
+
+The node scales a FLOAT and an IMAGE input. The per item version is called once
+per list item; the vectorized one once for the whole list, taking the images as
+one stacked tensor. With --broadcast the image list has a single image that is
+used for every item.
+
+Usage: python -m benchmarks.vectorized_nodes [--items 100 1000 10000] [--size 8] [--broadcast]
+"""
+import argparse
+import asyncio
+import time
+
+import torch
+
+from comfy.cli_args import args
+args.cpu = True
+
+from execution import get_output_data
+
+
+class ScalePerItem:
+    RETURN_TYPES = ("FLOAT", "IMAGE")
+    FUNCTION = "run"
+
+    def run(self, value, image):
+        return (value * 2.0, image * 0.5)
+
+
+class ScaleVectorized(ScalePerItem):
+    VECTORIZED = True
+
+    def run(self, value, image):
+        return ((value.stack() * 2.0).tolist(), image.stack() * 0.5)
+
+
+def make_inputs(items, size, broadcast):
+    images = [torch.rand(1, size, size, 3) for _ in range(1 if broadcast else items)]
+    return {"value": [float(i) for i in range(items)], "image": images}
+
+
+async def measure(node, inputs, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output, _, _, _ = await get_output_data("benchmark", "1", node, inputs)
+        best = min(best, time.perf_counter() - start)
+    return best, output
+
+
+def run(items_list, size, broadcast, repeats):
+    torch.set_num_threads(1)
+    print("{:>8} {:>14} {:>16} {:>9}".format("items", "per item (ms)", "vectorized (ms)", "speedup"))  # noqa: T201
+    for items in items_list:
+        inputs = make_inputs(items, size, broadcast)
+        times = {}
+        for node in (ScalePerItem(), ScaleVectorized()):
+            best, output = asyncio.run(measure(node, inputs, repeats))
+            assert len(output[0]) == items and len(output[1]) == items
+            times[type(node)] = best
+        per_item, vectorized = times[ScalePerItem], times[ScaleVectorized]
+        print("{:>8} {:>14.2f} {:>16.2f} {:>8.1f}x".format(items, per_item * 1000, vectorized * 1000, per_item / vectorized))  # noqa: T201
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--size", type=int, default=8, help="Width and height of the images.")
+    parser.add_argument("--broadcast", action="store_true")
+    parser.add_argument("--repeats", type=int, default=3)
+    cli = parser.parse_args()
+    run(cli.items, cli.size, cli.broadcast, cli.repeats)
@@ -41,8 +41,11 @@ parser.add_argument("--tls-keyfile", type=str, help="Path to TLS (SSL) key file.
 parser.add_argument("--tls-certfile", type=str, help="Path to TLS (SSL) certificate file. Enables TLS, makes app accessible at https://... requires --tls-keyfile to function")
 parser.add_argument("--enable-cors-header", type=str, default=None, metavar="ORIGIN", nargs="?", const="*", help="Enable CORS (Cross-Origin Resource Sharing) with optional origin or allow all with default '*'.")
 parser.add_argument("--max-upload-size", type=float, default=100, help="Set the maximum upload size in MB.")
+parser.add_argument("--websocket-update-interval", type=float, default=0, metavar="MS", help="Send progress, preview and queue status updates to each websocket client at most once every MS milliseconds, newer updates replace the ones not sent yet. Updates for clients that cannot keep up are always replaced this way.")
 
 parser.add_argument("--base-directory", type=str, default=None, help="Set the ComfyUI base directory for models, custom_nodes, input, output, temp, and user directories.")
+parser.add_argument("--folder-index", type=str, nargs="?", const="auto", default=None, choices=["auto", "inotify", "poll"], help="Keep an in-memory index of the files in the model folders instead of listing them on every request. The index is updated with inotify (auto uses it when available) or by polling the folders for changes.")
+parser.add_argument("--folder-index-poll-interval", type=float, default=10.0, metavar="SECONDS", help="How often --folder-index checks the folders it can't watch with inotify for changes.")
 parser.add_argument("--extra-model-paths-config", type=str, default=None, metavar="PATH", nargs='+', action='append', help="Load one or more extra_model_paths.yaml files.")
 parser.add_argument("--output-directory", type=str, default=None, help="Set the ComfyUI output directory. Overrides --base-directory.")
 parser.add_argument("--temp-directory", type=str, default=None, help="Set the ComfyUI temp directory (default is in the ComfyUI directory). Overrides --base-directory.")
@@ -116,6 +119,13 @@ cache_group.add_argument("--cache-classic", action="store_true", help="Use the o
 cache_group.add_argument("--cache-lru", type=int, default=0, help="Use LRU caching with a maximum of N node results cached. May use more RAM/VRAM.")
 cache_group.add_argument("--cache-none", action="store_true", help="Reduced RAM/VRAM usage at the expense of executing every node for each run.")
 cache_group.add_argument("--high-ram", action="store_true", help="Can improve performance slightly on high RAM or on systems where pagefile use is preferred over model loading.")
+parser.add_argument("--cache-disk", type=float, default=0, metavar="GB", help="Also keep serializable node outputs (latents, conditionings, images) in a local disk cache of at most GB size so they survive restarts. Works together with any of the cache modes above.")
+parser.add_argument("--cache-disk-directory", type=str, default=None, help="Directory used by --cache-disk. Defaults to the __cache system user directory.")
+parser.add_argument("--patched-weight-cache", type=float, default=0, metavar="GB", help="Keep up to GB of model weights with LoRAs and other patches applied, so reloading a model with the same patches doesn't calculate them again. Kept in RAM unless --patched-weight-cache-directory is set.")
+parser.add_argument("--patched-weight-cache-directory", type=str, default=None, help="Keep the --patched-weight-cache entries in this directory instead of RAM, so they survive restarts.")
+parser.add_argument("--prefetch-models", type=int, default=0, metavar="PROMPTS", help="While a prompt runs, read the model files used by the next PROMPTS queued prompts into RAM in the background so switching models between jobs doesn't wait for the disk.")
+parser.add_argument("--prefetch-models-ram", type=float, default=16.0, metavar="GB", help="Most RAM used by --prefetch-models.")
+parser.add_argument("--plan-model-residency", type=int, nargs="?", const=4, default=None, metavar="PROMPTS", help="When VRAM runs out, unload the models the next PROMPTS queued prompts (default: 4) don't use first and the one needed last after them, instead of the least recently loaded ones. Logs the bytes of model weights moved per prompt.")
 
 attn_group = parser.add_mutually_exclusive_group()
 attn_group.add_argument("--use-split-cross-attention", action="store_true", help="Use the split cross attention optimization. Ignored when xformers is used.")
@@ -153,6 +163,9 @@ parser.add_argument("--disable-dynamic-vram", action="store_true", help="Disable
 parser.add_argument("--enable-dynamic-vram", action="store_true", help="Enable dynamic VRAM on systems where it's not enabled by default.")
 parser.add_argument("--fast-disk", action="store_true", help="Prefer disk-backed dynamic loading and offload over unpinned RAM. Can be faster for users with fast NVME disks.")
 
+parser.add_argument("--parallel-cpu-nodes", type=int, default=0, metavar="NUM_THREADS", help="Run ready nodes that are marked THREAD_SAFE on a pool of NUM_THREADS worker threads so independent branches (image loading, resizing, ...) overlap with the node running on the GPU. Disabled by default.")
+parser.add_argument("--gpu-workers", type=str, default=None, metavar="DEVICE_IDS", help="Run one prompt executor per device from a single server, as a comma-separated list of device ids (e.g. '0,1'). Queued prompts go to idle workers, preferring the one that last ran the same models. By default a single executor runs on the default device.")
+
 parser.add_argument("--force-non-blocking", action="store_true", help="Force ComfyUI to use non-blocking operations for all applicable tensors. This may improve performance on some non-Nvidia systems but can cause issues with some workflows.")
 
 parser.add_argument("--default-hashing-function", type=str, choices=['md5', 'sha1', 'sha256', 'sha512'], default='sha256', help="Allows you to choose the hash function to use for duplicate filename / contents comparison. Default is sha256.")
@@ -174,6 +187,8 @@ parser.add_argument("--disable-pinned-memory", action="store_true", help="Disabl
 
 parser.add_argument("--mmap-torch-files", action="store_true", help="Use mmap when loading ckpt/pt files.")
 parser.add_argument("--disable-mmap", action="store_true", help="Don't use mmap when loading safetensors.")
+parser.add_argument("--disable-model-config-cache", action="store_true", help="Don't keep the detected configs of loaded model files on disk, detect them again on every load.")
+parser.add_argument("--parallel-load", type=int, nargs="?", const=0, default=None, metavar="THREADS", help="Read large safetensors files into RAM with a pool of THREADS threads (default: up to 8) in big chunks instead of memory mapping them. Can be much faster on fast NVMe drives.")
 
 parser.add_argument("--dont-print-server", action="store_true", help="Don't print server output.")
 parser.add_argument("--quick-test-for-ci", action="store_true", help="Quick test for CI.")
@@ -21,7 +21,10 @@ import comfy.utils
 import comfy.model_management
 import comfy.model_base
 import comfy.weight_adapter as weight_adapter
+import collections
 import logging
+import re
+import threading
 import torch
 
 LORA_CLIP_MAP = {
@@ -34,10 +37,32 @@ LORA_CLIP_MAP = {
 }
 
 
+_KEY_SEPARATOR = re.compile(r"[._]")
+
+
+def get_lora_key_prefixes(lora) -> set[str]:
+    """
+    Every prefix of a key of lora that ends right before a "." or "_".
+
+    The names load_lora and the weight adapters look up for a key map entry x are
+    x followed by a suffix starting with "." or "_", so only the key map entries
+    in this set can load anything. Finding them once is much faster than looking
+    up every name for every entry of the key map.
+    """
+    prefixes = set()
+    for k in lora.keys():
+        for m in _KEY_SEPARATOR.finditer(k):
+            prefixes.add(k[:m.start()])
+    return prefixes
+
+
 def load_lora(lora, to_load, log_missing=True):
     patch_dict = {}
     loaded_keys = set()
+    prefixes = get_lora_key_prefixes(lora)
     for x in to_load:
+        if x not in prefixes:
+            continue
         alpha_name = "{}.alpha".format(x)
         alpha = None
         if alpha_name in lora.keys():
@@ -94,8 +119,7 @@ def load_lora(lora, to_load, log_missing=True):
 
     return patch_dict
 
-def model_lora_keys_clip(model, key_map={}):
-    sdk = model.state_dict().keys()
+def _model_lora_keys_clip(sdk, key_map):
     prefix_set = set()
     for k in sdk:
         if k.endswith(".weight"):
@@ -184,9 +208,7 @@ def model_lora_keys_clip(model, key_map={}):
 
     return key_map
 
-def model_lora_keys_unet(model, key_map={}):
-    sd = model.state_dict()
-    sdk = sd.keys()
+def _model_lora_keys_unet(model, sdk, key_map):
 
     for k in sdk:
         if k.startswith("diffusion_model."):
@@ -377,6 +399,46 @@ def model_lora_keys_unet(model, key_map={}):
     return key_map
 
 
+# Key maps are the same for every model with the same architecture and weights,
+# and LoRAs are often applied to a few models over and over.
+KEY_MAP_CACHE_SIZE = 8
+_key_map_cache = collections.OrderedDict()
+_key_map_cache_lock = threading.Lock()
+
+
+def _get_key_map(cache_key, build):
+    """The key map of cache_key, build() makes it when it isn't cached. Cached key maps must not be modified."""
+    with _key_map_cache_lock:
+        key_map = _key_map_cache.get(cache_key)
+        if key_map is not None:
+            _key_map_cache.move_to_end(cache_key)
+            return key_map
+    key_map = build()
+    with _key_map_cache_lock:
+        _key_map_cache[cache_key] = key_map
+        while len(_key_map_cache) > KEY_MAP_CACHE_SIZE:
+            _key_map_cache.popitem(last=False)
+    return key_map
+
+
+def _config_key(config):
+    return tuple(sorted((k, repr(v)) for k, v in config.items()))
+
+
+def model_lora_keys_clip(model, key_map={}):
+    sdk = model.state_dict().keys()
+    cache_key = ("clip", type(model), tuple(sdk))
+    key_map.update(_get_key_map(cache_key, lambda: _model_lora_keys_clip(sdk, {})))
+    return key_map
+
+
+def model_lora_keys_unet(model, key_map={}):
+    sdk = model.state_dict().keys()
+    cache_key = ("unet", type(model), _config_key(model.model_config.unet_config), tuple(sdk))
+    key_map.update(_get_key_map(cache_key, lambda: _model_lora_keys_unet(model, sdk, {})))
+    return key_map
+
+
 def pad_tensor_to_shape(tensor: torch.Tensor, new_shape: list[int]) -> torch.Tensor:
     """
     Pad a tensor to a new shape with zeros.
@@ -435,8 +497,125 @@ def calculate_shape(patches, weight, key, original_weights=None):
 
     return current_shape
 
-def calculate_weight(patches, weight, key, intermediate_dtype=torch.float32, original_weights=None):
+# Plain low rank patches (LoRAs without mid, dora or reshape weights) on the same weight
+# are applied together: their up and down matrices are concatenated along the rank so
+# the sum of their diffs is a single matmul, instead of one matmul and one full size
+# diff per LoRA. Weights of the same shape can also be batched, see calculate_weights.
+LOW_RANK_BATCH_MEMORY = 64 * 1024 * 1024
+LOW_RANK_BATCH_CPU = False
+
+
+def _is_low_rank_patch(p, weight):
+    v = p[1]
+    if type(v) is not weight_adapter.LoRAAdapter or p[2] != 1.0 or p[3] is not None or p[4] is not None:
+        return False
+    up, down, _, mid, dora_scale, reshape = v.weights
+    if mid is not None or dora_scale is not None or reshape is not None:
+        return False
+    return up.shape[0] * down.shape[1:].numel() == weight.numel()
+
+
+def _low_rank_runs(patches, weight):
+    """Yields the patches, with every run of two or more plain low rank patches yielded as a list."""
+    run = []
+    for p in patches:
+        if _is_low_rank_patch(p, weight):
+            run.append(p)
+            continue
+        if len(run) > 1:
+            yield run
+        else:
+            yield from run
+        run = []
+        yield p
+    if len(run) > 1:
+        yield run
+    else:
+        yield from run
+
+
+def stack_low_rank_patches(patches, device, intermediate_dtype=torch.float32):
+    """The up (out, rank) and down (rank, in) matrices, with the strengths and alphas in up, of the sum of patches."""
+    ups = []
+    downs = []
     for p in patches:
+        up, down, alpha = p[1].weights[:3]
+        down = comfy.model_management.cast_to_device(down, device, intermediate_dtype).flatten(start_dim=1)
+        scale = p[0] * (alpha / down.shape[0] if alpha is not None else 1.0)
+        ups.append(comfy.model_management.cast_to_device(up, device, intermediate_dtype).flatten(start_dim=1) * scale)
+        downs.append(down)
+    return torch.cat(ups, dim=1), torch.cat(downs, dim=0)
+
+
+def _apply_low_rank_patches(patches, weight, key, intermediate_dtype, original_weights):
+    if patches[0][1].weights[0].shape[0] * patches[0][1].weights[1].shape[1:].numel() != weight.numel():
+        # The weight was padded by an earlier patch.
+        for p in patches:
+            weight = p[1].calculate_weight(weight, key, p[0], p[2], p[3], lambda a: a, intermediate_dtype, original_weights)
+        return weight
+    try:
+        up, down = stack_low_rank_patches(patches, weight.device, intermediate_dtype)
+        diff = torch.mm(up, down).reshape(weight.shape).type(weight.dtype)
+    except Exception as e:
+        logging.error("ERROR {} {} {}".format("lora", key, e))
+        for p in patches:
+            weight = p[1].calculate_weight(weight, key, p[0], p[2], p[3], lambda a: a, intermediate_dtype, original_weights)
+        return weight
+    weight += diff
+    return weight
+
+
+def calculate_weights(items, intermediate_dtype=torch.float32, original_weights=None):
+    """
+    calculate_weight for a list of (patches, weight, key), returns the list of patched weights.
+
+    Weights of the same shape, patched only by plain low rank patches with the same total
+    rank, get their diffs from one batched matmul. This saves kernel launches on GPUs, on
+    the CPU patching the weights one at a time is faster (it keeps them in cache) so they
+    are only batched there when LOW_RANK_BATCH_CPU is set.
+    """
+    results = [None] * len(items)
+    groups = {}
+    for i, (patches, weight, key) in enumerate(items):
+        if (LOW_RANK_BATCH_CPU or weight.device.type != "cpu") and len(patches) > 0 and all(_is_low_rank_patch(p, weight) for p in patches):
+            rank = sum(p[1].weights[1].shape[0] for p in patches)
+            groups.setdefault((weight.shape, weight.dtype, weight.device, rank), []).append(i)
+        else:
+            results[i] = calculate_weight(patches, weight, key, intermediate_dtype=intermediate_dtype, original_weights=original_weights)
+
+    for (shape, _, device, _), indexes in groups.items():
+        diff_size = shape.numel() * intermediate_dtype.itemsize
+        batch_size = max(1, LOW_RANK_BATCH_MEMORY // max(1, diff_size))
+        for start in range(0, len(indexes), batch_size):
+            batch = indexes[start:start + batch_size]
+            if len(batch) == 1:
+                patches, weight, key = items[batch[0]]
+                results[batch[0]] = calculate_weight(patches, weight, key, intermediate_dtype=intermediate_dtype, original_weights=original_weights)
+                continue
+            try:
+                stacks = [stack_low_rank_patches(items[i][0], device, intermediate_dtype) for i in batch]
+                diffs = torch.bmm(torch.stack([s[0] for s in stacks]), torch.stack([s[1] for s in stacks]))
+                del stacks
+            except Exception as e:
+                logging.error("ERROR {} {} {}".format("lora", [items[i][2] for i in batch], e))
+                for i in batch:
+                    patches, weight, key = items[i]
+                    results[i] = calculate_weight(patches, weight, key, intermediate_dtype=intermediate_dtype, original_weights=original_weights)
+                continue
+            for i, diff in zip(batch, diffs):
+                weight = items[i][1]
+                weight += diff.reshape(shape).type(weight.dtype)
+                results[i] = weight
+            del diffs
+    return results
+
+
+def calculate_weight(patches, weight, key, intermediate_dtype=torch.float32, original_weights=None):
+    for p in _low_rank_runs(patches, weight):
+        if isinstance(p, list):
+            weight = _apply_low_rank_patches(p, weight, key, intermediate_dtype, original_weights)
+            continue
+
         strength = p[0]
         v = p[1]
         strength_model = p[2]
@@ -0,0 +1,119 @@
+"""
+Persistent cache of detected model configs.
+
+model_detection.detect_unet_config looks at every key of a state dict, which
+for big checkpoints takes a noticeable time on every load of the same file. The
+detected unet config is stored in a JSON file keyed by the path of the model
+file and how it was loaded, and is only used while the size and mtime of the
+file and the ComfyUI version match the ones it was detected with.
+"""
+import json
+import logging
+import os
+import threading
+
+import torch
+
+from comfyui_version import __version__
+
+# Set by main.py, None when the cache is disabled.
+model_config_cache = None
+
+
+def encode_config(value):
+    """Converts a unet config into JSON, keeping the tuples and torch dtypes the model configs compare against."""
+    if isinstance(value, dict):
+        if not all(isinstance(k, str) for k in value):
+            raise TypeError("Unsupported unet config key")
+        return {"dict": {k: encode_config(v) for k, v in value.items()}}
+    if isinstance(value, tuple):
+        return {"tuple": [encode_config(v) for v in value]}
+    if isinstance(value, list):
+        return [encode_config(v) for v in value]
+    if isinstance(value, torch.dtype):
+        return {"dtype": str(value).split(".")[-1]}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    raise TypeError("Unsupported unet config value of type {}".format(type(value).__name__))
+
+
+def decode_config(value):
+    if isinstance(value, list):
+        return [decode_config(v) for v in value]
+    if isinstance(value, dict):
+        if "dict" in value:
+            return {k: decode_config(v) for k, v in value["dict"].items()}
+        if "tuple" in value:
+            return tuple(decode_config(v) for v in value["tuple"])
+        if "dtype" in value:
+            return getattr(torch, value["dtype"])
+    return value
+
+
+class ModelConfigCache:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = None
+
+    def _load(self):
+        if self.entries is not None:
+            return
+        self.entries = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == __version__:
+                self.entries = data.get("entries", {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.warning("Could not read the model config cache {}: {}".format(self.path, e))
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = "{}.{}.tmp".format(self.path, threading.get_ident())
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": __version__, "entries": self.entries}, f)
+        os.replace(temp_path, self.path)
+
+    @staticmethod
+    def _file_key(file_path):
+        stat = os.stat(file_path)
+        return os.path.abspath(file_path), [stat.st_size, stat.st_mtime_ns]
+
+    def get(self, file_path, kind):
+        """Returns (True, unet_config) if the config of file_path loaded as kind is cached, (False, None) otherwise. unet_config can be None when detection failed."""
+        try:
+            path, stat = self._file_key(file_path)
+        except OSError:
+            return False, None
+        with self.lock:
+            self._load()
+            entry = self.entries.get("{}:{}".format(kind, path))
+        if entry is None or entry["stat"] != stat:
+            return False, None
+        return True, decode_config(entry["unet_config"])
+
+    def put(self, file_path, kind, unet_config):
+        try:
+            path, stat = self._file_key(file_path)
+            entry = {"stat": stat, "unet_config": encode_config(unet_config)}
+        except (OSError, TypeError) as e:
+            logging.debug("Not caching the model config of {}: {}".format(file_path, e))
+            return
+        with self.lock:
+            self._load()
+            self.entries["{}:{}".format(kind, path)] = entry
+            try:
+                self._save()
+            except OSError as e:
+                logging.warning("Could not write the model config cache {}: {}".format(self.path, e))
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
@@ -1,5 +1,7 @@
+import bisect
 import json
 import comfy.memory_management
+import comfy.model_config_cache
 import comfy.supported_models
 import comfy.supported_models_base
 import comfy.utils
@@ -7,8 +9,26 @@ import math
 import logging
 import torch
 
+class StateDictKeys(list):
+    """The keys of a state dict in their original order, indexed for fast membership and prefix checks."""
+    def __init__(self, keys):
+        super().__init__(keys)
+        self.key_set = set(self)
+        self.sorted_keys = sorted(self.key_set)
+
+    def __contains__(self, key):
+        return key in self.key_set
+
+    def has_prefix(self, prefix):
+        i = bisect.bisect_left(self.sorted_keys, prefix)
+        return i < len(self.sorted_keys) and self.sorted_keys[i].startswith(prefix)
+
 def count_blocks(state_dict_keys, prefix_string):
     count = 0
+    if isinstance(state_dict_keys, StateDictKeys):
+        while state_dict_keys.has_prefix(prefix_string.format(count)):
+            count += 1
+        return count
     while True:
         c = False
         for k in state_dict_keys:
@@ -42,7 +62,7 @@ def calculate_transformer_depth(prefix, state_dict_keys, state_dict):
     return None
 
 def detect_unet_config(state_dict, key_prefix, metadata=None):
-    state_dict_keys = list(state_dict.keys())
+    state_dict_keys = StateDictKeys(state_dict.keys())
 
     if '{}joint_blocks.0.context_block.attn.qkv.weight'.format(key_prefix) in state_dict_keys: #mmdit model
         unet_config = {}
@@ -1127,8 +1147,19 @@ def model_config_from_unet_config(unet_config, state_dict=None):
     logging.error("no match {}".format(unet_config))
     return None
 
-def model_config_from_unet(state_dict, unet_key_prefix, use_base_if_no_match=False, metadata=None):
-    unet_config = detect_unet_config(state_dict, unet_key_prefix, metadata=metadata)
+def detect_unet_config_cached(state_dict, key_prefix, metadata=None, cache_key=None):
+    """detect_unet_config that goes through the model config cache when cache_key, a (file path, kind) tuple, is given."""
+    cache = comfy.model_config_cache.model_config_cache
+    if cache is None or cache_key is None:
+        return detect_unet_config(state_dict, key_prefix, metadata=metadata)
+    found, unet_config = cache.get(*cache_key)
+    if not found:
+        unet_config = detect_unet_config(state_dict, key_prefix, metadata=metadata)
+        cache.put(*cache_key, unet_config)
+    return unet_config
+
+def model_config_from_unet(state_dict, unet_key_prefix, use_base_if_no_match=False, metadata=None, cache_key=None):
+    unet_config = detect_unet_config_cached(state_dict, unet_key_prefix, metadata=metadata, cache_key=cache_key)
     if unet_config is None:
         return None
     model_config = model_config_from_unet_config(unet_config, state_dict)
@@ -1166,6 +1197,50 @@ def unet_prefix_from_state_dict(state_dict):
         return "model." #aura flow and others
 
 
+def header_state_dict(header):
+    """A state dict of meta tensors with the keys, shapes and dtypes of a parsed safetensors header."""
+    sd = {}
+    for k, info in header.items():
+        if k == "__metadata__":
+            continue
+        sd[k] = torch.empty(info["shape"], dtype=comfy.utils._TYPES[info["dtype"]], device="meta")
+    return sd
+
+def _header_detection_inputs(header, kind):
+    # Same steps as load_state_dict_guess_config and load_diffusion_model_state_dict take before detecting the config.
+    sd = header_state_dict(header)
+    metadata = header.get("__metadata__", None)
+    if kind == "checkpoint":
+        key_prefix = unet_prefix_from_state_dict(sd)
+        sd, metadata = comfy.utils.convert_old_quants(sd, key_prefix, metadata=metadata)
+        return sd, key_prefix, metadata
+    sd, metadata = comfy.utils.convert_old_quants(sd, "", metadata=metadata)
+    temp_sd = comfy.utils.state_dict_prefix_replace(sd, {unet_prefix_from_state_dict(sd): ""}, filter_keys=True)
+    if len(temp_sd) > 0:
+        sd, metadata = comfy.utils.convert_old_quants(temp_sd, "", metadata=metadata)
+    return sd, "", metadata
+
+def model_config_from_safetensors_header(path):
+    """
+    Detects the model config of a checkpoint or diffusion model from its safetensors header only, without
+    reading any weights. Uses and fills the model config cache. Returns None when the model can't be detected this way.
+    """
+    header = comfy.utils.safetensors_header(path)
+    if header is None:
+        return None
+    header = json.loads(header)
+    for kind in ("checkpoint", "diffusion_model"):
+        try:
+            sd, key_prefix, metadata = _header_detection_inputs(header, kind)
+            unet_config = detect_unet_config_cached(sd, key_prefix, metadata=metadata, cache_key=(path, kind))
+        except Exception as e:
+            # Some detections need the weight values, which meta tensors don't have.
+            logging.debug("Could not detect the model config of {} from its header: {}".format(path, e))
+            return None
+        if unet_config is not None:
+            return model_config_from_unet_config(unet_config, sd)
+    return None
+
 def convert_config(unet_config):
     new_config = unet_config.copy()
     num_res_blocks = new_config.get("num_res_blocks", None)
@@ -28,10 +28,11 @@ import platform
 import weakref
 import gc
 import os
-from contextlib import contextmanager, nullcontext
+from contextlib import ExitStack, contextmanager, nullcontext
 import comfy.memory_management
 import comfy.utils
 import comfy.quant_ops
+import comfy.residency_planner
 import comfy_aimdo.host_buffer
 import comfy_aimdo.vram_buffer
 
@@ -608,6 +609,27 @@ except:
     pass
 
 current_loaded_models: list[LoadedModel] = []
+# With several prompt workers (--gpu-workers) loading and unloading models at once, current_loaded_models is
+# only read and changed under current_loaded_models_lock, which is never held for long. Loading and unloading
+# the models of a device holds the lock of that device instead, so workers on different devices don't wait
+# for each other.
+current_loaded_models_lock = threading.RLock()
+device_loading_locks = {}
+
+def device_loading_lock(device):
+    with current_loaded_models_lock:
+        lock = device_loading_locks.get(device)
+        if lock is None:
+            lock = device_loading_locks[device] = threading.RLock()
+        return lock
+
+@contextmanager
+def devices_loading_locked(devices):
+    """Holds the loading locks of devices, always taken in the same order so workers can't deadlock."""
+    with ExitStack() as stack:
+        for device in sorted(set(devices), key=str):
+            stack.enter_context(device_loading_lock(device))
+        yield
 
 DIRTY_MMAPS = set()
 
@@ -804,15 +826,26 @@ def minimum_inference_memory():
 
 def free_memory(memory_required, device, keep_loaded=[], for_dynamic=False, pins_required=0, ram_required=0):
     cleanup_models_gc()
+    with current_loaded_models_lock:
+        devices = [device] if device is not None else [m.device for m in current_loaded_models]
+    with devices_loading_locked(devices):
+        return _free_memory(memory_required, device, devices, keep_loaded, for_dynamic, pins_required)
+
+def _free_memory(memory_required, device, devices, keep_loaded, for_dynamic, pins_required):
     unloaded_model = []
     can_unload = []
-    unloaded_models = []
 
-    for i in range(len(current_loaded_models) -1, -1, -1):
-        shift_model = current_loaded_models[i]
-        if device is None or shift_model.device == device:
+    with current_loaded_models_lock:
+        loaded_models = current_loaded_models.copy()
+    planner = comfy.residency_planner.residency_planner
+    for i in range(len(loaded_models) -1, -1, -1):
+        shift_model = loaded_models[i]
+        if shift_model.device in devices:
             if shift_model not in keep_loaded and not shift_model.is_dead():
-                can_unload.append((-shift_model.model_offloaded_memory(), sys.getrefcount(shift_model.model), shift_model.model_memory(), i))
+                key = (-shift_model.model_offloaded_memory(), sys.getrefcount(shift_model.model), shift_model.model_memory(), i)
+                if planner is not None:
+                    key = planner.eviction_key(shift_model.model) + key
+                can_unload.append(key)
                 shift_model.currently_used = False
 
     can_unload_sorted = sorted(can_unload)
@@ -821,17 +854,24 @@ def free_memory(memory_required, device, keep_loaded=[], for_dynamic=False, pins
         memory_to_free = 1e32
         if not DISABLE_SMART_MEMORY or device is None:
             memory_to_free = 0 if device is None else memory_required - get_free_memory(device)
-            if current_loaded_models[i].model.is_dynamic() and for_dynamic:
+            if loaded_models[i].model.is_dynamic() and for_dynamic:
                 #don't actually unload dynamic models for the sake of other dynamic models
                 #as that works on-demand.
-                memory_required -= current_loaded_models[i].model.loaded_size()
+                memory_required -= loaded_models[i].model.loaded_size()
                 memory_to_free = 0
-        if memory_to_free > 0 and current_loaded_models[i].model_unload(memory_to_free):
-            logging.debug(f"Unloading {current_loaded_models[i].model.model.__class__.__name__}")
-            unloaded_model.append(i)
-
-    for i in sorted(unloaded_model, reverse=True):
-        unloaded_models.append(current_loaded_models.pop(i))
+        if memory_to_free > 0:
+            loaded_memory = loaded_models[i].model_loaded_memory()
+            unloaded = loaded_models[i].model_unload(memory_to_free)
+            if planner is not None:
+                planner.record_unload(loaded_models[i].device, loaded_memory - (0 if unloaded else loaded_models[i].model_loaded_memory()))
+            if unloaded:
+                logging.debug(f"Unloading {loaded_models[i].model.model.__class__.__name__}")
+                unloaded_model.append(i)
+
+    unloaded_models = [loaded_models[i] for i in sorted(unloaded_model, reverse=True)]
+    with current_loaded_models_lock:
+        unloaded_ids = set(id(m) for m in unloaded_models)
+        current_loaded_models[:] = [m for m in current_loaded_models if id(m) not in unloaded_ids]
 
     if not for_dynamic and pins_required > 0:
         ensure_pin_budget(pins_required)
@@ -848,6 +888,18 @@ def free_memory(memory_required, device, keep_loaded=[], for_dynamic=False, pins
 
 def load_models_gpu(models, memory_required=0, force_patch_weights=False, minimum_memory_required=None, force_full_load=False):
     cleanup_models_gc()
+    requested = []
+    for m in models:
+        requested.append(m)
+        requested.extend(m.model_patches_models())
+    devices = [m.load_device for m in requested]
+    with current_loaded_models_lock:
+        # Loading a model unloads its clones, which may be on other devices.
+        devices += [m.device for m in current_loaded_models if m.model is not None and any(x.is_clone(m.model) for x in requested)]
+    with devices_loading_locked(devices):
+        return _load_models_gpu(models, memory_required, force_patch_weights, minimum_memory_required, force_full_load)
+
+def _load_models_gpu(models, memory_required, force_patch_weights, minimum_memory_required, force_full_load):
     global vram_state
 
     inference_memory = minimum_inference_memory()
@@ -869,18 +921,24 @@ def load_models_gpu(models, memory_required=0, force_patch_weights=False, minimu
 
     models_to_load = []
 
+    # Mark every requested model, loaded or not, as used before free_memory picks what to unload.
+    planner = comfy.residency_planner.residency_planner
+    if planner is not None:
+        for x in models:
+            planner.touch(x)
+
     free_for_dynamic=True
     for x in models:
         if not x.is_dynamic():
             free_for_dynamic = False
         loaded_model = LoadedModel(x)
-        try:
-            loaded_model_index = current_loaded_models.index(loaded_model)
-        except:
-            loaded_model_index = None
+        with current_loaded_models_lock:
+            try:
+                loaded = current_loaded_models[current_loaded_models.index(loaded_model)]
+            except:
+                loaded = None
 
-        if loaded_model_index is not None:
-            loaded = current_loaded_models[loaded_model_index]
+        if loaded is not None:
             loaded.currently_used = True
             models_to_load.append(loaded)
         else:
@@ -890,11 +948,12 @@ def load_models_gpu(models, memory_required=0, force_patch_weights=False, minimu
 
     for loaded_model in models_to_load:
         to_unload = []
-        for i in range(len(current_loaded_models)):
-            if loaded_model.model.is_clone(current_loaded_models[i].model):
-                to_unload = [i] + to_unload
-        for i in to_unload:
-            model_to_unload = current_loaded_models.pop(i)
+        with current_loaded_models_lock:
+            for i in range(len(current_loaded_models)):
+                if loaded_model.model.is_clone(current_loaded_models[i].model):
+                    to_unload = [i] + to_unload
+            to_unload = [current_loaded_models.pop(i) for i in to_unload]
+        for model_to_unload in to_unload:
             model_to_unload.model.detach(unpatch_all=False)
             model_to_unload.model_finalizer.detach()
 
@@ -941,8 +1000,13 @@ def load_models_gpu(models, memory_required=0, force_patch_weights=False, minimu
         if vram_set_state == VRAMState.NO_VRAM:
             lowvram_model_memory = 0.1
 
+        if planner is not None:
+            loaded_memory = loaded_model.model_loaded_memory()
         loaded_model.model_load(lowvram_model_memory, force_patch_weights=force_patch_weights)
-        current_loaded_models.insert(0, loaded_model)
+        with current_loaded_models_lock:
+            current_loaded_models.insert(0, loaded_model)
+        if planner is not None:
+            planner.record_load(torch_dev, loaded_model.model_loaded_memory() - loaded_memory)
     return
 
 def load_model_gpu(model):
@@ -989,13 +1053,14 @@ def archive_model_dtypes(model):
 
 def cleanup_models():
     to_delete = []
-    for i in range(len(current_loaded_models)):
-        if current_loaded_models[i].real_model() is None:
-            to_delete = [i] + to_delete
+    with current_loaded_models_lock:
+        for i in range(len(current_loaded_models)):
+            if current_loaded_models[i].real_model() is None:
+                to_delete = [i] + to_delete
 
-    for i in to_delete:
-        x = current_loaded_models.pop(i)
-        del x
+        for i in to_delete:
+            x = current_loaded_models.pop(i)
+            del x
 
 def dtype_size(dtype):
     dtype_size = 4
@@ -2006,22 +2071,49 @@ class InterruptProcessingException(BaseException):
 interrupt_processing_mutex = threading.RLock()
 
 interrupt_processing = False
-def interrupt_current_processing(value=True):
+# Per device interrupt flags for the prompt workers registered with register_interrupt_device().
+interrupt_processing_devices = {}
+
+def register_interrupt_device(device):
+    with interrupt_processing_mutex:
+        interrupt_processing_devices[device] = False
+
+def _interrupt_device():
+    if len(interrupt_processing_devices) == 0:
+        return None
+    device = get_torch_device()
+    return device if device in interrupt_processing_devices else None
+
+def interrupt_current_processing(value=True, device=None):
+    """Set the interrupt flag. With device=None this applies to every worker, otherwise only to the worker running on device."""
     global interrupt_processing
     global interrupt_processing_mutex
     with interrupt_processing_mutex:
+        if device is not None and device in interrupt_processing_devices:
+            interrupt_processing_devices[device] = value
+            return
         interrupt_processing = value
+        for d in interrupt_processing_devices:
+            interrupt_processing_devices[d] = value
 
 def processing_interrupted():
     global interrupt_processing
     global interrupt_processing_mutex
     with interrupt_processing_mutex:
+        device = _interrupt_device()
+        if device is not None:
+            return interrupt_processing_devices[device]
         return interrupt_processing
 
 def throw_exception_if_processing_interrupted():
     global interrupt_processing
     global interrupt_processing_mutex
     with interrupt_processing_mutex:
-        if interrupt_processing:
+        device = _interrupt_device()
+        if device is not None:
+            if interrupt_processing_devices[device]:
+                interrupt_processing_devices[device] = False
+                raise InterruptProcessingException()
+        elif interrupt_processing:
             interrupt_processing = False
             raise InterruptProcessingException()
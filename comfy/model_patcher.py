@@ -33,6 +33,7 @@ import comfy.hooks
 import comfy.lora
 import comfy.model_management
 import comfy.ops
+import comfy.patched_weight_cache
 import comfy.patcher_extension
 import comfy.utils
 import comfy_aimdo.host_buffer
@@ -843,16 +844,14 @@ class ModelPatcher:
                         sd.pop(k)
             return sd
 
-    def patch_weight_to_device(self, key, device_to=None, inplace_update=False, return_weight=False, force_cast=False):
-        weight, set_func, convert_func = get_key_weight(self.model, key)
-        if key not in self.patches and not force_cast:
-            return weight
-
+    def _backup_weight(self, key, weight, inplace_update, return_weight):
         inplace_update = self.weight_inplace_update or inplace_update
 
         if key not in self.backup and not return_weight:
             self.backup[key] = collections.namedtuple('Dimension', ['weight', 'inplace_update'])(weight.to(device=self.offload_device, copy=inplace_update), inplace_update)
+        return inplace_update
 
+    def _patch_weight_temp(self, key, weight, convert_func, device_to):
         temp_dtype = comfy.model_management.lora_compute_dtype(device_to) if key in self.patches else None
         if device_to is not None:
             temp_weight = comfy.model_management.cast_to_device(weight, device_to, temp_dtype, copy=True)
@@ -860,11 +859,26 @@ class ModelPatcher:
             temp_weight = weight.to(temp_dtype, copy=True)
         if convert_func is not None:
             temp_weight = convert_func(temp_weight, inplace=True)
-
-        out_weight = comfy.lora.calculate_weight(self.patches[key], temp_weight, key) if key in self.patches else temp_weight
+        return temp_weight
+
+    def _cached_patched_weight(self, key, weight, set_func, convert_func, device_to):
+        """The patched weight cache key of key, and its patched weight when it is cached."""
+        cache = comfy.patched_weight_cache.patched_weight_cache
+        if cache is None or set_func is not None or convert_func is not None:
+            return None, None
+        compute_dtype = comfy.model_management.lora_compute_dtype(device_to)
+        cache_key = comfy.patched_weight_cache.weight_cache_key(key, weight, self.patches[key], compute_dtype, full=cache.cache_dir is not None)
+        if cache_key is None:
+            return None, None
+        return cache_key, cache.get(cache_key, device_to if device_to is not None else weight.device)
+
+    def _patch_weight_finish(self, key, weight, set_func, out_weight, inplace_update, return_weight, cache_key=None):
         if set_func is None:
-            if key in self.patches:
+            # Weights from the patched weight cache are rounded already.
+            if key in self.patches and out_weight.dtype != weight.dtype:
                 out_weight = comfy.float.stochastic_rounding(out_weight, weight.dtype, seed=comfy.utils.string_to_seed(key))
+            if cache_key is not None:
+                comfy.patched_weight_cache.patched_weight_cache.put(cache_key, out_weight)
             if return_weight:
                 return out_weight
             elif inplace_update:
@@ -874,6 +888,41 @@ class ModelPatcher:
         else:
             return set_func(out_weight, inplace_update=inplace_update, seed=comfy.utils.string_to_seed(key), return_weight=return_weight)
 
+    def patch_weight_to_device(self, key, device_to=None, inplace_update=False, return_weight=False, force_cast=False):
+        weight, set_func, convert_func = get_key_weight(self.model, key)
+        if key not in self.patches and not force_cast:
+            return weight
+
+        inplace_update = self._backup_weight(key, weight, inplace_update, return_weight)
+        cache_key, out_weight = None, None
+        if key in self.patches and not return_weight:
+            cache_key, out_weight = self._cached_patched_weight(key, weight, set_func, convert_func, device_to)
+        if out_weight is not None:
+            cache_key = None
+        else:
+            temp_weight = self._patch_weight_temp(key, weight, convert_func, device_to)
+            out_weight = comfy.lora.calculate_weight(self.patches[key], temp_weight, key) if key in self.patches else temp_weight
+        return self._patch_weight_finish(key, weight, set_func, out_weight, inplace_update, return_weight, cache_key)
+
+    def patch_weights_to_device(self, keys, device_to=None):
+        """patch_weight_to_device for every key, the patches of weights with the same shape are calculated together."""
+        started = []
+        for key in keys:
+            if key not in self.patches:
+                continue
+            weight, set_func, convert_func = get_key_weight(self.model, key)
+            inplace_update = self._backup_weight(key, weight, False, False)
+            cache_key, out_weight = self._cached_patched_weight(key, weight, set_func, convert_func, device_to)
+            if out_weight is not None:
+                self._patch_weight_finish(key, weight, set_func, out_weight, inplace_update, False)
+                continue
+            temp_weight = self._patch_weight_temp(key, weight, convert_func, device_to)
+            started.append((key, weight, set_func, temp_weight, inplace_update, cache_key))
+
+        out_weights = comfy.lora.calculate_weights([(self.patches[s[0]], s[3], s[0]) for s in started])
+        for (key, weight, set_func, _, inplace_update, cache_key), out_weight in zip(started, out_weights):
+            self._patch_weight_finish(key, weight, set_func, out_weight, inplace_update, False, cache_key)
+
     def pin_weight_to_device(self, key):
         weight, set_func, convert_func = get_key_weight(self.model, key)
         if comfy.model_management.pin_memory(weight):
@@ -927,6 +976,7 @@ class ModelPatcher:
         return loading
 
     def load(self, device_to=None, lowvram_model_memory=0, force_patch_weights=False, full_load=False):
+        comfy.patched_weight_cache.start_load()
         with self.use_ejected():
             self.unpatch_hooks()
             mem_counter = 0
@@ -1006,25 +1056,34 @@ class ModelPatcher:
                 mem_counter += move_weight_functions(m, device_to)
 
             load_completely.sort(reverse=True)
-            for x in load_completely:
-                n = x[1]
-                m = x[2]
-                params = x[3]
-                if hasattr(m, "comfy_patched_weights"):
-                    if m.comfy_patched_weights == True:
-                        continue
-
-                for param, param_value in params.items():
-                    if hasattr(m, "comfy_cast_weights") and getattr(param_value, "is_meta", False):
-                        comfy.ops.disable_weight_init._zero_init_parameter(m, param)
-                    key = key_param_name_to_key(n, param)
-                    self.unpin_weight(key)
-                    self.patch_weight_to_device(key, device_to=device_to)
+            to_patch = [x for x in load_completely if getattr(x[2], "comfy_patched_weights", False) != True]
+            # Modules are patched in chunks so the LoRA patches of the same shaped weights
+            # of different layers can be calculated together.
+            chunk_start = 0
+            while chunk_start < len(to_patch):
+                chunk_end = chunk_start + 1
+                chunk_mem = to_patch[chunk_start][0]
+                while chunk_end < len(to_patch) and chunk_mem + to_patch[chunk_end][0] <= comfy.lora.LOW_RANK_BATCH_MEMORY:
+                    chunk_mem += to_patch[chunk_end][0]
+                    chunk_end += 1
+                chunk = to_patch[chunk_start:chunk_end]
+                chunk_start = chunk_end
+
+                keys = []
+                for module_mem, n, m, params in chunk:
+                    for param, param_value in params.items():
+                        if hasattr(m, "comfy_cast_weights") and getattr(param_value, "is_meta", False):
+                            comfy.ops.disable_weight_init._zero_init_parameter(m, param)
+                        key = key_param_name_to_key(n, param)
+                        self.unpin_weight(key)
+                        keys.append(key)
+                self.patch_weights_to_device(keys, device_to=device_to)
                 if comfy.model_management.is_device_cuda(device_to):
                     torch.cuda.synchronize()
 
-                logging.debug("lowvram: loaded module regularly {} {}".format(n, m))
-                m.comfy_patched_weights = True
+                for module_mem, n, m, params in chunk:
+                    logging.debug("lowvram: loaded module regularly {} {}".format(n, m))
+                    m.comfy_patched_weights = True
 
             for x in load_completely:
                 x[2].to(device_to)
@@ -1792,6 +1851,7 @@ class ModelPatcherDynamic(ModelPatcher):
         num_patches = 0
         allocated_size = 0
         self.restore_loaded_backups()
+        comfy.patched_weight_cache.start_load()
 
         with self.use_ejected():
             self.unpatch_hooks()
@@ -1,3 +1,4 @@
+import os
 import comfy_aimdo.model_vbar
 import comfy.memory_management
 import comfy.model_management
@@ -75,3 +76,21 @@ def make_prefetch_queue(queue, device, transformer_options):
     queue = [None] + queue + [None]
     PREFETCH_QUEUES.append(queue)
     return queue
+
+WARM_FILE_CHUNK_SIZE = 16 * 1024 * 1024
+
+def warm_file(path, should_stop=None, chunk_size=WARM_FILE_CHUNK_SIZE):
+    """Reads a file into the OS page cache so a later load or mmap of it doesn't wait for the disk.
+
+    should_stop is checked between chunks, returns False if it stopped the read before the end of the file."""
+    with open(path, "rb", buffering=0) as f:
+        if hasattr(os, "posix_fadvise"):
+            try:
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+            except OSError:
+                pass
+        buffer = bytearray(chunk_size)
+        while f.readinto(buffer) > 0:
+            if should_stop is not None and should_stop():
+                return False
+    return True
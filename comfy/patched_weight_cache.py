@@ -0,0 +1,313 @@
+"""
+Optional cache of patched model weights.
+
+ModelPatcher calculates the patched weights (LoRAs and other patches applied to
+the base weights) every time a model is loaded, so a queue alternating between
+two LoRA setups of the same model pays the full patching cost on every switch.
+With the cache enabled the patched weights are kept, in CPU RAM or in a
+directory, and a load that applies the same patches to the same base weights
+copies them back instead of calling comfy.lora.calculate_weight.
+
+Entries are content addressed: the key hashes the weight name, a fingerprint of
+the base weight, the patches with their strengths (fingerprints of their
+tensors) and the dtype the patches are calculated in. Fingerprints hash the
+shape, dtype and an evenly spaced sample of the elements of a tensor for the
+entries kept in RAM. Entries in a directory outlive the process, so a wrong hit
+there would keep loading wrong weights: their fingerprints hash every element.
+Fingerprints are remembered per tensor until it is modified in place.
+
+A model load only caches weights while their total stays under the budget: when
+a model with more patched weights than fit is loaded, caching all of them would
+evict the first ones to make room for the last ones, every time, for the cost of
+copying each weight to the CPU.
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import hashlib
+import logging
+import os
+import threading
+import uuid
+import weakref
+
+import psutil
+import safetensors.torch
+import torch
+
+import comfy.weight_adapter as weight_adapter
+
+FILE_EXTENSION = ".safetensors"
+FINGERPRINT_ELEMENTS = 65536
+# Elements copied to the CPU at a time when hashing whole tensors.
+FULL_FINGERPRINT_CHUNK = 16 * 1024 * 1024
+
+
+class _Uncacheable(Exception):
+    pass
+
+
+_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+
+
+def tensor_fingerprint(t: torch.Tensor, full: bool = False) -> bytes:
+    """Hash of the shape, dtype and a sample of the elements of t, or of all of them if full."""
+    version = t._version
+    with _fingerprints_lock:
+        cached = _fingerprints.get(id(t))
+        if cached is not None and cached[0]() is t and cached[1] == version and full in cached[2]:
+            return cached[2][full]
+
+    flat = t.detach().reshape(-1)
+    h = hashlib.blake2b(digest_size=16)
+    h.update("{} {} {}".format(tuple(t.shape), t.dtype, "full" if full else "sampled").encode())
+    if full:
+        for chunk in flat.split(FULL_FINGERPRINT_CHUNK):
+            h.update(chunk.to("cpu").contiguous().view(torch.uint8).numpy().tobytes())
+    else:
+        if flat.numel() > FINGERPRINT_ELEMENTS:
+            flat = flat[::flat.numel() // FINGERPRINT_ELEMENTS][:FINGERPRINT_ELEMENTS]
+        h.update(flat.to("cpu").contiguous().view(torch.uint8).numpy().tobytes())
+    fingerprint = h.digest()
+
+    t_id = id(t)
+
+    def forget(ref):
+        with _fingerprints_lock:
+            if _fingerprints.get(t_id, (None,))[0] is ref:
+                del _fingerprints[t_id]
+    with _fingerprints_lock:
+        cached = _fingerprints.get(t_id)
+        if cached is not None and cached[0]() is t and cached[1] == version:
+            cached[2][full] = fingerprint
+        else:
+            _fingerprints[t_id] = (weakref.ref(t, forget), version, {full: fingerprint})
+    return fingerprint
+
+
+def _hash_value(h, value, full):
+    if isinstance(value, torch.Tensor):
+        if value.is_meta or type(value) not in (torch.Tensor, torch.nn.Parameter):
+            # Quantized tensor subclasses and weights that aren't loaded yet.
+            raise _Uncacheable(type(value).__name__)
+        h.update(b"T")
+        h.update(tensor_fingerprint(value, full))
+    elif isinstance(value, weight_adapter.WeightAdapterBase):
+        h.update("A{}(".format(type(value).__name__).encode())
+        _hash_value(h, value.weights, full)
+        h.update(b")")
+    elif isinstance(value, (tuple, list)):
+        h.update(b"(" if isinstance(value, tuple) else b"[")
+        for item in value:
+            _hash_value(h, item, full)
+            h.update(b",")
+        h.update(b")")
+    elif isinstance(value, dict):
+        h.update(b"{")
+        for k in sorted(value):
+            h.update("{!r}:".format(k).encode())
+            _hash_value(h, value[k], full)
+            h.update(b",")
+        h.update(b"}")
+    elif value is None or isinstance(value, (bool, int, float, str, torch.dtype, torch.Size)):
+        h.update(repr(value).encode())
+    else:
+        # Functions and other objects can't be told apart by their content.
+        raise _Uncacheable(type(value).__name__)
+
+
+def weight_cache_key(key: str, weight: torch.Tensor, patches: list, compute_dtype, full: bool = False) -> Optional[str]:
+    """The cache key of weight patched with patches, or None if the patches can't be cached. full hashes every element of the tensors."""
+    h = hashlib.blake2b(digest_size=20)
+    try:
+        _hash_value(h, (key, weight, patches, compute_dtype), full)
+    except _Uncacheable:
+        return None
+    return h.hexdigest()
+
+
+class PatchedWeightCache:
+    """
+    Patched weights by cache key, kept under max_bytes in CPU RAM, or in cache_dir
+    when it is set, evicting the least recently used ones.
+    """
+
+    def __init__(self, max_bytes: int, cache_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, torch.Tensor | int]" = OrderedDict()
+        self.total_bytes = 0
+        self.load_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.writer = None
+        if cache_dir is not None:
+            self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="patched_weight_cache")
+            os.makedirs(cache_dir, exist_ok=True)
+            self._scan()
+
+    def _scan(self):
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for file in files:
+                path = os.path.join(root, file)
+                if not file.endswith(FILE_EXTENSION):
+                    # Leftover partial write from a crashed process.
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found.append((stat.st_mtime, file[:-len(FILE_EXTENSION)], stat.st_size))
+        found.sort()
+        with self.lock:
+            for _, key, size in found:
+                self.entries[key] = size
+                self.total_bytes += size
+        self._evict()
+        logging.info("Patched weight cache: {} entries, {:.2f} GB in {}".format(len(self.entries), self.total_bytes / (1024 ** 3), self.cache_dir))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + FILE_EXTENSION)
+
+    @staticmethod
+    def _entry_bytes(entry) -> int:
+        return entry if isinstance(entry, int) else entry.nbytes
+
+    def _pop_lru(self) -> Optional[str]:
+        key, entry = self.entries.popitem(last=False)
+        self.total_bytes -= self._entry_bytes(entry)
+        return key if self.cache_dir is not None else None
+
+    def _remove_files(self, keys):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _evict(self):
+        to_remove = []
+        with self.lock:
+            while self.total_bytes > self.max_bytes and self.entries:
+                to_remove.append(self._pop_lru())
+        if self.cache_dir is not None:
+            self._remove_files(to_remove)
+
+    def get(self, key: str, device) -> Optional[torch.Tensor]:
+        """A copy of the patched weight of key on device, or None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        if self.cache_dir is None:
+            return entry.to(device, copy=True)
+
+        path = self._path(key)
+        try:
+            weight = safetensors.torch.load_file(path, device=str(torch.device(device)))["weight"]
+            os.utime(path)
+        except Exception as e:
+            logging.warning("Patched weight cache: dropping unreadable entry {}: {}".format(path, e))
+            with self.lock:
+                if self.entries.pop(key, None) is not None:
+                    self.total_bytes -= self._entry_bytes(entry)
+            self._remove_files([key])
+            return None
+        return weight
+
+    def start_load(self):
+        """Starts counting the bytes put by a new model load against the budget."""
+        with self.lock:
+            self.load_bytes = 0
+
+    def put(self, key: str, weight: torch.Tensor):
+        size = weight.nbytes
+        with self.lock:
+            if key in self.entries or self.load_bytes + size > self.max_bytes:
+                return
+            self.load_bytes += size
+        weight = weight.detach().to("cpu", copy=True).contiguous()
+        if self.cache_dir is not None:
+            self.writer.submit(self._write, key, weight)
+            return
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = weight
+                self.total_bytes += size
+        self._evict()
+
+    def _write(self, key: str, weight: torch.Tensor):
+        path = self._path(key)
+        tmp_path = "{}.{}.tmp".format(path, uuid.uuid4().hex)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            safetensors.torch.save_file({"weight": weight}, tmp_path)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except Exception as e:
+            logging.warning("Patched weight cache: failed to write {}: {}".format(path, e))
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = size
+                self.total_bytes += size
+        self._evict()
+
+    def flush(self):
+        """Block until all queued writes are on disk."""
+        if self.writer is not None:
+            self.writer.submit(lambda: None).result()
+
+    def ram_release(self, target: int) -> int:
+        """Drop the least recently used weights kept in RAM until target bytes of RAM are available."""
+        if self.cache_dir is not None:
+            return 0
+        freed = 0
+        with self.lock:
+            while self.entries and psutil.virtual_memory().available < target:
+                before = self.total_bytes
+                self._pop_lru()
+                freed += before - self.total_bytes
+        return freed
+
+    def clear(self):
+        """Drop the weights kept in RAM, entries on disk are kept."""
+        if self.cache_dir is not None:
+            return
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "directory": self.cache_dir,
+            }
+
+
+# Set by main.py when --patched-weight-cache is used.
+patched_weight_cache: Optional[PatchedWeightCache] = None
+
+
+def start_load():
+    if patched_weight_cache is not None:
+        patched_weight_cache.start_load()
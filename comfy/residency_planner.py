@@ -0,0 +1,109 @@
+"""
+Plans which models stay on their device between jobs.
+
+free_memory unloads models in the order they were loaded, so a queue that
+alternates between a few big models keeps unloading the one the next job needs.
+With the planner enabled the prompt worker tells it which model files the
+current and upcoming prompts use, and free_memory unloads models in this order
+instead:
+
+1. models no upcoming job uses, least recently used first,
+2. models used by upcoming jobs, the one needed last first.
+
+free_memory only frees as much as the load needs, so the last model it touches
+is partially offloaded and everything after it stays fully loaded. That is the
+policy that evicts the model whose next use is farthest away, which minimizes
+the number of bytes reloaded for a known sequence of jobs.
+
+The planner also counts the bytes moved to and from each device per job.
+"""
+import logging
+import math
+import os
+import threading
+import weakref
+
+# Set by main.py, None when the planner is disabled.
+residency_planner = None
+
+
+def model_files(model):
+    """The files a ModelPatcher was loaded from, from the factory the loaders register to reload it."""
+    init = getattr(model, "cached_patcher_init", None)
+    if init is None or len(init[1]) == 0:
+        return frozenset()
+    paths = init[1][0]
+    if isinstance(paths, str):
+        paths = [paths]
+    if not isinstance(paths, (list, tuple)):
+        return frozenset()
+    return frozenset(os.path.realpath(p) for p in paths if isinstance(p, str))
+
+
+class _Transfers:
+    __slots__ = ("loaded", "unloaded")
+
+    def __init__(self):
+        self.loaded = 0
+        self.unloaded = 0
+
+
+class ResidencyPlanner:
+    def __init__(self, lookahead):
+        self.lookahead = lookahead
+        self.lock = threading.Lock()
+        # Sets of model files of the running job followed by the upcoming ones, in execution order.
+        self.upcoming = []
+        self.jobs_started = 0
+        self.last_used = weakref.WeakKeyDictionary()
+        self.transfers = {}
+
+    def set_upcoming(self, jobs):
+        """jobs is a list with the model file paths of the job starting now followed by those of the next queued jobs."""
+        with self.lock:
+            self.upcoming = [frozenset(os.path.realpath(p) for p in paths) for paths in jobs[:self.lookahead + 1]]
+
+    def next_use(self, model):
+        """How many jobs from now model is used again, 0 for the current job and math.inf if it isn't."""
+        files = model_files(model)
+        if len(files) == 0:
+            return math.inf
+        with self.lock:
+            for i, job in enumerate(self.upcoming):
+                if not files.isdisjoint(job):
+                    return i
+        return math.inf
+
+    def touch(self, model):
+        with self.lock:
+            self.last_used[model] = self.jobs_started
+
+    def eviction_key(self, model):
+        """Sorts the models free_memory may unload, the ones to unload first first."""
+        with self.lock:
+            last_used = self.last_used.get(model, -1)
+        return (-self.next_use(model), last_used)
+
+    def record_load(self, device, size):
+        if size > 0:
+            with self.lock:
+                self.transfers.setdefault(device, _Transfers()).loaded += size
+
+    def record_unload(self, device, size):
+        if size > 0:
+            with self.lock:
+                self.transfers.setdefault(device, _Transfers()).unloaded += size
+
+    def begin_job(self, device):
+        with self.lock:
+            self.jobs_started += 1
+            self.transfers[device] = _Transfers()
+
+    def end_job(self, device):
+        """Returns and logs the bytes loaded to and unloaded from device since begin_job."""
+        with self.lock:
+            transfers = self.transfers.pop(device, _Transfers())
+        stats = {"loaded_bytes": transfers.loaded, "unloaded_bytes": transfers.unloaded}
+        logging.info("Model residency: loaded {:.2f} MB to and unloaded {:.2f} MB from {}".format(
+            transfers.loaded / (1024 * 1024), transfers.unloaded / (1024 * 1024), device))
+        return stats
@@ -29,6 +29,8 @@ import math
 import os
 
 import comfy.utils
+import comfy.weight_pool
+import comfy.vae_memory
 
 from . import clip_vision
 from . import gligen
@@ -984,7 +986,74 @@ class VAE:
     def vae_output_dtype(self):
         return model_management.intermediate_dtype()
 
-    def decode_tiled_(self, samples, tile_x=64, tile_y=64, overlap = 16):
+    def tile_batch_size(self, memory_per_tile):
+        """How many tiles needing memory_per_tile fit in the free memory of the VAE device at once."""
+        free_memory = self.patcher.get_free_memory(self.device)
+        return max(1, int(free_memory / max(1, memory_per_tile)))
+
+    def tiled_with_batch_fallback(self, tiled_fn, memory_per_tile):
+        """Runs tiled_fn(tile_batch_size) with as many tiles per batch as fit, one tile at a time if that runs out of memory."""
+        tile_batch_size = self.tile_batch_size(memory_per_tile)
+        if tile_batch_size > 1:
+            try:
+                return tiled_fn(tile_batch_size)
+            except Exception as e:
+                model_management.raise_non_oom(e)
+                logging.warning("Warning: Ran out of memory with batched VAE tiles, retrying one tile at a time.")
+            comfy.model_management.soft_empty_cache()
+        return tiled_fn(1)
+
+    def memory_profile(self, encode=False, measure=True):
+        """The measured memory model of decoding (or encoding) with this VAE, None if it can't be measured or measure is False and it wasn't yet. Measuring needs the VAE loaded."""
+        if self.latent_dim != 2 or self.extra_1d_channel is not None:
+            # A single frame probe can't tell the temporal cost of video VAEs, they keep the memory_used_* estimates.
+            return None
+        key = (type(self.first_stage_model).__name__, self.model_size(), self.latent_channels, self.output_channels, self.latent_dim, self.vae_dtype, str(self.device), encode)
+        if key in comfy.vae_memory.profiles or not measure:
+            return comfy.vae_memory.profiles.get(key)
+        if encode:
+            ratio = self.spacial_compression_encode()
+            make_input = lambda size: torch.zeros((1, self.output_channels, size * ratio, size * ratio), device=self.device, dtype=self.vae_dtype)
+            fn = self.first_stage_model.encode
+        else:
+            make_input = lambda size: torch.zeros((1, self.latent_channels, size, size), device=self.device, dtype=self.vae_dtype)
+            fn = self.first_stage_model.decode
+        return comfy.vae_memory.profile(key, fn, make_input, self.device)
+
+    def decode_memory_required(self, shape, measure=True):
+        profile = self.memory_profile(measure=measure)
+        if profile is None:
+            return self.memory_used_decode(shape, self.vae_dtype)
+        return profile.memory_required(shape)
+
+    def encode_memory_required(self, shape, measure=True):
+        profile = self.memory_profile(encode=True, measure=measure)
+        if profile is None:
+            return self.memory_used_encode(shape, self.vae_dtype)
+        return profile.memory_required(shape)
+
+    def largest_tile_args(self, shape, free_memory, memory_required, minimum, step):
+        """Tile arguments for the tiled decode or encode of an input of shape with the largest square tiles that fit free_memory, minimum sized ones if nothing is measured."""
+        tile = minimum
+        if memory_required is not None:
+            tile_shape = lambda size: (1,) + tuple(shape[1:-2]) + (size, size)
+            tile = comfy.vae_memory.largest_tile(lambda size: memory_required(tile_shape(size)), free_memory, max(shape[-2:]), minimum, step)
+        if len(shape) == 4:
+            return {"tile_x": tile, "tile_y": tile}
+        overlap = tile // 4
+        return {"tile_x": tile, "tile_y": tile, "overlap": (1, overlap, overlap)}
+
+    def decode_tile_args(self, shape, free_memory):
+        memory_required = self.decode_memory_required if self.memory_profile() is not None else None
+        minimum = 64 if len(shape) == 4 else 256 // self.spacial_compression_decode()
+        return self.largest_tile_args(shape, free_memory, memory_required, minimum, 8)
+
+    def encode_tile_args(self, shape, free_memory):
+        memory_required = self.encode_memory_required if self.memory_profile(encode=True) is not None else None
+        minimum = 512 if len(shape) == 4 else 256
+        return self.largest_tile_args(shape, free_memory, memory_required, minimum, 64)
+
+    def decode_tiled_(self, samples, tile_x=64, tile_y=64, overlap = 16, tile_batch_size=1):
         steps = samples.shape[0] * comfy.utils.get_tiled_scale_steps(samples.shape[3], samples.shape[2], tile_x, tile_y, overlap)
         steps += samples.shape[0] * comfy.utils.get_tiled_scale_steps(samples.shape[3], samples.shape[2], tile_x // 2, tile_y * 2, overlap)
         steps += samples.shape[0] * comfy.utils.get_tiled_scale_steps(samples.shape[3], samples.shape[2], tile_x * 2, tile_y // 2, overlap)
@@ -992,9 +1061,9 @@ class VAE:
 
         decode_fn = lambda a: self.first_stage_model.decode(a.to(self.vae_dtype).to(self.device)).to(dtype=self.vae_output_dtype())
         output = self.process_output(
-            (comfy.utils.tiled_scale(samples, decode_fn, tile_x // 2, tile_y * 2, overlap, upscale_amount = self.upscale_ratio, output_device=self.output_device, pbar = pbar) +
-            comfy.utils.tiled_scale(samples, decode_fn, tile_x * 2, tile_y // 2, overlap, upscale_amount = self.upscale_ratio, output_device=self.output_device, pbar = pbar) +
-             comfy.utils.tiled_scale(samples, decode_fn, tile_x, tile_y, overlap, upscale_amount = self.upscale_ratio, output_device=self.output_device, pbar = pbar))
+            (comfy.utils.tiled_scale(samples, decode_fn, tile_x // 2, tile_y * 2, overlap, upscale_amount = self.upscale_ratio, output_device=self.output_device, pbar = pbar, tile_batch_size=tile_batch_size) +
+            comfy.utils.tiled_scale(samples, decode_fn, tile_x * 2, tile_y // 2, overlap, upscale_amount = self.upscale_ratio, output_device=self.output_device, pbar = pbar, tile_batch_size=tile_batch_size) +
+             comfy.utils.tiled_scale(samples, decode_fn, tile_x, tile_y, overlap, upscale_amount = self.upscale_ratio, output_device=self.output_device, pbar = pbar, tile_batch_size=tile_batch_size))
             / 3.0)
         return output
 
@@ -1012,16 +1081,16 @@ class VAE:
         decode_fn = lambda a: self.first_stage_model.decode(a.to(self.vae_dtype).to(self.device)).to(dtype=self.vae_output_dtype())
         return self.process_output(comfy.utils.tiled_scale_multidim(samples, decode_fn, tile=(tile_t, tile_x, tile_y), overlap=overlap, upscale_amount=self.upscale_ratio, out_channels=self.output_channels, index_formulas=self.upscale_index_formula, output_device=self.output_device))
 
-    def encode_tiled_(self, pixel_samples, tile_x=512, tile_y=512, overlap = 64):
+    def encode_tiled_(self, pixel_samples, tile_x=512, tile_y=512, overlap = 64, tile_batch_size=1):
         steps = pixel_samples.shape[0] * comfy.utils.get_tiled_scale_steps(pixel_samples.shape[3], pixel_samples.shape[2], tile_x, tile_y, overlap)
         steps += pixel_samples.shape[0] * comfy.utils.get_tiled_scale_steps(pixel_samples.shape[3], pixel_samples.shape[2], tile_x // 2, tile_y * 2, overlap)
         steps += pixel_samples.shape[0] * comfy.utils.get_tiled_scale_steps(pixel_samples.shape[3], pixel_samples.shape[2], tile_x * 2, tile_y // 2, overlap)
         pbar = comfy.utils.ProgressBar(steps)
 
         encode_fn = lambda a: self.first_stage_model.encode((self.process_input(a)).to(self.vae_dtype).to(self.device)).to(dtype=self.vae_output_dtype())
-        samples = comfy.utils.tiled_scale(pixel_samples, encode_fn, tile_x, tile_y, overlap, upscale_amount = (1/self.downscale_ratio), out_channels=self.latent_channels, output_device=self.output_device, pbar=pbar)
-        samples += comfy.utils.tiled_scale(pixel_samples, encode_fn, tile_x * 2, tile_y // 2, overlap, upscale_amount = (1/self.downscale_ratio), out_channels=self.latent_channels, output_device=self.output_device, pbar=pbar)
-        samples += comfy.utils.tiled_scale(pixel_samples, encode_fn, tile_x // 2, tile_y * 2, overlap, upscale_amount = (1/self.downscale_ratio), out_channels=self.latent_channels, output_device=self.output_device, pbar=pbar)
+        samples = comfy.utils.tiled_scale(pixel_samples, encode_fn, tile_x, tile_y, overlap, upscale_amount = (1/self.downscale_ratio), out_channels=self.latent_channels, output_device=self.output_device, pbar=pbar, tile_batch_size=tile_batch_size)
+        samples += comfy.utils.tiled_scale(pixel_samples, encode_fn, tile_x * 2, tile_y // 2, overlap, upscale_amount = (1/self.downscale_ratio), out_channels=self.latent_channels, output_device=self.output_device, pbar=pbar, tile_batch_size=tile_batch_size)
+        samples += comfy.utils.tiled_scale(pixel_samples, encode_fn, tile_x // 2, tile_y * 2, overlap, upscale_amount = (1/self.downscale_ratio), out_channels=self.latent_channels, output_device=self.output_device, pbar=pbar, tile_batch_size=tile_batch_size)
         samples /= 3.0
         return samples
 
@@ -1057,29 +1126,34 @@ class VAE:
 
         with model_management.cuda_device_context(self.device):
             try:
-                memory_used = self.memory_used_decode(samples_in.shape, self.vae_dtype)
+                memory_used = self.decode_memory_required(samples_in.shape, measure=False)
                 model_management.load_models_gpu([self.patcher], memory_required=memory_used, force_full_load=self.disable_offload)
                 free_memory = self.patcher.get_free_memory(self.device)
-                batch_number = int(free_memory / memory_used)
-                batch_number = max(1, batch_number)
-
-                # Pre-allocate output for VAEs that support direct buffer writes
-                preallocated = False
-                if getattr(self.first_stage_model, 'comfy_has_chunked_io', False):
-                    pixel_samples = torch.empty(self.first_stage_model.decode_output_shape(samples_in.shape), device=self.output_device, dtype=self.vae_output_dtype())
-                    preallocated = True
-
-                for x in range(0, samples_in.shape[0], batch_number):
-                    samples = samples_in[x:x + batch_number].to(device=self.device, dtype=self.vae_dtype)
-                    if preallocated:
-                        self.first_stage_model.decode(samples, output_buffer=pixel_samples[x:x+batch_number], **vae_options)
-                    else:
-                        out = self.first_stage_model.decode(samples, **vae_options).to(device=self.output_device, dtype=self.vae_output_dtype(), copy=True)
-                        if pixel_samples is None:
-                            pixel_samples = torch.empty((samples_in.shape[0],) + tuple(out.shape[1:]), device=self.output_device, dtype=self.vae_output_dtype())
-                        pixel_samples[x:x+batch_number].copy_(out)
-                        del out
-                    self.process_output(pixel_samples[x:x+batch_number])
+                if self.memory_profile() is not None:
+                    # Go straight to tiling with tiles that fit instead of running out of memory first.
+                    memory_used = self.decode_memory_required((1,) + tuple(samples_in.shape[1:]))
+                    do_tile = memory_used > free_memory
+                if not do_tile:
+                    batch_number = int(free_memory / memory_used)
+                    batch_number = max(1, batch_number)
+
+                    # Pre-allocate output for VAEs that support direct buffer writes
+                    preallocated = False
+                    if getattr(self.first_stage_model, 'comfy_has_chunked_io', False):
+                        pixel_samples = torch.empty(self.first_stage_model.decode_output_shape(samples_in.shape), device=self.output_device, dtype=self.vae_output_dtype())
+                        preallocated = True
+
+                    for x in range(0, samples_in.shape[0], batch_number):
+                        samples = samples_in[x:x + batch_number].to(device=self.device, dtype=self.vae_dtype)
+                        if preallocated:
+                            self.first_stage_model.decode(samples, output_buffer=pixel_samples[x:x+batch_number], **vae_options)
+                        else:
+                            out = self.first_stage_model.decode(samples, **vae_options).to(device=self.output_device, dtype=self.vae_output_dtype(), copy=True)
+                            if pixel_samples is None:
+                                pixel_samples = torch.empty((samples_in.shape[0],) + tuple(out.shape[1:]), device=self.output_device, dtype=self.vae_output_dtype())
+                            pixel_samples[x:x+batch_number].copy_(out)
+                            del out
+                        self.process_output(pixel_samples[x:x+batch_number])
             except Exception as e:
                 model_management.raise_non_oom(e)
                 logging.warning("Warning: Ran out of memory when regular VAE decoding, retrying with tiled VAE decoding.")
@@ -1094,12 +1168,13 @@ class VAE:
                 dims = samples_in.ndim - 2
                 if dims == 1 or self.extra_1d_channel is not None:
                     pixel_samples = self.decode_tiled_1d(samples_in)
-                elif dims == 2:
-                    pixel_samples = self.decode_tiled_(samples_in)
-                elif dims == 3:
-                    tile = 256 // self.spacial_compression_decode()
-                    overlap = tile // 4
-                    pixel_samples = self.decode_tiled_3d(samples_in, tile_x=tile, tile_y=tile, overlap=(1, overlap, overlap))
+                else:
+                    tile_args = self.decode_tile_args(samples_in.shape, self.patcher.get_free_memory(self.device))
+                    if dims == 2:
+                        memory_per_tile = self.decode_memory_required((1, samples_in.shape[1], tile_args["tile_y"], tile_args["tile_x"]))
+                        pixel_samples = self.tiled_with_batch_fallback(lambda tile_batch_size: self.decode_tiled_(samples_in, tile_batch_size=tile_batch_size, **tile_args), memory_per_tile)
+                    elif dims == 3:
+                        pixel_samples = self.decode_tiled_3d(samples_in, **tile_args)
 
         pixel_samples = pixel_samples.to(self.output_device).movedim(1,-1)
         return pixel_samples
@@ -1134,6 +1209,75 @@ class VAE:
                 output = self.decode_tiled_3d(samples, **args)
         return output.movedim(1, -1)
 
+    def decode_frame_count(self, samples):
+        """Number of frames decode returns for video latents of shape samples, all batch entries combined."""
+        up = self.upscale_ratio[0]
+        frames = up(samples.shape[2]) if callable(up) else up * samples.shape[2]
+        return samples.shape[0] * round(frames)
+
+    def decode_stream(self, samples, chunk_frames=16, overlap_frames=1):
+        """
+        Decodes video latents chunk_frames latent frames at a time and yields the decoded frames in order,
+        as (frames, height, width, channels) tensors, as soon as no later chunk overlaps them. Neighbouring
+        chunks overlap by overlap_frames latent frames and are blended like the temporal tiles of
+        decode_tiled_3d, so only about two chunks of pixels are in memory at once.
+        """
+        self.throw_exception_if_invalid()
+        if self.latent_dim != 3 or samples.ndim != 5:
+            images = self.decode(samples)
+            yield images.reshape((-1,) + tuple(images.shape[-3:]))
+            return
+
+        up = self.upscale_ratio[0]
+        index = self.upscale_index_formula[0] if self.upscale_index_formula is not None else up
+        frames_of = lambda t: round(up(t) if callable(up) else up * t)
+        start_of = lambda t: round(index(t) if callable(index) else index * t)
+
+        chunk_frames = max(overlap_frames + 1, chunk_frames)
+        feather = frames_of(overlap_frames)
+        length = samples.shape[2]
+        total = frames_of(length)
+        positions = [0]
+        if length > chunk_frames:
+            positions = [max(0, min(length - overlap_frames, p)) for p in range(0, length - overlap_frames, chunk_frames - overlap_frames)]
+
+        for b in range(samples.shape[0]):
+            pending = None
+            pending_weight = None
+            pending_start = 0
+            for i, p in enumerate(positions):
+                out = self.decode(samples[b:b + 1, :, p:p + min(chunk_frames, length - p)])[0]
+                if len(positions) == 1:
+                    yield out
+                    continue
+
+                ramp = torch.ones(out.shape[0], device=out.device, dtype=out.dtype)
+                if feather < out.shape[0]:
+                    a = torch.arange(1, feather + 1, device=out.device, dtype=out.dtype) / feather
+                    ramp[:feather] *= a
+                    ramp[out.shape[0] - feather:] *= a.flip(0)
+                start = start_of(p)
+                count = min(out.shape[0], total - start)
+                out = out[:count] * ramp[:count].view(-1, 1, 1, 1)
+
+                end = start + count - pending_start
+                if pending is None:
+                    pending = torch.zeros((end,) + tuple(out.shape[1:]), device=out.device, dtype=out.dtype)
+                    pending_weight = torch.zeros((end, 1, 1, 1), device=out.device, dtype=out.dtype)
+                elif end > pending.shape[0]:
+                    grow = end - pending.shape[0]
+                    pending = torch.cat((pending, pending.new_zeros((grow,) + tuple(pending.shape[1:]))))
+                    pending_weight = torch.cat((pending_weight, pending_weight.new_zeros((grow, 1, 1, 1))))
+                pending[start - pending_start:end] += out
+                pending_weight[start - pending_start:end] += ramp[:count].view(-1, 1, 1, 1)
+                del out
+
+                done = (start_of(positions[i + 1]) if i + 1 < len(positions) else total) - pending_start
+                yield pending[:done] / pending_weight[:done]
+                pending = pending[done:].clone()
+                pending_weight = pending_weight[done:].clone()
+                pending_start += done
+
     def encode(self, pixel_samples):
         self.throw_exception_if_invalid()
         pixel_samples = self.vae_encode_crop_pixels(pixel_samples)
@@ -1147,23 +1291,28 @@ class VAE:
 
         with model_management.cuda_device_context(self.device):
             try:
-                memory_used = self.memory_used_encode(pixel_samples.shape, self.vae_dtype)
+                memory_used = self.encode_memory_required(pixel_samples.shape, measure=False)
                 model_management.load_models_gpu([self.patcher], memory_required=memory_used, force_full_load=self.disable_offload)
                 free_memory = self.patcher.get_free_memory(self.device)
-                batch_number = int(free_memory / max(1, memory_used))
-                batch_number = max(1, batch_number)
+                if self.memory_profile(encode=True) is not None:
+                    # Go straight to tiling with tiles that fit instead of running out of memory first.
+                    memory_used = self.encode_memory_required((1,) + tuple(pixel_samples.shape[1:]))
+                    do_tile = memory_used > free_memory
                 samples = None
-                for x in range(0, pixel_samples.shape[0], batch_number):
-                    pixels_in = self.process_input(pixel_samples[x:x + batch_number]).to(self.vae_dtype)
-                    if getattr(self.first_stage_model, 'comfy_has_chunked_io', False):
-                        out = self.first_stage_model.encode(pixels_in, device=self.device)
-                    else:
-                        pixels_in = pixels_in.to(self.device)
-                        out = self.first_stage_model.encode(pixels_in)
-                    out = out.to(self.output_device).to(dtype=self.vae_output_dtype())
-                    if samples is None:
-                        samples = torch.empty((pixel_samples.shape[0],) + tuple(out.shape[1:]), device=self.output_device, dtype=self.vae_output_dtype())
-                    samples[x:x + batch_number] = out
+                if not do_tile:
+                    batch_number = int(free_memory / max(1, memory_used))
+                    batch_number = max(1, batch_number)
+                    for x in range(0, pixel_samples.shape[0], batch_number):
+                        pixels_in = self.process_input(pixel_samples[x:x + batch_number]).to(self.vae_dtype)
+                        if getattr(self.first_stage_model, 'comfy_has_chunked_io', False):
+                            out = self.first_stage_model.encode(pixels_in, device=self.device)
+                        else:
+                            pixels_in = pixels_in.to(self.device)
+                            out = self.first_stage_model.encode(pixels_in)
+                        out = out.to(self.output_device).to(dtype=self.vae_output_dtype())
+                        if samples is None:
+                            samples = torch.empty((pixel_samples.shape[0],) + tuple(out.shape[1:]), device=self.output_device, dtype=self.vae_output_dtype())
+                        samples[x:x + batch_number] = out
 
             except Exception as e:
                 model_management.raise_non_oom(e)
@@ -1177,13 +1326,13 @@ class VAE:
             if do_tile:
                 comfy.model_management.soft_empty_cache()
                 if self.latent_dim == 3:
-                    tile = 256
-                    overlap = tile // 4
-                    samples = self.encode_tiled_3d(pixel_samples, tile_x=tile, tile_y=tile, overlap=(1, overlap, overlap))
+                    samples = self.encode_tiled_3d(pixel_samples, **self.encode_tile_args(pixel_samples.shape, self.patcher.get_free_memory(self.device)))
                 elif self.latent_dim == 1 or self.extra_1d_channel is not None:
                     samples = self.encode_tiled_1d(pixel_samples)
                 else:
-                    samples = self.encode_tiled_(pixel_samples)
+                    tile_args = self.encode_tile_args(pixel_samples.shape, self.patcher.get_free_memory(self.device))
+                    memory_per_tile = self.encode_memory_required((1, pixel_samples.shape[1], tile_args["tile_y"], tile_args["tile_x"]))
+                    samples = self.tiled_with_batch_fallback(lambda tile_batch_size: self.encode_tiled_(pixel_samples, tile_batch_size=tile_batch_size, **tile_args), memory_per_tile)
 
         return samples
 
@@ -1320,7 +1469,7 @@ def load_clip_model_patcher(ckpt_paths, embedding_directory=None, clip_type=CLIP
 def load_clip(ckpt_paths, embedding_directory=None, clip_type=CLIPType.STABLE_DIFFUSION, model_options={}, disable_dynamic=False):
     clip_data = []
     for p in ckpt_paths:
-        sd, metadata = comfy.utils.load_torch_file(p, safe_load=True, return_metadata=True)
+        sd, metadata = comfy.weight_pool.load_torch_file(p, safe_load=True, return_metadata=True)
         if model_options.get("custom_operations", None) is None:
             sd, metadata = comfy.utils.convert_old_quants(sd, model_prefix="", metadata=metadata)
         clip_data.append(sd)
@@ -1789,8 +1938,8 @@ def load_checkpoint(config_path=None, ckpt_path=None, output_vae=True, output_cl
     return (model, clip, vae)
 
 def load_checkpoint_guess_config(ckpt_path, output_vae=True, output_clip=True, output_clipvision=False, embedding_directory=None, output_model=True, model_options={}, te_model_options={}, disable_dynamic=False):
-    sd, metadata = comfy.utils.load_torch_file(ckpt_path, return_metadata=True)
-    out = load_state_dict_guess_config(sd, output_vae, output_clip, output_clipvision, embedding_directory, output_model, model_options, te_model_options=te_model_options, metadata=metadata, disable_dynamic=disable_dynamic)
+    sd, metadata = comfy.weight_pool.load_torch_file(ckpt_path, return_metadata=True)
+    out = load_state_dict_guess_config(sd, output_vae, output_clip, output_clipvision, embedding_directory, output_model, model_options, te_model_options=te_model_options, metadata=metadata, disable_dynamic=disable_dynamic, ckpt_path=ckpt_path)
     if out is None:
         raise RuntimeError("ERROR: Could not detect model type of: {}\n{}".format(ckpt_path, model_detection_error_hint(ckpt_path, sd)))
     if out[0] is not None:
@@ -1855,7 +2004,7 @@ def load_checkpoint_guess_config_clip_only(ckpt_path, embedding_directory=None,
             disable_dynamic=disable_dynamic)
     return clip.patcher
 
-def load_state_dict_guess_config(sd, output_vae=True, output_clip=True, output_clipvision=False, embedding_directory=None, output_model=True, model_options={}, te_model_options={}, metadata=None, disable_dynamic=False):
+def load_state_dict_guess_config(sd, output_vae=True, output_clip=True, output_clipvision=False, embedding_directory=None, output_model=True, model_options={}, te_model_options={}, metadata=None, disable_dynamic=False, ckpt_path=None):
     clip = None
     clipvision = None
     vae = None
@@ -1868,10 +2017,13 @@ def load_state_dict_guess_config(sd, output_vae=True, output_clip=True, output_c
     load_device = model_options.get("load_device", model_management.get_torch_device())
 
     custom_operations = model_options.get("custom_operations", None)
+    cache_key = None
     if custom_operations is None:
         sd, metadata = comfy.utils.convert_old_quants(sd, diffusion_model_prefix, metadata=metadata)
+        if ckpt_path is not None:
+            cache_key = (ckpt_path, "checkpoint")
 
-    model_config = model_detection.model_config_from_unet(sd, diffusion_model_prefix, metadata=metadata)
+    model_config = model_detection.model_config_from_unet(sd, diffusion_model_prefix, metadata=metadata, cache_key=cache_key)
     if model_config is None:
         logging.warning("Warning, This is not a checkpoint file, trying to load it as a diffusion model only.")
         diffusion_model = load_diffusion_model_state_dict(sd, model_options={})
@@ -1958,7 +2110,7 @@ def load_state_dict_guess_config(sd, output_vae=True, output_clip=True, output_c
     return (model_patcher, clip, vae, clipvision)
 
 
-def load_diffusion_model_state_dict(sd, model_options={}, metadata=None, disable_dynamic=False):
+def load_diffusion_model_state_dict(sd, model_options={}, metadata=None, disable_dynamic=False, unet_path=None):
     """
     Loads a UNet diffusion model from a state dictionary, supporting both diffusers and regular formats.
 
@@ -1968,6 +2120,7 @@ def load_diffusion_model_state_dict(sd, model_options={}, metadata=None, disable
             - dtype: Override model data type
             - custom_operations: Custom model operations
             - fp8_optimizations: Enable FP8 optimizations
+        unet_path (str, optional): File sd was loaded from, used to cache the detected model config
 
     Returns:
         ModelPatcher: A wrapped model instance that handles device management and weight loading.
@@ -1998,7 +2151,10 @@ def load_diffusion_model_state_dict(sd, model_options={}, metadata=None, disable
     weight_dtype = comfy.utils.weight_dtype(sd)
 
     load_device = model_options.get("load_device", model_management.get_torch_device())
-    model_config = model_detection.model_config_from_unet(sd, "", metadata=metadata)
+    cache_key = None
+    if custom_operations is None and unet_path is not None:
+        cache_key = (unet_path, "diffusion_model")
+    model_config = model_detection.model_config_from_unet(sd, "", metadata=metadata, cache_key=cache_key)
 
     if model_config is not None:
         new_sd = sd
@@ -2056,8 +2212,8 @@ def load_diffusion_model_state_dict(sd, model_options={}, metadata=None, disable
     return model_patcher
 
 def load_diffusion_model(unet_path, model_options={}, disable_dynamic=False):
-    sd, metadata = comfy.utils.load_torch_file(unet_path, return_metadata=True)
-    model = load_diffusion_model_state_dict(sd, model_options=model_options, metadata=metadata, disable_dynamic=disable_dynamic)
+    sd, metadata = comfy.weight_pool.load_torch_file(unet_path, return_metadata=True)
+    model = load_diffusion_model_state_dict(sd, model_options=model_options, metadata=metadata, disable_dynamic=disable_dynamic, unet_path=unet_path)
     if model is None:
         logging.error("ERROR UNSUPPORTED DIFFUSION MODEL {}".format(unet_path))
         raise RuntimeError("ERROR: Could not detect model type of: {}\n{}".format(unet_path, model_detection_error_hint(unet_path, sd)))
@@ -2077,9 +2233,9 @@ def load_vae_patcher(vae_path, metadata=None, device=None, disable_dynamic=False
     where the cloned patcher is targeted.
     """
     if metadata is None:
-        sd, metadata = comfy.utils.load_torch_file(vae_path, return_metadata=True)
+        sd, metadata = comfy.weight_pool.load_torch_file(vae_path, return_metadata=True)
     else:
-        sd = comfy.utils.load_torch_file(vae_path)
+        sd = comfy.weight_pool.load_torch_file(vae_path)
     vae = VAE(sd=sd, metadata=metadata, device=device)
     vae.throw_exception_if_invalid()
     return vae.patcher
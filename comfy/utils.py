@@ -36,9 +36,13 @@ import json
 import time
 import threading
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 
 MMAP_TORCH_FILES = args.mmap_torch_files
 DISABLE_MMAP = args.disable_mmap
+PARALLEL_LOAD_THREADS = args.parallel_load
+PARALLEL_LOAD_MIN_SIZE = 256 * 1024 * 1024
+PARALLEL_LOAD_CHUNK_SIZE = 64 * 1024 * 1024
 
 
 if True:  # ckpt/pt file whitelist for safe loading of old sd files
@@ -119,6 +123,122 @@ def load_safetensors(ckpt):
     return sd, header.get("__metadata__", {}),
 
 
+def parallel_load_threads(ckpt):
+    """Number of threads load_torch_file reads ckpt with, 0 when it doesn't use load_safetensors_parallel."""
+    if PARALLEL_LOAD_THREADS is None or comfy.memory_management.aimdo_enabled or not hasattr(os, "preadv"):
+        return 0
+    lower = ckpt.lower()
+    if not (lower.endswith(".safetensors") or lower.endswith(".sft")):
+        return 0
+    try:
+        if os.path.getsize(ckpt) < PARALLEL_LOAD_MIN_SIZE:
+            return 0
+    except OSError:
+        return 0
+    return PARALLEL_LOAD_THREADS if PARALLEL_LOAD_THREADS > 0 else min(8, os.cpu_count() or 1)
+
+
+def _fadvise(fd, offset, size, advice):
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, offset, size, advice)
+        except OSError:
+            pass
+
+
+def _pread_into(fd, views, offset):
+    iov_max = os.sysconf("SC_IOV_MAX") if hasattr(os, "sysconf") else 1024
+    while len(views) > 0:
+        n = os.preadv(fd, views[:iov_max], offset)
+        if n <= 0:
+            raise EOFError("Unexpected end of file at offset {}".format(offset))
+        offset += n
+        while len(views) > 0 and n >= len(views[0]):
+            n -= len(views[0])
+            views.pop(0)
+        if n > 0:
+            views[0] = views[0][n:]
+
+
+def load_safetensors_parallel(ckpt, device=None, threads=8, chunk_size=None):
+    """
+    Reads a safetensors file into RAM with a pool of threads, each reading PARALLEL_LOAD_CHUNK_SIZE
+    pieces straight into the tensors with preadv, instead of page faulting through a mmap on one thread.
+
+    Every tensor gets its own storage. Tensors are moved to device as soon as their pieces are read,
+    overlapping the copies with the reads of the rest of the file.
+    """
+    if chunk_size is None:
+        chunk_size = PARALLEL_LOAD_CHUNK_SIZE
+    with open(ckpt, "rb") as f:
+        fd = f.fileno()
+        header_size = struct.unpack("<Q", os.pread(fd, 8, 0))[0]
+        header = json.loads(os.pread(fd, header_size, 8).decode("utf-8"))
+        data_start = 8 + header_size
+        data_size = os.fstat(fd).st_size - data_start
+
+        tensors = []
+        for name, info in header.items():
+            if name == "__metadata__":
+                continue
+            start, end = info["data_offsets"]
+            if info["dtype"] not in _TYPES or start > end or end > data_size:
+                raise ValueError("Unsupported or invalid tensor {} in {}".format(name, ckpt))
+            tensors.append((start, end, name, _TYPES[info["dtype"]], info["shape"]))
+        tensors.sort(key=lambda t: t[:2])
+        buffers = [torch.empty(end - start, dtype=torch.uint8) for start, end, _, _, _ in tensors]
+
+        # Chunks start at chunk_size aligned file offsets.
+        boundaries = list(range(chunk_size - data_start % chunk_size, data_size, chunk_size))
+        chunks = list(zip([0] + boundaries, boundaries + [data_size]))
+
+        def read_chunk(chunk_start, chunk_end, first):
+            views = []
+            position = chunk_start
+            for i in range(first, len(tensors)):
+                start, end = tensors[i][:2]
+                if start >= chunk_end:
+                    break
+                if end <= chunk_start or start == end:
+                    continue
+                if start > position:
+                    views.append(memoryview(bytearray(start - position)))
+                piece_start, piece_end = max(start, chunk_start), min(end, chunk_end)
+                views.append(memoryview(buffers[i].numpy())[piece_start - start:piece_end - start])
+                position = piece_end
+            if position < chunk_end and len(views) > 0:
+                views.append(memoryview(bytearray(chunk_end - position)))
+            _pread_into(fd, views, data_start + chunk_start)
+
+        _fadvise(fd, data_start, data_size, getattr(os, "POSIX_FADV_SEQUENTIAL", 2))
+        sd = {}
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="safetensors_load") as pool:
+            futures = []
+            first = 0
+            for chunk_start, chunk_end in chunks:
+                while first < len(tensors) and tensors[first][1] <= chunk_start:
+                    first += 1
+                futures.append(pool.submit(read_chunk, chunk_start, chunk_end, first))
+
+            done = 0
+            try:
+                for (_, chunk_end), future in zip(chunks, futures):
+                    future.result()
+                    while done < len(tensors) and tensors[done][1] <= chunk_end:
+                        _, _, name, dtype, shape = tensors[done]
+                        tensor = buffers[done].view(dtype).view(shape)
+                        buffers[done] = None
+                        if device is not None and device.type != "cpu":
+                            tensor = tensor.to(device)
+                        sd[name] = tensor
+                        done += 1
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+    return sd, header.get("__metadata__", {})
+
+
 def load_torch_file(ckpt, safe_load=False, device=None, return_metadata=False):
     if device is None:
         device = torch.device("cpu")
@@ -129,6 +249,10 @@ def load_torch_file(ckpt, safe_load=False, device=None, return_metadata=False):
                 sd, metadata = load_safetensors(ckpt)
                 if not return_metadata:
                     metadata = None
+            elif (threads := parallel_load_threads(ckpt)) > 0:
+                sd, metadata = load_safetensors_parallel(ckpt, device=device, threads=threads)
+                if not return_metadata:
+                    metadata = None
             else:
                 with safetensors.safe_open(ckpt, framework="pt", device=device.type) as f:
                     sd = {}
@@ -1106,7 +1230,13 @@ def get_tiled_scale_steps(width, height, tile_x, tile_y, overlap):
     return rows * cols
 
 @torch.inference_mode()
-def tiled_scale_multidim(samples, function, tile=(64, 64), overlap=8, upscale_amount=4, out_channels=3, output_device="cpu", downscale=False, index_formulas=None, pbar=None):
+def tiled_scale_multidim(samples, function, tile=(64, 64), overlap=8, upscale_amount=4, out_channels=3, output_device="cpu", downscale=False, index_formulas=None, pbar=None, tile_batch_size=1):
+    """
+    Runs function on overlapping tiles of samples and blends the outputs together with feathered masks.
+
+    Tiles of the same shape are concatenated along the batch dimension and passed to function up to
+    tile_batch_size at a time, so function must treat batch elements independently when it is above 1.
+    """
     dims = len(tile)
 
     if not (isinstance(upscale_amount, (tuple, list))):
@@ -1162,6 +1292,25 @@ def tiled_scale_multidim(samples, function, tile=(64, 64), overlap=8, upscale_am
             out.append(round(get_scale(i, a[i])))
         return out
 
+    feathers = [round(get_scale(d, overlap[d])) for d in range(dims)]
+    masks = {}
+
+    def blend_mask(shape):
+        # The masks only depend on the tile output shape, so they are built once per shape.
+        mask = masks.get(shape)
+        if mask is None:
+            mask = torch.ones([1, 1] + [1] * dims, device=output_device)
+            for d in range(dims):
+                ramp = torch.ones(shape[d], device=output_device)
+                feather = feathers[d]
+                if feather < shape[d]:
+                    a = torch.arange(1, feather + 1, device=output_device) / feather
+                    ramp[:feather] *= a
+                    ramp[shape[d] - feather:] *= a.flip(0)
+                mask = mask * ramp.view([1, 1] + [-1 if i == d else 1 for i in range(dims)])
+            masks[shape] = mask
+        return mask
+
     output = torch.empty([samples.shape[0], out_channels] + mult_list_upscale(samples.shape[2:]), device=output_device)
 
     for b in range(samples.shape[0]):
@@ -1179,51 +1328,58 @@ def tiled_scale_multidim(samples, function, tile=(64, 64), overlap=8, upscale_am
 
         positions = [range(0, s.shape[d+2] - overlap[d], tile[d] - overlap[d]) if s.shape[d+2] > tile[d] else [0] for d in range(dims)]
 
+        # Group the tiles by input shape, keeping their order within each group. Without batching every tile is
+        # its own group so they are blended in the same order as before.
+        groups = {}
         for it in itertools.product(*positions):
-            s_in = s
-            upscaled = []
-
+            pos = []
+            lengths = []
             for d in range(dims):
-                pos = max(0, min(s.shape[d + 2] - overlap[d], it[d]))
-                l = min(tile[d], s.shape[d + 2] - pos)
-                s_in = s_in.narrow(d + 2, pos, l)
-                upscaled.append(round(get_pos(d, pos)))
-
-            ps = function(s_in).to(output_device)
-            mask = torch.ones([1, 1] + list(ps.shape[2:]), device=output_device)
-
-            for d in range(2, dims + 2):
-                feather = round(get_scale(d - 2, overlap[d - 2]))
-                if feather >= mask.shape[d]:
-                    continue
-                for t in range(feather):
-                    a = (t + 1) / feather
-                    mask.narrow(d, t, 1).mul_(a)
-                    mask.narrow(d, mask.shape[d] - 1 - t, 1).mul_(a)
-
-            o = out
-            o_d = out_div
-            ps_view = ps
-            mask_view = mask
-            for d in range(dims):
-                l = min(ps_view.shape[d + 2], o.shape[d + 2] - upscaled[d])
-                o = o.narrow(d + 2, upscaled[d], l)
-                o_d = o_d.narrow(d + 2, upscaled[d], l)
-                if l < ps_view.shape[d + 2]:
-                    ps_view = ps_view.narrow(d + 2, 0, l)
-                    mask_view = mask_view.narrow(d + 2, 0, l)
-
-            o.add_(ps_view * mask_view)
-            o_d.add_(mask_view)
-
-            if pbar is not None:
-                pbar.update(1)
+                p = max(0, min(s.shape[d + 2] - overlap[d], it[d]))
+                pos.append(p)
+                lengths.append(min(tile[d], s.shape[d + 2] - p))
+            key = tuple(lengths) if tile_batch_size > 1 else len(groups)
+            groups.setdefault(key, []).append((pos, lengths))
+
+        for group in groups.values():
+            for i in range(0, len(group), tile_batch_size):
+                batch = [pos for pos, _ in group[i:i + tile_batch_size]]
+                lengths = group[i][1]
+                tiles = []
+                for pos in batch:
+                    s_in = s
+                    for d in range(dims):
+                        s_in = s_in.narrow(d + 2, pos[d], lengths[d])
+                    tiles.append(s_in)
+                s_in = tiles[0] if len(tiles) == 1 else torch.cat(tiles)
+                ps_all = function(s_in).to(output_device)
+                mask = blend_mask(tuple(ps_all.shape[2:]))
+
+                for j, pos in enumerate(batch):
+                    o = out
+                    o_d = out_div
+                    ps_view = ps_all[j:j + 1]
+                    mask_view = mask
+                    for d in range(dims):
+                        upscaled = round(get_pos(d, pos[d]))
+                        l = min(ps_view.shape[d + 2], o.shape[d + 2] - upscaled)
+                        o = o.narrow(d + 2, upscaled, l)
+                        o_d = o_d.narrow(d + 2, upscaled, l)
+                        if l < ps_view.shape[d + 2]:
+                            ps_view = ps_view.narrow(d + 2, 0, l)
+                            mask_view = mask_view.narrow(d + 2, 0, l)
+
+                    o.add_(ps_view * mask_view)
+                    o_d.add_(mask_view)
+
+                    if pbar is not None:
+                        pbar.update(1)
 
         out.div_(out_div)
     return output
 
-def tiled_scale(samples, function, tile_x=64, tile_y=64, overlap = 8, upscale_amount = 4, out_channels = 3, output_device="cpu", pbar = None):
-    return tiled_scale_multidim(samples, function, (tile_y, tile_x), overlap=overlap, upscale_amount=upscale_amount, out_channels=out_channels, output_device=output_device, pbar=pbar)
+def tiled_scale(samples, function, tile_x=64, tile_y=64, overlap = 8, upscale_amount = 4, out_channels = 3, output_device="cpu", pbar = None, tile_batch_size=1):
+    return tiled_scale_multidim(samples, function, (tile_y, tile_x), overlap=overlap, upscale_amount=upscale_amount, out_channels=out_channels, output_device=output_device, pbar=pbar, tile_batch_size=tile_batch_size)
 
 def model_trange(*args, **kwargs):
     if not comfy.memory_management.aimdo_enabled:
@@ -0,0 +1,89 @@
+"""
+Measured memory model of VAE decodes and encodes.
+
+The memory_used_decode/memory_used_encode estimates of each VAE are formulas
+that have to hold for the worst case, so they overestimate most of the time and
+the tiled fallbacks use small fixed tiles. Instead, the first decode or encode
+with an image VAE on a CUDA device runs the model on two small inputs and records the
+peak memory of each. That gives a fixed cost and a cost per latent (decode) or
+pixel (encode) element, which is kept for every VAE with the same architecture,
+size, dtype and device. decode and encode then know up front whether the whole
+input fits and, if it doesn't, tile with the largest tile that fits instead of
+running out of memory first.
+
+Video VAEs aren't profiled: the probes have a single frame, which says nothing
+about how the memory use of a causal VAE grows with the number of frames.
+"""
+import logging
+import math
+
+import torch
+
+# Latent sizes of the decode probes, the encode probes use the matching pixel sizes.
+PROBE_SIZES = (16, 32)
+# Headroom for the allocator and for the parts of the memory use that grow faster than the input.
+SAFETY_FACTOR = 1.25
+
+# profile key -> MemoryProfile, or None if the VAE can't be profiled.
+profiles = {}
+
+
+class MemoryProfile:
+    __slots__ = ("fixed", "per_element")
+
+    def __init__(self, fixed, per_element):
+        self.fixed = fixed
+        self.per_element = per_element
+
+    def memory_required(self, shape):
+        """Bytes needed to run on an input of shape, batch and channel dimensions first."""
+        return self.fixed + self.per_element * shape[0] * math.prod(shape[2:])
+
+
+def fit_profile(points):
+    """Fits a MemoryProfile to (elements, peak bytes) measurements."""
+    (e1, m1), (e2, m2) = points[0], points[-1]
+    per_element = max(0.0, (m2 - m1) / max(1, e2 - e1))
+    fixed = max(0.0, m2 - per_element * e2)
+    return MemoryProfile(fixed * SAFETY_FACTOR, per_element * SAFETY_FACTOR)
+
+
+def measure_peak_memory(fn, x, device):
+    """Peak memory allocated on device while running fn(x), on top of what was allocated before."""
+    torch.cuda.synchronize(device)
+    torch.cuda.reset_peak_memory_stats(device)
+    base = torch.cuda.memory_allocated(device)
+    out = fn(x)
+    torch.cuda.synchronize(device)
+    del out
+    return torch.cuda.max_memory_allocated(device) - base
+
+
+def profile(key, fn, make_input, device):
+    """Returns the cached profile for key, measuring it with fn on make_input(size) for each probe size first if needed."""
+    if key in profiles:
+        return profiles[key]
+    result = None
+    if device.type == "cuda":
+        try:
+            points = []
+            with torch.inference_mode():
+                for size in PROBE_SIZES:
+                    x = make_input(size)
+                    points.append((x[0].numel() // x.shape[1], measure_peak_memory(fn, x, device)))
+                    del x
+            result = fit_profile(points)
+            logging.debug("VAE memory profile {}: {:.0f} bytes + {:.1f} bytes per element".format(key, result.fixed, result.per_element))
+        except Exception as e:
+            logging.debug("Could not profile the memory use of VAE {}: {}".format(key, e))
+        torch.cuda.empty_cache()
+    profiles[key] = result
+    return result
+
+
+def largest_tile(memory_required, free_memory, maximum, minimum, step):
+    """Largest tile size in steps of step between minimum and maximum for which memory_required(size) fits free_memory, minimum if none does."""
+    size = max(minimum, math.ceil(maximum / step) * step)
+    while size > minimum and memory_required(size) > free_memory:
+        size -= step
+    return max(minimum, size)
@@ -0,0 +1,194 @@
+"""
+Process wide pool of loaded model files.
+
+Loader nodes load their files with comfy.utils.load_torch_file, so the same file
+used by two loader nodes, or by one loader with different options, ends up
+loaded twice. Loading through load_torch_file in this module instead shares the
+tensors of a file between every caller:
+
+* files are keyed by real path, modification time and size, so a file that is
+  replaced on disk is loaded again,
+* every caller gets its own dict of the shared tensors, loaders pop keys from the
+  state dicts they get. The tensors themselves must not be modified in place,
+* a file stays pooled while one of the dicts handed out for it is alive. Files
+  whose tensors are memory mapped, and LoRAs, are also kept when no dict of them
+  is left, until RAM runs low (see ram_release) or the pool is cleared. Keeping
+  any other file would keep a second copy of its weights in RAM. Without the RAM
+  pressure cache, LoRAs read into RAM are only kept until the end of the prompt
+  (see release_idle).
+"""
+import os
+import threading
+import time
+import weakref
+
+import psutil
+
+import comfy.memory_management
+import comfy.utils
+
+
+class PooledStateDict(dict):
+    """A state dict handed out by the pool, the pool tracks how many of them are alive."""
+    pass
+
+
+class _Entry:
+    __slots__ = ("sd", "metadata", "keep_idle", "mmap_backed", "references", "ram_bytes", "last_used", "hits")
+
+    def __init__(self, sd, metadata, keep_idle, mmap_backed):
+        self.sd = sd
+        self.metadata = metadata
+        self.keep_idle = keep_idle
+        self.mmap_backed = mmap_backed
+        self.references = 0
+        self.ram_bytes = sum(t.nbytes for t in sd.values() if hasattr(t, "nbytes"))
+        self.last_used = time.time()
+        self.hits = 0
+
+
+def is_mmap_backed(path: str) -> bool:
+    """Whether load_torch_file memory maps the tensors of path instead of reading them into RAM."""
+    if comfy.utils.DISABLE_MMAP and not comfy.memory_management.aimdo_enabled:
+        return False
+    if comfy.utils.parallel_load_threads(path) > 0:
+        return False
+    lower = path.lower()
+    if lower.endswith(".safetensors") or lower.endswith(".sft"):
+        return True
+    return bool(comfy.utils.MMAP_TORCH_FILES)
+
+
+class WeightPool:
+    def __init__(self):
+        # Reentrant, a state dict can be garbage collected, and released, while the lock is held.
+        self.lock = threading.RLock()
+        self.entries: dict[tuple, _Entry] = {}
+        self.loading: dict[tuple, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _get_key(self, path: str) -> tuple:
+        real_path = os.path.realpath(path)
+        stat = os.stat(real_path)
+        return (real_path, stat.st_mtime_ns, stat.st_size, comfy.memory_management.aimdo_enabled)
+
+    def _hand_out(self, key: tuple, entry: _Entry, return_metadata: bool):
+        entry.references += 1
+        entry.last_used = time.time()
+        sd = PooledStateDict(entry.sd)
+        weakref.finalize(sd, self._release, key, entry)
+        if not return_metadata:
+            return sd
+        return sd, (dict(entry.metadata) if entry.metadata is not None else None)
+
+    def _release(self, key: tuple, entry: _Entry):
+        with self.lock:
+            entry.references -= 1
+            if entry.references == 0 and not entry.keep_idle and self.entries.get(key) is entry:
+                del self.entries[key]
+
+    def load(self, path: str, safe_load: bool = False, return_metadata: bool = False, keep_idle: bool = None):
+        """
+        Same as comfy.utils.load_torch_file(path, safe_load, return_metadata=return_metadata) but shares the tensors.
+
+        keep_idle keeps the file pooled when none of its state dicts is in use,
+        the default is to only keep memory mapped files.
+        """
+        key = self._get_key(path)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                loading = self.loading.setdefault(key, threading.Lock())
+        if entry is None:
+            # Concurrent loads of the same file wait for the first one instead of loading it again.
+            with loading:
+                with self.lock:
+                    entry = self.entries.get(key)
+                if entry is None:
+                    try:
+                        sd, metadata = comfy.utils.load_torch_file(path, safe_load=safe_load, return_metadata=True)
+                    except Exception:
+                        with self.lock:
+                            self.loading.pop(key, None)
+                        raise
+                    mmap_backed = is_mmap_backed(path)
+                    if keep_idle is None:
+                        keep_idle = mmap_backed
+                    entry = _Entry(sd, metadata, keep_idle, mmap_backed)
+                    with self.lock:
+                        self.misses += 1
+                        self._remove_stale(key)
+                        self.entries[key] = entry
+                        self.loading.pop(key, None)
+                        return self._hand_out(key, entry, return_metadata)
+        with self.lock:
+            self.hits += 1
+            entry.hits += 1
+            if keep_idle:
+                entry.keep_idle = True
+            return self._hand_out(key, entry, return_metadata)
+
+    def _remove_stale(self, key: tuple):
+        """Drop the entries of older versions of the file of key."""
+        for other in [k for k in self.entries if k[0] == key[0] and k != key]:
+            del self.entries[other]
+
+    def _evict(self, key: tuple) -> int:
+        entry = self.entries.pop(key)
+        self.evictions += 1
+        return entry.ram_bytes
+
+    def ram_release(self, target: int) -> int:
+        """Drop the least recently used files not in use until target bytes of RAM are available."""
+        freed = 0
+        with self.lock:
+            idle = sorted((entry.last_used, key) for key, entry in self.entries.items() if entry.references == 0)
+            for _, key in idle:
+                if psutil.virtual_memory().available >= target:
+                    break
+                freed += self._evict(key)
+        return freed
+
+    def release_idle(self) -> int:
+        """
+        Drop the files not in use that were read into RAM, keeping the memory mapped ones.
+        Called after every prompt when no RAM pressure cache releases them when RAM runs low.
+        """
+        freed = 0
+        with self.lock:
+            for key in [key for key, entry in self.entries.items() if entry.references == 0 and not entry.mmap_backed]:
+                freed += self._evict(key)
+        return freed
+
+    def clear(self):
+        """Drop every file not in use."""
+        with self.lock:
+            for key in [key for key, entry in self.entries.items() if entry.references == 0]:
+                self._evict(key)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            files = [{
+                "path": key[0],
+                "ram_bytes": entry.ram_bytes,
+                "references": entry.references,
+                "hits": entry.hits,
+                "last_used": entry.last_used,
+            } for key, entry in self.entries.items()]
+            files.sort(key=lambda f: f["ram_bytes"], reverse=True)
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "total_ram_bytes": sum(f["ram_bytes"] for f in files),
+                "files": files,
+            }
+
+
+weight_pool = WeightPool()
+
+
+def load_torch_file(ckpt, safe_load=False, return_metadata=False, keep_idle=None):
+    return weight_pool.load(ckpt, safe_load=safe_load, return_metadata=return_metadata, keep_idle=keep_idle)
@@ -1,7 +1,7 @@
 from av.container import InputContainer
 from av.subtitles.stream import SubtitleStream
 from fractions import Fraction
-from typing import Optional
+from typing import Callable, Iterable, Optional
 from .._input import AudioInput, VideoInput
 import av
 import io
@@ -58,6 +58,93 @@ def video_stream_bit_depth(stream) -> int:
     return max(component.bits for component in stream.format.components)
 
 
+ENCODE_CHUNK_FRAMES = 16
+
+
+def write_video_chunks(
+    path: str | io.BytesIO,
+    chunks: Iterable[torch.Tensor],
+    frame_count: int,
+    width: int,
+    height: int,
+    frame_rate: Fraction,
+    audio: Optional[AudioInput] = None,
+    format: VideoContainer = VideoContainer.AUTO,
+    codec: VideoCodec = VideoCodec.AUTO,
+    metadata: Optional[dict] = None,
+    bit_depth: int = 8,
+):
+    """
+    Encode frames given as chunks of (frames, height, width, 3) tensors into an H264 MP4.
+    Each chunk is converted and encoded before the next one is requested, so chunks can be
+    produced lazily by a generator.
+    """
+    if format != VideoContainer.AUTO and format != VideoContainer.MP4:
+        raise ValueError("Only MP4 format is supported for now")
+    if codec != VideoCodec.AUTO and codec != VideoCodec.H264:
+        raise ValueError("Only H264 codec is supported for now")
+    is_10bit = bit_depth >= 10
+    extra_kwargs = {}
+    if isinstance(format, VideoContainer) and format != VideoContainer.AUTO:
+        extra_kwargs["format"] = format.value
+    elif isinstance(path, io.BytesIO):
+        # BytesIO has no file extension, so av.open can't infer the format.
+        # Default to mp4 since that's the only supported format anyway.
+        extra_kwargs["format"] = "mp4"
+    with av.open(path, mode='w', options={'movflags': 'use_metadata_tags'}, **extra_kwargs) as output:
+        # Add metadata before writing any streams
+        if metadata is not None:
+            for key, value in metadata.items():
+                output.metadata[key] = json.dumps(value)
+
+        frame_rate = Fraction(round(frame_rate * 1000), 1000)
+        # Create a video stream
+        pix_fmt = "yuv420p10le" if is_10bit else "yuv420p"
+        video_stream = output.add_stream('h264', rate=frame_rate)
+        video_stream.width = width
+        video_stream.height = height
+        video_stream.pix_fmt = pix_fmt
+
+        # Create an audio stream
+        audio_sample_rate = 1
+        audio_stream: Optional[av.AudioStream] = None
+        if audio:
+            audio_sample_rate = int(audio['sample_rate'])
+            waveform = audio['waveform']
+            waveform = waveform[0, :, :math.ceil((audio_sample_rate / frame_rate) * frame_count)]
+            layout = {1: 'mono', 2: 'stereo', 6: '5.1'}.get(waveform.shape[0], 'stereo')
+            audio_stream = output.add_stream('aac', rate=audio_sample_rate, layout=layout)
+
+        # Encode video
+        for chunk in chunks:
+            if is_10bit:
+                # 16-bit RGB keeps float precision through the conversion to 10-bit YUV.
+                imgs = (chunk.float() * 65535).clamp(0, 65535).cpu().numpy().astype(np.uint16)  # shape: (N, H, W, 3)
+                pixel_format = "rgb48le"
+            else:
+                imgs = (chunk * 255).clamp(0, 255).byte().cpu().numpy()  # shape: (N, H, W, 3)
+                pixel_format = "rgb24"
+            for img in imgs:
+                frame = av.VideoFrame.from_ndarray(img, format=pixel_format)
+                frame = frame.reformat(format=pix_fmt)
+                packet = video_stream.encode(frame)
+                output.mux(packet)
+            del imgs
+
+        # Flush video
+        packet = video_stream.encode(None)
+        output.mux(packet)
+
+        if audio_stream and audio:
+            frame = av.AudioFrame.from_ndarray(waveform.float().cpu().contiguous().numpy(), format='fltp', layout=layout)
+            frame.sample_rate = audio_sample_rate
+            frame.pts = 0
+            output.mux(audio_stream.encode(frame))
+
+            # Flush encoder
+            output.mux(audio_stream.encode(None))
+
+
 class VideoFromFile(VideoInput):
     """
     Class representing video input from a file.
@@ -517,70 +604,96 @@ class VideoFromComponents(VideoInput):
         bit_depth: int | None = None,
     ):
         """Save the video to a file path or BytesIO buffer."""
-        if format != VideoContainer.AUTO and format != VideoContainer.MP4:
-            raise ValueError("Only MP4 format is supported for now")
-        if codec != VideoCodec.AUTO and codec != VideoCodec.H264:
-            raise ValueError("Only H264 codec is supported for now")
         # None means "use the depth this video was created with" (CreateVideo's choice).
         if bit_depth is None:
             bit_depth = self.__bit_depth
-        is_10bit = bit_depth >= 10
-        extra_kwargs = {}
-        if isinstance(format, VideoContainer) and format != VideoContainer.AUTO:
-            extra_kwargs["format"] = format.value
-        elif isinstance(path, io.BytesIO):
-            # BytesIO has no file extension, so av.open can't infer the format.
-            # Default to mp4 since that's the only supported format anyway.
-            extra_kwargs["format"] = "mp4"
-        with av.open(path, mode='w', options={'movflags': 'use_metadata_tags'}, **extra_kwargs) as output:
-            # Add metadata before writing any streams
-            if metadata is not None:
-                for key, value in metadata.items():
-                    output.metadata[key] = json.dumps(value)
-
-            frame_rate = Fraction(round(self.__components.frame_rate * 1000), 1000)
-            # Create a video stream
-            pix_fmt = "yuv420p10le" if is_10bit else "yuv420p"
-            video_stream = output.add_stream('h264', rate=frame_rate)
-            video_stream.width = self.__components.images.shape[2]
-            video_stream.height = self.__components.images.shape[1]
-            video_stream.pix_fmt = pix_fmt
-
-            # Create an audio stream
-            audio_sample_rate = 1
-            audio_stream: Optional[av.AudioStream] = None
-            if self.__components.audio:
-                audio_sample_rate = int(self.__components.audio['sample_rate'])
-                waveform = self.__components.audio['waveform']
-                waveform = waveform[0, :, :math.ceil((audio_sample_rate / frame_rate) * self.__components.images.shape[0])]
-                layout = {1: 'mono', 2: 'stereo', 6: '5.1'}.get(waveform.shape[0], 'stereo')
-                audio_stream = output.add_stream('aac', rate=audio_sample_rate, layout=layout)
-
-            # Encode video
-            for i, frame in enumerate(self.__components.images):
-                if is_10bit:
-                    # 16-bit RGB keeps float precision through the conversion to 10-bit YUV.
-                    img = (frame.float() * 65535).clamp(0, 65535).cpu().numpy().astype(np.uint16)  # shape: (H, W, 3)
-                    frame = av.VideoFrame.from_ndarray(img, format="rgb48le")
-                else:
-                    img = (frame * 255).clamp(0, 255).byte().cpu().numpy() # shape: (H, W, 3)
-                    frame = av.VideoFrame.from_ndarray(img, format='rgb24')
-                frame = frame.reformat(format=pix_fmt)
-                packet = video_stream.encode(frame)
-                output.mux(packet)
+        images = self.__components.images
+        write_video_chunks(
+            path, images.split(ENCODE_CHUNK_FRAMES), images.shape[0], images.shape[2], images.shape[1],
+            self.__components.frame_rate, self.__components.audio,
+            format=format, codec=codec, metadata=metadata, bit_depth=bit_depth,
+        )
+
+    def as_trimmed(
+        self,
+        start_time: float | None = None,
+        duration: float | None = None,
+        strict_duration: bool = True,
+    ) -> VideoInput | None:
+        if self.get_duration() < start_time + duration:
+            return None
+        #TODO Consider tracking duration and trimming at time of save?
+        return VideoFromFile(self.get_stream_source(), start_time=start_time, duration=duration)
+
+
+class VideoFromFrameChunks(VideoInput):
+    """
+    Class representing a video whose frames are produced in chunks when they are needed,
+    e.g. by a streaming VAE decode. Saving encodes each chunk as soon as it is produced,
+    so only a few chunks of frames are in memory at once.
+    """
+
+    def __init__(
+        self,
+        get_chunks: Callable[[], Iterable[torch.Tensor]],
+        frame_count: int,
+        width: int,
+        height: int,
+        frame_rate: Fraction,
+        audio: Optional[AudioInput] = None,
+        bit_depth: int = 8,
+    ):
+        """
+        get_chunks returns a new iterable of (frames, height, width, 3) tensors every time
+        it is called, which together contain frame_count frames.
+        """
+        self.__get_chunks = get_chunks
+        self.__frame_count = frame_count
+        self.__width = width
+        self.__height = height
+        self.__frame_rate = frame_rate
+        self.__audio = audio
+        self.__bit_depth = bit_depth
+
+    def get_components(self) -> VideoComponents:
+        # Needs all the frames at once, only save_to streams them.
+        return VideoComponents(
+            images=torch.cat(list(self.__get_chunks())),
+            audio=self.__audio,
+            frame_rate=self.__frame_rate,
+        )
+
+    def get_dimensions(self) -> tuple[int, int]:
+        return self.__width, self.__height
+
+    def get_bit_depth(self) -> int:
+        return self.__bit_depth
 
-            # Flush video
-            packet = video_stream.encode(None)
-            output.mux(packet)
+    def get_duration(self) -> float:
+        return float(self.__frame_count / self.__frame_rate)
+
+    def get_frame_count(self) -> int:
+        return self.__frame_count
 
-            if audio_stream and self.__components.audio:
-                frame = av.AudioFrame.from_ndarray(waveform.float().cpu().contiguous().numpy(), format='fltp', layout=layout)
-                frame.sample_rate = audio_sample_rate
-                frame.pts = 0
-                output.mux(audio_stream.encode(frame))
+    def get_frame_rate(self) -> Fraction:
+        return self.__frame_rate
 
-                # Flush encoder
-                output.mux(audio_stream.encode(None))
+    def save_to(
+        self,
+        path: str,
+        format: VideoContainer = VideoContainer.AUTO,
+        codec: VideoCodec = VideoCodec.AUTO,
+        metadata: Optional[dict] = None,
+        bit_depth: int | None = None,
+    ):
+        """Save the video to a file path or BytesIO buffer, producing the frames while encoding them."""
+        if bit_depth is None:
+            bit_depth = self.__bit_depth
+        write_video_chunks(
+            path, self.__get_chunks(), self.__frame_count, self.__width, self.__height,
+            self.__frame_rate, self.__audio,
+            format=format, codec=codec, metadata=metadata, bit_depth=bit_depth,
+        )
 
     def as_trimmed(
         self,
@@ -590,5 +703,4 @@ class VideoFromComponents(VideoInput):
     ) -> VideoInput | None:
         if self.get_duration() < start_time + duration:
             return None
-        #TODO Consider tracking duration and trimming at time of save?
         return VideoFromFile(self.get_stream_source(), start_time=start_time, duration=duration)
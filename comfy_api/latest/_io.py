@@ -1635,6 +1635,10 @@ class Schema:
     """Optional client-evaluated pricing badge declaration for this node."""
     not_idempotent: bool=False
     """Flags a node as not idempotent; when True, the node will run and not reuse the cached outputs when identical inputs are provided on a different node in the graph."""
+    is_thread_safe: bool=False
+    """Flags a node as safe to run on a worker thread; with --parallel-cpu-nodes it may execute concurrently with other nodes. Only set this if execute works purely on its inputs and doesn't load models or modify shared state."""
+    is_vectorized: bool=False
+    """Flags a node as vectorized; when its inputs are lists, execute is called once with a VectorizedInput per input and returns the values of all the items, instead of being called per item. See comfy_execution/vectorized.py."""
     enable_expand: bool=False
     """Flags a node as expandable, allowing NodeOutput to include 'expand' property."""
     accept_all_inputs: bool=False
@@ -2108,6 +2112,22 @@ class _ComfyNodeBaseInternal(_ComfyNodeInternal):
             cls.GET_SCHEMA()
         return cls._ACCEPT_ALL_INPUTS
 
+    _THREAD_SAFE = None
+    @final
+    @classproperty
+    def THREAD_SAFE(cls):  # noqa
+        if cls._THREAD_SAFE is None:
+            cls.GET_SCHEMA()
+        return cls._THREAD_SAFE
+
+    _VECTORIZED = None
+    @final
+    @classproperty
+    def VECTORIZED(cls):  # noqa
+        if cls._VECTORIZED is None:
+            cls.GET_SCHEMA()
+        return cls._VECTORIZED
+
     @final
     @classmethod
     def INPUT_TYPES(cls) -> dict[str, dict]:
@@ -2152,6 +2172,10 @@ class _ComfyNodeBaseInternal(_ComfyNodeInternal):
             cls._NOT_IDEMPOTENT = schema.not_idempotent
         if cls._ACCEPT_ALL_INPUTS is None:
             cls._ACCEPT_ALL_INPUTS = schema.accept_all_inputs
+        if cls._THREAD_SAFE is None:
+            cls._THREAD_SAFE = schema.is_thread_safe
+        if cls._VECTORIZED is None:
+            cls._VECTORIZED = schema.is_vectorized
 
         if cls._RETURN_TYPES is None:
             output = []
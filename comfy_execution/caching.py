@@ -1,9 +1,12 @@
 import asyncio
-import bisect
+import heapq
 import itertools
+import math
+import numpy as np
 import psutil
 import time
 import torch
+from collections import OrderedDict
 from typing import Sequence, Mapping, Dict
 from comfy.model_patcher import ModelPatcher
 from comfy_execution.graph import DynamicPrompt
@@ -79,11 +82,36 @@ class CacheKeySetID(CacheKeySet):
             self.keys[node_id] = (node_id, node["class_type"])
             self.subcache_keys[node_id] = (node_id, node["class_type"])
 
+#Process-wide memo of node signature digests. The memo key is the node's immediate
+#signature with every link already replaced by the digest of the linked node, so
+#an entry is only reused when the whole upstream subgraph is unchanged.
+
+SIGNATURE_DIGEST_CACHE_SIZE = 65536
+_signature_digest_cache: "OrderedDict[object, str]" = OrderedDict()
+
+
+def _signature_digest(signature):
+    try:
+        digest = _signature_digest_cache.pop(signature, None)
+    except TypeError:
+        return Unhashable()
+    if digest is None:
+        from comfy_execution.cache_provider import _serialize_cache_key
+        digest = _serialize_cache_key(signature)
+        if digest is None:
+            return Unhashable()
+    _signature_digest_cache[signature] = digest
+    if len(_signature_digest_cache) > SIGNATURE_DIGEST_CACHE_SIZE:
+        _signature_digest_cache.popitem(last=False)
+    return digest
+
+
 class CacheKeySetInputSignature(CacheKeySet):
     def __init__(self, dynprompt, node_ids, is_changed_cache):
         super().__init__(dynprompt, node_ids, is_changed_cache)
         self.dynprompt = dynprompt
         self.is_changed_cache = is_changed_cache
+        self.node_digests = {}
 
     def include_node_id_in_input(self) -> bool:
         return False
@@ -99,54 +127,62 @@ class CacheKeySetInputSignature(CacheKeySet):
             self.subcache_keys[node_id] = (node_id, node["class_type"])
 
     async def get_node_signature(self, dynprompt, node_id):
-        signature = []
-        ancestors, order_mapping = self.get_ordered_ancestry(dynprompt, node_id)
-        signature.append(await self.get_immediate_node_signature(dynprompt, node_id, order_mapping))
-        for ancestor_id in ancestors:
-            signature.append(await self.get_immediate_node_signature(dynprompt, ancestor_id, order_mapping))
-        return to_hashable(signature)
-
-    async def get_immediate_node_signature(self, dynprompt, node_id, ancestor_order_mapping):
+        # Merkle-style signature: each node is hashed from its own inputs plus the
+        # digests of the nodes it links to, so every node is only visited once per
+        # key set. Nodes that can't be cached get a fresh Unhashable, which never
+        # compares equal to anything else and poisons all of their descendants.
+        if node_id in self.node_digests:
+            return self.node_digests[node_id]
+        visiting = set()
+        stack = [(node_id, False)]
+        while stack:
+            current_id, parents_done = stack.pop()
+            if current_id in self.node_digests:
+                continue
+            if not parents_done:
+                if current_id in visiting:
+                    # Dependency cycle -- validation will reject it later.
+                    self.node_digests[current_id] = Unhashable()
+                    continue
+                visiting.add(current_id)
+                stack.append((current_id, True))
+                if dynprompt.has_node(current_id):
+                    inputs = dynprompt.get_node(current_id)["inputs"]
+                    for key in sorted(inputs.keys(), reverse=True):
+                        if is_link(inputs[key]) and inputs[key][0] not in self.node_digests:
+                            stack.append((inputs[key][0], False))
+                continue
+            visiting.discard(current_id)
+            signature = await self.get_immediate_node_signature(dynprompt, current_id, self.node_digests)
+            self.node_digests[current_id] = signature if isinstance(signature, Unhashable) else _signature_digest(signature)
+        return self.node_digests[node_id]
+
+    async def get_immediate_node_signature(self, dynprompt, node_id, ancestor_digests):
+        from comfy_execution.cache_provider import _contains_self_unequal
         if not dynprompt.has_node(node_id):
             # This node doesn't exist -- we can't cache it.
-            return [float("NaN")]
+            return Unhashable()
         node = dynprompt.get_node(node_id)
         class_type = node["class_type"]
         class_def = nodes.NODE_CLASS_MAPPINGS[class_type]
-        signature = [class_type, await self.is_changed_cache.get(node_id)]
+        signature = [class_type, to_hashable(await self.is_changed_cache.get(node_id))]
         if self.include_node_id_in_input() or (hasattr(class_def, "NOT_IDEMPOTENT") and class_def.NOT_IDEMPOTENT) or include_unique_id_in_input(class_type):
             signature.append(node_id)
         inputs = node["inputs"]
         for key in sorted(inputs.keys()):
             if is_link(inputs[key]):
                 (ancestor_id, ancestor_socket) = inputs[key]
-                ancestor_index = ancestor_order_mapping[ancestor_id]
-                signature.append((key,("ANCESTOR", ancestor_index, ancestor_socket)))
+                ancestor_digest = ancestor_digests.get(ancestor_id)
+                if ancestor_digest is None or isinstance(ancestor_digest, Unhashable):
+                    return Unhashable()
+                signature.append((key, ("ANCESTOR", ancestor_digest, ancestor_socket)))
             else:
-                signature.append((key, inputs[key]))
+                signature.append((key, to_hashable(inputs[key])))
+        signature = tuple(signature)
+        if _contains_self_unequal(signature):
+            return Unhashable()
         return signature
 
-    # This function returns a list of all ancestors of the given node. The order of the list is
-    # deterministic based on which specific inputs the ancestor is connected by.
-    def get_ordered_ancestry(self, dynprompt, node_id):
-        ancestors = []
-        order_mapping = {}
-        self.get_ordered_ancestry_internal(dynprompt, node_id, ancestors, order_mapping)
-        return ancestors, order_mapping
-
-    def get_ordered_ancestry_internal(self, dynprompt, node_id, ancestors, order_mapping):
-        if not dynprompt.has_node(node_id):
-            return
-        inputs = dynprompt.get_node(node_id)["inputs"]
-        input_keys = sorted(inputs.keys())
-        for key in input_keys:
-            if is_link(inputs[key]):
-                ancestor_id = inputs[key][0]
-                if ancestor_id not in order_mapping:
-                    ancestors.append(ancestor_id)
-                    order_mapping[ancestor_id] = len(ancestors) - 1
-                    self.get_ordered_ancestry_internal(dynprompt, ancestor_id, ancestors, order_mapping)
-
 class BasicCache:
     def __init__(self, key_class, enable_providers=False):
         self.key_class = key_class
@@ -493,7 +529,7 @@ class LRUCache(BasicCache):
         return self
 
 
-#Small baseline weight used when a cache entry has no measurable CPU tensors.
+#Small baseline weight used when a cache entry has no measurable CPU memory.
 #Keeps unknown-sized entries in eviction scoring without dominating tensor-backed entries.
 
 RAM_CACHE_DEFAULT_RAM_USAGE = 0.05
@@ -502,6 +538,7 @@ RAM_CACHE_DEFAULT_RAM_USAGE = 0.05
 #in constantly changing setups.
 
 RAM_CACHE_OLD_WORKFLOW_OOM_MULTIPLIER = 1.3
+_LOG_OLD_WORKFLOW_OOM_MULTIPLIER = math.log(RAM_CACHE_OLD_WORKFLOW_OOM_MULTIPLIER)
 
 
 def all_outputs_dynamic(outputs):
@@ -518,11 +555,61 @@ def all_outputs_dynamic(outputs):
     return True
 
 
+def measure_ram_usage(outputs):
+    """Returns (bytes of CPU memory referenced by outputs, whether outputs hold a ModelPatcher).
+
+    Walks nested lists, tuples and dicts (LATENT, CONDITIONING, ...). Tensors are counted
+    by their underlying storage, once per storage, so views and shared tensors aren't
+    double counted. numpy arrays are counted by their base buffer.
+    """
+    ram_usage = 0
+    holds_model = False
+    seen = set()
+    stack = [outputs]
+    while stack:
+        obj = stack.pop()
+        if obj is None:
+            continue
+        if isinstance(obj, torch.Tensor):
+            if obj.device.type != 'cpu':
+                continue
+            try:
+                storage = obj.untyped_storage()
+                ptr, nbytes = storage.data_ptr(), storage.nbytes()
+            except (NotImplementedError, RuntimeError):
+                ptr, nbytes = id(obj), obj.numel() * obj.element_size()
+            if ptr not in seen:
+                seen.add(ptr)
+                ram_usage += nbytes
+        elif isinstance(obj, np.ndarray):
+            base = obj
+            while isinstance(base.base, np.ndarray):
+                base = base.base
+            if id(base) not in seen:
+                seen.add(id(base))
+                ram_usage += base.nbytes
+        elif isinstance(obj, ModelPatcher):
+            holds_model = True
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+        elif isinstance(obj, dict):
+            stack.extend(obj.values())
+    return ram_usage, holds_model
+
+
 class RAMPressureCache(LRUCache):
 
     def __init__(self, key_class, enable_providers=False):
         super().__init__(key_class, 0, enable_providers=enable_providers)
         self.timestamps = {}
+        # cache_key -> (ram bytes, holds ModelPatcher, node_id, class_type), measured on insert
+        self.entry_sizes = {}
+        self.total_ram_usage = 0
+        # Min-heap of eviction candidates with lazy invalidation: an item is only
+        # valid while its sequence number matches heap_seq[key].
+        self.eviction_heap = []
+        self.heap_seq = {}
+        self.seq_counter = itertools.count()
 
     def clean_unused(self):
         self._clean_subcaches()
@@ -530,53 +617,103 @@ class RAMPressureCache(LRUCache):
     async def set(self, node_id, value):
         self.timestamps[self.cache_key_set.get_data_key(node_id)] = time.time()
         await super().set(node_id, value)
+        self._account(node_id)
 
     async def get(self, node_id):
         self.timestamps[self.cache_key_set.get_data_key(node_id)] = time.time()
-        return await super().get(node_id)
+        result = await super().get(node_id)
+        if result is not None:
+            # Entries restored by a cache provider are inserted by _get_immediate.
+            self._account(node_id, only_new=True)
+        return result
 
     def set_local(self, node_id, value):
         self.timestamps[self.cache_key_set.get_data_key(node_id)] = time.time()
         super().set_local(node_id, value)
+        self._account(node_id)
 
-    def ram_release(self, target, free_active=False):
-        if psutil.virtual_memory().available >= target:
-            return
+    def _mark_used(self, node_id):
+        super()._mark_used(node_id)
+        cache_key = self.cache_key_set.get_data_key(node_id)
+        if cache_key in self.entry_sizes:
+            self._push_eviction_candidate(cache_key)
 
-        clean_list = []
+    def _account(self, node_id, only_new=False):
+        cache_key = self.cache_key_set.get_data_key(node_id)
+        if cache_key not in self.cache or (only_new and cache_key in self.entry_sizes):
+            return
+        ram_usage, holds_model = measure_ram_usage(self.cache[cache_key].outputs)
+        previous = self.entry_sizes.get(cache_key)
+        if previous is not None:
+            self.total_ram_usage -= previous[0]
+        class_type = self._get_class_type(node_id)
+        self.entry_sizes[cache_key] = (ram_usage, holds_model, node_id, class_type)
+        self.total_ram_usage += ram_usage
+        self._push_eviction_candidate(cache_key)
+
+    def _push_eviction_candidate(self, key):
+        # The OOM score is MULTIPLIER ** (generation - used_generation) * ram_usage. The
+        # generation term is shared by every entry, so ordering by
+        # log(ram_usage) - used_generation * log(MULTIPLIER) is equivalent and doesn't go
+        # stale when the generation advances.
+        ram_usage, holds_model, _, _ = self.entry_sizes[key]
+        log_score = math.log(ram_usage + RAM_CACHE_DEFAULT_RAM_USAGE) - self.used_generation.get(key, 0) * _LOG_OLD_WORKFLOW_OOM_MULTIPLIER
+        seq = next(self.seq_counter)
+        self.heap_seq[key] = seq
+        # ModelPatchers are the first to go; ties on the score fall back to LRU.
+        heapq.heappush(self.eviction_heap, (not holds_model, -log_score, self.timestamps.get(key, 0), seq, key))
+        if len(self.eviction_heap) > 4 * len(self.entry_sizes) + 64:
+            self._compact_heap()
+
+    def _compact_heap(self):
+        self.eviction_heap = [item for item in self.eviction_heap if self.heap_seq.get(item[4]) == item[3]]
+        heapq.heapify(self.eviction_heap)
+
+    def _evict(self, key):
+        ram_usage = self.entry_sizes.pop(key, (0,))[0]
+        self.total_ram_usage -= ram_usage
+        self.heap_seq.pop(key, None)
+        self.cache.pop(key, None)
+        self.used_generation.pop(key, None)
+        self.timestamps.pop(key, None)
+        self.children.pop(key, None)
+        return ram_usage
 
-        for key, cache_entry in self.cache.items():
-            if not free_active and self.used_generation[key] == self.generation:
+    def ram_release(self, target, free_active=False):
+        if psutil.virtual_memory().available >= target:
+            return 0
+
+        freed = 0
+        skipped = []
+        while self.eviction_heap and psutil.virtual_memory().available < target:
+            item = heapq.heappop(self.eviction_heap)
+            key = item[4]
+            if self.heap_seq.get(key) != item[3]:
                 continue
-
-            if all_outputs_dynamic(cache_entry.outputs) and self.used_generation[key] == self.generation:
+            if key not in self.cache:
+                self._evict(key)
                 continue
-
-            oom_score = RAM_CACHE_OLD_WORKFLOW_OOM_MULTIPLIER ** (self.generation - self.used_generation[key])
-
-            ram_usage = RAM_CACHE_DEFAULT_RAM_USAGE
-            def scan_list_for_ram_usage(outputs):
-                nonlocal ram_usage
-                if outputs is None:
-                    return
-                for output in outputs:
-                    if isinstance(output, (list, tuple)):
-                        scan_list_for_ram_usage(output)
-                    elif isinstance(output, torch.Tensor) and output.device.type == 'cpu':
-                        ram_usage += output.numel() * output.element_size()
-                    elif isinstance(output, ModelPatcher) and self.used_generation[key] != self.generation:
-                        #old ModelPatchers are the first to go
-                        ram_usage = 1e30
-            scan_list_for_ram_usage(cache_entry.outputs)
-
-            oom_score *= ram_usage
-            #In the case where we have no information on the node ram usage at all,
-            #break OOM score ties on the last touch timestamp (pure LRU)
-            bisect.insort(clean_list, (oom_score, self.timestamps[key], key))
-
-        while psutil.virtual_memory().available < target and clean_list:
-            _, _, key = clean_list.pop()
-            del self.cache[key]
-            self.used_generation.pop(key, None)
-            self.timestamps.pop(key, None)
-            self.children.pop(key, None)
+            if self.used_generation.get(key) == self.generation:
+                if not free_active or all_outputs_dynamic(self.cache[key].outputs):
+                    skipped.append(item)
+                    continue
+            freed += self._evict(key)
+
+        for item in skipped:
+            heapq.heappush(self.eviction_heap, item)
+        return freed
+
+    def get_ram_usage(self):
+        """Per entry RAM usage, largest first, for reporting what the cache holds."""
+        entries = []
+        for key, (ram_usage, holds_model, node_id, class_type) in list(self.entry_sizes.items()):
+            entries.append({
+                "node_id": node_id,
+                "class_type": class_type,
+                "ram_bytes": ram_usage,
+                "holds_model": holds_model,
+                "generations_unused": self.generation - self.used_generation.get(key, self.generation),
+                "last_used": self.timestamps.get(key),
+            })
+        entries.sort(key=lambda e: e["ram_bytes"], reverse=True)
+        return {"total_ram_bytes": self.total_ram_usage, "entries": entries}
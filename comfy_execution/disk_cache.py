@@ -0,0 +1,217 @@
+"""
+Local on-disk tier for the output cache.
+
+Node outputs are written as safetensors files under a content-addressed directory
+(the file name is the cache key hash) and loaded back memory-mapped, so encoded
+conditionings, latents and images survive restarts. The directory is kept under
+a byte budget by evicting the least recently used entries.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from typing import Optional
+import asyncio
+import json
+import logging
+import os
+import threading
+import uuid
+
+import torch
+import safetensors.torch
+
+import comfy.utils
+import nodes
+from comfyui_version import __version__
+from comfy_execution.cache_provider import CacheProvider, CacheContext, CacheValue
+
+FILE_EXTENSION = ".safetensors"
+STRUCTURE_METADATA_KEY = "comfy_outputs"
+UI_METADATA_KEY = "comfy_ui"
+
+
+class _Unserializable(Exception):
+    pass
+
+
+def _encode(obj, tensors, tensor_names):
+    if isinstance(obj, torch.Tensor):
+        name = tensor_names.get(id(obj))
+        if name is None:
+            name = "t{}".format(len(tensors))
+            tensor_names[id(obj)] = name
+            tensors[name] = obj
+        return {"__tensor__": name}
+    elif isinstance(obj, (bool, int, float, str, type(None))):
+        return obj
+    elif isinstance(obj, list):
+        return [_encode(x, tensors, tensor_names) for x in obj]
+    elif isinstance(obj, tuple):
+        return {"__tuple__": [_encode(x, tensors, tensor_names) for x in obj]}
+    elif isinstance(obj, dict):
+        if not all(isinstance(k, str) for k in obj):
+            raise _Unserializable("dict with non string keys")
+        return {"__dict__": {k: _encode(v, tensors, tensor_names) for k, v in obj.items()}}
+    raise _Unserializable(type(obj).__name__)
+
+
+def _decode(obj, tensors):
+    if isinstance(obj, list):
+        return [_decode(x, tensors) for x in obj]
+    if isinstance(obj, dict):
+        if "__tensor__" in obj:
+            return tensors[obj["__tensor__"]]
+        if "__tuple__" in obj:
+            return tuple(_decode(x, tensors) for x in obj["__tuple__"])
+        return {k: _decode(v, tensors) for k, v in obj["__dict__"].items()}
+    return obj
+
+
+def encode_outputs(outputs):
+    """Split node outputs into (structure JSON, tensor dict). Raises _Unserializable for models and other objects."""
+    tensors = {}
+    structure = _encode(list(outputs), tensors, {})
+    return json.dumps(structure), tensors
+
+
+def decode_outputs(structure, tensors):
+    return _decode(json.loads(structure), tensors)
+
+
+class DiskCacheProvider(CacheProvider):
+    """Cache provider that persists serializable node outputs to a local directory."""
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = os.path.join(cache_dir, __version__)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, int]" = OrderedDict()
+        self.total_bytes = 0
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="disk_cache")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for file in files:
+                path = os.path.join(root, file)
+                if not file.endswith(FILE_EXTENSION):
+                    # Leftover partial write from a crashed process.
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found.append((stat.st_mtime, file[:-len(FILE_EXTENSION)], stat.st_size))
+        found.sort()
+        with self.lock:
+            for _, key, size in found:
+                self.entries[key] = size
+                self.total_bytes += size
+        self._evict()
+        logging.info("Disk cache: {} entries, {:.2f} GB in {}".format(len(self.entries), self.total_bytes / (1024 ** 3), self.cache_dir))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + FILE_EXTENSION)
+
+    def _evict(self):
+        with self.lock:
+            to_remove = []
+            while self.total_bytes > self.max_bytes and self.entries:
+                key, size = self.entries.popitem(last=False)
+                self.total_bytes -= size
+                to_remove.append(key)
+        for key in to_remove:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def should_cache(self, context: CacheContext, value: Optional[CacheValue] = None) -> bool:
+        # Output nodes have side effects (saved or temp files) that a restored entry wouldn't reproduce.
+        class_def = nodes.NODE_CLASS_MAPPINGS.get(context.class_type)
+        return class_def is not None and getattr(class_def, "OUTPUT_NODE", False) is not True
+
+    async def on_lookup(self, context: CacheContext) -> Optional[CacheValue]:
+        key = context.cache_key_hash
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+        return await asyncio.to_thread(self._read, key)
+
+    def _read(self, key: str) -> Optional[CacheValue]:
+        path = self._path(key)
+        try:
+            tensors, metadata = comfy.utils.load_torch_file(path, return_metadata=True)
+            outputs = decode_outputs(metadata[STRUCTURE_METADATA_KEY], tensors)
+            ui = json.loads(metadata[UI_METADATA_KEY]) if UI_METADATA_KEY in metadata else None
+            os.utime(path)
+        except Exception as e:
+            logging.warning("Disk cache: dropping unreadable entry {}: {}".format(path, e))
+            self._remove(key)
+            return None
+        return CacheValue(outputs=outputs, ui=ui)
+
+    def _remove(self, key: str):
+        with self.lock:
+            size = self.entries.pop(key, None)
+            if size is not None:
+                self.total_bytes -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    async def on_store(self, context: CacheContext, value: CacheValue) -> None:
+        with self.lock:
+            if context.cache_key_hash in self.entries:
+                return
+        try:
+            structure, tensors = encode_outputs(value.outputs)
+            ui = json.dumps(value.ui) if value.ui is not None else None
+        except (_Unserializable, TypeError, ValueError):
+            return
+        # Hand off to the writer thread so the write isn't tied to the executor's event loop.
+        self.writer.submit(self._write, context.cache_key_hash, structure, ui, tensors)
+
+    def _write(self, key: str, structure: str, ui: Optional[str], tensors: dict):
+        path = self._path(key)
+        tmp_path = "{}.{}.tmp".format(path, uuid.uuid4().hex)
+        metadata = {STRUCTURE_METADATA_KEY: structure}
+        if ui is not None:
+            metadata[UI_METADATA_KEY] = ui
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tensors = {k: v.detach().to("cpu").contiguous() for k, v in tensors.items()}
+            try:
+                safetensors.torch.save_file(tensors, tmp_path, metadata=metadata)
+            except RuntimeError:
+                # Views sharing one storage have to be written as separate copies.
+                safetensors.torch.save_file({k: v.clone() for k, v in tensors.items()}, tmp_path, metadata=metadata)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except Exception as e:
+            logging.warning("Disk cache: failed to write {}: {}".format(path, e))
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = size
+                self.total_bytes += size
+        self._evict()
+
+    def flush(self):
+        """Block until all queued writes are on disk."""
+        self.writer.submit(lambda: None).result()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"entries": len(self.entries), "bytes": self.total_bytes, "max_bytes": self.max_bytes}
@@ -0,0 +1,160 @@
+"""
+Background preloading of the model files of upcoming prompts.
+
+Loader nodes only start reading their files once the prompt using them runs, so
+switching models between jobs leaves the GPU idle while the disk catches up. The
+prefetcher watches the first pending prompts of the PromptQueue, finds the model
+files their inputs refer to and, while the current prompt runs:
+
+* loads files that are read into RAM anyway into comfy.weight_pool, and holds
+  them there until the prompts that use them are done, so the loader gets them
+  from the pool. Only the folders whose loaders go through the pool
+  (POOLED_FOLDERS) are loaded this way,
+* reads the other files, and the ones that are loaded memory mapped, into the
+  OS page cache.
+
+Files are prefetched in queue order for as long as they fit the RAM budget.
+"""
+import logging
+import os
+import threading
+
+import psutil
+
+import comfy.model_prefetch
+import comfy.weight_pool
+import folder_paths
+
+POLL_INTERVAL = 0.5
+EXCLUDED_FOLDERS = ("custom_nodes", "configs")
+# Folders of the models loaded with comfy.weight_pool.load_torch_file.
+POOLED_FOLDERS = ("checkpoints", "diffusion_models", "vae", "text_encoders", "loras")
+
+# Set by main.py, None when prefetching is disabled.
+file_prefetcher = None
+
+
+def get_prompt_model_files(prompt):
+    """Full path -> folder name of the model files referenced by the widget values of a prompt, in node order."""
+    extensions = tuple(folder_paths.supported_pt_extensions)
+    files = {}
+    for node in prompt.values():
+        for value in node.get("inputs", {}).values():
+            if not isinstance(value, str) or not value.lower().endswith(extensions):
+                continue
+            for folder_name in folder_paths.folder_names_and_paths:
+                if folder_name in EXCLUDED_FOLDERS:
+                    continue
+                path = folder_paths.get_full_path(folder_name, value)
+                if path is not None:
+                    files.setdefault(path, folder_name)
+                    break
+    return files
+
+
+def get_prompt_model_paths(prompt):
+    """Full paths of the model files referenced by the widget values of a prompt, in node order."""
+    return list(get_prompt_model_files(prompt))
+
+
+class FilePrefetcher:
+    def __init__(self, prompt_queue, lookahead, ram_budget):
+        self.prompt_queue = prompt_queue
+        self.lookahead = lookahead
+        self.ram_budget = ram_budget
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        # path -> size of the files prefetched for the current lookahead, in the page cache or held in the pool.
+        self.prefetched = {}
+        self.held = {}
+        self.version = None
+        self.prefetched_bytes = 0
+        self.prefetched_files = 0
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True, name="file_prefetch").start()
+
+    def notify(self):
+        """Check the queue now instead of at the next poll."""
+        self.wake.set()
+
+    def clear(self):
+        """Release the files held in the weight pool, e.g. before freeing memory."""
+        with self.lock:
+            self.held.clear()
+            self.prefetched.clear()
+            self.version = None
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "files": dict(self.prefetched),
+                "held_files": list(self.held),
+                "prefetched_bytes": self.prefetched_bytes,
+                "prefetched_files": self.prefetched_files,
+            }
+
+    def _run(self):
+        while True:
+            self.wake.wait(timeout=POLL_INTERVAL)
+            self.wake.clear()
+            try:
+                self.update()
+            except Exception:
+                logging.exception("Model file prefetch failed")
+
+    def update(self):
+        """Prefetch the files of the next prompts if the queue changed since the last call."""
+        snapshot = self.prompt_queue.get_snapshot()
+        if snapshot.version == self.version:
+            return
+        self.version = snapshot.version
+
+        running = set()
+        for item in snapshot.running:
+            running.update(get_prompt_model_paths(item[2]))
+        upcoming = {}
+        for item in snapshot.pending[:self.lookahead]:
+            for path, folder_name in get_prompt_model_files(item[2]).items():
+                upcoming.setdefault(path, folder_name)
+
+        with self.lock:
+            wanted = running.union(upcoming)
+            for path in [p for p in self.held if p not in wanted]:
+                del self.held[path]
+            for path in [p for p in self.prefetched if p not in wanted]:
+                del self.prefetched[path]
+
+        for path, folder_name in upcoming.items():
+            if path in self.prefetched or path in running:
+                continue
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            with self.lock:
+                used = sum(self.prefetched.values())
+            if used + size > self.ram_budget or psutil.virtual_memory().available < size:
+                continue
+            try:
+                if not self._prefetch(path, folder_name):
+                    # The queue changed, start over with the new lookahead.
+                    self.version = None
+                    return
+            except Exception as e:
+                logging.warning("Could not prefetch {}: {}".format(path, e))
+                size = 0
+            with self.lock:
+                self.prefetched[path] = size
+                if size > 0:
+                    self.prefetched_bytes += size
+                    self.prefetched_files += 1
+
+    def _prefetch(self, path, folder_name):
+        """Returns False if a queue change interrupted it."""
+        if folder_name not in POOLED_FOLDERS or comfy.weight_pool.is_mmap_backed(path):
+            return comfy.model_prefetch.warm_file(path, should_stop=self.wake.is_set)
+        sd = comfy.weight_pool.load_torch_file(path, safe_load=True)
+        with self.lock:
+            self.held[path] = sd
+        return True
@@ -4,6 +4,7 @@ import nodes
 import asyncio
 import inspect
 from comfy_execution.graph_utils import is_link, ExecutionBlocker
+from comfy_execution.utils import runs_on_thread_pool
 from comfy.comfy_types.node_typing import ComfyNodeABC, InputTypeDict, InputTypeOptions
 
 # NOTE: ExecutionBlocker code got moved to graph_utils.py to prevent torch being imported too soon during unit tests
@@ -280,10 +281,11 @@ class ExecutionList(TopologicalSort):
 
         # If an available node is async, do that first.
         # This will execute the asynchronous function earlier, reducing the overall time.
+        # Nodes dispatched to the worker pool are started early for the same reason.
         def is_async(node_id):
             class_type = self.dynprompt.get_node(node_id)["class_type"]
             class_def = nodes.NODE_CLASS_MAPPINGS[class_type]
-            return inspect.iscoroutinefunction(getattr(class_def, class_def.FUNCTION))
+            return inspect.iscoroutinefunction(getattr(class_def, class_def.FUNCTION)) or runs_on_thread_pool(class_def)
 
         for node_id in node_list:
             if is_output(node_id) or is_async(node_id):
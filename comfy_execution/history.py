@@ -0,0 +1,86 @@
+"""
+Storage for the history of finished prompts.
+
+PromptQueue starts with the in memory HistoryStore. When the database is
+available main.py replaces it with app.job_history.DatabaseHistoryStore, which
+keeps the history across restarts and pages through it with SQL queries.
+"""
+from __future__ import annotations
+
+import copy
+import threading
+from typing import Optional
+
+from comfy_execution.jobs import job_sort_key, normalize_history_item
+
+
+class HistoryStore:
+    """History kept in a dict, dropping the oldest entries past max_items."""
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self.lock = threading.RLock()
+        self.history = {}
+
+    def add(self, prompt_id: str, entry: dict):
+        with self.lock:
+            self.history.pop(prompt_id, None)
+            if len(self.history) > self.max_items:
+                self.history.pop(next(iter(self.history)))
+            self.history[prompt_id] = entry
+
+    def get(self, prompt_id: str) -> Optional[dict]:
+        """The entry for prompt_id as a copy the caller may modify, or None."""
+        with self.lock:
+            entry = self.history.get(prompt_id)
+            return copy.deepcopy(entry) if entry is not None else None
+
+    def list(self, max_items: Optional[int] = None, offset: int = -1, before: Optional[str] = None) -> dict:
+        """Entries in the order they finished, keyed by prompt_id.
+
+        Starts at offset, or returns the last max_items entries when offset is
+        negative. With before, only the entries that finished before that prompt
+        are considered, which lets clients page back through the history.
+        """
+        with self.lock:
+            keys = list(self.history)
+            if before is not None:
+                keys = keys[:keys.index(before)] if before in self.history else []
+            if offset < 0:
+                offset = 0 if max_items is None else max(0, len(keys) - max_items)
+            keys = keys[offset:]
+            if max_items is not None:
+                keys = keys[:max_items]
+            return {k: self.history[k] for k in keys}
+
+    def delete(self, prompt_id: str):
+        with self.lock:
+            self.history.pop(prompt_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.history = {}
+
+    def query_jobs(self, statuses: list[str], workflow_id: Optional[str] = None, sort_by: str = "created_at",
+                   sort_order: str = "desc", limit: Optional[int] = None, after: Optional[tuple] = None) -> tuple[list[dict], int]:
+        """Job summaries of the finished jobs with one of statuses.
+
+        Sorted by comfy_execution.jobs.job_sort_key and starting after the key
+        after. Returns (jobs, total), total counting every matching job regardless
+        of after and limit.
+        """
+        with self.lock:
+            items = list(self.history.items())
+        jobs = []
+        for prompt_id, entry in items:
+            job = normalize_history_item(prompt_id, entry)
+            if job.get('status') in statuses and (not workflow_id or job.get('workflow_id') == workflow_id):
+                jobs.append(job)
+        total = len(jobs)
+        reverse = (sort_order == 'desc')
+        if after is not None:
+            jobs = [j for j in jobs if (job_sort_key(j, sort_by) < after if reverse else job_sort_key(j, sort_by) > after)]
+        jobs.sort(key=lambda j: job_sort_key(j, sort_by), reverse=reverse)
+        if limit is not None:
+            jobs = jobs[:limit]
+        return jobs, total
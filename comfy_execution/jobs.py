@@ -3,6 +3,9 @@ Job utilities for the /api/jobs endpoint.
 Provides normalization and helper functions for job status tracking.
 """
 
+import base64
+import binascii
+import json
 import uuid
 from typing import Callable, Optional
 
@@ -329,6 +332,103 @@ def apply_sorting(jobs: list[dict], sort_by: str, sort_order: str) -> list[dict]
     return sorted(jobs, key=get_sort_key, reverse=reverse)
 
 
+def job_sort_key(job: dict, sort_by: str) -> tuple:
+    """Total order used for keyset pagination: the sort value with the job id as tie breaker.
+
+    Matches the values stored by the history database (a missing create_time or
+    duration sorts as 0).
+    """
+    if sort_by == 'execution_duration':
+        start = job.get('execution_start_time', 0)
+        end = job.get('execution_end_time', 0)
+        value = end - start if end and start else 0
+    else:
+        value = job.get('create_time') or 0
+    return (value, job['id'])
+
+
+def encode_job_cursor(key: tuple) -> str:
+    """Encode a job_sort_key as an opaque /api/jobs cursor."""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode().rstrip('=')
+
+
+def decode_job_cursor(cursor: str) -> tuple:
+    """Decode a cursor from encode_job_cursor. Raises ValueError when it is malformed."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError("invalid cursor")
+    if not isinstance(key, list) or len(key) != 2 or not isinstance(key[0], (int, float)) or isinstance(key[0], bool) or not isinstance(key[1], str):
+        raise ValueError("invalid cursor")
+    return tuple(key)
+
+
+def get_jobs_page(
+    running: list,
+    queued: list,
+    history_store,
+    status_filter: Optional[list[str]] = None,
+    workflow_id: Optional[str] = None,
+    sort_by: str = "created_at",
+    sort_order: str = "desc",
+    limit: Optional[int] = None,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+) -> tuple[list[dict], int, Optional[str]]:
+    """
+    Get one page of jobs (running, pending, finished) with filtering and sorting.
+
+    Like get_all_jobs, but finished jobs come from a history store
+    (comfy_execution.history.HistoryStore) that filters, sorts and pages them
+    itself, so only the requested page of history is loaded.
+
+    Args:
+        cursor: next_cursor of the previous page; pages with a cursor start right
+            after the last job of that page instead of at offset.
+
+    Returns:
+        tuple: (jobs_list, total_count, next_cursor), next_cursor is None on the last page
+
+    Raises:
+        ValueError: if cursor is malformed
+    """
+    if status_filter is None:
+        status_filter = JobStatus.ALL
+    after = decode_job_cursor(cursor) if cursor is not None else None
+    reverse = (sort_order == 'desc')
+
+    jobs = []
+    if JobStatus.IN_PROGRESS in status_filter:
+        for item in running:
+            jobs.append(normalize_queue_item(item, JobStatus.IN_PROGRESS))
+    if JobStatus.PENDING in status_filter:
+        for item in queued:
+            jobs.append(normalize_queue_item(item, JobStatus.PENDING))
+    if workflow_id:
+        jobs = [j for j in jobs if j.get('workflow_id') == workflow_id]
+    total_count = len(jobs)
+    if after is not None:
+        jobs = [j for j in jobs if (job_sort_key(j, sort_by) < after if reverse else job_sort_key(j, sort_by) > after)]
+
+    history_statuses = [s for s in (JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED) if s in status_filter]
+    if history_statuses:
+        fetch = None if limit is None else offset + limit + 1
+        history_jobs, history_count = history_store.query_jobs(
+            history_statuses, workflow_id=workflow_id, sort_by=sort_by, sort_order=sort_order, limit=fetch, after=after
+        )
+        jobs += history_jobs
+        total_count += history_count
+
+    jobs.sort(key=lambda j: job_sort_key(j, sort_by), reverse=reverse)
+    if offset > 0:
+        jobs = jobs[offset:]
+    next_cursor = None
+    if limit is not None and len(jobs) > limit:
+        jobs = jobs[:limit]
+        next_cursor = encode_job_cursor(job_sort_key(jobs[-1], sort_by))
+    return (jobs, total_count, next_cursor)
+
+
 def get_job(prompt_id: str, running: list, queued: list, history: dict) -> Optional[dict]:
     """
     Get a single job by prompt_id from history or queue.
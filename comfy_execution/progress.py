@@ -4,11 +4,13 @@ from PIL import Image
 from enum import Enum
 from abc import ABC
 from tqdm import tqdm
+import threading
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from comfy_execution.graph import DynamicPrompt
 from protocol import BinaryEventTypes
 from comfy_api import feature_flags
+from comfy_execution.utils import get_executing_context
 
 PreviewImageTuple = Tuple[str, Image.Image, Optional[int]]
 
@@ -156,6 +158,16 @@ class WebUIProgressHandler(ProgressHandler):
 
     def set_registry(self, registry: "ProgressRegistry"):
         self.registry = registry
+        self.node_ids = {}
+
+    def _get_node_ids(self, node_id: str) -> tuple:
+        """(display_node_id, parent_node_id, real_node_id) of a node, they don't change during a prompt."""
+        ids = self.node_ids.get(node_id)
+        if ids is None:
+            dynprompt = self.registry.dynprompt
+            ids = (dynprompt.get_display_node_id(node_id), dynprompt.get_parent_node_id(node_id), dynprompt.get_real_node_id(node_id))
+            self.node_ids[node_id] = ids
+        return ids
 
     def _send_progress_state(self, prompt_id: str, nodes: Dict[str, NodeProgressState]):
         """Send the current progress state to the client"""
@@ -163,20 +175,21 @@ class WebUIProgressHandler(ProgressHandler):
             return
 
         # Only send info for non-pending nodes
-        active_nodes = {
-            node_id: {
+        active_nodes = {}
+        for node_id, state in nodes.items():
+            if state["state"] == NodeState.Pending:
+                continue
+            display_node_id, parent_node_id, real_node_id = self._get_node_ids(node_id)
+            active_nodes[node_id] = {
                 "value": state["value"],
                 "max": state["max"],
                 "state": state["state"].value,
                 "node_id": node_id,
                 "prompt_id": prompt_id,
-                "display_node_id": self.registry.dynprompt.get_display_node_id(node_id),
-                "parent_node_id": self.registry.dynprompt.get_parent_node_id(node_id),
-                "real_node_id": self.registry.dynprompt.get_real_node_id(node_id),
+                "display_node_id": display_node_id,
+                "parent_node_id": parent_node_id,
+                "real_node_id": real_node_id,
             }
-            for node_id, state in nodes.items()
-            if state["state"] != NodeState.Pending
-        }
 
         # Send a combined progress_state message with all node states
         # Include client_id to ensure message is only sent to the initiating client
@@ -319,16 +332,20 @@ class ProgressRegistry:
 
 # Global registry instance
 global_progress_registry: ProgressRegistry | None = None
+# Registry of the prompt each prompt worker thread is running, for when several workers run at once (--gpu-workers)
+worker_progress_registries: Dict[int, ProgressRegistry] = {}
 
 def reset_progress_state(prompt_id: str, dynprompt: "DynamicPrompt") -> None:
     global global_progress_registry
 
     # Reset existing handlers if registry exists
-    if global_progress_registry is not None:
-        global_progress_registry.reset_handlers()
+    previous = worker_progress_registries.get(threading.get_ident(), global_progress_registry)
+    if previous is not None:
+        previous.reset_handlers()
 
     # Create new registry
     global_progress_registry = ProgressRegistry(prompt_id, dynprompt)
+    worker_progress_registries[threading.get_ident()] = global_progress_registry
 
 
 def add_progress_handler(handler: ProgressHandler) -> None:
@@ -339,6 +356,16 @@ def add_progress_handler(handler: ProgressHandler) -> None:
 
 def get_progress_state() -> ProgressRegistry:
     global global_progress_registry
+    if len(worker_progress_registries) > 1:
+        registry = worker_progress_registries.get(threading.get_ident())
+        if registry is not None:
+            return registry
+        # Thread pool threads run nodes on behalf of a worker, find it by the prompt being executed.
+        context = get_executing_context()
+        if context is not None:
+            for registry in list(worker_progress_registries.values()):
+                if registry.prompt_id == context.prompt_id:
+                    return registry
     if global_progress_registry is None:
         from comfy_execution.graph import DynamicPrompt
 
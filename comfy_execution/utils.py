@@ -1,6 +1,9 @@
 import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, NamedTuple
 
+from comfy.cli_args import args
+
 class ExecutionContext(NamedTuple):
     """
     Context information about the currently executing node.
@@ -44,3 +47,26 @@ class CurrentNodeContext:
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.token is not None:
             current_executing_context.reset(self.token)
+
+
+_thread_safe_node_pool: Optional[ThreadPoolExecutor] = None
+
+def get_thread_safe_node_pool() -> Optional[ThreadPoolExecutor]:
+    """
+    Worker pool for nodes marked THREAD_SAFE, or None when --parallel-cpu-nodes is not set.
+    """
+    global _thread_safe_node_pool
+    if args.parallel_cpu_nodes <= 0:
+        return None
+    if _thread_safe_node_pool is None:
+        _thread_safe_node_pool = ThreadPoolExecutor(max_workers=args.parallel_cpu_nodes, thread_name_prefix="node_worker")
+    return _thread_safe_node_pool
+
+def runs_on_thread_pool(class_def) -> bool:
+    """
+    Whether the main function of this node class is dispatched to the worker pool.
+
+    Nodes opt in with THREAD_SAFE = True (or is_thread_safe=True in a V3 schema) when their
+    function only works on its own inputs and doesn't load models or touch other shared state.
+    """
+    return get_thread_safe_node_pool() is not None and getattr(class_def, "THREAD_SAFE", False) is True
@@ -1,3 +1,10 @@
+import inspect
+import threading
+from typing import Any, NamedTuple
+
+import folder_paths
+
+from comfy_api.internal import _ComfyNodeInternal, first_real_override
 from comfy_api.latest import IO
 
 
@@ -56,3 +63,107 @@ def validate_node_input(
     else:
         # In non-strict mode, there must be at least one type in common
         return len(received_types.intersection(input_types)) > 0
+
+
+class NodeInputSchema(NamedTuple):
+    """What validating a node needs from its class, see get_node_input_schema."""
+    class_inputs: dict[str, Any]
+    validate_function_name: str
+    validate_function_inputs: list[str]
+    validate_has_kwargs: bool
+
+
+def get_node_input_schema(class_def) -> NodeInputSchema:
+    """Call INPUT_TYPES() of class_def and look up its input validation function."""
+    class_inputs = class_def.INPUT_TYPES()
+    if issubclass(class_def, _ComfyNodeInternal):
+        validate_function_name = "validate_inputs"
+        validate_function = first_real_override(class_def, validate_function_name)
+    else:
+        validate_function_name = "VALIDATE_INPUTS"
+        validate_function = getattr(class_def, validate_function_name, None)
+    validate_function_inputs = []
+    validate_has_kwargs = False
+    if validate_function is not None:
+        argspec = inspect.getfullargspec(validate_function)
+        validate_function_inputs = argspec.args
+        validate_has_kwargs = argspec.varkw is not None
+    return NodeInputSchema(class_inputs, validate_function_name, validate_function_inputs, validate_has_kwargs)
+
+
+class InputSchemaCache:
+    """
+    Node input schemas by node class, for one filesystem generation at a time.
+
+    INPUT_TYPES() of loader nodes lists folders on every call, so validating a
+    prompt would mostly be spent listing files. Schemas are kept until
+    folder_paths.get_filesystem_generation() changes. Cached schemas are
+    shared and must not be modified.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.generation = None
+        self.schemas = {}
+
+    def get(self, class_def, generation: int) -> tuple[NodeInputSchema, bool]:
+        """The schema of class_def and whether it was taken from the cache."""
+        with self.lock:
+            if generation != self.generation:
+                self.generation = generation
+                self.schemas = {}
+            schema = self.schemas.get(class_def)
+        if schema is not None:
+            return schema, True
+        schema = get_node_input_schema(class_def)
+        with self.lock:
+            if generation == self.generation:
+                self.schemas[class_def] = schema
+        return schema, False
+
+    def invalidate(self, class_defs=None):
+        """Drop the schemas of class_defs, or all of them."""
+        with self.lock:
+            if class_defs is None:
+                self.schemas = {}
+            else:
+                for class_def in class_defs:
+                    self.schemas.pop(class_def, None)
+
+
+input_schema_cache = InputSchemaCache()
+
+
+class InputSchemaLookup:
+    """
+    Schemas for validating one batch of prompts.
+
+    Checks the filesystem generation once for the whole batch. refresh() reloads
+    the schemas taken from the cache, for retrying a prompt that failed
+    validation in case a cached schema missed a file added since.
+    """
+
+    def __init__(self, cache: InputSchemaCache = input_schema_cache):
+        self.cache = cache
+        self.generation = folder_paths.get_filesystem_generation()
+        self.schemas = {}
+        self.cached = set()
+
+    def get(self, class_def) -> NodeInputSchema:
+        schema = self.schemas.get(class_def)
+        if schema is None:
+            schema, cached = self.cache.get(class_def, self.generation)
+            self.schemas[class_def] = schema
+            if cached:
+                self.cached.add(class_def)
+        return schema
+
+    def refresh(self) -> bool:
+        """Drop the schemas that came from the cache. Returns False if there were none."""
+        if len(self.cached) == 0:
+            return False
+        self.cache.invalidate(self.cached)
+        for class_def in self.cached:
+            self.schemas.pop(class_def, None)
+        self.cached = set()
+        return True
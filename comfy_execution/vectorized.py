@@ -0,0 +1,112 @@
+"""
+Running nodes on whole lists at once.
+
+When a node gets lists as inputs (from OUTPUT_IS_LIST nodes) it is called once
+per list item with that item's inputs, and its results are joined back into
+lists. A node can set VECTORIZED = True (or is_vectorized=True in a V3 schema)
+to be called once instead:
+
+* every input is a VectorizedInput, a sequence of the input value of every
+  item that looks values up in the input list instead of copying them,
+* the node returns, for every output, the sequence of the values of every item
+  (the whole list for OUTPUT_IS_LIST outputs). A tensor is taken as the
+  sequence of its slices along the first dimension.
+
+Only the node function is vectorized: check_lazy_status and VALIDATE_INPUTS
+are still called per item. When an ExecutionBlocker blocks some of the items,
+the node is called once per item that isn't blocked, with inputs of length 1.
+Vectorized nodes can't expand into subgraphs.
+"""
+import collections.abc
+import itertools
+from typing import Any
+
+import torch
+
+
+class VectorizedInput(collections.abc.Sequence):
+    """
+    The values of one input for each of the length list items a VECTORIZED node runs on.
+
+    Item i is the i-th value of the input list, or its last value when the list is
+    shorter, like for nodes called once per item.
+    """
+    __slots__ = ("values", "length")
+
+    def __init__(self, values: list, length: int):
+        self.values = values
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.length))]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("vectorized input index out of range")
+        return self.values[min(index, len(self.values) - 1)]
+
+    def __iter__(self):
+        values = self.values[:self.length]
+        return itertools.chain(values, itertools.repeat(self.values[-1], self.length - len(values)))
+
+    @property
+    def is_broadcast(self) -> bool:
+        """Whether every item has the same value."""
+        return len(self.values) == 1 or self.length <= 1
+
+    def stack(self) -> torch.Tensor:
+        """
+        The items as one tensor with a first dimension of len(self).
+
+        Tensor items are stacked, numbers become a 1D tensor. Items repeating the
+        last value are an expanded view of it rather than copies, so a broadcast
+        input costs no memory.
+        """
+        values = self.values[:self.length]
+        if isinstance(values[0], torch.Tensor):
+            head = torch.stack(values) if len(values) > 1 else values[0].unsqueeze(0)
+            last = values[-1]
+        else:
+            head = torch.tensor(values)
+            last = head[-1]
+        repeats = self.length - len(values)
+        if repeats == 0:
+            return head
+        if len(values) == 1:
+            return head.expand(self.length, *last.shape)
+        return torch.cat((head, last.unsqueeze(0).expand(repeats, *last.shape)))
+
+
+class VectorizedResult:
+    """What a VECTORIZED node returned for all the items, as opposed to the result of one item."""
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+
+def _get_output_list(values) -> list:
+    """The output list of one output of a vectorized node."""
+    if isinstance(values, list):
+        return values
+    if isinstance(values, torch.Tensor):
+        return list(values.unbind(0))
+    if isinstance(values, collections.abc.Sequence) and not isinstance(values, (str, bytes)):
+        return list(values)
+    # A single value, e.g. an ExecutionBlocker for every item.
+    return [values]
+
+
+def merge_vectorized_results(results: list) -> list:
+    """The output lists of a vectorized node from the results of its calls."""
+    if len(results) == 1:
+        return [_get_output_list(values) for values in results[0]]
+    output = [[] for _ in results[0]]
+    for result in results:
+        for i, values in enumerate(result):
+            output[i].extend(_get_output_list(values))
+    return output
@@ -69,7 +69,8 @@ class ImageUpscaleWithModel(io.ComfyNode):
         device = model_management.get_torch_device()
 
         memory_required = model_management.module_size(upscale_model.model)
-        memory_required += (512 * 512 * 3) * image.element_size() * max(upscale_model.scale, 1.0) * 384.0 #The 384.0 is an estimate of how much some of these models take, TODO: make it more accurate
+        tile_memory = (512 * 512 * 3) * image.element_size() * max(upscale_model.scale, 1.0) * 384.0 #The 384.0 is an estimate of how much some of these models take, TODO: make it more accurate
+        memory_required += tile_memory
         memory_required += image.nelement() * image.element_size()
         model_management.free_memory(memory_required, device)
 
@@ -81,16 +82,21 @@ class ImageUpscaleWithModel(io.ComfyNode):
 
         output_device = comfy.model_management.intermediate_device()
 
+        tile_batch_size = max(1, int(model_management.get_free_memory(device) / tile_memory))
+
         oom = True
         try:
             while oom:
                 try:
                     steps = in_img.shape[0] * comfy.utils.get_tiled_scale_steps(in_img.shape[3], in_img.shape[2], tile_x=tile, tile_y=tile, overlap=overlap)
                     pbar = comfy.utils.ProgressBar(steps)
-                    s = comfy.utils.tiled_scale(in_img, lambda a: upscale_model(a.float()), tile_x=tile, tile_y=tile, overlap=overlap, upscale_amount=upscale_model.scale, pbar=pbar, output_device=output_device)
+                    s = comfy.utils.tiled_scale(in_img, lambda a: upscale_model(a.float()), tile_x=tile, tile_y=tile, overlap=overlap, upscale_amount=upscale_model.scale, pbar=pbar, output_device=output_device, tile_batch_size=tile_batch_size)
                     oom = False
                 except Exception as e:
                     model_management.raise_non_oom(e)
+                    if tile_batch_size > 1:
+                        tile_batch_size = 1
+                        continue
                     tile //= 2
                     if tile < 128:
                         raise e
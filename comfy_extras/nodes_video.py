@@ -164,6 +164,65 @@ class CreateVideo(io.ComfyNode):
             )
         )
 
+class CreateVideoFromLatent(io.ComfyNode):
+    @classmethod
+    def define_schema(cls):
+        return io.Schema(
+            node_id="CreateVideoFromLatent",
+            search_aliases=["streaming vae decode", "decode video", "latent to video"],
+            display_name="Create Video from Latent",
+            category="video",
+            description="Create a video from video latents. The latents are decoded in chunks while the video is"
+            " encoded, so long videos never need all their frames in memory at once. Chunks overlap by one latent"
+            " frame and are blended, so with causal video VAEs the frames around each seam differ slightly from"
+            " VAE Decode, even when the whole video would fit.",
+            inputs=[
+                io.Latent.Input("samples", tooltip="The video latents to decode."),
+                io.Vae.Input("vae", tooltip="The VAE used to decode the latents."),
+                io.Float.Input("fps", default=30.0, min=1.0, max=120.0, step=1.0),
+                io.Int.Input("chunk_frames", default=16, min=2, max=4096, step=1, advanced=True,
+                             tooltip="How many latent frames are decoded at a time. Lower uses less memory, higher has fewer"
+                             " chunk seams. Set it to the number of latent frames to decode in one pass like VAE Decode."),
+                io.Audio.Input("audio", optional=True, tooltip="The audio to add to the video."),
+                io.Int.Input(
+                    "bit_depth",
+                    min=8,
+                    max=10,
+                    default=8,
+                    step=2,
+                    tooltip="Bit depth of the created video. 10-bit keeps smoother gradients with less"
+                    " banding, but some players and downstream nodes may not support it.",
+                    optional=True,
+                    display_mode=io.NumberDisplay.number,
+                ),
+            ],
+            outputs=[
+                io.Video.Output(),
+            ],
+        )
+
+    @classmethod
+    def execute(
+        cls, samples, vae, fps: float, chunk_frames: int, audio: Optional[Input.Audio] = None, bit_depth: int = 8,
+    ) -> io.NodeOutput:
+        latent = samples["samples"]
+        if latent.is_nested:
+            latent = latent.unbind()[0]
+        if latent.ndim != 5:
+            raise ValueError("Create Video from Latent needs video latents.")
+        scale = vae.spacial_compression_decode()
+        return io.NodeOutput(
+            InputImpl.VideoFromFrameChunks(
+                lambda: vae.decode_stream(latent, chunk_frames=chunk_frames),
+                frame_count=vae.decode_frame_count(latent),
+                width=latent.shape[-1] * scale,
+                height=latent.shape[-2] * scale,
+                frame_rate=Fraction(fps),
+                audio=audio,
+                bit_depth=bit_depth,
+            )
+        )
+
 class GetVideoComponents(io.ComfyNode):
     @classmethod
     def define_schema(cls):
@@ -284,6 +343,7 @@ class VideoExtension(ComfyExtension):
             SaveWEBM,
             SaveVideo,
             CreateVideo,
+            CreateVideoFromLatent,
             GetVideoComponents,
             LoadVideo,
             VideoSlice,
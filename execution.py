@@ -1,3 +1,4 @@
+import collections
 import copy
 import heapq
 import inspect
@@ -13,10 +14,13 @@ import asyncio
 
 import torch
 
+import folder_paths
 from comfy.cli_args import args
 import comfy.memory_management
 import comfy.model_management
 import comfy.model_prefetch
+import comfy.patched_weight_cache
+import comfy.weight_pool
 import comfy_aimdo.model_vbar
 
 from latent_preview import set_preview_method
@@ -37,9 +41,11 @@ from comfy_execution.graph import (
     get_input_info,
 )
 from comfy_execution.graph_utils import GraphBuilder, is_link
-from comfy_execution.validation import validate_node_input
+from comfy_execution.validation import InputSchemaLookup, validate_node_input
+from comfy_execution.history import HistoryStore
 from comfy_execution.progress import get_progress_state, reset_progress_state, add_progress_handler, WebUIProgressHandler
-from comfy_execution.utils import CurrentNodeContext
+from comfy_execution.vectorized import VectorizedInput, VectorizedResult, merge_vectorized_results
+from comfy_execution.utils import CurrentNodeContext, get_thread_safe_node_pool, runs_on_thread_pool
 from comfy_execution.asset_enrichment import enrich_output_with_assets
 from comfy_api.internal import _ComfyNodeInternal, _NodeOutputInternal, first_real_override, is_class, make_locked_method_func
 from comfy_api.latest import io, _io
@@ -153,11 +159,11 @@ class CacheSet:
 
 SENSITIVE_EXTRA_DATA_KEYS = ("auth_token_comfy_org", "api_key_comfy_org")
 
-def get_input_data(inputs, class_def, unique_id, execution_list=None, dynprompt=None, extra_data={}):
+def get_input_data(inputs, class_def, unique_id, execution_list=None, dynprompt=None, extra_data={}, class_inputs=None):
     is_v3 = issubclass(class_def, _ComfyNodeInternal)
     v3_data: io.V3Data = {}
     hidden_inputs_v3 = {}
-    valid_inputs = class_def.INPUT_TYPES()
+    valid_inputs = class_inputs if class_inputs is not None else class_def.INPUT_TYPES()
     if is_v3:
         valid_inputs, hidden, v3_data = _io.get_finalized_class_inputs(valid_inputs, inputs)
     input_data_all = {}
@@ -237,6 +243,9 @@ async def resolve_map_node_over_list_results(results):
                 raise exc
         return [x.result() if isinstance(x, asyncio.Task) else x for x in results]
 
+async def _wrap_result(coroutine, wrap):
+    return wrap(await coroutine)
+
 async def _async_map_node_over_list(prompt_id, unique_id, obj, input_data_all, func, allow_interrupt=False, execution_block_cb=None, pre_execute_cb=None, v3_data=None):
     # check if node wants the lists
     input_is_list = getattr(obj, "INPUT_IS_LIST", False)
@@ -250,8 +259,11 @@ async def _async_map_node_over_list(prompt_id, unique_id, obj, input_data_all, f
     def slice_dict(d, i):
         return {k: v[i if len(v) > i else -1] for k, v in d.items()}
 
+    run_on_pool = func == getattr(obj, "FUNCTION", None) and runs_on_thread_pool(obj if is_class(obj) else type(obj))
+    vectorized = func == getattr(obj, "FUNCTION", None) and getattr(obj, "VECTORIZED", False) is True
+
     results = []
-    async def process_inputs(inputs, index=None, input_is_list=False):
+    async def process_inputs(inputs, index=None, input_is_list=False, wrap=None):
         if allow_interrupt:
             nodes.before_node_execution()
         execution_block = None
@@ -286,11 +298,25 @@ async def _async_map_node_over_list(prompt_id, unique_id, obj, input_data_all, f
             # V1
             else:
                 f = getattr(obj, func)
-            if inspect.iscoroutinefunction(f):
-                async def async_wrapper(f, prompt_id, unique_id, list_index, args):
-                    with CurrentNodeContext(prompt_id, unique_id, list_index):
-                        return await f(**args)
-                task = asyncio.create_task(async_wrapper(f, prompt_id, unique_id, index, args=inputs))
+            if inspect.iscoroutinefunction(f) or run_on_pool:
+                if inspect.iscoroutinefunction(f):
+                    async def async_wrapper(f, prompt_id, unique_id, list_index, args):
+                        with CurrentNodeContext(prompt_id, unique_id, list_index):
+                            return await f(**args)
+                else:
+                    # Thread safe nodes run on the worker pool and are awaited like async nodes,
+                    # so the executor can stage other ready nodes in the meantime.
+                    def pool_wrapper(f, prompt_id, unique_id, list_index, args, device):
+                        # Pool threads are shared by all prompt workers, so take on the device of the calling one.
+                        comfy.model_management.set_torch_device(device)
+                        with torch.inference_mode(), CurrentNodeContext(prompt_id, unique_id, list_index):
+                            return f(**args)
+                    async def async_wrapper(f, prompt_id, unique_id, list_index, args):
+                        return await asyncio.get_running_loop().run_in_executor(get_thread_safe_node_pool(), pool_wrapper, f, prompt_id, unique_id, list_index, args, comfy.model_management.get_torch_device())
+                coroutine = async_wrapper(f, prompt_id, unique_id, index, args=inputs)
+                if wrap is not None:
+                    coroutine = _wrap_result(coroutine, wrap)
+                task = asyncio.create_task(coroutine)
                 # Give the task a chance to execute without yielding
                 await asyncio.sleep(0)
                 if task.done():
@@ -301,18 +327,25 @@ async def _async_map_node_over_list(prompt_id, unique_id, obj, input_data_all, f
             else:
                 with CurrentNodeContext(prompt_id, unique_id, index):
                     result = f(**inputs)
-                results.append(result)
+                results.append(result if wrap is None else wrap(result))
         else:
             results.append(execution_block)
 
     if input_is_list:
         await process_inputs(input_data_all, 0, input_is_list=input_is_list)
+    elif vectorized and not any(isinstance(v, ExecutionBlocker) for values in input_data_all.values() for v in values):
+        # One call for all the items, see comfy_execution/vectorized.py
+        length = max(max_len_input, 1)
+        await process_inputs({k: VectorizedInput(v, length) for k, v in input_data_all.items()}, 0, wrap=VectorizedResult)
     elif max_len_input == 0:
         await process_inputs({})
     else:
         for i in range(max_len_input):
             input_dict = slice_dict(input_data_all, i)
-            await process_inputs(input_dict, i)
+            if vectorized and not any(isinstance(v, ExecutionBlocker) for v in input_dict.values()):
+                await process_inputs({k: VectorizedInput([v], 1) for k, v in input_dict.items()}, i, wrap=VectorizedResult)
+            else:
+                await process_inputs(input_dict, i)
     return results
 
 
@@ -350,8 +383,12 @@ def get_output_from_returns(return_values, obj):
     uis = []
     subgraph_results = []
     has_subgraph = False
+    vectorized = False
     for i in range(len(return_values)):
         r = return_values[i]
+        if isinstance(r, VectorizedResult):
+            vectorized = True
+            r = r.value
         if isinstance(r, dict):
             if 'ui' in r:
                 uis.append(r['ui'])
@@ -395,8 +432,12 @@ def get_output_from_returns(return_values, obj):
             results.append(r)
             subgraph_results.append((None, r))
 
+    if vectorized and has_subgraph:
+        raise RuntimeError("VECTORIZED nodes can't expand into subgraphs")
     if has_subgraph:
         output = subgraph_results
+    elif vectorized and len(results) > 0:
+        output = merge_vectorized_results(results)
     elif len(results) > 0:
         output = merge_result_data(results, obj)
     else:
@@ -659,10 +700,12 @@ async def execute(server, dynprompt, caches, current_item, extra_data, executed,
     return (ExecutionResult.SUCCESS, None, None)
 
 class PromptExecutor:
-    def __init__(self, server, cache_type=False, cache_args=None):
+    def __init__(self, server, cache_type=False, cache_args=None, device=None):
         self.cache_args = cache_args
         self.cache_type = cache_type
         self.server = server
+        # Set when this executor is one of several prompt workers, each pinned to its own device.
+        self.device = device
         self.reset()
 
     def reset(self):
@@ -670,6 +713,11 @@ class PromptExecutor:
         self.status_messages = []
         self.success = True
 
+    def get_cache_ram_usage(self):
+        if self.cache_type != CacheType.RAM_PRESSURE:
+            return None
+        return self.caches.outputs.get_ram_usage()
+
     def add_message(self, event, data: dict, broadcast: bool):
         data = {
             **data,
@@ -726,7 +774,7 @@ class PromptExecutor:
     async def execute_async(self, prompt, prompt_id, extra_data={}, execute_outputs=[]):
         set_preview_method(extra_data.get("preview_method"))
 
-        nodes.interrupt_processing(False)
+        nodes.interrupt_processing(False, self.device)
 
         if "client_id" in extra_data:
             self.server.client_id = extra_data["client_id"]
@@ -792,6 +840,10 @@ class PromptExecutor:
                         execution_list.complete_node_execution()
 
                     if self.cache_type == CacheType.RAM_PRESSURE:
+                        # Pooled model files nothing uses are the cheapest to drop.
+                        comfy.weight_pool.weight_pool.ram_release(ram_inactive_headroom)
+                        if comfy.patched_weight_cache.patched_weight_cache is not None:
+                            comfy.patched_weight_cache.patched_weight_cache.ram_release(ram_inactive_headroom)
                         ram_release_callback(ram_inactive_headroom)
                         ram_shortfall = ram_headroom - psutil.virtual_memory().available
                         freed = comfy.model_management.free_pins(ram_shortfall + 512 * (1024 ** 2))
@@ -828,12 +880,17 @@ class PromptExecutor:
                     comfy.model_management.unload_all_models()
         finally:
             comfy.memory_management.set_ram_cache_release_state(None, 0)
+            if self.cache_type != CacheType.RAM_PRESSURE:
+                # Nothing releases idle pooled files under RAM pressure in the other cache modes.
+                comfy.weight_pool.weight_pool.release_idle()
             self._notify_prompt_lifecycle("end", prompt_id)
 
 
-async def validate_inputs(prompt_id, prompt, item, validated, visiting=None):
+async def validate_inputs(prompt_id, prompt, item, validated, visiting=None, schemas=None):
     if visiting is None:
         visiting = []
+    if schemas is None:
+        schemas = InputSchemaLookup()
 
     unique_id = item
     if unique_id in validated:
@@ -863,22 +920,13 @@ async def validate_inputs(prompt_id, prompt, item, validated, visiting=None):
     valid = True
 
     v3_data = None
-    validate_function_inputs = []
-    validate_has_kwargs = False
+    schema = schemas.get(obj_class)
+    class_inputs = schema.class_inputs
     if issubclass(obj_class, _ComfyNodeInternal):
-        obj_class: _io._ComfyNodeBaseInternal
-        class_inputs = obj_class.INPUT_TYPES()
         class_inputs, _, v3_data = _io.get_finalized_class_inputs(class_inputs, inputs)
-        validate_function_name = "validate_inputs"
-        validate_function = first_real_override(obj_class, validate_function_name)
-    else:
-        class_inputs = obj_class.INPUT_TYPES()
-        validate_function_name = "VALIDATE_INPUTS"
-        validate_function = getattr(obj_class, validate_function_name, None)
-    if validate_function is not None:
-        argspec = inspect.getfullargspec(validate_function)
-        validate_function_inputs = argspec.args
-        validate_has_kwargs = argspec.varkw is not None
+    validate_function_name = schema.validate_function_name
+    validate_function_inputs = schema.validate_function_inputs
+    validate_has_kwargs = schema.validate_has_kwargs
     received_types = {}
 
     valid_inputs = set(class_inputs.get('required',{})).union(set(class_inputs.get('optional',{})))
@@ -940,7 +988,7 @@ async def validate_inputs(prompt_id, prompt, item, validated, visiting=None):
             try:
                 visiting.append(unique_id)
                 try:
-                    r = await validate_inputs(prompt_id, prompt, o_id, validated, visiting)
+                    r = await validate_inputs(prompt_id, prompt, o_id, validated, visiting, schemas)
                 finally:
                     visiting.pop()
                 if r[0] is False:
@@ -1068,7 +1116,7 @@ async def validate_inputs(prompt_id, prompt, item, validated, visiting=None):
                         continue
 
     if len(validate_function_inputs) > 0 or validate_has_kwargs:
-        input_data_all, _, v3_data = get_input_data(inputs, obj_class, unique_id)
+        input_data_all, _, v3_data = get_input_data(inputs, obj_class, unique_id, class_inputs=schema.class_inputs)
         input_filtered = {}
         for x in input_data_all:
             if x in validate_function_inputs or validate_has_kwargs:
@@ -1113,7 +1161,41 @@ def full_type_name(klass):
         return klass.__qualname__
     return module + '.' + klass.__qualname__
 
-async def validate_prompt(prompt_id, prompt, partial_execution_list: Union[list[str], None]):
+async def validate_outputs(prompt_id, prompt, outputs, schemas):
+    """Validate the output nodes and everything they depend on.
+
+    Returns ({output: (valid, reasons, checked)}, validated). validated holds the result of every node checked,
+    in the order they were checked, and the first checked of them were checked by the time that output was.
+    """
+    results = {}
+    validated = {}
+    for o in outputs:
+        valid = False
+        reasons = []
+        try:
+            m = await validate_inputs(prompt_id, prompt, o, validated, schemas=schemas)
+            valid = m[0]
+            reasons = m[1]
+        except Exception as ex:
+            typ, _, tb = sys.exc_info()
+            valid = False
+            exception_type = full_type_name(typ)
+            reasons = [{
+                "type": "exception_during_validation",
+                "message": "Exception when validating node",
+                "details": str(ex),
+                "extra_info": {
+                    "exception_type": exception_type,
+                    "traceback": traceback.format_tb(tb)
+                }
+            }]
+            validated[o] = (False, reasons, o)
+        results[o] = (valid, reasons, len(validated))
+    return results, validated
+
+async def validate_prompt(prompt_id, prompt, partial_execution_list: Union[list[str], None], schemas=None):
+    if schemas is None:
+        schemas = InputSchemaLookup()
     outputs = set()
     for x in prompt:
         if 'class_type' not in prompt[x]:
@@ -1161,32 +1243,15 @@ async def validate_prompt(prompt_id, prompt, partial_execution_list: Union[list[
         }
         return (False, error, [], {})
 
+    results, validated = await validate_outputs(prompt_id, prompt, outputs, schemas)
+    if any(reason["type"] == "value_not_in_list" for _, reasons, _ in validated.values() for reason in reasons) and schemas.refresh():
+        # The value may be a file added since the cached schemas listed the folder.
+        results, validated = await validate_outputs(prompt_id, prompt, outputs, schemas)
+
     good_outputs = set()
     errors = []
     node_errors = {}
-    validated = {}
-    for o in outputs:
-        valid = False
-        reasons = []
-        try:
-            m = await validate_inputs(prompt_id, prompt, o, validated)
-            valid = m[0]
-            reasons = m[1]
-        except Exception as ex:
-            typ, _, tb = sys.exc_info()
-            valid = False
-            exception_type = full_type_name(typ)
-            reasons = [{
-                "type": "exception_during_validation",
-                "message": "Exception when validating node",
-                "details": str(ex),
-                "extra_info": {
-                    "exception_type": exception_type,
-                    "traceback": traceback.format_tb(tb)
-                }
-            }]
-            validated[o] = (False, reasons, o)
-
+    for o, (valid, reasons, checked) in results.items():
         if valid is True:
             good_outputs.add(o)
         else:
@@ -1196,7 +1261,7 @@ async def validate_prompt(prompt_id, prompt, partial_execution_list: Union[list[
                 for reason in reasons:
                     logging.error(f"  - {reason['message']}: {reason['details']}")
             errors += [(o, reasons)]
-            for node_id, result in validated.items():
+            for node_id, result in list(validated.items())[:checked]:
                 valid = result[0]
                 reasons = result[1]
                 # If a node upstream has errors, the nodes downstream will also
@@ -1234,35 +1299,147 @@ async def validate_prompt(prompt_id, prompt, partial_execution_list: Union[list[
 
     return (True, None, list(good_outputs), node_errors)
 
+async def validate_prompts(prompts):
+    """Validate many prompts in one pass, sharing the node input schemas between them.
+
+    prompts is a list of (prompt_id, prompt, partial_execution_list), returns the validate_prompt result of each.
+    """
+    schemas = InputSchemaLookup()
+    return [await validate_prompt(prompt_id, prompt, partial_execution_list, schemas) for prompt_id, prompt, partial_execution_list in prompts]
+
 MAXIMUM_HISTORY_SIZE = 10000
 
+# How many of the oldest queued prompts a worker may choose between when picking one that matches its loaded models,
+# and how many times in a row the oldest prompt may be passed over that way before it has to be taken.
+PROMPT_AFFINITY_LOOKAHEAD = 4
+
+def get_prompt_model_files(prompt):
+    """Model file names referenced by the widget values of a prompt."""
+    extensions = tuple(folder_paths.supported_pt_extensions)
+    files = set()
+    for node in prompt.values():
+        for value in node.get("inputs", {}).values():
+            if isinstance(value, str) and value.lower().endswith(extensions):
+                files.add(value)
+    return frozenset(files)
+
+# How many queue changes are kept for pollers fetching the queue incrementally (get_queue_changes).
+QUEUE_CHANGE_LOG_SIZE = 10000
+
+class QueueSnapshot(NamedTuple):
+    """The queue at one version: running items in start order and pending items in execution order."""
+    version: int
+    running: tuple
+    pending: tuple
+
 class PromptQueue:
+    """Queue of prompt records (number, prompt_id, prompt, extra_data, outputs_to_execute, sensitive).
+
+    Records are treated as immutable once put: the queue, snapshots, the worker and the history all share the
+    same objects instead of copying them, so nothing may modify a record or the dicts in it after put().
+    """
     def __init__(self, server):
         self.server = server
         self.mutex = threading.RLock()
         self.not_empty = threading.Condition(self.mutex)
         self.task_counter = 0
+        # Heap of (number, seq, item). Entries whose seq is no longer in self.pending were deleted and are dropped lazily.
         self.queue = []
+        self.queue_seq = 0
+        self.pending = {}
+        self.pending_ids = {}
         self.currently_running = {}
-        self.history = {}
+        self.running_ids = {}
+        self.running_devices = {}
+        self.affinity_skips = 0
+        self.version = 0
+        self.changes = collections.deque(maxlen=QUEUE_CHANGE_LOG_SIZE)
+        self.snapshot = None
+        self.history_store = HistoryStore(MAXIMUM_HISTORY_SIZE)
         self.flags = {}
+        self.worker_flags = {}
+
+    def _changed(self, prompt_id, status, item=None):
+        self.version += 1
+        self.changes.append((self.version, prompt_id, status, item))
+        self.snapshot = None
+
+    def _remove_pending(self, seq):
+        item = self.pending.pop(seq)
+        seqs = self.pending_ids[item[1]]
+        seqs.remove(seq)
+        if len(seqs) == 0:
+            del self.pending_ids[item[1]]
+        # Drop deleted entries once they make up most of the heap.
+        if len(self.queue) > 2 * len(self.pending) + 64:
+            self.queue = [x for x in self.queue if x[1] in self.pending]
+            heapq.heapify(self.queue)
+        return item
+
+    def _changed_after_removal(self, prompt_id):
+        """Record the status of prompt_id after one of its entries left the queue, duplicates of it may still be queued or running."""
+        seqs = self.pending_ids.get(prompt_id)
+        if seqs is not None:
+            self._changed(prompt_id, "pending", self.pending[seqs[-1]])
+        elif prompt_id in self.running_ids:
+            self._changed(prompt_id, "running", self.currently_running[self.running_ids[prompt_id]])
+        else:
+            self._changed(prompt_id, "removed")
+
+    def _pop_pending(self):
+        while True:
+            entry = heapq.heappop(self.queue)
+            if entry[1] in self.pending:
+                return entry
 
     def put(self, item):
         with self.mutex:
-            heapq.heappush(self.queue, item)
+            seq = self.queue_seq
+            self.queue_seq += 1
+            heapq.heappush(self.queue, (item[0], seq, item))
+            self.pending[seq] = item
+            self.pending_ids.setdefault(item[1], []).append(seq)
+            self._changed(item[1], "pending", item)
             self.server.queue_updated()
             self.not_empty.notify()
 
-    def get(self, timeout=None):
+    def get(self, timeout=None, device=None, affinity=None):
+        """Take the next prompt to run.
+
+        device is the device of the worker taking the prompt, used to target interrupts at it. affinity is an
+        optional function scoring queue items for this worker: the highest scoring of the oldest
+        PROMPT_AFFINITY_LOOKAHEAD prompts is taken, ties going to the oldest, unless the oldest prompt
+        was already passed over PROMPT_AFFINITY_LOOKAHEAD times.
+        """
         with self.not_empty:
-            while len(self.queue) == 0:
+            if device is not None:
+                self.worker_flags.setdefault(device, {})
+            while len(self.pending) == 0:
                 self.not_empty.wait(timeout=timeout)
-                if timeout is not None and len(self.queue) == 0:
+                if timeout is not None and len(self.pending) == 0:
                     return None
-            item = heapq.heappop(self.queue)
+            entry = self._pop_pending()
+            if affinity is not None and len(self.pending) > 1 and self.affinity_skips < PROMPT_AFFINITY_LOOKAHEAD:
+                candidates = [entry]
+                while len(candidates) < PROMPT_AFFINITY_LOOKAHEAD and len(candidates) < len(self.pending):
+                    candidates.append(self._pop_pending())
+                entry = max(candidates, key=lambda x: affinity(x[2]))
+                for x in candidates:
+                    if x is not entry:
+                        heapq.heappush(self.queue, x)
+                if entry is candidates[0]:
+                    self.affinity_skips = 0
+                else:
+                    self.affinity_skips += 1
+            else:
+                self.affinity_skips = 0
+            item = self._remove_pending(entry[1])
             i = self.task_counter
-            self.currently_running[i] = copy.deepcopy(item)
+            self.currently_running[i] = item
+            self.running_ids[item[1]] = i
+            self.running_devices[i] = device
             self.task_counter += 1
+            self._changed(item[1], "running", item)
             self.server.queue_updated()
             return (item, i)
 
@@ -1274,39 +1451,70 @@ class PromptQueue:
     def task_done(self, item_id, history_result,
                   status: Optional['PromptQueue.ExecutionStatus'], process_item=None):
         with self.mutex:
-            prompt = self.currently_running.pop(item_id)
-            if len(self.history) > MAXIMUM_HISTORY_SIZE:
-                self.history.pop(next(iter(self.history)))
+            prompt = self.currently_running[item_id]
+            history_store = self.history_store
 
-            status_dict: Optional[dict] = None
-            if status is not None:
-                status_dict = copy.deepcopy(status._asdict())
+        status_dict: Optional[dict] = None
+        if status is not None:
+            status_dict = copy.deepcopy(status._asdict())
 
-            if process_item is not None:
-                prompt = process_item(prompt)
+        entry_prompt = prompt
+        if process_item is not None:
+            entry_prompt = process_item(prompt)
 
-            self.history[prompt[1]] = {
-                "prompt": prompt,
-                "outputs": {},
-                'status': status_dict,
-            }
-            self.history[prompt[1]].update(history_result)
+        entry = {
+            "prompt": entry_prompt,
+            "outputs": {},
+            'status': status_dict,
+        }
+        entry.update(history_result)
+        # The database store writes synchronously, don't hold up the queue while it does. The prompt stays
+        # running until its history is stored, so clients always find it in one of the two.
+        history_store.add(entry_prompt[1], entry)
+
+        with self.mutex:
+            self.currently_running.pop(item_id)
+            self.running_devices.pop(item_id, None)
+            if self.running_ids.get(prompt[1]) == item_id:
+                del self.running_ids[prompt[1]]
+            self._changed_after_removal(prompt[1])
             self.server.queue_updated()
 
-    # Note: slow
-    def get_current_queue(self):
+    def get_snapshot(self):
+        """The current QueueSnapshot. It is only rebuilt after the queue changes, so polling it is cheap."""
         with self.mutex:
-            out = []
-            for x in self.currently_running.values():
-                out += [x]
-            return (out, copy.deepcopy(self.queue))
+            if self.snapshot is None:
+                pending = tuple(x[2] for x in sorted(x for x in self.queue if x[1] in self.pending))
+                self.snapshot = QueueSnapshot(self.version, tuple(self.currently_running.values()), pending)
+            return self.snapshot
+
+    def get_queue_changes(self, since_version):
+        """What changed after since_version, as (version, [(prompt_id, status, item)]).
+
+        status is "pending", "running" or "removed" (finished or deleted, item is None), only the latest status of
+        each prompt is returned. Returns None when since_version is too old for the change log, in which case the
+        caller should fetch a full snapshot instead.
+        """
+        with self.mutex:
+            if since_version == self.version:
+                return (self.version, [])
+            if since_version > self.version or len(self.changes) == 0 or self.changes[0][0] > since_version + 1:
+                return None
+            latest = {}
+            for version, prompt_id, status, item in reversed(self.changes):
+                if version <= since_version:
+                    break
+                if prompt_id not in latest:
+                    latest[prompt_id] = (prompt_id, status, item)
+            return (self.version, list(reversed(latest.values())))
+
+    def get_current_queue(self):
+        snapshot = self.get_snapshot()
+        return (list(snapshot.running), list(snapshot.pending))
 
     # read-safe as long as queue items are immutable
     def get_current_queue_volatile(self):
-        with self.mutex:
-            running = [x for x in self.currently_running.values()]
-            queued = copy.copy(self.queue)
-            return (running, queued)
+        return self.get_current_queue()
 
     def interrupt_if_running(self, prompt_id):
         """Interrupt the running prompt with this id, atomically.
@@ -1321,76 +1529,88 @@ class PromptQueue:
         the flag cannot leak the interrupt onto its successor.
         """
         with self.mutex:
-            for item in self.currently_running.values():
-                if item[1] == prompt_id:
-                    nodes.interrupt_processing()
-                    return True
+            i = self.running_ids.get(prompt_id)
+            if i is not None:
+                nodes.interrupt_processing(device=self.running_devices.get(i))
+                return True
         return False
 
     def get_tasks_remaining(self):
         with self.mutex:
-            return len(self.queue) + len(self.currently_running)
+            return len(self.pending) + len(self.currently_running)
 
     def wipe_queue(self):
         with self.mutex:
+            for item in self.pending.values():
+                self._changed(item[1], "removed")
             self.queue = []
+            self.pending = {}
+            self.pending_ids = {}
             self.server.queue_updated()
 
+    def delete_queue_item_by_id(self, prompt_id):
+        """Remove the pending prompt with this id. Returns True if one was queued."""
+        with self.mutex:
+            seqs = self.pending_ids.get(prompt_id)
+            if seqs is None:
+                return False
+            self._delete_pending(seqs[-1])
+            return True
+
+    def _delete_pending(self, seq):
+        item = self._remove_pending(seq)
+        self._changed_after_removal(item[1])
+        self.server.queue_updated()
+
     def delete_queue_item(self, function):
+        """Remove the first pending prompt, in execution order, that function returns True for. Prefer delete_queue_item_by_id."""
         with self.mutex:
-            for x in range(len(self.queue)):
-                if function(self.queue[x]):
-                    if len(self.queue) == 1:
-                        self.wipe_queue()
-                    else:
-                        self.queue.pop(x)
-                        heapq.heapify(self.queue)
-                    self.server.queue_updated()
+            for _, seq, item in sorted(x for x in self.queue if x[1] in self.pending):
+                if function(item):
+                    self._delete_pending(seq)
                     return True
         return False
 
-    def get_history(self, prompt_id=None, max_items=None, offset=-1, map_function=None):
+    def set_history_store(self, history_store):
+        """Replace the history store, e.g. with one backed by the database once it is initialized."""
         with self.mutex:
-            if prompt_id is None:
-                out = {}
-                i = 0
-                if offset < 0 and max_items is not None:
-                    offset = len(self.history) - max_items
-                for k in self.history:
-                    if i >= offset:
-                        p = self.history[k]
-                        if map_function is not None:
-                            p = map_function(p)
-                        out[k] = p
-                        if max_items is not None and len(out) >= max_items:
-                            break
-                    i += 1
-                return out
-            elif prompt_id in self.history:
-                p = self.history[prompt_id]
-                if map_function is None:
-                    p = copy.deepcopy(p)
-                else:
-                    p = map_function(p)
-                return {prompt_id: p}
-            else:
-                return {}
+            self.history_store = history_store
+
+    def get_history(self, prompt_id=None, max_items=None, offset=-1, map_function=None, before=None):
+        if prompt_id is None:
+            out = self.history_store.list(max_items=max_items, offset=offset, before=before)
+            if map_function is not None:
+                out = {k: map_function(v) for k, v in out.items()}
+            return out
+        p = self.history_store.get(prompt_id)
+        if p is None:
+            return {}
+        if map_function is not None:
+            p = map_function(p)
+        return {prompt_id: p}
 
     def wipe_history(self):
-        with self.mutex:
-            self.history = {}
+        self.history_store.clear()
 
     def delete_history_item(self, id_to_delete):
-        with self.mutex:
-            self.history.pop(id_to_delete, None)
+        self.history_store.delete(id_to_delete)
 
     def set_flag(self, name, data):
         with self.mutex:
             self.flags[name] = data
-            self.not_empty.notify()
+            for flags in self.worker_flags.values():
+                flags[name] = data
+            self.not_empty.notify_all()
 
-    def get_flags(self, reset=True):
+    def get_flags(self, reset=True, device=None):
+        """Get the pending flags. Workers pinned to a device each get their own copy of every flag."""
         with self.mutex:
+            if device is not None:
+                flags = self.worker_flags.setdefault(device, {})
+                if reset:
+                    self.worker_flags[device] = {}
+                    return flags
+                return flags.copy()
             if reset:
                 ret = self.flags
                 self.flags = {}
@@ -67,6 +67,10 @@ user_directory = os.path.join(base_path, "user")
 
 filename_list_cache: dict[str, tuple[list[str], dict[str, float], float]] = {}
 
+# Optional app.folder_index.FolderIndex, set with --folder-index. When set, file
+# lists and full paths of model folders come from it instead of the filesystem.
+filename_index = None
+
 class CacheHelper:
     """
     Helper class for managing file list cache data.
@@ -411,7 +415,10 @@ def recursive_search(directory: str, excluded_dir_names: list[str] | None=None)
     return result, dirs
 
 def filter_files_extensions(files: Collection[str], extensions: Collection[str]) -> list[str]:
-    return sorted(list(filter(lambda a: os.path.splitext(a)[-1].lower() in extensions or len(extensions) == 0, files)))
+    if len(extensions) == 0:
+        return sorted(files)
+    extensions = set(extensions)
+    return sorted([f for f in files if os.path.splitext(f)[-1].lower() in extensions])
 
 
 
@@ -425,6 +432,11 @@ def get_full_path(folder_name: str, filename: str) -> str | None:
         return None
     folders = folder_names_and_paths[folder_name]
     filename = os.path.relpath(os.path.join("/", filename), "/")
+    if filename_index is not None:
+        full_path = filename_index.get_full_path(folder_name, folders[0], filename)
+        if full_path is not None:
+            return full_path
+        # Not indexed (yet), the watcher may not have seen a file that was just created.
     for x in folders[0]:
         full_path = os.path.join(x, filename)
         if os.path.isfile(full_path):
@@ -486,6 +498,9 @@ def cached_filename_list_(folder_name: str) -> tuple[list[str], dict[str, float]
 
 def get_filename_list(folder_name: str) -> list[str]:
     folder_name = map_legacy(folder_name)
+    if filename_index is not None:
+        folders = folder_names_and_paths[folder_name]
+        return list(filename_index.get_filename_list(folder_name, folders[0], folders[1]))
     out = cached_filename_list_(folder_name)
     if out is None:
         out = get_filename_list_(folder_name)
@@ -494,6 +509,46 @@ def get_filename_list(folder_name: str) -> list[str]:
     cache_helper.set(folder_name, out)
     return list(out[0])
 
+filesystem_generation = 0
+_filesystem_fingerprint: frozenset | None = None
+
+def get_filesystem_generation() -> int:
+    """
+    Counter increased whenever the input directory or a model folder may have changed.
+
+    Compares the modification times of those folders, of the subfolders of the
+    input directory and of the model subfolders found by get_filename_list, with
+    the previous call. Lets callers cache values built from folder listings, like
+    the INPUT_TYPES of loader nodes.
+    """
+    global filesystem_generation, _filesystem_fingerprint
+    folders = {input_directory}
+    try:
+        # Nodes like Load3D list subfolders of the input directory.
+        with os.scandir(input_directory) as entries:
+            folders.update(entry.path for entry in entries if entry.is_dir())
+    except OSError:
+        pass
+    fingerprint = []
+    if filename_index is not None:
+        # The index already knows when the model folders changed.
+        fingerprint.append(("filename_index", filename_index.generation))
+    else:
+        for paths, _ in list(folder_names_and_paths.values()):
+            folders.update(paths)
+        for _, subfolders, _ in list(filename_list_cache.values()):
+            folders.update(subfolders)
+    for folder in folders:
+        try:
+            fingerprint.append((folder, os.path.getmtime(folder)))
+        except OSError:
+            fingerprint.append((folder, None))
+    fingerprint = frozenset(fingerprint)
+    if fingerprint != _filesystem_fingerprint:
+        _filesystem_fingerprint = fingerprint
+        filesystem_generation += 1
+    return filesystem_generation
+
 def get_save_image_path(filename_prefix: str, output_dir: str, image_width=0, image_height=0) -> tuple[str, str, int, str, str]:
     def map_filename(filename: str) -> tuple[int, str]:
         prefix_len = len(os.path.basename(filename_prefix))
@@ -7,11 +7,22 @@ import comfy.model_management
 import folder_paths
 import comfy.utils
 import logging
+import threading
+import time
 
 default_preview_method = args.preview_method
 
 MAX_PREVIEW_RESOLUTION = args.preview_size
 VIDEO_TAES = ["taehv", "lighttaew2_2", "lighttaew2_1", "lighttaehy1_5", "taeltx_2"]
+# Minimum time between two previews decoded off the sampling thread.
+PREVIEW_MIN_INTERVAL = 0.1
+
+# (decoder path, device, latent channels) -> loaded TAESD model, so sampling calls don't reload it.
+preview_models = {}
+
+def clear_preview_models():
+    """Drops the cached preview models, e.g. when all the models are unloaded."""
+    preview_models.clear()
 
 def preview_to_image(latent_image, do_scale=True):
         if do_scale:
@@ -94,12 +105,19 @@ def get_previewer(device, latent_format):
 
         if method == LatentPreviewMethod.TAESD:
             if taesd_decoder_path:
-                if latent_format.taesd_decoder_name in VIDEO_TAES:
-                    taesd = VAE(comfy.utils.load_torch_file(taesd_decoder_path))
-                    taesd.first_stage_model.show_progress_bar = False
+                video = latent_format.taesd_decoder_name in VIDEO_TAES
+                key = (taesd_decoder_path, None if video else str(device), latent_format.latent_channels)
+                taesd = preview_models.get(key)
+                if taesd is None:
+                    if video:
+                        taesd = VAE(comfy.utils.load_torch_file(taesd_decoder_path))
+                        taesd.first_stage_model.show_progress_bar = False
+                    else:
+                        taesd = TAESD(None, taesd_decoder_path, latent_channels=latent_format.latent_channels).to(device)
+                    preview_models[key] = taesd
+                if video:
                     previewer = TAEHVPreviewerImpl(taesd)
                 else:
-                    taesd = TAESD(None, taesd_decoder_path, latent_channels=latent_format.latent_channels).to(device)
                     previewer = TAESDPreviewerImpl(taesd)
             else:
                 logging.warning("Warning: TAESD previews enabled, but could not find models/vae_approx/{}".format(latent_format.taesd_decoder_name))
@@ -109,12 +127,88 @@ def get_previewer(device, latent_format):
                 previewer = Latent2RGBPreviewer(latent_format.latent_rgb_factors, latent_format.latent_rgb_factors_bias, latent_format.latent_rgb_factors_reshape)
     return previewer
 
+class AsyncPreviewer:
+    """
+    Decodes previews on a worker thread, on its own CUDA stream, so the sampling steps don't wait for them.
+    submit() only queues a copy of the newest latent, at most every PREVIEW_MIN_INTERVAL seconds, and
+    replaces the one waiting if the worker is still busy. take() returns the newest finished preview.
+    finish() decodes the preview of the last step on the calling thread so it is never dropped.
+    """
+    lock = threading.Lock()
+    wake = threading.Event()
+    # The newest (AsyncPreviewer, latent, event) waiting for the worker, shared by all samplers.
+    job = None
+    worker = None
+
+    def __init__(self, previewer, preview_format, device):
+        self.previewer = previewer
+        self.preview_format = preview_format
+        self.stream = torch.cuda.Stream(device)
+        self.last_submit = 0.0
+        self.result = None
+
+    def submit(self, x0):
+        now = time.perf_counter()
+        if now - self.last_submit < PREVIEW_MIN_INTERVAL:
+            return
+        self.last_submit = now
+        x0 = x0[:1].clone()
+        event = torch.cuda.Event()
+        event.record(torch.cuda.current_stream(x0.device))
+        cls = AsyncPreviewer
+        with cls.lock:
+            cls.job = (self, x0, event)
+            if cls.worker is None:
+                cls.worker = threading.Thread(target=cls._run, daemon=True, name="latent_preview")
+                cls.worker.start()
+        cls.wake.set()
+
+    def take(self):
+        with AsyncPreviewer.lock:
+            result, self.result = self.result, None
+        return result
+
+    def finish(self, x0):
+        cls = AsyncPreviewer
+        with cls.lock:
+            if cls.job is not None and cls.job[0] is self:
+                cls.job = None
+            self.result = None
+        return self.previewer.decode_latent_to_preview_image(self.preview_format, x0)
+
+    def _decode(self, x0, event):
+        with torch.inference_mode(), torch.cuda.stream(self.stream):
+            self.stream.wait_event(event)
+            preview = self.previewer.decode_latent_to_preview_image(self.preview_format, x0)
+            self.stream.synchronize()
+        with AsyncPreviewer.lock:
+            self.result = preview
+
+    @classmethod
+    def _run(cls):
+        while True:
+            cls.wake.wait()
+            cls.wake.clear()
+            with cls.lock:
+                job, cls.job = cls.job, None
+            if job is None:
+                continue
+            try:
+                job[0]._decode(job[1], job[2])
+            except Exception as e:
+                logging.warning("Latent preview failed: {}".format(e))
+
+
 def prepare_callback(model, steps, x0_output_dict=None):
     preview_format = "JPEG"
     if preview_format not in ["JPEG", "PNG"]:
         preview_format = "JPEG"
 
     previewer = get_previewer(model.load_device, model.model.latent_format)
+    async_previewer = None
+    # Previewers that go through model management (the video TAEs) have to stay on the sampling thread.
+    if previewer is not None and not isinstance(previewer, TAEHVPreviewerImpl) and comfy.model_management.is_device_cuda(model.load_device):
+        async_previewer = AsyncPreviewer(previewer, preview_format, model.load_device)
 
     pbar = comfy.utils.ProgressBar(steps)
     def callback(step, x0, x, total_steps):
@@ -122,7 +216,13 @@ def prepare_callback(model, steps, x0_output_dict=None):
             x0_output_dict["x0"] = x0
 
         preview_bytes = None
-        if previewer:
+        if async_previewer is not None:
+            if step + 1 == total_steps:
+                preview_bytes = async_previewer.finish(x0)
+            else:
+                async_previewer.submit(x0)
+                preview_bytes = async_previewer.take()
+        elif previewer:
             preview_bytes = previewer.decode_latent_to_preview_image(preview_format, x0)
         pbar.update_absolute(step + 1, total_steps, preview_bytes)
     return callback
@@ -31,7 +31,7 @@ import sys
 from comfy_execution.progress import get_progress_state
 from comfy_execution.utils import get_executing_context
 from comfy_api import feature_flags
-from app.database.db import init_db, dependencies_available
+from app.database.db import init_db, dependencies_available, can_create_session
 
 if __name__ == "__main__":
     #NOTE: These do not do anything on core ComfyUI, they are for custom nodes.
@@ -155,6 +155,10 @@ def apply_custom_paths():
         logging.info(f"Setting user directory to: {user_dir}")
         folder_paths.set_user_directory(user_dir)
 
+    if args.folder_index is not None:
+        from app.folder_index import FolderIndex
+        folder_paths.filename_index = FolderIndex(args.folder_index, args.folder_index_poll_interval)
+
 
 def execute_prestartup_script():
     if args.disable_all_custom_nodes and len(args.whitelist_custom_nodes) == 0:
@@ -228,6 +232,7 @@ import execution
 import server
 from protocol import BinaryEventTypes
 import nodes
+import latent_preview
 import comfy.model_management
 import comfyui_version
 import app.logger
@@ -235,6 +240,10 @@ import hook_breaker_ac10a0
 
 import comfy.memory_management
 import comfy.model_patcher
+import comfy.patched_weight_cache
+import comfy.residency_planner
+import comfy_execution.file_prefetch
+import comfy.weight_pool
 
 if args.enable_dynamic_vram or (enables_dynamic_vram() and comfy.model_management.is_nvidia() and not comfy.model_management.is_wsl()):
     if (not args.enable_dynamic_vram) and (comfy.model_management.torch_version_numeric < (2, 8)):
@@ -309,7 +318,9 @@ def _collect_output_absolute_paths(history_result: dict) -> list[str]:
     return paths
 
 
-def prompt_worker(q, server_instance):
+def prompt_worker(q, server_instance, device=None):
+    if device is not None:
+        comfy.model_management.set_torch_device(device)
     current_time: float = 0.0
     cache_ram = 0
     cache_ram_inactive = 0
@@ -329,7 +340,16 @@ def prompt_worker(q, server_instance):
     elif args.cache_none:
         cache_type = execution.CacheType.NONE
 
-    e = execution.PromptExecutor(server_instance, cache_type=cache_type, cache_args={ "lru" : args.cache_lru, "ram" : cache_ram, "ram_inactive" : cache_ram_inactive } )
+    e = execution.PromptExecutor(server_instance, cache_type=cache_type, cache_args={ "lru" : args.cache_lru, "ram" : cache_ram, "ram_inactive" : cache_ram_inactive }, device=device)
+    if server_instance.prompt_executor is None:
+        server_instance.prompt_executor = e
+    server_instance.prompt_executors.append(e)
+    # Model files used by the last prompt, whose loaded models are likely still in this executor's cache.
+    model_files = frozenset()
+    affinity = None
+    if device is not None:
+        affinity = lambda item: len(model_files & execution.get_prompt_model_files(item[2]))
+    planner_device = device if device is not None else comfy.model_management.get_torch_device()
     last_gc_collect = 0
     need_gc = False
     gc_collect_interval = 10.0
@@ -339,9 +359,11 @@ def prompt_worker(q, server_instance):
         if need_gc:
             timeout = max(gc_collect_interval - (current_time - last_gc_collect), 0.0)
 
-        queue_item = q.get(timeout=timeout)
+        queue_item = q.get(timeout=timeout, device=device, affinity=affinity)
         if queue_item is not None:
             item, item_id = queue_item
+            if comfy_execution.file_prefetch.file_prefetcher is not None:
+                comfy_execution.file_prefetch.file_prefetcher.notify()
             execution_start_time = time.perf_counter()
             prompt_id = item[1]
             server_instance.last_prompt_id = prompt_id
@@ -351,8 +373,17 @@ def prompt_worker(q, server_instance):
             for k in sensitive:
                 extra_data[k] = sensitive[k]
 
+            planner = comfy.residency_planner.residency_planner
+            if planner is not None:
+                pending = q.get_snapshot().pending[:planner.lookahead]
+                planner.set_upcoming([comfy_execution.file_prefetch.get_prompt_model_paths(x[2]) for x in (item,) + pending])
+                planner.begin_job(planner_device)
+
             asset_seeder.pause()
             e.execute(item[2], prompt_id, extra_data, item[4])
+            model_files = execution.get_prompt_model_files(item[2])
+            if planner is not None:
+                planner.end_job(planner_device)
 
             need_gc = True
 
@@ -380,16 +411,23 @@ def prompt_worker(q, server_instance):
                 paths = _collect_output_absolute_paths(e.history_result)
                 register_output_files(paths, job_id=prompt_id)
 
-        flags = q.get_flags()
+        flags = q.get_flags(device=device)
         free_memory = flags.get("free_memory", False)
 
         if flags.get("unload_models", free_memory):
             comfy.model_management.unload_all_models()
+            latent_preview.clear_preview_models()
+            model_files = frozenset()
             need_gc = True
             last_gc_collect = 0
 
         if free_memory:
             e.reset()
+            if comfy_execution.file_prefetch.file_prefetcher is not None:
+                comfy_execution.file_prefetch.file_prefetcher.clear()
+            comfy.weight_pool.weight_pool.clear()
+            if comfy.patched_weight_cache.patched_weight_cache is not None:
+                comfy.patched_weight_cache.patched_weight_cache.clear()
             need_gc = True
             last_gc_collect = 0
 
@@ -407,6 +445,28 @@ def prompt_worker(q, server_instance):
                 asset_seeder.resume()
 
 
+def start_prompt_workers(server_instance):
+    devices = [None]
+    if args.gpu_workers is not None:
+        all_devices = comfy.model_management.get_all_torch_devices()
+        devices = []
+        for device_id in args.gpu_workers.split(","):
+            device_id = int(device_id)
+            if device_id < 0 or device_id >= len(all_devices) or comfy.model_management.is_device_cpu(all_devices[device_id]):
+                logging.warning("--gpu-workers: device {} is not available, skipping it.".format(device_id))
+                continue
+            devices.append(all_devices[device_id])
+        if len(devices) == 0:
+            devices = [None]
+        else:
+            for device in devices:
+                comfy.model_management.register_interrupt_device(device)
+            logging.info("Starting prompt workers on: {}".format(", ".join(str(d) for d in devices)))
+
+    for device in devices:
+        threading.Thread(target=prompt_worker, daemon=True, args=(server_instance.prompt_queue, server_instance, device)).start()
+
+
 async def run(server_instance, address='', port=8188, verbose=True, call_on_start=None):
     addresses = []
     for addr in address.split(","):
@@ -481,6 +541,51 @@ def setup_database():
         logging.error(f"Failed to initialize database. Please ensure you have installed the latest requirements. If the error persists, please report this as in future the database will be required: {e}")
 
 
+def setup_disk_cache():
+    if args.cache_disk <= 0:
+        return
+    from comfy_execution.cache_provider import register_cache_provider
+    from comfy_execution.disk_cache import DiskCacheProvider
+    cache_dir = args.cache_disk_directory or os.path.join(folder_paths.get_system_user_directory("cache"), "outputs")
+    register_cache_provider(DiskCacheProvider(cache_dir, int(args.cache_disk * (1024 ** 3))))
+
+
+def setup_patched_weight_cache():
+    if args.patched_weight_cache <= 0:
+        return
+    max_bytes = int(args.patched_weight_cache * (1024 ** 3))
+    comfy.patched_weight_cache.patched_weight_cache = comfy.patched_weight_cache.PatchedWeightCache(max_bytes, args.patched_weight_cache_directory)
+
+
+def setup_model_config_cache():
+    if args.disable_model_config_cache:
+        return
+    import comfy.model_config_cache
+    cache_path = os.path.join(folder_paths.get_system_user_directory("cache"), "model_configs.json")
+    comfy.model_config_cache.model_config_cache = comfy.model_config_cache.ModelConfigCache(cache_path)
+
+
+def setup_file_prefetcher(prompt_queue):
+    if args.prefetch_models <= 0:
+        return
+    ram_budget = int(args.prefetch_models_ram * (1024 ** 3))
+    comfy_execution.file_prefetch.file_prefetcher = comfy_execution.file_prefetch.FilePrefetcher(prompt_queue, args.prefetch_models, ram_budget)
+    comfy_execution.file_prefetch.file_prefetcher.start()
+
+
+def setup_residency_planner():
+    if args.plan_model_residency is None:
+        return
+    comfy.residency_planner.residency_planner = comfy.residency_planner.ResidencyPlanner(args.plan_model_residency)
+
+
+def setup_history_store(prompt_queue):
+    if not can_create_session():
+        return
+    from app.job_history import DatabaseHistoryStore
+    prompt_queue.set_history_store(DatabaseHistoryStore(execution.MAXIMUM_HISTORY_SIZE))
+
+
 def start_comfyui(asyncio_loop=None):
     """
     Starts the ComfyUI server using the provided asyncio event loop or creates a new one.
@@ -514,11 +619,17 @@ def start_comfyui(asyncio_loop=None):
 
     cuda_malloc_warning()
     setup_database()
+    setup_history_store(prompt_server.prompt_queue)
+    setup_disk_cache()
+    setup_patched_weight_cache()
+    setup_model_config_cache()
+    setup_file_prefetcher(prompt_server.prompt_queue)
+    setup_residency_planner()
 
     prompt_server.add_routes()
     hijack_progress(prompt_server)
 
-    threading.Thread(target=prompt_worker, daemon=True, args=(prompt_server.prompt_queue, prompt_server,)).start()
+    start_prompt_workers(prompt_server)
 
     if args.quick_test_for_ci:
         exit(0)
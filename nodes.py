@@ -13,6 +13,8 @@ import math
 import time
 import random
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from PIL import Image, ImageOps, ImageSequence
 from PIL.PngImagePlugin import PngInfo
@@ -25,6 +27,7 @@ import comfy.samplers
 import comfy.sample
 import comfy.sd
 import comfy.utils
+import comfy.weight_pool
 import comfy.controlnet
 from comfy.comfy_types import IO, ComfyNodeABC, InputTypeDict, FileLocator
 from comfy_api.internal import register_versions, ComfyAPIWithVersion
@@ -48,8 +51,8 @@ if args.enable_manager:
 def before_node_execution():
     comfy.model_management.throw_exception_if_processing_interrupted()
 
-def interrupt_processing(value=True):
-    comfy.model_management.interrupt_current_processing(value)
+def interrupt_processing(value=True, device=None):
+    comfy.model_management.interrupt_current_processing(value, device)
 
 MAX_RESOLUTION=16384
 
@@ -693,9 +696,6 @@ class CLIPSetLastLayer:
 class LoraLoader:
     ESSENTIALS_CATEGORY = "Image Generation"
 
-    def __init__(self):
-        self.loaded_lora = None
-
     @classmethod
     def INPUT_TYPES(s):
         return {
@@ -721,19 +721,7 @@ class LoraLoader:
             return (model, clip)
 
         lora_path = folder_paths.get_full_path_or_raise("loras", lora_name)
-        lora = None
-        lora_metadata = None
-        if self.loaded_lora is not None:
-            if self.loaded_lora[0] == lora_path:
-                lora = self.loaded_lora[1]
-                lora_metadata = self.loaded_lora[2] if len(self.loaded_lora) > 2 else None
-            else:
-                self.loaded_lora = None
-
-        if lora is None:
-            lora, lora_metadata = comfy.utils.load_torch_file(lora_path, safe_load=True, return_metadata=True)
-            self.loaded_lora = (lora_path, lora, lora_metadata)
-
+        lora, lora_metadata = comfy.weight_pool.load_torch_file(lora_path, safe_load=True, return_metadata=True, keep_idle=True)
         model_lora, clip_lora = comfy.sd.load_lora_for_models(model, clip, lora, strength_model, strength_clip, lora_metadata=lora_metadata)
         return (model_lora, clip_lora)
 
@@ -828,7 +816,7 @@ class VAELoader:
                 vae_path = folder_paths.get_full_path_or_raise("vae_approx", vae_name)
             else:
                 vae_path = folder_paths.get_full_path_or_raise("vae", vae_name)
-            sd, metadata = comfy.utils.load_torch_file(vae_path, return_metadata=True)
+            sd, metadata = comfy.weight_pool.load_torch_file(vae_path, return_metadata=True)
         if vae_name == "taef2":
             if metadata is None:
                 metadata = {"tae_latent_channels": 128}
@@ -1640,6 +1628,18 @@ class KSamplerAdvanced:
             disable_noise = True
         return common_ksampler(model, noise_seed, steps, cfg, sampler_name, scheduler, positive, negative, latent_image, denoise=denoise, disable_noise=disable_noise, start_step=start_at_step, last_step=end_at_step, force_full_denoise=force_full_denoise)
 
+SAVE_IMAGE_THREADS = min(8, os.cpu_count() or 1)
+save_image_pool = None
+save_image_pool_lock = threading.Lock()
+
+def get_save_image_pool():
+    """Threads that encode and write the images of SaveImage, PIL releases the GIL while compressing."""
+    global save_image_pool
+    with save_image_pool_lock:
+        if save_image_pool is None:
+            save_image_pool = ThreadPoolExecutor(max_workers=SAVE_IMAGE_THREADS, thread_name_prefix="save_image")
+        return save_image_pool
+
 class SaveImage:
     def __init__(self):
         self.output_dir = folder_paths.get_output_directory()
@@ -1676,22 +1676,26 @@ class SaveImage:
     def save_images(self, images, filename_prefix="ComfyUI", prompt=None, extra_pnginfo=None):
         filename_prefix += self.prefix_append
         full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(filename_prefix, self.output_dir, images[0].shape[1], images[0].shape[0])
-        results = list()
-        for (batch_number, image) in enumerate(images):
-            i = 255. * image.cpu().numpy()
-            img = Image.fromarray(np.clip(i, 0, 255).astype(np.uint8))
-            metadata = None
-            if not args.disable_metadata:
-                metadata = PngInfo()
-                if prompt is not None:
-                    metadata.add_text("prompt", json.dumps(prompt))
-                if extra_pnginfo is not None:
-                    for x in extra_pnginfo:
-                        metadata.add_text(x, json.dumps(extra_pnginfo[x]))
+        if isinstance(images, torch.Tensor):
+            # One device to host copy for the whole batch, each image is converted by the thread saving it.
+            pixels = images.cpu()
+        else:
+            pixels = [image.cpu() for image in images]
+        metadata = None
+        if not args.disable_metadata:
+            metadata = PngInfo()
+            if prompt is not None:
+                metadata.add_text("prompt", json.dumps(prompt))
+            if extra_pnginfo is not None:
+                for x in extra_pnginfo:
+                    metadata.add_text(x, json.dumps(extra_pnginfo[x]))
 
+        results = list()
+        files = list()
+        for batch_number in range(len(pixels)):
             filename_with_batch_num = filename.replace("%batch_num%", str(batch_number))
             file = f"{filename_with_batch_num}_{counter:05}_.png"
-            img.save(os.path.join(full_output_folder, file), pnginfo=metadata, compress_level=self.compress_level)
+            files.append(file)
             results.append({
                 "filename": file,
                 "subfolder": subfolder,
@@ -1699,6 +1703,17 @@ class SaveImage:
             })
             counter += 1
 
+        def save(batch_number):
+            i = 255. * pixels[batch_number].numpy()
+            img = Image.fromarray(np.clip(i, 0, 255).astype(np.uint8))
+            img.save(os.path.join(full_output_folder, files[batch_number]), pnginfo=metadata, compress_level=self.compress_level)
+
+        if len(pixels) == 1:
+            save(0)
+        else:
+            # The files are written before returning since the UI loads them as soon as the node finishes.
+            list(get_save_image_pool().map(save, range(len(pixels))))
+
         return { "ui": { "images": results }, "result" : (images,) }
 
 class PreviewImage(SaveImage):
@@ -1733,6 +1748,7 @@ class LoadImage:
 
     RETURN_TYPES = ("IMAGE", "MASK")
     FUNCTION = "load_image"
+    THREAD_SAFE = True
 
     def load_image(self, image):
         image_path = folder_paths.get_annotated_filepath(image)
@@ -1874,6 +1890,7 @@ class ImageScale:
                               "crop": (s.crop_methods,)}}
     RETURN_TYPES = ("IMAGE",)
     FUNCTION = "upscale"
+    THREAD_SAFE = True
 
     CATEGORY = "image/upscaling"
     ESSENTIALS_CATEGORY = "Image Tools"
@@ -1904,6 +1921,7 @@ class ImageScaleBy:
                               "scale_by": ("FLOAT", {"default": 1.0, "min": 0.01, "max": 8.0, "step": 0.01}),}}
     RETURN_TYPES = ("IMAGE",)
     FUNCTION = "upscale"
+    THREAD_SAFE = True
 
     CATEGORY = "image/upscaling"
 
@@ -1925,6 +1943,7 @@ class ImageInvert:
 
     RETURN_TYPES = ("IMAGE",)
     FUNCTION = "invert"
+    THREAD_SAFE = True
 
     CATEGORY = "image/color"
 
@@ -3,6 +3,7 @@ import os
 import sys
 import asyncio
 import traceback
+import threading
 import time
 
 import nodes
@@ -11,12 +12,13 @@ import execution
 from comfy_execution.jobs import (
     JobStatus,
     get_job,
-    get_all_jobs,
+    get_jobs_page,
     validate_job_id,
     cancel_job,
     CANCEL_PENDING,
     CANCEL_RUNNING,
 )
+from comfy_execution.validation import input_schema_cache
 import uuid
 import urllib
 import json
@@ -38,6 +40,7 @@ from comfy.cli_args import args
 from comfy.deploy_environment import get_deploy_environment
 import comfy.utils
 import comfy.model_management
+import comfy.weight_pool
 from comfy_api import feature_flags
 import node_helpers
 from comfyui_version import __version__
@@ -53,6 +56,8 @@ from app.model_manager import ModelFileManager
 from app.custom_node_manager import CustomNodeManager
 from app.subgraph_manager import SubgraphManager
 from app.node_replace_manager import NodeReplaceManager
+from app.object_info_cache import ObjectInfoCache
+from app.websocket_stream import WebSocketStream, send_socket_catch_exception  # noqa: F401
 from typing import Optional, Union
 from api_server.routes.internal.internal_routes import InternalRoutes
 from protocol import BinaryEventTypes
@@ -69,12 +74,6 @@ def _remove_sensitive_from_queue(queue: list) -> list:
     return [item[:5] for item in queue]
 
 
-async def send_socket_catch_exception(function, message):
-    try:
-        await function(message)
-    except (aiohttp.ClientError, aiohttp.ClientPayloadError, ConnectionResetError, BrokenPipeError, ConnectionError) as err:
-        logging.warning("send error: {}".format(err))
-
 # Track deprecated paths that have been warned about to only warn once per file
 _deprecated_paths_warned = set()
 
@@ -105,6 +104,9 @@ async def compress_body(request: web.Request, handler):
         return response
     if response.content_type not in ["application/json", "text/plain"]:
         return response
+    if "Content-Encoding" in response.headers:
+        # Already compressed, like the cached /object_info.
+        return response
     if response.body and "gzip" in accept_encoding:
         response.enable_compression()
     return response
@@ -246,6 +248,7 @@ class PromptServer():
         self.app = web.Application(client_max_size=max_upload_size, middlewares=middlewares)
         self.sockets = dict()
         self.sockets_metadata = dict()
+        self.websocket_streams = dict()
         self.web_root = (
             FrontendManager.init_frontend(args.front_end_version)
             if args.front_end_root is None
@@ -259,8 +262,13 @@ class PromptServer():
             asset_seeder.disable()
         routes = web.RouteTableDef()
         self.routes = routes
+        self._worker_state = threading.local()
         self.last_node_id = None
         self.client_id = None
+        self.prompt_executor = None
+        # The executors of all the prompt workers, prompt_executor is the first one.
+        self.prompt_executors = []
+        self._queue_response = None
 
         self.on_prompt_handlers = []
 
@@ -279,6 +287,12 @@ class PromptServer():
             self.sockets[sid] = ws
             # Store metadata separately
             self.sockets_metadata[sid] = {"feature_flags": {}}
+            old_stream = self.websocket_streams.pop(sid, None)
+            if old_stream is not None:
+                old_stream.close()
+            stream = WebSocketStream(ws, args.websocket_update_interval / 1000)
+            stream.start()
+            self.websocket_streams[sid] = stream
 
             try:
                 # Send initial state to the new client
@@ -301,6 +315,9 @@ class PromptServer():
                                 # Store client feature flags
                                 client_flags = data.get("data", {})
                                 self.sockets_metadata[sid]["feature_flags"] = client_flags
+                                stream.delta = feature_flags.supports_feature(
+                                    self.sockets_metadata, sid, "supports_progress_state_delta"
+                                )
 
                                 # Send server feature flags in response
                                 await self.send(
@@ -322,6 +339,9 @@ class PromptServer():
             finally:
                 self.sockets.pop(sid, None)
                 self.sockets_metadata.pop(sid, None)
+                stream.close()
+                if self.websocket_streams.get(sid) is stream:
+                    self.websocket_streams.pop(sid)
             return ws
 
         @routes.get("/")
@@ -730,13 +750,17 @@ class PromptServer():
         async def get_prompt(request):
             return web.json_response(self.get_queue_info())
 
-        def node_info(node_class):
+        def node_info(node_class, generation=None):
             obj_class = nodes.NODE_CLASS_MAPPINGS[node_class]
             if issubclass(obj_class, _ComfyNodeInternal):
                 return obj_class.GET_NODE_INFO_V1()
+            if generation is None:
+                class_inputs = obj_class.INPUT_TYPES()
+            else:
+                class_inputs = input_schema_cache.get(obj_class, generation)[0].class_inputs
             info = {}
-            info['input'] = obj_class.INPUT_TYPES()
-            info['input_order'] = {key: list(value.keys()) for (key, value) in obj_class.INPUT_TYPES().items()}
+            info['input'] = class_inputs
+            info['input_order'] = {key: list(value.keys()) for (key, value) in class_inputs.items()}
             info['is_input_list'] = getattr(obj_class, "INPUT_IS_LIST", False)
             info['output'] = obj_class.RETURN_TYPES
             info['output_is_list'] = obj_class.OUTPUT_IS_LIST if hasattr(obj_class, 'OUTPUT_IS_LIST') else [False] * len(obj_class.RETURN_TYPES)
@@ -779,26 +803,23 @@ class PromptServer():
 
             return info
 
+        self.object_info_cache = ObjectInfoCache(node_info)
+
         @routes.get("/object_info")
         async def get_object_info(request):
             asset_seeder.start(roots=("models", "input", "output"))
             with folder_paths.cache_helper:
-                out = {}
-                for x in nodes.NODE_CLASS_MAPPINGS:
-                    try:
-                        out[x] = node_info(x)
-                    except Exception:
-                        logging.error(f"[ERROR] An error occurred while retrieving information for the '{x}' node.")
-                        logging.error(traceback.format_exc())
-                return web.json_response(out)
+                return await self.object_info_cache.response(request)
 
         @routes.get("/object_info/{node_class}")
         async def get_object_info_node(request):
             node_class = request.match_info.get("node_class", None)
-            out = {}
-            if (node_class is not None) and (node_class in nodes.NODE_CLASS_MAPPINGS):
-                out[node_class] = node_info(node_class)
-            return web.json_response(out)
+            node_json = None
+            if node_class is not None:
+                node_json = self.object_info_cache.get_node_json(node_class)
+            if node_json is None:
+                return web.json_response({})
+            return web.Response(body=b"{" + json.dumps(node_class).encode() + b": " + node_json + b"}", content_type="application/json")
 
         @routes.get("/api/jobs")
         async def get_jobs(request):
@@ -811,6 +832,7 @@ class PromptServer():
                 sort_order: Sort direction: asc, desc (default)
                 limit: Max items to return (positive integer)
                 offset: Items to skip (non-negative integer, default 0)
+                after: pagination.next_cursor of the previous page, continues after it (offset is ignored)
             """
             query = request.rel_url.query
 
@@ -870,32 +892,46 @@ class PromptServer():
                         status=400
                     )
 
+            cursor = query.get('after')
+            if cursor is not None:
+                offset = 0
+
             running, queued = self.prompt_queue.get_current_queue_volatile()
-            history = self.prompt_queue.get_history()
 
             running = _remove_sensitive_from_queue(running)
             queued = _remove_sensitive_from_queue(queued)
 
-            jobs, total = get_all_jobs(
-                running, queued, history,
-                status_filter=status_filter,
-                workflow_id=workflow_id,
-                sort_by=sort_by,
-                sort_order=sort_order,
-                limit=limit,
-                offset=offset
-            )
+            try:
+                # The history store may be the database, keep its queries off the event loop.
+                jobs, total, next_cursor = await asyncio.to_thread(
+                    get_jobs_page,
+                    running, queued, self.prompt_queue.history_store,
+                    status_filter=status_filter,
+                    workflow_id=workflow_id,
+                    sort_by=sort_by,
+                    sort_order=sort_order,
+                    limit=limit,
+                    offset=offset,
+                    cursor=cursor
+                )
+            except ValueError:
+                return web.json_response(
+                    {"error": "cursor is invalid"},
+                    status=400
+                )
 
-            has_more = (offset + len(jobs)) < total
+            pagination = {
+                'offset': offset,
+                'limit': limit,
+                'total': total,
+                'has_more': next_cursor is not None
+            }
+            if next_cursor is not None:
+                pagination['next_cursor'] = next_cursor
 
             return web.json_response({
                 'jobs': jobs,
-                'pagination': {
-                    'offset': offset,
-                    'limit': limit,
-                    'total': total,
-                    'has_more': has_more
-                }
+                'pagination': pagination
             })
 
         @routes.get("/api/jobs/{job_id}")
@@ -909,7 +945,7 @@ class PromptServer():
                 )
 
             running, queued = self.prompt_queue.get_current_queue_volatile()
-            history = self.prompt_queue.get_history(prompt_id=job_id)
+            history = await asyncio.to_thread(self.prompt_queue.get_history, prompt_id=job_id)
 
             running = _remove_sensitive_from_queue(running)
             queued = _remove_sensitive_from_queue(queued)
@@ -934,7 +970,7 @@ class PromptServer():
             pending job), False when the call was a no-op (terminal/unknown id).
             """
             running, queued = self.prompt_queue.get_current_queue()
-            history = self.prompt_queue.get_history()
+            history = self.prompt_queue.get_history(prompt_id=job_id)
 
             def interrupt(prompt_id):
                 logging.info(f"Cancelling running prompt {prompt_id}")
@@ -945,7 +981,7 @@ class PromptServer():
 
             def dequeue(prompt_id):
                 logging.info(f"Cancelling pending prompt {prompt_id}")
-                return self.prompt_queue.delete_queue_item(lambda a: a[1] == prompt_id)
+                return self.prompt_queue.delete_queue_item_by_id(prompt_id)
 
             classification = cancel_job(job_id, running, queued, history, interrupt, dequeue)
             return classification in (CANCEL_RUNNING, CANCEL_PENDING)
@@ -1036,20 +1072,48 @@ class PromptServer():
             else:
                 offset = -1
 
-            return web.json_response(self.prompt_queue.get_history(max_items=max_items, offset=offset))
+            # Entries that finished before this prompt, for paging back through the history.
+            before = request.rel_url.query.get("before", None)
+
+            history = await asyncio.to_thread(self.prompt_queue.get_history, max_items=max_items, offset=offset, before=before)
+            return web.json_response(history)
 
         @routes.get("/history/{prompt_id}")
         async def get_history_prompt_id(request):
             prompt_id = request.match_info.get("prompt_id", None)
-            return web.json_response(self.prompt_queue.get_history(prompt_id=prompt_id))
+            history = await asyncio.to_thread(self.prompt_queue.get_history, prompt_id=prompt_id)
+            return web.json_response(history)
 
         @routes.get("/queue")
         async def get_queue(request):
-            queue_info = {}
-            current_queue = self.prompt_queue.get_current_queue_volatile()
-            queue_info['queue_running'] = _remove_sensitive_from_queue(current_queue[0])
-            queue_info['queue_pending'] = _remove_sensitive_from_queue(current_queue[1])
-            return web.json_response(queue_info)
+            since = request.rel_url.query.get("since")
+            if since is not None:
+                try:
+                    since = int(since)
+                except ValueError:
+                    return web.json_response({"error": "since must be an integer"}, status=400)
+                queue_changes = self.prompt_queue.get_queue_changes(since)
+                if queue_changes is not None:
+                    version, changes = queue_changes
+                    return web.json_response({
+                        "version": version,
+                        "changes": [
+                            {"prompt_id": prompt_id, "status": status, "item": item[:5] if item is not None else None}
+                            for prompt_id, status, item in changes
+                        ],
+                    })
+
+            # Polling clients mostly see an unchanged queue, so reuse the encoded response until the version changes.
+            snapshot = self.prompt_queue.get_snapshot()
+            cached = self._queue_response
+            if cached is None or cached[0] != snapshot.version:
+                queue_info = {}
+                queue_info['queue_running'] = _remove_sensitive_from_queue(snapshot.running)
+                queue_info['queue_pending'] = _remove_sensitive_from_queue(snapshot.pending)
+                queue_info['version'] = snapshot.version
+                cached = (snapshot.version, json.dumps(queue_info))
+                self._queue_response = cached
+            return web.Response(text=cached[1], content_type="application/json")
 
         @routes.post("/prompt")
         async def post_prompt(request):
@@ -1134,8 +1198,7 @@ class PromptServer():
             if "delete" in json_data:
                 to_delete = json_data['delete']
                 for id_to_delete in to_delete:
-                    delete_func = lambda a: a[1] == id_to_delete
-                    self.prompt_queue.delete_queue_item(delete_func)
+                    self.prompt_queue.delete_queue_item_by_id(id_to_delete)
 
             return web.Response(status=200)
 
@@ -1149,19 +1212,9 @@ class PromptServer():
             # Check if a specific prompt_id was provided for targeted interruption
             prompt_id = json_data.get('prompt_id')
             if prompt_id:
-                currently_running, _ = self.prompt_queue.get_current_queue()
-
-                # Check if the prompt_id matches any currently running prompt
-                should_interrupt = False
-                for item in currently_running:
-                    # item structure: (number, prompt_id, prompt, extra_data, outputs_to_execute)
-                    if item[1] == prompt_id:
-                        logging.info(f"Interrupting prompt {prompt_id}")
-                        should_interrupt = True
-                        break
-
-                if should_interrupt:
-                    nodes.interrupt_processing()
+                # Only interrupts the worker running this prompt when several are running.
+                if self.prompt_queue.interrupt_if_running(prompt_id):
+                    logging.info(f"Interrupting prompt {prompt_id}")
                 else:
                     logging.info(f"Prompt {prompt_id} is not currently running, skipping interrupt")
             else:
@@ -1171,6 +1224,27 @@ class PromptServer():
 
             return web.Response(status=200)
 
+        @routes.get("/cache/ram")
+        async def get_cache_ram(request):
+            usages = []
+            for executor in list(self.prompt_executors):
+                usage = executor.get_cache_ram_usage()
+                if usage is not None:
+                    device = str(executor.device) if executor.device is not None else None
+                    usages.append((device, usage))
+            if len(usages) == 0:
+                return web.json_response({"error": "RAM pressure cache is not enabled"}, status=404)
+            entries = []
+            for device, usage in usages:
+                for entry in usage["entries"]:
+                    entries.append({**entry, "device": device})
+            entries.sort(key=lambda e: e["ram_bytes"], reverse=True)
+            return web.json_response({"total_ram_bytes": sum(usage["total_ram_bytes"] for _, usage in usages), "entries": entries})
+
+        @routes.get("/cache/weights")
+        async def get_cache_weights(request):
+            return web.json_response(comfy.weight_pool.weight_pool.get_stats())
+
         @routes.post("/free")
         async def post_free(request):
             json_data = await request.json()
@@ -1187,11 +1261,11 @@ class PromptServer():
             json_data =  await request.json()
             if "clear" in json_data:
                 if json_data["clear"]:
-                    self.prompt_queue.wipe_history()
+                    await asyncio.to_thread(self.prompt_queue.wipe_history)
             if "delete" in json_data:
                 to_delete = json_data['delete']
                 for id_to_delete in to_delete:
-                    self.prompt_queue.delete_history_item(id_to_delete)
+                    await asyncio.to_thread(self.prompt_queue.delete_history_item, id_to_delete)
 
             return web.Response(status=200)
 
@@ -1199,6 +1273,26 @@ class PromptServer():
         timeout = aiohttp.ClientTimeout(total=None) # no timeout
         self.client_session = aiohttp.ClientSession(timeout=timeout)
 
+    # client_id and last_node_id are set by the prompt worker that is executing. With several workers each
+    # thread sees the values of its own prompt, other threads see the most recently set ones.
+    @property
+    def client_id(self):
+        return getattr(self._worker_state, "client_id", self._client_id)
+
+    @client_id.setter
+    def client_id(self, value):
+        self._worker_state.client_id = value
+        self._client_id = value
+
+    @property
+    def last_node_id(self):
+        return getattr(self._worker_state, "last_node_id", self._last_node_id)
+
+    @last_node_id.setter
+    def last_node_id(self, value):
+        self._worker_state.last_node_id = value
+        self._last_node_id = value
+
     def add_routes(self):
         self.user_manager.add_routes(self.routes)
         self.model_file_manager.add_routes(self.routes)
@@ -1349,27 +1443,23 @@ class PromptServer():
         combined_data.extend(metadata_json)
         combined_data.extend(image_bytes)
 
-        await self.send_bytes(BinaryEventTypes.PREVIEW_IMAGE_WITH_METADATA, combined_data, sid=sid)
+        await self.send_bytes(BinaryEventTypes.PREVIEW_IMAGE_WITH_METADATA, combined_data, sid=sid, metadata=metadata)
+
+    def get_websocket_streams(self, sid=None):
+        if sid is None:
+            return list(self.websocket_streams.values())
+        stream = self.websocket_streams.get(sid)
+        return [stream] if stream is not None else []
 
-    async def send_bytes(self, event, data, sid=None):
+    async def send_bytes(self, event, data, sid=None, metadata=None):
         message = self.encode_bytes(event, data)
 
-        if sid is None:
-            sockets = list(self.sockets.values())
-            for ws in sockets:
-                await send_socket_catch_exception(ws.send_bytes, message)
-        elif sid in self.sockets:
-            await send_socket_catch_exception(self.sockets[sid].send_bytes, message)
+        for stream in self.get_websocket_streams(sid):
+            stream.put_bytes(event, message, metadata)
 
     async def send_json(self, event, data, sid=None):
-        message = {"type": event, "data": data}
-
-        if sid is None:
-            sockets = list(self.sockets.values())
-            for ws in sockets:
-                await send_socket_catch_exception(ws.send_json, message)
-        elif sid in self.sockets:
-            await send_socket_catch_exception(self.sockets[sid].send_json, message)
+        for stream in self.get_websocket_streams(sid):
+            stream.put_json(event, data)
 
     def send_sync(self, event, data, sid=None):
         self.loop.call_soon_threadsafe(
@@ -6,6 +6,7 @@ import av
 import io
 from fractions import Fraction
 from comfy_api.input_impl.video_types import VideoFromFile, VideoFromComponents
+from comfy_api.latest._input_impl.video_types import VideoFromFrameChunks
 from comfy_api.util.video_types import VideoComponents
 from comfy_api.input.basic_types import AudioInput
 from av.error import InvalidDataError
@@ -116,6 +117,28 @@ def test_video_from_components_get_dimensions(video_components):
     assert height == 2
 
 
+def test_video_from_frame_chunks_saves_chunks_lazily():
+    """Chunks are requested while encoding and end up as the frames of the video"""
+    requested = []
+
+    def get_chunks():
+        for i in range(3):
+            requested.append(i)
+            yield torch.full((4, 16, 16, 3), i / 3)
+
+    video = VideoFromFrameChunks(get_chunks, frame_count=12, width=16, height=16, frame_rate=Fraction(24))
+    assert video.get_dimensions() == (16, 16)
+    assert video.get_duration() == pytest.approx(12 / 24)
+    assert requested == []
+
+    buffer = io.BytesIO()
+    video.save_to(buffer)
+    assert requested == [0, 1, 2]
+
+    components = VideoFromFile(buffer).get_components()
+    assert components.images.shape == (12, 16, 16, 3)
+
+
 def test_video_from_file_get_duration(simple_video_file):
     """Duration extracted from file metadata"""
     video = VideoFromFile(simple_video_file)
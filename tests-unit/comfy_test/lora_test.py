@@ -0,0 +1,125 @@
+import torch
+
+import comfy.lora
+import comfy.weight_adapter as weight_adapter
+
+
+class _TextEncoder(torch.nn.Module):
+    def __init__(self, layers=2):
+        super().__init__()
+        self.clip_l = torch.nn.Module()
+        self.clip_l.transformer = torch.nn.Module()
+        self.clip_l.transformer.text_model = torch.nn.Module()
+        self.clip_l.transformer.text_model.encoder = torch.nn.Module()
+        self.clip_l.transformer.text_model.encoder.layers = torch.nn.ModuleList()
+        for _ in range(layers):
+            layer = torch.nn.Module()
+            layer.mlp = torch.nn.Module()
+            layer.mlp.fc1 = torch.nn.Linear(4, 4)
+            layer.mlp.fc2 = torch.nn.Linear(4, 4)
+            self.clip_l.transformer.text_model.encoder.layers.append(layer)
+
+
+def _lora_with_every_format():
+    up, down = torch.ones(4, 2), torch.ones(2, 4)
+    return {
+        "lora_te1_text_model_encoder_layers_0_mlp_fc1.lora_up.weight": up,
+        "lora_te1_text_model_encoder_layers_0_mlp_fc1.lora_down.weight": down,
+        "lora_te1_text_model_encoder_layers_0_mlp_fc1.alpha": torch.tensor(2.0),
+        "text_encoders.clip_l.transformer.text_model.encoder.layers.1.mlp.fc1.lora_B.weight": up,
+        "text_encoders.clip_l.transformer.text_model.encoder.layers.1.mlp.fc1.lora_A.weight": down,
+        "text_encoder.text_model.encoder.layers.0.mlp.fc2_lora.up.weight": up,
+        "text_encoder.text_model.encoder.layers.0.mlp.fc2_lora.down.weight": down,
+        "lora_te1_text_model_encoder_layers_1_mlp_fc2.hada_w1_a": up,
+        "lora_te1_text_model_encoder_layers_1_mlp_fc2.hada_w1_b": down,
+        "lora_te1_text_model_encoder_layers_1_mlp_fc2.hada_w2_a": up,
+        "lora_te1_text_model_encoder_layers_1_mlp_fc2.hada_w2_b": down,
+        "text_encoders.clip_l.transformer.text_model.encoder.layers.0.mlp.fc2.diff_b": torch.ones(4),
+        "text_encoders.clip_l.transformer.text_model.encoder.layers.1.mlp.fc2.w_norm": torch.ones(4),
+        "unrelated.lora_up.weight": up,
+    }
+
+
+def _describe(patches):
+    return {k: (type(v).__name__ if not isinstance(v, tuple) else v[0]) for k, v in patches.items()}
+
+
+class TestLoadLora:
+    def test_same_patches_as_probing_every_key(self, monkeypatch):
+        lora = _lora_with_every_format()
+        key_map = comfy.lora.model_lora_keys_clip(_TextEncoder(), {})
+        patches = comfy.lora.load_lora(lora, key_map, log_missing=False)
+        monkeypatch.setattr(comfy.lora, "get_lora_key_prefixes", lambda lora: set(key_map))
+        expected = comfy.lora.load_lora(lora, key_map, log_missing=False)
+        assert list(patches) == list(expected)
+        assert _describe(patches) == _describe(expected)
+        assert len(patches) == 5
+        assert isinstance(patches["clip_l.transformer.text_model.encoder.layers.0.mlp.fc1.weight"], weight_adapter.LoRAAdapter)
+
+    def test_key_prefixes(self):
+        prefixes = comfy.lora.get_lora_key_prefixes({"a.b_lora.up.weight": None, "c": None})
+        assert {"a", "a.b", "a.b_lora", "a.b_lora.up"} == prefixes
+
+
+class TestKeyMapCache:
+    def test_key_map_built_once_per_architecture(self, monkeypatch):
+        monkeypatch.setattr(comfy.lora, "_key_map_cache", comfy.lora.collections.OrderedDict())
+        builds = []
+        build = comfy.lora._model_lora_keys_clip
+
+        def counting_build(sdk, key_map):
+            builds.append(len(sdk))
+            return build(sdk, key_map)
+        monkeypatch.setattr(comfy.lora, "_model_lora_keys_clip", counting_build)
+
+        first = comfy.lora.model_lora_keys_clip(_TextEncoder(), {})
+        second = comfy.lora.model_lora_keys_clip(_TextEncoder(), {"existing": "key"})
+        assert len(builds) == 1
+        assert second.pop("existing") == "key" and second == first
+        first.clear()
+        assert comfy.lora.model_lora_keys_clip(_TextEncoder(), {}) == second
+
+        comfy.lora.model_lora_keys_clip(_TextEncoder(layers=3), {})
+        assert len(builds) == 2
+
+
+def _lora_patch(out_dim, in_dim, rank, strength=1.0, alpha=None, strength_model=1.0):
+    adapter = weight_adapter.LoRAAdapter(set(), (torch.randn(out_dim, rank), torch.randn(rank, in_dim), alpha, None, None, None))
+    return (strength, adapter, strength_model, None, None)
+
+
+def _unfused(patches, weight, key):
+    for p in patches:
+        weight = comfy.lora.calculate_weight([p], weight, key)
+    return weight
+
+
+class TestLowRankPatches:
+    def test_stacked_patches_match_one_by_one(self):
+        patches = [_lora_patch(8, 6, 2, 0.5, alpha=1.0), _lora_patch(8, 6, 4, -1.0),
+                   _lora_patch(8, 6, 1, 1.0, strength_model=0.5), _lora_patch(8, 6, 3, 2.0, alpha=4.0),
+                   (1.0, ("diff", (torch.ones(8, 6),)), 1.0, None, None), _lora_patch(8, 6, 2)]
+        weight = torch.randn(8, 6)
+        expected = _unfused(patches, weight.clone(), "w")
+        assert torch.allclose(comfy.lora.calculate_weight(patches, weight.clone(), "w"), expected, atol=1e-4)
+        assert [len(r) if isinstance(r, list) else 1 for r in comfy.lora._low_rank_runs(patches, weight)] == [2, 1, 1, 1, 1]
+
+    def test_conv_weight(self):
+        patches = [_lora_patch(4, 3 * 3 * 3, 2, 0.7), _lora_patch(4, 3 * 3 * 3, 5, 1.3, alpha=2.0)]
+        weight = torch.randn(4, 3, 3, 3)
+        expected = _unfused(patches, weight.clone(), "w")
+        assert torch.allclose(comfy.lora.calculate_weight(patches, weight.clone(), "w"), expected, atol=1e-4)
+
+    def test_batched_weights(self, monkeypatch):
+        monkeypatch.setattr(comfy.lora, "LOW_RANK_BATCH_MEMORY", 2 * 8 * 6 * 4)
+        monkeypatch.setattr(comfy.lora, "LOW_RANK_BATCH_CPU", True)
+        items = []
+        for i in range(5):
+            items.append(([_lora_patch(8, 6, 2, 0.5), _lora_patch(8, 6, 3)], torch.randn(8, 6), "a{}".format(i)))
+        items.append(([_lora_patch(8, 6, 4)], torch.randn(8, 6), "other_rank"))
+        items.append(([_lora_patch(4, 6, 2)], torch.randn(4, 6), "other_shape"))
+        items.append(([(1.0, ("diff", (torch.ones(4),)), 1.0, None, None)], torch.randn(4), "bias"))
+        expected = [_unfused(patches, weight.clone(), key) for patches, weight, key in items]
+        results = comfy.lora.calculate_weights([(patches, weight.clone(), key) for patches, weight, key in items])
+        for result, e in zip(results, expected):
+            assert torch.allclose(result, e, atol=1e-4)
@@ -0,0 +1,78 @@
+import os
+
+import pytest
+import safetensors.torch
+import torch
+
+import comfy.model_config_cache
+import comfy.model_detection
+from comfy.model_config_cache import ModelConfigCache
+from comfy.model_detection import StateDictKeys, count_blocks, detect_unet_config
+
+
+def _make_flux_sd(prefix=""):
+    sd = {}
+    H = 32
+    sd[prefix + "img_in.weight"] = torch.zeros(H, 64)
+    sd[prefix + "txt_in.weight"] = torch.zeros(H, 4096)
+    sd[prefix + "time_in.in_layer.weight"] = torch.zeros(H, 256)
+    sd[prefix + "final_layer.linear.weight"] = torch.zeros(64, H)
+    for i in range(3):
+        sd[prefix + "double_blocks.{}.img_attn.norm.key_norm.weight".format(i)] = torch.zeros(128)
+        sd[prefix + "double_blocks.{}.img_attn.qkv.weight".format(i)] = torch.zeros(3 * H, H)
+    for i in range(5):
+        sd[prefix + "single_blocks.{}.modulation.lin.weight".format(i)] = torch.zeros(H, H)
+    return sd
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ModelConfigCache(str(tmp_path / "cache" / "model_configs.json"))
+    monkeypatch.setattr(comfy.model_config_cache, "model_config_cache", cache)
+    return cache
+
+
+def test_count_blocks_with_index_matches_list():
+    keys = list(_make_flux_sd().keys())
+    for prefix in ("double_blocks.{}.", "single_blocks.{}.", "missing.{}."):
+        assert count_blocks(StateDictKeys(keys), prefix) == count_blocks(keys, prefix)
+
+
+def test_cache_round_trip_keeps_types(tmp_path, cache):
+    path = str(tmp_path / "model.safetensors")
+    safetensors.torch.save_file({"a": torch.zeros(1)}, path)
+    unet_config = {"depth": 3, "axes_dim": [16, 56, 56], "txt_ids_dims": (1, 2), "dtype": torch.float32, "nested": {"x": None}}
+    cache.put(path, "checkpoint", unet_config)
+
+    reloaded = ModelConfigCache(cache.path)
+    assert reloaded.get(path, "checkpoint") == (True, unet_config)
+    assert reloaded.get(path, "diffusion_model") == (False, None)
+
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1000))
+    assert reloaded.get(path, "checkpoint") == (False, None)
+
+
+def test_header_detection_matches_full_detection(tmp_path, cache):
+    path = str(tmp_path / "flux.safetensors")
+    sd = _make_flux_sd()
+    safetensors.torch.save_file(sd, path)
+
+    model_config = comfy.model_detection.model_config_from_safetensors_header(path)
+    assert type(model_config).__name__ == "FluxSchnell"
+    assert cache.get(path, "checkpoint") == (True, None)
+    assert cache.get(path, "diffusion_model") == (True, detect_unet_config(sd, ""))
+
+
+def test_cached_config_skips_detection(tmp_path, cache, monkeypatch):
+    path = str(tmp_path / "flux.safetensors")
+    sd = _make_flux_sd("model.diffusion_model.")
+    safetensors.torch.save_file(sd, path)
+    expected = comfy.model_detection.model_config_from_unet(sd, "model.diffusion_model.", cache_key=(path, "checkpoint"))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("detect_unet_config called")
+    monkeypatch.setattr(comfy.model_detection, "detect_unet_config", fail)
+    model_config = comfy.model_detection.model_config_from_unet(sd, "model.diffusion_model.", cache_key=(path, "checkpoint"))
+    assert model_config.unet_config == expected.unet_config
+    assert type(comfy.model_detection.model_config_from_safetensors_header(path)) is type(expected)
@@ -0,0 +1,55 @@
+import pytest
+import safetensors.torch
+import torch
+
+import comfy.utils
+
+
+@pytest.fixture
+def model_file(tmp_path):
+    path = str(tmp_path / "model.safetensors")
+    sd = {
+        "big": torch.randn(1000, 37),
+        "half": torch.randn(333).to(torch.float16),
+        "empty": torch.zeros(0, 4),
+        "ints": torch.arange(77, dtype=torch.int64),
+        "bf16": torch.randn(5, 7).to(torch.bfloat16),
+    }
+    safetensors.torch.save_file(sd, path, metadata={"format": "pt"})
+    return path, sd
+
+
+class TestLoadSafetensorsParallel:
+    @pytest.mark.parametrize("chunk_size", [64, 1000, 4096, 1 << 20])
+    def test_matches_safetensors(self, model_file, chunk_size):
+        path, expected = model_file
+        sd, metadata = comfy.utils.load_safetensors_parallel(path, threads=3, chunk_size=chunk_size)
+        assert metadata == {"format": "pt"}
+        assert set(sd) == set(expected)
+        for k, v in expected.items():
+            assert sd[k].dtype == v.dtype and sd[k].shape == v.shape
+            assert torch.equal(sd[k], v)
+
+    def test_tensors_do_not_share_storage(self, model_file):
+        path, _ = model_file
+        sd, _ = comfy.utils.load_safetensors_parallel(path, threads=2, chunk_size=256)
+        sd["big"].zero_()
+        assert not torch.equal(sd["ints"], torch.zeros_like(sd["ints"]))
+
+    def test_threads_only_for_large_safetensors(self, model_file, monkeypatch):
+        path, _ = model_file
+        monkeypatch.setattr(comfy.utils, "PARALLEL_LOAD_THREADS", 4)
+        assert comfy.utils.parallel_load_threads(path) == 0
+        monkeypatch.setattr(comfy.utils, "PARALLEL_LOAD_MIN_SIZE", 0)
+        assert comfy.utils.parallel_load_threads(path) == 4
+        assert comfy.utils.parallel_load_threads(path[:-len(".safetensors")] + ".ckpt") == 0
+        monkeypatch.setattr(comfy.utils, "PARALLEL_LOAD_THREADS", None)
+        assert comfy.utils.parallel_load_threads(path) == 0
+
+    def test_load_torch_file_uses_parallel_loader(self, model_file, monkeypatch):
+        path, expected = model_file
+        monkeypatch.setattr(comfy.utils, "PARALLEL_LOAD_THREADS", 2)
+        monkeypatch.setattr(comfy.utils, "PARALLEL_LOAD_MIN_SIZE", 0)
+        sd, metadata = comfy.utils.load_torch_file(path, return_metadata=True)
+        assert metadata == {"format": "pt"}
+        assert all(torch.equal(sd[k], v) for k, v in expected.items())
@@ -0,0 +1,118 @@
+import pytest
+import torch
+
+import comfy.lora
+import comfy.model_patcher
+import comfy.patched_weight_cache as patched_weight_cache
+import comfy.weight_adapter as weight_adapter
+from comfy.patched_weight_cache import PatchedWeightCache, weight_cache_key
+
+
+def _lora(out_dim=4, in_dim=4, rank=2):
+    return weight_adapter.LoRAAdapter(set(), (torch.randn(out_dim, rank), torch.randn(rank, in_dim), None, None, None, None))
+
+
+class TestWeightCacheKey:
+    def test_key_depends_on_weight_patches_and_strength(self):
+        weight, lora = torch.randn(4, 4), _lora()
+        key = weight_cache_key("w", weight, [(1.0, lora, 1.0, None, None)], torch.float32)
+        assert key == weight_cache_key("w", weight.clone(), [(1.0, lora, 1.0, None, None)], torch.float32)
+        assert key != weight_cache_key("w", weight, [(0.5, lora, 1.0, None, None)], torch.float32)
+        assert key != weight_cache_key("w", weight, [(1.0, _lora(), 1.0, None, None)], torch.float32)
+        assert key != weight_cache_key("w", weight, [(1.0, lora, 1.0, None, None)], torch.float16)
+        assert key != weight_cache_key("v", weight, [(1.0, lora, 1.0, None, None)], torch.float32)
+        weight += 1
+        assert key != weight_cache_key("w", weight, [(1.0, lora, 1.0, None, None)], torch.float32)
+
+    def test_full_key_sees_every_element(self):
+        weight = torch.zeros(4, patched_weight_cache.FINGERPRINT_ELEMENTS)
+        changed = weight.clone()
+        changed[0, 1] = 1.0
+        patches = [(1.0, _lora(in_dim=patched_weight_cache.FINGERPRINT_ELEMENTS), 1.0, None, None)]
+        assert weight_cache_key("w", weight, patches, torch.float32) == weight_cache_key("w", changed, patches, torch.float32)
+        assert weight_cache_key("w", weight, patches, torch.float32, full=True) != weight_cache_key("w", changed, patches, torch.float32, full=True)
+        assert weight_cache_key("w", weight, patches, torch.float32, full=True) == weight_cache_key("w", weight.clone(), patches, torch.float32, full=True)
+
+    def test_functions_are_not_cached(self):
+        patches = [(1.0, _lora(), 1.0, None, lambda a: a)]
+        assert weight_cache_key("w", torch.randn(4, 4), patches, torch.float32) is None
+
+
+class TestPatchedWeightCache:
+    def test_ram_budget(self):
+        cache = PatchedWeightCache(2 * 16 * 4)
+        for name in "abc":
+            cache.start_load()
+            cache.put(name, torch.ones(4, 4))
+        assert cache.get("a", "cpu") is None
+        cached = cache.get("b", "cpu")
+        cached += 1
+        assert torch.equal(cache.get("b", "cpu"), torch.ones(4, 4))
+        stats = cache.get_stats()
+        assert (stats["entries"], stats["hits"], stats["misses"]) == (2, 2, 1)
+        cache.clear()
+        assert cache.get("c", "cpu") is None
+
+    def test_load_over_budget_keeps_earlier_entries(self):
+        cache = PatchedWeightCache(2 * 16 * 4)
+        cache.start_load()
+        for name in "abc":
+            cache.put(name, torch.ones(4, 4))
+        assert cache.get("a", "cpu") is not None
+        assert cache.get("c", "cpu") is None
+        cache.start_load()
+        cache.put("c", torch.ones(4, 4))
+        assert cache.get("c", "cpu") is not None
+
+    def test_directory(self, tmp_path):
+        cache = PatchedWeightCache(1 << 20, str(tmp_path))
+        cache.put("aa", torch.zeros(4, 4))
+        cache.flush()
+        cache.max_bytes = 2 * cache.get_stats()["bytes"]
+        for name in ("bb", "cc"):
+            cache.put(name, torch.full((4, 4), float(len(name))))
+            cache.flush()
+        assert cache.get("aa", "cpu") is None
+        assert torch.equal(cache.get("cc", "cpu"), torch.full((4, 4), 2.0))
+        reopened = PatchedWeightCache(1 << 20, str(tmp_path))
+        assert reopened.get_stats()["entries"] == 2
+        assert torch.equal(reopened.get("bb", "cpu"), torch.full((4, 4), 2.0))
+
+
+class _Model(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.a = torch.nn.Linear(4, 4)
+        self.b = torch.nn.Linear(4, 4)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = PatchedWeightCache(1 << 20)
+    monkeypatch.setattr(patched_weight_cache, "patched_weight_cache", cache)
+    return cache
+
+
+class TestModelPatcher:
+    def test_reload_skips_calculate_weight(self, cache, monkeypatch):
+        model = _Model()
+        patches = {"a.weight": _lora(), "b.weight": _lora(), "b.bias": ("diff", (torch.ones(4),))}
+        calculated = []
+        calculate_weight = comfy.lora.calculate_weight
+
+        def counting_calculate_weight(patches, weight, key, *args, **kwargs):
+            calculated.append(key)
+            return calculate_weight(patches, weight, key, *args, **kwargs)
+        monkeypatch.setattr(comfy.lora, "calculate_weight", counting_calculate_weight)
+
+        results = []
+        for _ in range(2):
+            patcher = comfy.model_patcher.ModelPatcher(model, torch.device("cpu"), torch.device("cpu"))
+            patcher.add_patches(patches, 0.5)
+            patcher.load(torch.device("cpu"), full_load=True)
+            results.append({k: v.clone() for k, v in model.state_dict().items()})
+            patcher.unpatch_model(torch.device("cpu"))
+        assert sorted(calculated) == ["a.weight", "b.bias", "b.weight"]
+        assert cache.get_stats()["hits"] == 3
+        for k in results[0]:
+            assert torch.equal(results[0][k], results[1][k])
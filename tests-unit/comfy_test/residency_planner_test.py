@@ -0,0 +1,57 @@
+import math
+
+from comfy.residency_planner import ResidencyPlanner, model_files
+
+
+class _Patcher:
+    def __init__(self, *paths):
+        self.cached_patcher_init = (None, (paths[0] if len(paths) == 1 else list(paths), False))
+
+
+def test_model_files(tmp_path):
+    a, b = str(tmp_path / "a.safetensors"), str(tmp_path / "b.safetensors")
+    assert model_files(_Patcher(a)) == {a}
+    assert model_files(_Patcher(a, b)) == {a, b}
+    assert model_files(object()) == frozenset()
+
+
+def test_evicts_unused_then_farthest_next_use(tmp_path):
+    sdxl, flux, video, old = (_Patcher(str(tmp_path / n)) for n in ("sdxl", "flux", "video", "old"))
+    planner = ResidencyPlanner(lookahead=4)
+    planner.set_upcoming([[str(tmp_path / "flux")], [str(tmp_path / "video")], [str(tmp_path / "sdxl")]])
+    for model in (old, sdxl, video, flux):
+        planner.begin_job("cuda")
+        planner.touch(model)
+    assert planner.next_use(flux) == 0
+    assert planner.next_use(sdxl) == 2
+    assert planner.next_use(old) == math.inf
+    order = sorted([sdxl, flux, video, old], key=planner.eviction_key)
+    assert order == [old, sdxl, video, flux]
+
+
+def test_lru_among_unused(tmp_path):
+    a, b = _Patcher(str(tmp_path / "a")), _Patcher(str(tmp_path / "b"))
+    planner = ResidencyPlanner(lookahead=2)
+    planner.begin_job("cuda")
+    planner.touch(b)
+    planner.begin_job("cuda")
+    planner.touch(a)
+    assert sorted([a, b], key=planner.eviction_key) == [b, a]
+
+
+def test_lookahead_limit(tmp_path):
+    model = _Patcher(str(tmp_path / "a"))
+    planner = ResidencyPlanner(lookahead=1)
+    planner.set_upcoming([[], [], [str(tmp_path / "a")]])
+    assert planner.next_use(model) == math.inf
+
+
+def test_transfers_per_job():
+    planner = ResidencyPlanner(lookahead=1)
+    planner.begin_job("cuda")
+    planner.record_load("cuda", 100)
+    planner.record_unload("cuda", 40)
+    planner.record_load("cuda", 0)
+    assert planner.end_job("cuda") == {"loaded_bytes": 100, "unloaded_bytes": 40}
+    planner.begin_job("cuda")
+    assert planner.end_job("cuda") == {"loaded_bytes": 0, "unloaded_bytes": 0}
@@ -0,0 +1,49 @@
+import pytest
+import torch
+
+import comfy.utils
+
+
+def upscale_nearest(x, scale=2):
+    for d in range(2, x.ndim):
+        x = x.repeat_interleave(scale, dim=d)
+    return x * 0.5 + 0.25
+
+
+class TestTiledScaleMultidim:
+    @pytest.mark.parametrize("tile_batch_size", [1, 3, 64])
+    def test_2d_matches_full(self, tile_batch_size):
+        torch.manual_seed(0)
+        samples = torch.rand(2, 3, 70, 45)
+        out = comfy.utils.tiled_scale(samples, upscale_nearest, tile_x=16, tile_y=16, overlap=4, upscale_amount=2, tile_batch_size=tile_batch_size)
+        assert torch.allclose(out, upscale_nearest(samples), atol=1e-6)
+
+    @pytest.mark.parametrize("tile_batch_size", [1, 4])
+    def test_3d_matches_full(self, tile_batch_size):
+        torch.manual_seed(0)
+        samples = torch.rand(1, 2, 9, 20, 27)
+        out = comfy.utils.tiled_scale_multidim(samples, upscale_nearest, tile=(4, 8, 8), overlap=(1, 2, 2), upscale_amount=2, out_channels=2, tile_batch_size=tile_batch_size)
+        assert torch.allclose(out, upscale_nearest(samples), atol=1e-6)
+
+    def test_batches_same_shaped_tiles(self):
+        calls = []
+
+        def function(x):
+            calls.append(x.shape[0])
+            return upscale_nearest(x)
+
+        samples = torch.rand(1, 3, 64, 64)
+        pbar = type("Bar", (), {"steps": 0, "update": lambda self, n: setattr(self, "steps", self.steps + n)})()
+        comfy.utils.tiled_scale(samples, function, tile_x=16, tile_y=16, overlap=4, upscale_amount=2, tile_batch_size=8, pbar=pbar)
+        steps = comfy.utils.get_tiled_scale_steps(64, 64, 16, 16, 4)
+        assert sum(calls) == steps == pbar.steps
+        assert max(calls) == 8 and len(calls) < steps
+
+    def test_batched_matches_unbatched(self):
+        torch.manual_seed(0)
+        weight = torch.randn(3, 3, 3, 3)
+        function = lambda x: torch.nn.functional.conv2d(x, weight, padding=1)
+        samples = torch.rand(1, 3, 50, 61)
+        unbatched = comfy.utils.tiled_scale(samples, function, tile_x=16, tile_y=16, overlap=4, upscale_amount=1)
+        batched = comfy.utils.tiled_scale(samples, function, tile_x=16, tile_y=16, overlap=4, upscale_amount=1, tile_batch_size=16)
+        assert torch.allclose(unbatched, batched, atol=1e-5)
@@ -0,0 +1,41 @@
+import pytest
+import torch
+
+import comfy.sd
+
+
+class CausalDecoder:
+    """Decodes t latent frames to 4t-3 frames, 8x the size, with a ramp over the output frames so chunk seams differ."""
+
+    def decode(self, x):
+        out = x[:, :3].repeat_interleave(4, dim=2)[:, :, 3:]
+        out = out + 0.01 * torch.arange(out.shape[2], dtype=out.dtype).view(1, 1, -1, 1, 1)
+        return out.repeat_interleave(8, dim=3).repeat_interleave(8, dim=4)
+
+
+@pytest.fixture
+def vae():
+    vae = comfy.sd.VAE.__new__(comfy.sd.VAE)
+    vae.first_stage_model = CausalDecoder()
+    vae.latent_dim = 3
+    vae.output_channels = 3
+    vae.upscale_ratio = (lambda a: max(0, a * 4 - 3), 8, 8)
+    vae.upscale_index_formula = (4, 8, 8)
+    vae.vae_dtype = torch.float32
+    vae.device = torch.device("cpu")
+    vae.output_device = torch.device("cpu")
+    vae.process_output = lambda image: image.add_(1.0).div_(2.0).clamp_(0.0, 1.0)
+    vae.decode = lambda samples: vae.process_output(vae.first_stage_model.decode(samples)).movedim(1, -1)
+    return vae
+
+
+@pytest.mark.parametrize("length,chunk_frames,overlap", [(10, 4, 1), (11, 4, 1), (16, 5, 2), (3, 4, 1)])
+@torch.inference_mode()
+def test_decode_stream_matches_tiled_decode(vae, length, chunk_frames, overlap):
+    samples = torch.rand((2, 4, length, 2, 3)) * 0.5
+    chunks = list(vae.decode_stream(samples, chunk_frames=chunk_frames, overlap_frames=overlap))
+    streamed = torch.cat(chunks)
+    assert streamed.shape[0] == vae.decode_frame_count(samples)
+
+    tiled = vae.decode_tiled_3d(samples, tile_t=chunk_frames, tile_x=64, tile_y=64, overlap=(overlap, 1, 1)).movedim(1, -1)
+    assert torch.allclose(streamed, tiled.reshape((-1,) + tuple(tiled.shape[2:])), atol=1e-6)
@@ -0,0 +1,65 @@
+import pytest
+import torch
+
+import comfy.model_management
+import comfy.sd
+import comfy.vae_memory
+
+
+@pytest.fixture(autouse=True)
+def clear_profiles():
+    comfy.vae_memory.profiles.clear()
+    yield
+    comfy.vae_memory.profiles.clear()
+
+
+class TestFitProfile:
+    def test_linear_fit(self):
+        profile = comfy.vae_memory.fit_profile([(256, 1000 + 256 * 10), (1024, 1000 + 1024 * 10)])
+        scale = comfy.vae_memory.SAFETY_FACTOR
+        assert profile.fixed == pytest.approx(1000 * scale)
+        assert profile.per_element == pytest.approx(10 * scale)
+
+    def test_memory_required_scales_with_batch_and_elements(self):
+        profile = comfy.vae_memory.MemoryProfile(100, 2)
+        assert profile.memory_required((1, 4, 8, 8)) == 100 + 2 * 64
+        assert profile.memory_required((3, 4, 5, 8, 8)) == 100 + 2 * 3 * 5 * 64
+
+    def test_never_negative(self):
+        profile = comfy.vae_memory.fit_profile([(256, 5000), (1024, 4000)])
+        assert profile.per_element == 0
+        assert profile.fixed > 0
+
+
+class TestLargestTile:
+    def test_largest_that_fits(self):
+        assert comfy.vae_memory.largest_tile(lambda size: size * size, 100 * 100, 500, 64, 8) == 96
+
+    def test_whole_input_fits(self):
+        assert comfy.vae_memory.largest_tile(lambda size: size, 1000, 130, 64, 8) == 136
+
+    def test_minimum_if_nothing_fits(self):
+        assert comfy.vae_memory.largest_tile(lambda size: size, 1, 500, 64, 8) == 64
+
+
+def test_profile_is_cached_and_skipped_off_cuda():
+    calls = []
+    result = comfy.vae_memory.profile("key", lambda x: calls.append(x), lambda size: torch.zeros((1, 4, size, size)), torch.device("cpu"))
+    assert result is None
+    assert calls == []
+    assert "key" in comfy.vae_memory.profiles
+
+
+def test_tiled_batch_falls_back_to_single_tiles(monkeypatch):
+    monkeypatch.setattr(comfy.model_management, "soft_empty_cache", lambda: None)
+    vae = comfy.sd.VAE.__new__(comfy.sd.VAE)
+    vae.tile_batch_size = lambda memory_per_tile: 4
+    calls = []
+
+    def tiled(tile_batch_size):
+        calls.append(tile_batch_size)
+        if tile_batch_size > 1:
+            raise comfy.model_management.OOM_EXCEPTION("out of memory")
+        return "output"
+    assert vae.tiled_with_batch_fallback(tiled, 1000) == "output"
+    assert calls == [4, 1]
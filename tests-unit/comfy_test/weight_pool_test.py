@@ -0,0 +1,89 @@
+import gc
+import os
+
+import pytest
+import safetensors.torch
+import torch
+
+from comfy.weight_pool import WeightPool
+
+
+@pytest.fixture
+def model_file(tmp_path):
+    path = str(tmp_path / "model.safetensors")
+    safetensors.torch.save_file({"a": torch.ones(4, 4), "b": torch.zeros(2)}, path, metadata={"format": "pt"})
+    return path
+
+
+@pytest.fixture
+def torch_file(tmp_path):
+    path = str(tmp_path / "model.pt")
+    torch.save({"a": torch.ones(4, 4)}, path)
+    return path
+
+
+class TestWeightPool:
+    def test_tensors_shared_between_loads(self, model_file):
+        pool = WeightPool()
+        sd, metadata = pool.load(model_file, return_metadata=True)
+        sd.pop("a")
+        metadata["format"] = "changed"
+        sd2, metadata2 = pool.load(model_file, return_metadata=True)
+        assert set(sd2) == {"a", "b"} and metadata2 == {"format": "pt"}
+        assert sd2["b"].data_ptr() == sd["b"].data_ptr()
+        stats = pool.get_stats()
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+        assert stats["files"][0]["references"] == 2
+        assert stats["total_ram_bytes"] == 4 * 4 * 4 + 2 * 4
+
+    def test_mmap_files_kept_when_unused(self, model_file):
+        pool = WeightPool()
+        sd = pool.load(model_file)
+        del sd
+        gc.collect()
+        stats = pool.get_stats()
+        assert len(stats["files"]) == 1 and stats["files"][0]["references"] == 0
+        pool.load(model_file)
+        assert pool.get_stats()["hits"] == 1
+
+    def test_other_files_dropped_when_unused(self, torch_file):
+        pool = WeightPool()
+        sd = pool.load(torch_file)
+        assert len(pool.get_stats()["files"]) == 1
+        del sd
+        gc.collect()
+        assert len(pool.get_stats()["files"]) == 0
+        sd = pool.load(torch_file, keep_idle=True)
+        del sd
+        gc.collect()
+        assert len(pool.get_stats()["files"]) == 1
+
+    def test_changed_file_is_reloaded(self, model_file):
+        pool = WeightPool()
+        pool.load(model_file)
+        safetensors.torch.save_file({"c": torch.ones(1)}, model_file)
+        os.utime(model_file, ns=(1, 1))
+        assert set(pool.load(model_file)) == {"c"}
+        stats = pool.get_stats()
+        assert stats["misses"] == 2 and len(stats["files"]) == 1
+
+    def test_ram_release_and_clear(self, model_file, torch_file):
+        pool = WeightPool()
+        in_use = pool.load(torch_file)
+        pool.load(model_file)
+        gc.collect()
+        assert pool.ram_release(0) == 0
+        assert pool.ram_release(1 << 62) == 4 * 4 * 4 + 2 * 4
+        assert [f["references"] for f in pool.get_stats()["files"]] == [1]
+        pool.clear()
+        assert pool.get_stats()["evictions"] == 1
+        assert in_use["a"].sum() == 16
+
+    def test_release_idle_keeps_mmap_files(self, model_file, torch_file):
+        pool = WeightPool()
+        pool.load(torch_file, keep_idle=True)
+        pool.load(model_file)
+        gc.collect()
+        assert len(pool.get_stats()["files"]) == 2
+        assert pool.release_idle() == 4 * 4 * 4
+        assert [os.path.basename(f["path"]) for f in pool.get_stats()["files"]] == ["model.safetensors"]
@@ -0,0 +1,80 @@
+"""
+Unit tests for the caching of preview models in latent_preview.get_previewer().
+"""
+import pytest
+import torch
+from comfy.cli_args import args, LatentPreviewMethod
+import latent_preview
+
+
+class FakeTAESD:
+    loads = 0
+
+    def __init__(self, encoder_path, decoder_path, latent_channels=4):
+        FakeTAESD.loads += 1
+        self.latent_channels = latent_channels
+
+    def to(self, device):
+        return self
+
+
+class FakeLatentFormat:
+    taesd_decoder_name = "taesd_decoder"
+    latent_channels = 4
+    latent_rgb_factors = None
+    latent_rgb_factors_bias = None
+    latent_rgb_factors_reshape = None
+
+
+@pytest.fixture
+def fake_taesd(monkeypatch):
+    FakeTAESD.loads = 0
+    monkeypatch.setattr(latent_preview, "TAESD", FakeTAESD)
+    monkeypatch.setattr(latent_preview.folder_paths, "get_filename_list", lambda folder: ["taesd_decoder.safetensors"])
+    monkeypatch.setattr(latent_preview.folder_paths, "get_full_path", lambda folder, name: "/models/vae_approx/" + name)
+    monkeypatch.setattr(latent_preview, "preview_models", {})
+    original = args.preview_method
+    args.preview_method = LatentPreviewMethod.TAESD
+    yield
+    args.preview_method = original
+
+
+def test_taesd_loaded_once_per_format_and_device(fake_taesd):
+    first = latent_preview.get_previewer(torch.device("cpu"), FakeLatentFormat())
+    second = latent_preview.get_previewer(torch.device("cpu"), FakeLatentFormat())
+    assert FakeTAESD.loads == 1
+    assert first.taesd is second.taesd
+
+    other_format = FakeLatentFormat()
+    other_format.latent_channels = 16
+    latent_preview.get_previewer(torch.device("cpu"), other_format)
+    assert FakeTAESD.loads == 2
+
+
+def test_async_previewer_keeps_newest_result():
+    previewer = latent_preview.AsyncPreviewer.__new__(latent_preview.AsyncPreviewer)
+    previewer.result = ("JPEG", "image", 512)
+    assert previewer.take() == ("JPEG", "image", 512)
+    assert previewer.take() is None
+
+
+def test_clear_preview_models(fake_taesd):
+    latent_preview.get_previewer(torch.device("cpu"), FakeLatentFormat())
+    latent_preview.clear_preview_models()
+    latent_preview.get_previewer(torch.device("cpu"), FakeLatentFormat())
+    assert FakeTAESD.loads == 2
+
+
+def test_async_previewer_finish_decodes_last_step(monkeypatch):
+    class Previewer:
+        def decode_latent_to_preview_image(self, preview_format, x0):
+            return (preview_format, x0, 512)
+
+    previewer = latent_preview.AsyncPreviewer.__new__(latent_preview.AsyncPreviewer)
+    previewer.previewer = Previewer()
+    previewer.preview_format = "JPEG"
+    previewer.result = ("JPEG", "older", 512)
+    monkeypatch.setattr(latent_preview.AsyncPreviewer, "job", (previewer, "queued", None))
+    assert previewer.finish("last") == ("JPEG", "last", 512)
+    assert latent_preview.AsyncPreviewer.job is None
+    assert previewer.take() is None
@@ -0,0 +1,135 @@
+"""Tests for the Merkle-style input signatures used as output cache keys."""
+
+import pytest
+
+import nodes
+from comfy_execution.caching import CacheKeySetInputSignature, Unhashable
+from comfy_execution.graph import DynamicPrompt
+
+
+class _Node:
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {"required": {}}
+
+
+class _NotIdempotentNode(_Node):
+    NOT_IDEMPOTENT = True
+
+
+class _IsChanged:
+    def __init__(self, values=None):
+        self.values = values or {}
+
+    async def get(self, node_id):
+        return self.values.get(node_id, False)
+
+
+@pytest.fixture(autouse=True)
+def fake_nodes(monkeypatch):
+    monkeypatch.setitem(nodes.NODE_CLASS_MAPPINGS, "SigTestNode", _Node)
+    monkeypatch.setitem(nodes.NODE_CLASS_MAPPINGS, "SigTestNotIdempotent", _NotIdempotentNode)
+
+
+def _node(inputs, class_type="SigTestNode"):
+    return {"class_type": class_type, "inputs": inputs}
+
+
+async def _keys(prompt, is_changed=None):
+    dynprompt = DynamicPrompt(prompt)
+    key_set = CacheKeySetInputSignature(dynprompt, list(prompt.keys()), is_changed or _IsChanged())
+    await key_set.add_keys(list(prompt.keys()))
+    return key_set
+
+
+def _chain():
+    return {
+        "1": _node({"seed": 1}),
+        "2": _node({"a": ["1", 0], "text": "hello"}),
+        "3": _node({"a": ["2", 0], "b": ["1", 0]}),
+    }
+
+
+class TestCacheKeySetInputSignature:
+    @pytest.mark.asyncio
+    async def test_keys_stable_across_prompts(self):
+        first = await _keys(_chain())
+        second = await _keys(_chain())
+        for node_id in ("1", "2", "3"):
+            assert first.get_data_key(node_id) == second.get_data_key(node_id)
+
+    @pytest.mark.asyncio
+    async def test_upstream_change_propagates(self):
+        first = await _keys(_chain())
+        changed = _chain()
+        changed["1"]["inputs"]["seed"] = 2
+        second = await _keys(changed)
+        for node_id in ("1", "2", "3"):
+            assert first.get_data_key(node_id) != second.get_data_key(node_id)
+
+    @pytest.mark.asyncio
+    async def test_downstream_change_does_not_affect_ancestors(self):
+        first = await _keys(_chain())
+        changed = _chain()
+        changed["3"]["inputs"]["c"] = 5
+        second = await _keys(changed)
+        assert first.get_data_key("1") == second.get_data_key("1")
+        assert first.get_data_key("2") == second.get_data_key("2")
+        assert first.get_data_key("3") != second.get_data_key("3")
+
+    @pytest.mark.asyncio
+    async def test_identical_subgraphs_share_keys(self):
+        prompt = {
+            "1": _node({"seed": 1}),
+            "2": _node({"a": ["1", 0]}),
+            "10": _node({"seed": 1}),
+            "20": _node({"a": ["10", 0]}),
+        }
+        key_set = await _keys(prompt)
+        assert key_set.get_data_key("2") == key_set.get_data_key("20")
+
+    @pytest.mark.asyncio
+    async def test_output_socket_is_part_of_key(self):
+        first = await _keys({"1": _node({}), "2": _node({"a": ["1", 0]})})
+        second = await _keys({"1": _node({}), "2": _node({"a": ["1", 1]})})
+        assert first.get_data_key("2") != second.get_data_key("2")
+
+    @pytest.mark.asyncio
+    async def test_not_idempotent_includes_node_id(self):
+        prompt = {
+            "1": _node({}, "SigTestNotIdempotent"),
+            "2": _node({}, "SigTestNotIdempotent"),
+        }
+        key_set = await _keys(prompt)
+        assert key_set.get_data_key("1") != key_set.get_data_key("2")
+
+    @pytest.mark.asyncio
+    async def test_nan_is_changed_is_never_cached(self):
+        is_changed = _IsChanged({"1": float("NaN")})
+        first = await _keys(_chain(), is_changed)
+        second = await _keys(_chain(), is_changed)
+        for node_id in ("1", "2", "3"):
+            assert isinstance(first.get_data_key(node_id), Unhashable)
+            assert first.get_data_key(node_id) != second.get_data_key(node_id)
+
+    @pytest.mark.asyncio
+    async def test_missing_ancestor_is_never_cached(self):
+        key_set = await _keys({"2": _node({"a": ["missing", 0]})})
+        assert isinstance(key_set.get_data_key("2"), Unhashable)
+
+    @pytest.mark.asyncio
+    async def test_cycle_does_not_hang(self):
+        key_set = await _keys({
+            "1": _node({"a": ["2", 0]}),
+            "2": _node({"a": ["1", 0]}),
+        })
+        assert isinstance(key_set.get_data_key("1"), Unhashable)
+        assert isinstance(key_set.get_data_key("2"), Unhashable)
+
+    @pytest.mark.asyncio
+    async def test_deep_chain(self):
+        prompt = {"0": _node({"seed": 0})}
+        for i in range(1, 5000):
+            prompt[str(i)] = _node({"a": [str(i - 1), 0]})
+        key_set = await _keys(prompt)
+        assert isinstance(key_set.get_data_key("4999"), str)
@@ -0,0 +1,112 @@
+"""Tests for the local disk cache provider."""
+
+import asyncio
+import os
+
+import pytest
+import torch
+
+import nodes
+from comfy_execution.cache_provider import CacheContext, CacheValue
+from comfy_execution.disk_cache import DiskCacheProvider, encode_outputs, decode_outputs, _Unserializable
+
+
+class _Node:
+    pass
+
+
+class _OutputNode:
+    OUTPUT_NODE = True
+
+
+@pytest.fixture(autouse=True)
+def fake_nodes(monkeypatch):
+    monkeypatch.setitem(nodes.NODE_CLASS_MAPPINGS, "DiskCacheTestNode", _Node)
+    monkeypatch.setitem(nodes.NODE_CLASS_MAPPINGS, "DiskCacheTestOutput", _OutputNode)
+
+
+def _context(key, class_type="DiskCacheTestNode"):
+    return CacheContext(node_id="1", class_type=class_type, cache_key_hash=key)
+
+
+def _store(provider, key, outputs, ui=None):
+    asyncio.run(provider.on_store(_context(key), CacheValue(outputs=outputs, ui=ui)))
+    provider.flush()
+
+
+def _lookup(provider, key):
+    return asyncio.run(provider.on_lookup(_context(key)))
+
+
+class TestEncodeOutputs:
+    def test_roundtrip_nested_structures(self):
+        latent = {"samples": torch.randn(1, 4, 8, 8), "batch_index": [0]}
+        conditioning = [[torch.randn(1, 77, 16), {"pooled_output": torch.randn(1, 16)}]]
+        outputs = [[latent], [conditioning], [("a", 1, 2.5, None, True)]]
+        structure, tensors = encode_outputs(outputs)
+        decoded = decode_outputs(structure, tensors)
+        assert torch.equal(decoded[0][0]["samples"], latent["samples"])
+        assert decoded[0][0]["batch_index"] == [0]
+        assert torch.equal(decoded[1][0][0][1]["pooled_output"], conditioning[0][1]["pooled_output"])
+        assert decoded[2][0] == ("a", 1, 2.5, None, True)
+
+    def test_shared_tensor_stored_once(self):
+        t = torch.zeros(4)
+        _, tensors = encode_outputs([[t], [t]])
+        assert len(tensors) == 1
+
+    def test_unserializable_object_raises(self):
+        with pytest.raises(_Unserializable):
+            encode_outputs([[object()]])
+
+
+class TestDiskCacheProvider:
+    def test_store_and_lookup(self, tmp_path):
+        provider = DiskCacheProvider(str(tmp_path), 1024 ** 3)
+        image = torch.rand(1, 8, 8, 3)
+        _store(provider, "ab" * 32, [[image]], ui={"text": ["hi"]})
+        result = _lookup(provider, "ab" * 32)
+        assert torch.equal(result.outputs[0][0], image)
+        assert result.ui == {"text": ["hi"]}
+
+    def test_miss_returns_none(self, tmp_path):
+        provider = DiskCacheProvider(str(tmp_path), 1024 ** 3)
+        assert _lookup(provider, "cd" * 32) is None
+
+    def test_survives_new_instance(self, tmp_path):
+        provider = DiskCacheProvider(str(tmp_path), 1024 ** 3)
+        image = torch.rand(1, 8, 8, 3)
+        _store(provider, "ef" * 32, [[image]])
+        restarted = DiskCacheProvider(str(tmp_path), 1024 ** 3)
+        assert restarted.stats()["entries"] == 1
+        assert torch.equal(_lookup(restarted, "ef" * 32).outputs[0][0], image)
+
+    def test_lru_eviction_respects_budget(self, tmp_path):
+        tensor = torch.zeros(256 * 1024, dtype=torch.uint8)
+        provider = DiskCacheProvider(str(tmp_path), int(2.5 * tensor.numel()))
+        _store(provider, "01" * 32, [[tensor]])
+        _store(provider, "02" * 32, [[tensor]])
+        assert _lookup(provider, "01" * 32) is not None
+        _store(provider, "03" * 32, [[tensor]])
+        assert provider.stats()["bytes"] <= provider.max_bytes
+        assert _lookup(provider, "02" * 32) is None
+        assert _lookup(provider, "01" * 32) is not None
+        assert _lookup(provider, "03" * 32) is not None
+
+    def test_unserializable_outputs_are_skipped(self, tmp_path):
+        provider = DiskCacheProvider(str(tmp_path), 1024 ** 3)
+        _store(provider, "aa" * 32, [[object()]])
+        assert provider.stats()["entries"] == 0
+
+    def test_output_nodes_are_not_cached(self, tmp_path):
+        provider = DiskCacheProvider(str(tmp_path), 1024 ** 3)
+        assert provider.should_cache(_context("bb" * 32))
+        assert not provider.should_cache(_context("bb" * 32, "DiskCacheTestOutput"))
+
+    def test_corrupt_entry_is_dropped(self, tmp_path):
+        provider = DiskCacheProvider(str(tmp_path), 1024 ** 3)
+        _store(provider, "cc" * 32, [[torch.zeros(4)]])
+        with open(provider._path("cc" * 32), "wb") as f:
+            f.write(b"garbage")
+        assert _lookup(provider, "cc" * 32) is None
+        assert not os.path.exists(provider._path("cc" * 32))
@@ -0,0 +1,106 @@
+"""Tests for the queue driven model file prefetcher."""
+
+import safetensors.torch
+import torch
+import pytest
+
+import comfy.weight_pool
+import folder_paths
+from comfy_execution import file_prefetch
+from comfy_execution.file_prefetch import FilePrefetcher, get_prompt_model_paths
+from execution import PromptQueue
+
+
+class _Server:
+    def queue_updated(self):
+        pass
+
+
+def _item(number, prompt_id, ckpt_name):
+    prompt = {"1": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": ckpt_name}}}
+    return (number, prompt_id, prompt, {}, ["1"], {})
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    monkeypatch.setitem(folder_paths.folder_names_and_paths, "checkpoints", ([str(tmp_path)], {".safetensors"}))
+    monkeypatch.setattr(folder_paths, "filename_index", None)
+    for name in ("a", "b", "c"):
+        safetensors.torch.save_file({"w": torch.zeros(256)}, str(tmp_path / "{}.safetensors".format(name)))
+    return tmp_path
+
+
+@pytest.fixture
+def warmed(monkeypatch):
+    warmed = []
+    monkeypatch.setattr(comfy.weight_pool, "is_mmap_backed", lambda path: True)
+    monkeypatch.setattr(file_prefetch.comfy.model_prefetch, "warm_file", lambda path, should_stop=None: warmed.append(path) or True)
+    return warmed
+
+
+def test_prompt_model_paths(model_dir):
+    prompt = {"1": {"inputs": {"ckpt_name": "b.safetensors", "seed": 1}}, "2": {"inputs": {"name": "missing.safetensors", "other": "b.safetensors"}}}
+    assert get_prompt_model_paths(prompt) == [str(model_dir / "b.safetensors")]
+
+
+def test_prefetches_lookahead_in_queue_order(model_dir, warmed):
+    q = PromptQueue(_Server())
+    for i, name in enumerate(["a", "b", "c"]):
+        q.put(_item(i, str(i), "{}.safetensors".format(name)))
+    prefetcher = FilePrefetcher(q, 2, 1 << 30)
+    prefetcher.update()
+    assert warmed == [str(model_dir / "a.safetensors"), str(model_dir / "b.safetensors")]
+
+    prefetcher.update()
+    assert len(warmed) == 2
+
+    q.get()
+    prefetcher.update()
+    assert warmed[2:] == [str(model_dir / "c.safetensors")]
+    assert set(prefetcher.get_stats()["files"]) == {str(model_dir / "{}.safetensors".format(n)) for n in "abc"}
+
+
+def test_ram_budget(model_dir, warmed):
+    q = PromptQueue(_Server())
+    for i, name in enumerate(["a", "b"]):
+        q.put(_item(i, str(i), "{}.safetensors".format(name)))
+    size = (model_dir / "a.safetensors").stat().st_size
+    prefetcher = FilePrefetcher(q, 2, size)
+    prefetcher.update()
+    assert warmed == [str(model_dir / "a.safetensors")]
+
+
+def test_ram_loaded_files_held_in_pool(model_dir, monkeypatch):
+    monkeypatch.setattr(comfy.weight_pool, "is_mmap_backed", lambda path: False)
+    pool = comfy.weight_pool.WeightPool()
+    monkeypatch.setattr(comfy.weight_pool, "weight_pool", pool)
+    q = PromptQueue(_Server())
+    q.put(_item(0, "0", "a.safetensors"))
+    prefetcher = FilePrefetcher(q, 1, 1 << 30)
+    prefetcher.update()
+    assert pool.get_stats()["misses"] == 1
+
+    comfy.weight_pool.load_torch_file(str(model_dir / "a.safetensors"))
+    assert pool.get_stats()["hits"] == 1
+
+    item, item_id = q.get()
+    q.task_done(item_id, {}, None)
+    prefetcher.update()
+    assert prefetcher.get_stats()["held_files"] == []
+
+
+def test_files_of_unpooled_folders_are_warmed(model_dir, warmed, monkeypatch):
+    monkeypatch.setattr(comfy.weight_pool, "is_mmap_backed", lambda path: False)
+    upscale_dir = model_dir / "upscale_models"
+    upscale_dir.mkdir()
+    monkeypatch.setitem(folder_paths.folder_names_and_paths, "upscale_models", ([str(upscale_dir)], {".pth"}))
+    (upscale_dir / "up.pth").write_bytes(b"0" * 64)
+    pool = comfy.weight_pool.WeightPool()
+    monkeypatch.setattr(comfy.weight_pool, "weight_pool", pool)
+    q = PromptQueue(_Server())
+    q.put((0, "0", {"1": {"class_type": "UpscaleModelLoader", "inputs": {"model_name": "up.pth"}}}, {}, ["1"], {}))
+    prefetcher = FilePrefetcher(q, 1, 1 << 30)
+    prefetcher.update()
+    assert warmed == [str(upscale_dir / "up.pth")]
+    assert pool.get_stats()["misses"] == 0
+    assert prefetcher.get_stats()["held_files"] == []
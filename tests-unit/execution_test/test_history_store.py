@@ -0,0 +1,140 @@
+"""Tests for the prompt history stores and cursor paging of /api/jobs."""
+
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from app.database.models import Base
+from app.job_history import DatabaseHistoryStore
+from comfy_execution.history import HistoryStore
+from comfy_execution.jobs import JobStatus, decode_job_cursor, get_jobs_page
+
+
+def _entry(create_time, status_str="success", workflow_id=None):
+    extra_data = {"create_time": create_time}
+    if workflow_id is not None:
+        extra_data["extra_pnginfo"] = {"workflow": {"id": workflow_id}}
+    return {
+        "prompt": (0, "unused", {}, extra_data, []),
+        "outputs": {},
+        "status": {"status_str": status_str, "completed": status_str == "success", "messages": []},
+        "meta": {},
+    }
+
+
+@pytest.fixture
+def db_session(monkeypatch):
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+
+    @contextmanager
+    def _create_session():
+        with Session(engine) as session:
+            yield session
+
+    monkeypatch.setattr("app.job_history.create_session", _create_session)
+    return _create_session
+
+
+@pytest.fixture(params=["memory", "database"])
+def store_factory(request):
+    if request.param == "memory":
+        return HistoryStore
+    request.getfixturevalue("db_session")
+    return DatabaseHistoryStore
+
+
+class TestHistoryStore:
+    def test_keeps_most_recent(self, store_factory):
+        store = store_factory(3)
+        for i in range(6):
+            store.add(str(i), _entry(i))
+        history = store.list()
+        assert list(history)[-1] == "5"
+        assert len(history) <= 4
+        assert store.get("0") is None
+        assert store.get("5")["prompt"][3] == {"create_time": 5}
+
+    def test_list_offset_max_items_before(self, store_factory):
+        store = store_factory(100)
+        for i in range(10):
+            store.add(str(i), _entry(i))
+        assert list(store.list(max_items=3)) == ["7", "8", "9"]
+        assert list(store.list(max_items=2, offset=1)) == ["1", "2"]
+        assert list(store.list(offset=8)) == ["8", "9"]
+        assert list(store.list(offset=100)) == []
+        assert list(store.list(max_items=3, before="5")) == ["2", "3", "4"]
+        assert store.list(before="missing") == {}
+
+    def test_delete_and_clear(self, store_factory):
+        store = store_factory(100)
+        store.add("a", _entry(1))
+        store.add("b", _entry(2))
+        store.delete("a")
+        assert list(store.list()) == ["b"]
+        store.clear()
+        assert store.list() == {}
+
+    def test_readding_moves_to_end(self, store_factory):
+        store = store_factory(100)
+        store.add("a", _entry(1))
+        store.add("b", _entry(2))
+        store.add("a", _entry(3))
+        assert list(store.list()) == ["b", "a"]
+
+    def test_query_jobs_filters_and_pages(self, store_factory):
+        store = store_factory(100)
+        for i in range(6):
+            store.add(str(i), _entry(i * 10, "success" if i % 2 else "error", workflow_id="w" if i < 4 else None))
+        jobs, total = store.query_jobs([JobStatus.COMPLETED])
+        assert total == 3
+        assert [j["id"] for j in jobs] == ["5", "3", "1"]
+        jobs, total = store.query_jobs([JobStatus.COMPLETED, JobStatus.FAILED], workflow_id="w", sort_order="asc", limit=2)
+        assert total == 4
+        assert [j["id"] for j in jobs] == ["0", "1"]
+        jobs, _ = store.query_jobs([JobStatus.COMPLETED, JobStatus.FAILED], after=(30, "3"))
+        assert [j["id"] for j in jobs] == ["2", "1", "0"]
+
+
+class TestDatabaseHistoryStore:
+    def test_survives_restart(self, db_session):
+        DatabaseHistoryStore(10).add("a", _entry(1))
+        assert DatabaseHistoryStore(10).get("a")["status"]["status_str"] == "success"
+
+
+class TestJobsCursor:
+    def test_pages_cover_all_jobs_once(self, store_factory):
+        store = store_factory(100)
+        # Several jobs share a create_time so the cursor has to break ties.
+        for i in range(25):
+            store.add("job-{:02}".format(i), _entry(i // 3))
+        running = [(0, "running", {}, {"create_time": 100}, [])]
+        queued = [(1, "queued", {}, {"create_time": 101}, [])]
+
+        seen = []
+        cursor = None
+        while True:
+            jobs, total, cursor = get_jobs_page(running, queued, store, limit=4, cursor=cursor)
+            assert total == 27
+            seen += [j["id"] for j in jobs]
+            if cursor is None:
+                break
+        assert seen[:2] == ["queued", "running"]
+        assert len(seen) == len(set(seen)) == 27
+
+    def test_offset_without_cursor(self):
+        store = HistoryStore(100)
+        for i in range(5):
+            store.add(str(i), _entry(i))
+        jobs, total, cursor = get_jobs_page([], [], store, sort_order="asc", limit=2, offset=2)
+        assert [j["id"] for j in jobs] == ["2", "3"]
+        assert decode_job_cursor(cursor) == (3, "3")
+        jobs, _, cursor = get_jobs_page([], [], store, sort_order="asc", limit=2, offset=4)
+        assert [j["id"] for j in jobs] == ["4"] and cursor is None
+
+    def test_invalid_cursor(self):
+        with pytest.raises(ValueError):
+            get_jobs_page([], [], HistoryStore(10), limit=2, cursor="not-a-cursor")
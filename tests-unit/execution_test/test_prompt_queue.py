@@ -0,0 +1,144 @@
+"""Tests for the indexed PromptQueue and its versioned snapshots."""
+
+import execution
+from execution import PromptQueue
+
+
+class _Server:
+    def __init__(self):
+        self.updates = 0
+
+    def queue_updated(self):
+        self.updates += 1
+
+
+def _item(number, prompt_id):
+    return (number, prompt_id, {"1": {"class_type": "Test", "inputs": {}}}, {"create_time": number}, ["1"], {})
+
+
+def _ids(items):
+    return [x[1] for x in items]
+
+
+class TestPromptQueue:
+    def test_runs_in_number_order(self):
+        q = PromptQueue(_Server())
+        for number, prompt_id in [(2, "c"), (0, "a"), (1, "b"), (-1, "front")]:
+            q.put(_item(number, prompt_id))
+        assert _ids(q.get_current_queue()[1]) == ["front", "a", "b", "c"]
+        assert [q.get()[0][1] for _ in range(4)] == ["front", "a", "b", "c"]
+
+    def test_records_are_shared_not_copied(self):
+        q = PromptQueue(_Server())
+        item = _item(0, "a")
+        q.put(item)
+        assert q.get_current_queue()[1][0] is item
+        taken, _ = q.get()
+        assert taken is item
+        assert q.get_current_queue()[0][0] is item
+
+    def test_delete_by_id(self):
+        q = PromptQueue(_Server())
+        for i in range(5):
+            q.put(_item(i, str(i)))
+        assert q.delete_queue_item_by_id("2")
+        assert not q.delete_queue_item_by_id("2")
+        assert not q.delete_queue_item_by_id("missing")
+        assert q.delete_queue_item(lambda a: a[1] == "4")
+        assert q.get_tasks_remaining() == 3
+        assert [q.get()[0][1] for _ in range(3)] == ["0", "1", "3"]
+        assert q.get(timeout=0) is None
+
+    def test_deleted_entries_are_compacted(self):
+        q = PromptQueue(_Server())
+        for i in range(1000):
+            q.put(_item(i, str(i)))
+        for i in range(999):
+            q.delete_queue_item_by_id(str(i))
+        assert len(q.queue) < 100
+        assert q.get()[0][1] == "999"
+
+    def test_duplicate_prompt_ids(self):
+        q = PromptQueue(_Server())
+        q.put(_item(0, "a"))
+        q.put(_item(1, "a"))
+        assert q.get_tasks_remaining() == 2
+        assert q.delete_queue_item_by_id("a")
+        assert q.delete_queue_item_by_id("a")
+        assert q.get_tasks_remaining() == 0
+
+    def test_delete_matching_duplicate(self):
+        q = PromptQueue(_Server())
+        first = _item(0, "a")
+        second = _item(1, "a")
+        q.put(first)
+        q.put(second)
+        version = q.get_snapshot().version
+        assert q.delete_queue_item(lambda a: a is first)
+        assert q.get_current_queue()[1] == [second]
+        assert q.get_queue_changes(version)[1] == [("a", "pending", second)]
+        assert q.delete_queue_item(lambda a: a is second)
+        assert q.get_queue_changes(version)[1] == [("a", "removed", None)]
+
+    def test_interrupt_if_running(self, monkeypatch):
+        interrupts = []
+        monkeypatch.setattr("nodes.interrupt_processing", lambda value=True, device=None: interrupts.append(device))
+        q = PromptQueue(_Server())
+        q.put(_item(0, "a"))
+        q.put(_item(1, "b"))
+        _, item_id = q.get()
+        assert not q.interrupt_if_running("b")
+        assert q.interrupt_if_running("a")
+        q.task_done(item_id, {}, None)
+        assert not q.interrupt_if_running("a")
+        assert interrupts == [None]
+        assert "a" in q.get_history()
+
+    def test_wipe_queue_keeps_running(self):
+        q = PromptQueue(_Server())
+        for i in range(3):
+            q.put(_item(i, str(i)))
+        q.get()
+        q.wipe_queue()
+        running, pending = q.get_current_queue()
+        assert _ids(running) == ["0"] and pending == []
+        assert q.get_tasks_remaining() == 1
+
+
+class TestQueueSnapshots:
+    def test_snapshot_reused_until_changed(self):
+        q = PromptQueue(_Server())
+        q.put(_item(0, "a"))
+        first = q.get_snapshot()
+        assert q.get_snapshot() is first
+        q.put(_item(1, "b"))
+        second = q.get_snapshot()
+        assert second.version > first.version
+        assert _ids(second.pending) == ["a", "b"]
+
+    def test_incremental_changes(self):
+        q = PromptQueue(_Server())
+        q.put(_item(0, "a"))
+        version = q.get_snapshot().version
+        assert q.get_queue_changes(version) == (version, [])
+
+        q.put(_item(1, "b"))
+        _, item_id = q.get()
+        q.delete_queue_item_by_id("b")
+        new_version, changes = q.get_queue_changes(version)
+        assert new_version == q.get_snapshot().version
+        assert [(prompt_id, status) for prompt_id, status, _ in changes] == [("a", "running"), ("b", "removed")]
+        assert changes[0][2][1] == "a" and changes[1][2] is None
+
+        q.task_done(item_id, {}, None)
+        _, changes = q.get_queue_changes(new_version)
+        assert [(prompt_id, status) for prompt_id, status, _ in changes] == [("a", "removed")]
+
+    def test_changes_too_old_or_unknown(self, monkeypatch):
+        monkeypatch.setattr(execution, "QUEUE_CHANGE_LOG_SIZE", 4)
+        q = PromptQueue(_Server())
+        for i in range(10):
+            q.put(_item(i, str(i)))
+        assert q.get_queue_changes(0) is None
+        assert q.get_queue_changes(q.version + 5) is None
+        assert len(q.get_queue_changes(q.version - 4)[1]) == 4
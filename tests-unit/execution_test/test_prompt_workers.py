@@ -0,0 +1,140 @@
+"""Tests for running several prompt workers (--gpu-workers) off one PromptQueue."""
+
+import threading
+
+import pytest
+import torch
+
+import comfy.model_management
+import comfy.model_patcher
+from execution import PROMPT_AFFINITY_LOOKAHEAD, PromptQueue, get_prompt_model_files
+
+
+class _Server:
+    def queue_updated(self):
+        pass
+
+
+def _item(number, prompt_id, ckpt_name):
+    prompt = {"1": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": ckpt_name}}}
+    return (number, prompt_id, prompt, {}, [], {})
+
+
+def _affinity(model_files):
+    return lambda item: len(model_files & get_prompt_model_files(item[2]))
+
+
+class TestPromptModelFiles:
+    def test_collects_model_widget_values(self):
+        prompt = {
+            "1": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "sdxl/base.safetensors"}},
+            "2": {"class_type": "LoraLoader", "inputs": {"lora_name": "detail.SAFETENSORS", "model": ["1", 0], "strength_model": 1.0}},
+            "3": {"class_type": "CLIPTextEncode", "inputs": {"text": "a photo", "clip": ["2", 1]}},
+        }
+        assert get_prompt_model_files(prompt) == {"sdxl/base.safetensors", "detail.SAFETENSORS"}
+
+
+class TestPromptQueueAffinity:
+    def test_without_affinity_takes_oldest(self):
+        q = PromptQueue(_Server())
+        q.put(_item(1, "b", "b.safetensors"))
+        q.put(_item(0, "a", "a.safetensors"))
+        item, _ = q.get()
+        assert item[1] == "a"
+
+    def test_prefers_matching_models(self):
+        q = PromptQueue(_Server())
+        q.put(_item(0, "a", "a.safetensors"))
+        q.put(_item(1, "b", "b.safetensors"))
+        q.put(_item(2, "c", "a.safetensors"))
+        item, _ = q.get(affinity=_affinity({"b.safetensors"}))
+        assert item[1] == "b"
+        assert [x[1] for x in q.get_current_queue()[1]] == ["a", "c"]
+        item, _ = q.get(affinity=_affinity({"b.safetensors"}))
+        assert item[1] == "a"
+
+    def test_oldest_prompt_is_not_starved(self):
+        q = PromptQueue(_Server())
+        q.put(_item(0, "old", "a.safetensors"))
+        for i in range(1, 20):
+            q.put(_item(i, str(i), "b.safetensors"))
+        taken = []
+        for _ in range(PROMPT_AFFINITY_LOOKAHEAD + 1):
+            taken.append(q.get(affinity=_affinity({"b.safetensors"}))[0][1])
+        assert taken[-1] == "old"
+
+    def test_interrupt_targets_worker_device(self, monkeypatch):
+        interrupts = []
+        monkeypatch.setattr("nodes.interrupt_processing", lambda value=True, device=None: interrupts.append(device))
+        q = PromptQueue(_Server())
+        q.put(_item(0, "a", "a.safetensors"))
+        q.put(_item(1, "b", "b.safetensors"))
+        q.get(device="cuda:0")
+        q.get(device="cuda:1")
+        assert q.interrupt_if_running("b")
+        assert interrupts == ["cuda:1"]
+
+    def test_flags_reach_every_worker(self):
+        q = PromptQueue(_Server())
+        q.get(timeout=0, device="cuda:0")
+        q.get(timeout=0, device="cuda:1")
+        q.set_flag("free_memory", True)
+        assert q.get_flags(device="cuda:0") == {"free_memory": True}
+        assert q.get_flags(device="cuda:0") == {}
+        assert q.get_flags(device="cuda:1") == {"free_memory": True}
+
+
+class TestDeviceInterrupts:
+    @pytest.fixture(autouse=True)
+    def worker_devices(self, monkeypatch):
+        monkeypatch.setattr(comfy.model_management, "interrupt_processing_devices", {})
+        monkeypatch.setattr(comfy.model_management, "interrupt_processing", False)
+        monkeypatch.setattr(comfy.model_management, "get_torch_device", lambda: torch.device("cuda", 0))
+        comfy.model_management.register_interrupt_device(torch.device("cuda", 0))
+        comfy.model_management.register_interrupt_device(torch.device("cuda", 1))
+
+    def test_other_device_interrupt_is_ignored(self):
+        comfy.model_management.interrupt_current_processing(True, torch.device("cuda", 1))
+        assert not comfy.model_management.processing_interrupted()
+        comfy.model_management.throw_exception_if_processing_interrupted()
+
+    def test_own_device_interrupt(self):
+        comfy.model_management.interrupt_current_processing(True, torch.device("cuda", 0))
+        with pytest.raises(comfy.model_management.InterruptProcessingException):
+            comfy.model_management.throw_exception_if_processing_interrupted()
+        assert not comfy.model_management.processing_interrupted()
+
+    def test_global_interrupt_reaches_all_workers(self):
+        comfy.model_management.interrupt_current_processing(True)
+        assert comfy.model_management.processing_interrupted()
+        assert comfy.model_management.interrupt_processing_devices[torch.device("cuda", 1)]
+        comfy.model_management.interrupt_current_processing(False, torch.device("cuda", 0))
+        assert not comfy.model_management.processing_interrupted()
+        assert comfy.model_management.interrupt_processing_devices[torch.device("cuda", 1)]
+
+
+class TestDeviceLoading:
+    def test_devices_load_at_the_same_time(self, monkeypatch):
+        mm = comfy.model_management
+        monkeypatch.setattr(mm, "current_loaded_models", [])
+        monkeypatch.setattr(mm, "device_loading_locks", {})
+        monkeypatch.setattr(mm, "get_free_memory", lambda dev=None, torch_free_too=False: (1 << 40, 1 << 40) if torch_free_too else 1 << 40)
+        monkeypatch.setattr(mm, "soft_empty_cache", lambda *args, **kwargs: None)
+        both_loading = threading.Barrier(2, timeout=10)
+        monkeypatch.setattr(mm.LoadedModel, "model_load", lambda self, lowvram_model_memory=0, force_patch_weights=False: both_loading.wait())
+
+        patchers = [comfy.model_patcher.ModelPatcher(torch.nn.Linear(2, 2), torch.device("cuda", i), torch.device("cpu")) for i in range(2)]
+        errors = []
+
+        def load(patcher):
+            try:
+                mm.load_models_gpu([patcher])
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=load, args=(p,)) for p in patchers]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert errors == []
+        assert sorted(m.device.index for m in mm.current_loaded_models) == [0, 1]
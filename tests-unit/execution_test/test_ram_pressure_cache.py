@@ -0,0 +1,120 @@
+"""Tests for RAMPressureCache size accounting and eviction order."""
+
+from typing import NamedTuple
+
+import numpy as np
+import pytest
+import torch
+
+from comfy_execution import caching
+from comfy_execution.caching import CacheKeySetID, RAMPressureCache, measure_ram_usage
+from comfy_execution.graph import DynamicPrompt
+
+
+class _Entry(NamedTuple):
+    ui: dict
+    outputs: list
+
+
+class _VirtualMemory(NamedTuple):
+    available: int
+
+
+class _FakeRam:
+    """Reports available RAM as a fixed baseline plus whatever the cache has released."""
+
+    def __init__(self, cache, baseline):
+        self.cache = cache
+        self.baseline = baseline
+
+    def __call__(self):
+        return _VirtualMemory(self.baseline - self.cache.total_ram_usage)
+
+
+def _prompt(node_ids):
+    return {node_id: {"class_type": "Test", "inputs": {}} for node_id in node_ids}
+
+
+async def _new_cache(node_ids):
+    cache = RAMPressureCache(CacheKeySetID)
+    await cache.set_prompt(DynamicPrompt(_prompt(node_ids)), node_ids, None)
+    return cache
+
+
+class TestMeasureRamUsage:
+    def test_nested_latent_and_conditioning(self):
+        latent = {"samples": torch.zeros(1, 4, 8, 8)}
+        conditioning = [[torch.zeros(1, 77, 8), {"pooled_output": torch.zeros(1, 8)}]]
+        ram_usage, holds_model = measure_ram_usage([[latent], [conditioning]])
+        assert ram_usage == (4 * 64 + 77 * 8 + 8) * 4
+        assert not holds_model
+
+    def test_views_counted_once(self):
+        t = torch.zeros(1024)
+        ram_usage, _ = measure_ram_usage([[t, t[:10], t.view(32, 32)]])
+        assert ram_usage == 1024 * 4
+
+    def test_numpy_arrays(self):
+        a = np.zeros(100, dtype=np.float32)
+        ram_usage, _ = measure_ram_usage([[a, a[10:20]]])
+        assert ram_usage == 400
+
+    def test_empty_outputs(self):
+        assert measure_ram_usage(None) == (0, False)
+        assert measure_ram_usage([[1, "a", None]]) == (0, False)
+
+
+class TestRAMPressureCache:
+    @pytest.mark.asyncio
+    async def test_tracks_total_and_report(self):
+        cache = await _new_cache(["1", "2"])
+        await cache.set("1", _Entry({}, [[torch.zeros(256)]]))
+        await cache.set("2", _Entry({}, [[torch.zeros(64)]]))
+        assert cache.total_ram_usage == 320 * 4
+        report = cache.get_ram_usage()
+        assert report["total_ram_bytes"] == 320 * 4
+        assert [e["node_id"] for e in report["entries"]] == ["1", "2"]
+
+        await cache.set("1", _Entry({}, [[torch.zeros(16)]]))
+        assert cache.total_ram_usage == 80 * 4
+
+    @pytest.mark.asyncio
+    async def test_evicts_largest_old_entries_first(self, monkeypatch):
+        cache = await _new_cache(["small", "big", "mid"])
+        await cache.set("small", _Entry({}, [[torch.zeros(10)]]))
+        await cache.set("big", _Entry({}, [[torch.zeros(1000)]]))
+        await cache.set("mid", _Entry({}, [[torch.zeros(100)]]))
+        # Move on to a new workflow so the entries are no longer active.
+        await cache.set_prompt(DynamicPrompt(_prompt(["other"])), ["other"], None)
+
+        monkeypatch.setattr(caching.psutil, "virtual_memory", _FakeRam(cache, 0))
+        freed = cache.ram_release(-600 * 4)
+        assert freed == 1000 * 4
+        assert set(e["node_id"] for e in cache.get_ram_usage()["entries"]) == {"small", "mid"}
+
+        cache.ram_release(-10)
+        assert cache.total_ram_usage == 0
+        assert len(cache.cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_active_entries_kept_unless_free_active(self, monkeypatch):
+        cache = await _new_cache(["1"])
+        await cache.set("1", _Entry({}, [[torch.zeros(100)]]))
+        monkeypatch.setattr(caching.psutil, "virtual_memory", _FakeRam(cache, 0))
+
+        assert cache.ram_release(1) == 0
+        assert len(cache.cache) == 1
+        assert cache.ram_release(1, free_active=True) == 400
+        assert len(cache.cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_recently_used_entries_outlive_older_ones(self, monkeypatch):
+        cache = await _new_cache(["old", "new"])
+        await cache.set("old", _Entry({}, [[torch.zeros(100)]]))
+        await cache.set("new", _Entry({}, [[torch.zeros(100)]]))
+        await cache.set_prompt(DynamicPrompt(_prompt(["new", "x"])), ["new", "x"], None)
+        await cache.set_prompt(DynamicPrompt(_prompt(["y"])), ["y"], None)
+
+        monkeypatch.setattr(caching.psutil, "virtual_memory", _FakeRam(cache, 0))
+        cache.ram_release(-100 * 4)
+        assert [e["node_id"] for e in cache.get_ram_usage()["entries"]] == ["new"]
@@ -0,0 +1,100 @@
+"""Tests for validating prompts with cached node input schemas."""
+
+import asyncio
+import os
+
+import pytest
+
+import folder_paths
+import nodes
+from comfy_execution.validation import input_schema_cache
+from execution import validate_prompt, validate_prompts
+
+
+class _Loader:
+    files = ["a.safetensors"]
+    input_types_calls = 0
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        cls.input_types_calls += 1
+        return {"required": {"name": (list(cls.files),), "strength": ("FLOAT", {"min": 0.0, "max": 1.0})}}
+
+    RETURN_TYPES = ("MODEL",)
+    FUNCTION = "load"
+
+
+class _Output:
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {"required": {"model": ("MODEL",)}}
+
+    RETURN_TYPES = ()
+    FUNCTION = "save"
+    OUTPUT_NODE = True
+
+
+def _prompt(name="a.safetensors", strength=0.5):
+    return {
+        "1": {"class_type": "TestLoader", "inputs": {"name": name, "strength": strength}},
+        "2": {"class_type": "TestOutput", "inputs": {"model": ["1", 0]}},
+    }
+
+
+@pytest.fixture(autouse=True)
+def test_nodes(monkeypatch):
+    monkeypatch.setitem(nodes.NODE_CLASS_MAPPINGS, "TestLoader", _Loader)
+    monkeypatch.setitem(nodes.NODE_CLASS_MAPPINGS, "TestOutput", _Output)
+    monkeypatch.setattr(_Loader, "files", ["a.safetensors"])
+    monkeypatch.setattr(_Loader, "input_types_calls", 0)
+    monkeypatch.setattr(folder_paths, "get_filesystem_generation", lambda: 1)
+    input_schema_cache.invalidate()
+    yield
+    input_schema_cache.invalidate()
+
+
+class TestValidatePrompts:
+    def test_batch_lists_inputs_once(self):
+        results = asyncio.run(validate_prompts([(str(i), _prompt(strength=i / 100), None) for i in range(100)]))
+        assert all(r[0] for r in results)
+        assert _Loader.input_types_calls == 1
+
+    def test_schema_reused_across_prompts(self):
+        for i in range(3):
+            assert asyncio.run(validate_prompt(str(i), _prompt(), None))[0]
+        assert _Loader.input_types_calls == 1
+
+    def test_new_generation_reloads_schema(self, monkeypatch):
+        assert asyncio.run(validate_prompt("1", _prompt(), None))[0]
+        monkeypatch.setattr(folder_paths, "get_filesystem_generation", lambda: 2)
+        assert asyncio.run(validate_prompt("2", _prompt(), None))[0]
+        assert _Loader.input_types_calls == 2
+
+    def test_errors_are_reported_per_prompt(self):
+        results = asyncio.run(validate_prompts([("1", _prompt(strength=2.0), None), ("2", _prompt(), None)]))
+        assert not results[0][0]
+        assert results[0][3]["1"]["errors"][0]["type"] == "value_bigger_than_max"
+        assert results[0][3]["1"]["dependent_outputs"] == ["2"]
+        assert results[1][0]
+
+    def test_stale_list_is_refreshed(self, monkeypatch):
+        assert asyncio.run(validate_prompt("1", _prompt(), None))[0]
+        # A file the cached schema does not list yet.
+        monkeypatch.setattr(_Loader, "files", ["a.safetensors", "b.safetensors"])
+        assert asyncio.run(validate_prompt("2", _prompt("b.safetensors"), None))[0]
+        assert _Loader.input_types_calls == 2
+
+        result = asyncio.run(validate_prompt("3", _prompt("missing.safetensors"), None))
+        assert not result[0]
+        assert result[3]["1"]["errors"][0]["type"] == "value_not_in_list"
+
+
+class TestFilesystemGeneration:
+    def test_changes_when_input_directory_changes(self, tmp_path, monkeypatch):
+        monkeypatch.undo()
+        monkeypatch.setattr(folder_paths, "input_directory", str(tmp_path))
+        generation = folder_paths.get_filesystem_generation()
+        assert folder_paths.get_filesystem_generation() == generation
+        (tmp_path / "image.png").write_bytes(b"")
+        os.utime(tmp_path, (0, 12345))
+        assert folder_paths.get_filesystem_generation() == generation + 1
@@ -0,0 +1,152 @@
+"""Tests for running VECTORIZED nodes once on whole input lists."""
+
+import asyncio
+
+import pytest
+import torch
+
+from comfy_api.latest import io
+from comfy_execution.graph_utils import ExecutionBlocker
+from comfy_execution.vectorized import VectorizedInput
+from execution import get_output_data
+
+
+class _PerItem:
+    RETURN_TYPES = ("FLOAT", "IMAGE")
+    FUNCTION = "run"
+
+    def __init__(self):
+        self.calls = 0
+
+    def run(self, value, image):
+        self.calls += 1
+        return (value * 2.0, image * 0.5)
+
+
+class _Vectorized(_PerItem):
+    VECTORIZED = True
+
+    def run(self, value, image):
+        self.calls += 1
+        assert isinstance(value, VectorizedInput) and isinstance(image, VectorizedInput)
+        return ((value.stack() * 2.0).tolist(), image.stack() * 0.5)
+
+
+class _AsyncVectorized(_PerItem):
+    VECTORIZED = True
+
+    async def run(self, value, image):
+        self.calls += 1
+        return ([v * 2.0 for v in value], [i * 0.5 for i in image])
+
+
+class _VectorizedListOutput:
+    RETURN_TYPES = ("INT",)
+    OUTPUT_IS_LIST = (True,)
+    FUNCTION = "run"
+    VECTORIZED = True
+
+    def run(self, count):
+        return ([i for c in count for i in range(c)],)
+
+
+class _V3Vectorized(io.ComfyNode):
+    calls = 0
+
+    @classmethod
+    def define_schema(cls):
+        return io.Schema(
+            node_id="_V3Vectorized",
+            inputs=[io.Float.Input("value"), io.Image.Input("image")],
+            outputs=[io.Float.Output(), io.Image.Output()],
+            is_vectorized=True,
+        )
+
+    @classmethod
+    def execute(cls, value, image):
+        _V3Vectorized.calls += 1
+        assert isinstance(value, VectorizedInput) and isinstance(image, VectorizedInput)
+        return io.NodeOutput((value.stack() * 2.0).tolist(), image.stack() * 0.5)
+
+
+def _run(obj, inputs):
+    output, ui, has_subgraph, pending = asyncio.run(get_output_data("prompt", "1", obj, inputs))
+    assert not has_subgraph and not pending
+    return output
+
+
+def _inputs(n):
+    return {"value": [float(i) for i in range(n)], "image": [torch.full((1, 2, 2, 3), float(i)) for i in range(n)]}
+
+
+class TestVectorizedInput:
+    def test_repeats_last_value(self):
+        v = VectorizedInput([1, 2, 3], 5)
+        assert len(v) == 5
+        assert list(v) == [1, 2, 3, 3, 3]
+        assert v[4] == 3 and v[-1] == 3 and v[1:3] == [2, 3]
+        with pytest.raises(IndexError):
+            v[5]
+        assert not v.is_broadcast and VectorizedInput([7], 3).is_broadcast
+
+    def test_stack(self):
+        assert VectorizedInput([1.0, 2.0], 3).stack().tolist() == [1.0, 2.0, 2.0]
+        images = [torch.ones(1, 2, 2, 3), torch.zeros(1, 2, 2, 3)]
+        stacked = VectorizedInput(images, 2).stack()
+        assert stacked.shape == (2, 1, 2, 2, 3) and stacked.is_contiguous()
+
+    def test_broadcast_stack_is_a_view(self):
+        image = torch.rand(1, 4, 4, 3)
+        stacked = VectorizedInput([image], 1000).stack()
+        assert stacked.shape == (1000, 1, 4, 4, 3)
+        assert stacked.stride(0) == 0
+        assert stacked.data_ptr() == image.data_ptr()
+
+
+class TestVectorizedExecution:
+    def test_same_outputs_as_per_item(self):
+        per_item, vectorized = _PerItem(), _Vectorized()
+        expected = _run(per_item, _inputs(20))
+        output = _run(vectorized, _inputs(20))
+        assert per_item.calls == 20 and vectorized.calls == 1
+        assert output[0] == expected[0]
+        assert len(output[1]) == 20
+        assert all(torch.equal(a, b) for a, b in zip(output[1], expected[1]))
+
+    def test_short_lists_broadcast(self):
+        inputs = {"value": [1.0, 2.0, 3.0], "image": [torch.ones(1, 2, 2, 3)]}
+        output = _run(_Vectorized(), inputs)
+        assert output[0] == [2.0, 4.0, 6.0]
+        assert len(output[1]) == 3
+
+    def test_async_node(self):
+        obj = _AsyncVectorized()
+
+        async def run():
+            output, _, _, pending = await get_output_data("prompt", "1", obj, _inputs(5))
+            return output, pending
+        output, pending = asyncio.run(run())
+        assert obj.calls == 1
+        assert not pending and output[0] == [0.0, 2.0, 4.0, 6.0, 8.0]
+
+    def test_blocked_items_run_per_item(self):
+        obj = _Vectorized()
+        inputs = _inputs(3)
+        blocker = ExecutionBlocker(None)
+        inputs["value"][1] = blocker
+        output = _run(obj, inputs)
+        assert obj.calls == 2
+        assert output[0] == [0.0, blocker, 4.0]
+        assert output[1][1] is blocker and torch.equal(output[1][2], inputs["image"][2] * 0.5)
+
+    def test_output_is_list(self):
+        assert _run(_VectorizedListOutput(), {"count": [1, 2, 3]}) == [[0, 0, 1, 0, 1, 2]]
+
+    def test_v3_node(self):
+        assert _V3Vectorized.VECTORIZED is True
+        _V3Vectorized.calls = 0
+        expected = _run(_PerItem(), _inputs(4))
+        output = _run(_V3Vectorized, _inputs(4))
+        assert _V3Vectorized.calls == 1
+        assert output[0] == expected[0]
+        assert all(torch.equal(a, b) for a, b in zip(output[1], expected[1]))
@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+
+import pytest
+
+import folder_paths
+from app.folder_index import FolderIndex
+
+
+def _touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write("x")
+
+
+def _wait_for(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+@pytest.fixture
+def model_folders(tmp_path, monkeypatch):
+    first = tmp_path / "first"
+    second = tmp_path / "second"
+    for path in ("a.safetensors", "b.ckpt", "notes.txt", os.path.join("sub", "c.safetensors"), os.path.join(".git", "d.safetensors")):
+        _touch(str(first / path))
+    _touch(str(second / "a.safetensors"))
+    _touch(str(second / "e.pt"))
+    paths = [str(first), str(second), str(tmp_path / "missing")]
+    monkeypatch.setitem(folder_paths.folder_names_and_paths, "test_models", (paths, {".safetensors", ".ckpt", ".pt"}))
+    monkeypatch.setattr(folder_paths, "filename_list_cache", {})
+    monkeypatch.setattr(folder_paths, "filename_index", None)
+    return paths
+
+
+@pytest.mark.parametrize("watcher", ["poll", "inotify"])
+class TestFolderIndex:
+    @pytest.fixture(autouse=True)
+    def _skip_inotify(self, watcher):
+        if watcher == "inotify" and not sys.platform.startswith("linux"):
+            pytest.skip("inotify is Linux only")
+
+    def test_same_results_as_without_index(self, model_folders, monkeypatch, watcher):
+        expected = folder_paths.get_filename_list("test_models")
+        expected_full_path = folder_paths.get_full_path("test_models", "a.safetensors")
+        monkeypatch.setattr(folder_paths, "filename_index", FolderIndex(watcher, poll_interval=0.05))
+        assert folder_paths.get_filename_list("test_models") == expected
+        assert folder_paths.get_full_path("test_models", "a.safetensors") == expected_full_path == os.path.join(model_folders[0], "a.safetensors")
+        assert folder_paths.get_full_path("test_models", "e.pt") == os.path.join(model_folders[1], "e.pt")
+        assert folder_paths.get_full_path("test_models", "sub/c.safetensors") == os.path.join(model_folders[0], "sub", "c.safetensors")
+        assert folder_paths.get_full_path("test_models", "notes.txt") is not None
+        assert folder_paths.get_full_path("test_models", "nothing.pt") is None
+
+    def test_follows_changes(self, model_folders, monkeypatch, watcher):
+        index = FolderIndex(watcher, poll_interval=0.05)
+        monkeypatch.setattr(folder_paths, "filename_index", index)
+        first, second, missing = model_folders
+        folder_paths.get_filename_list("test_models")
+        generation = folder_paths.get_filesystem_generation()
+
+        _touch(os.path.join(first, "sub", "deeper", "f.safetensors"))
+        assert _wait_for(lambda: os.path.join("sub", "deeper", "f.safetensors") in folder_paths.get_filename_list("test_models"))
+        assert folder_paths.get_filesystem_generation() > generation
+
+        os.remove(os.path.join(second, "e.pt"))
+        assert _wait_for(lambda: "e.pt" not in folder_paths.get_filename_list("test_models"))
+
+        os.rename(os.path.join(first, "sub"), os.path.join(first, "moved"))
+        assert _wait_for(lambda: os.path.join("moved", "deeper", "f.safetensors") in folder_paths.get_filename_list("test_models"))
+        assert os.path.join("sub", "c.safetensors") not in folder_paths.get_filename_list("test_models")
+
+        _touch(os.path.join(missing, "g.ckpt"))
+        assert "g.ckpt" in folder_paths.get_filename_list("test_models")
+
+    def test_full_path_of_file_not_indexed_yet(self, model_folders, monkeypatch, watcher):
+        monkeypatch.setattr(folder_paths, "filename_index", FolderIndex(watcher, poll_interval=60))
+        folder_paths.get_filename_list("test_models")
+        path = os.path.join(model_folders[1], "new.safetensors")
+        _touch(path)
+        assert folder_paths.get_full_path("test_models", "new.safetensors") == path
+
+
+def test_filter_files_extensions():
+    files = ["b.CKPT", "a.safetensors", "c.txt", "d"]
+    assert folder_paths.filter_files_extensions(files, {".ckpt", ".safetensors"}) == ["a.safetensors", "b.CKPT"]
+    assert folder_paths.filter_files_extensions(files, []) == sorted(files)
@@ -14,8 +14,8 @@ Covers both layers:
 The HTTP layer is exercised against a small aiohttp app whose handlers are a
 faithful copy of the wiring in ``server.py`` driven by a fake queue that
 mirrors ``execution.PromptQueue`` (``get_current_queue`` / ``get_history`` /
-``delete_queue_item``). This keeps the test free of the heavy ComfyUI runtime
-(torch, nodes, ...) while still testing the real cancel logic.
+``delete_queue_item_by_id``). This keeps the test free of the heavy ComfyUI
+runtime (torch, nodes, ...) while still testing the real cancel logic.
 """
 
 import json
@@ -71,9 +71,9 @@ class FakePromptQueue:
             return {prompt_id: self._history[prompt_id]}
         return {}
 
-    def delete_queue_item(self, function):
+    def delete_queue_item_by_id(self, prompt_id):
         for i, item in enumerate(self._pending):
-            if function(item):
+            if item[1] == prompt_id:
                 self._pending.pop(i)
                 return True
         return False
@@ -101,7 +101,7 @@ def build_app(queue):
             return queue.interrupt_if_running(prompt_id)
 
         def dequeue(prompt_id):
-            return queue.delete_queue_item(lambda a: a[1] == prompt_id)
+            return queue.delete_queue_item_by_id(prompt_id)
 
         classification = cancel_job(
             job_id, running, pending, history, interrupt, dequeue
@@ -335,7 +335,7 @@ class TestSingleCancelEndpoint:
         and the caller still gets cancelled=True."""
 
         class RacingQueue(FakePromptQueue):
-            def delete_queue_item(self, function):
+            def delete_queue_item_by_id(self, prompt_id):
                 # The worker picked the job up just before we removed it: it
                 # leaves the pending queue (delete misses) and is now running.
                 self._running = list(self._pending)
@@ -0,0 +1,52 @@
+"""SaveImage writes the same files as the original one image at a time loop."""
+import json
+import os
+
+import numpy as np
+import torch
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+import folder_paths
+import nodes
+
+
+def serial_save_images(output_dir, images, filename_prefix, prompt, extra_pnginfo):
+    full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(filename_prefix, output_dir, images[0].shape[1], images[0].shape[0])
+    results = list()
+    for (batch_number, image) in enumerate(images):
+        i = 255. * image.cpu().numpy()
+        img = Image.fromarray(np.clip(i, 0, 255).astype(np.uint8))
+        metadata = PngInfo()
+        metadata.add_text("prompt", json.dumps(prompt))
+        for x in extra_pnginfo:
+            metadata.add_text(x, json.dumps(extra_pnginfo[x]))
+        filename_with_batch_num = filename.replace("%batch_num%", str(batch_number))
+        file = f"{filename_with_batch_num}_{counter:05}_.png"
+        img.save(os.path.join(full_output_folder, file), pnginfo=metadata, compress_level=4)
+        results.append({"filename": file, "subfolder": subfolder, "type": "output"})
+        counter += 1
+    return results
+
+
+def test_matches_serial_save(tmp_path, monkeypatch):
+    monkeypatch.setattr(nodes.args, "disable_metadata", False)
+    images = torch.rand((3, 16, 24, 3)) * 1.2 - 0.1
+    prompt = {"1": {"class_type": "SaveImage"}}
+    extra_pnginfo = {"workflow": {"nodes": []}}
+    serial_dir, batched_dir = tmp_path / "serial", tmp_path / "batched"
+    for d in (serial_dir, batched_dir):
+        (d / "sub").mkdir(parents=True)
+        Image.new("RGB", (1, 1)).save(d / "sub" / "img_00004_.png")
+
+    expected = serial_save_images(str(serial_dir), images, "sub/img", prompt, extra_pnginfo)
+    node = nodes.SaveImage()
+    node.output_dir = str(batched_dir)
+    out = node.save_images(images, "sub/img", prompt, extra_pnginfo)
+
+    assert out["ui"]["images"] == expected
+    assert [r["filename"] for r in expected] == ["img_00005_.png", "img_00006_.png", "img_00007_.png"]
+    for r in expected:
+        with Image.open(serial_dir / "sub" / r["filename"]) as a, Image.open(batched_dir / "sub" / r["filename"]) as b:
+            assert a.text == b.text
+            assert np.array_equal(np.asarray(a), np.asarray(b))
@@ -0,0 +1,122 @@
+"""Tests for the cached /object_info responses."""
+
+import gzip
+import json
+
+import pytest
+from aiohttp import web
+
+import folder_paths
+import nodes
+from app.object_info_cache import ObjectInfoCache, etag_matches
+
+
+class _NodeA:
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {"required": {"value": ("INT",)}}
+
+
+class _NodeB(_NodeA):
+    pass
+
+
+@pytest.fixture
+def node_classes(monkeypatch):
+    monkeypatch.setattr(nodes, "NODE_CLASS_MAPPINGS", {"A": _NodeA, "B": _NodeB})
+    monkeypatch.setattr(nodes, "NODE_DISPLAY_NAME_MAPPINGS", {"A": "Node A"})
+    generation = [0]
+    monkeypatch.setattr(folder_paths, "get_filesystem_generation", lambda: generation[0])
+    return generation
+
+
+@pytest.fixture
+def cache(node_classes):
+    calls = []
+
+    def node_info(node_class, generation):
+        calls.append(node_class)
+        if node_class == "broken":
+            raise ValueError("broken node")
+        return {"name": node_class, "display_name": nodes.NODE_DISPLAY_NAME_MAPPINGS.get(node_class, node_class),
+                "input": nodes.NODE_CLASS_MAPPINGS[node_class].INPUT_TYPES()}
+    cache = ObjectInfoCache(node_info)
+    cache.calls = calls
+    return cache
+
+
+@pytest.fixture
+def client_factory(aiohttp_client, cache):
+    async def create():
+        app = web.Application()
+
+        async def handler(request):
+            return await cache.response(request)
+        app.router.add_get("/object_info", handler)
+        return await aiohttp_client(app)
+    return create
+
+
+class TestObjectInfoCache:
+    def test_node_info_called_once_per_class(self, cache):
+        first = cache.get_payload()
+        assert cache.get_payload() is first
+        assert sorted(cache.calls) == ["A", "B"]
+        assert json.loads(first.body)["A"]["display_name"] == "Node A"
+        assert cache.get_node_json("A") == json.dumps(json.loads(first.body)["A"]).encode()
+        assert cache.get_node_json("missing") is None
+        assert sorted(cache.calls) == ["A", "B"]
+
+    def test_filesystem_generation_invalidates(self, cache, node_classes):
+        cache.get_payload()
+        node_classes[0] += 1
+        cache.get_payload()
+        assert sorted(cache.calls) == ["A", "A", "B", "B"]
+
+    def test_changed_node_classes(self, cache, monkeypatch):
+        etag = cache.get_payload().etag
+        nodes.NODE_CLASS_MAPPINGS["C"] = _NodeA
+        nodes.NODE_DISPLAY_NAME_MAPPINGS["B"] = "Node B"
+        payload = cache.get_payload()
+        assert payload.etag != etag
+        assert sorted(cache.calls) == ["A", "B", "B", "C"]
+        assert json.loads(payload.body)["B"]["display_name"] == "Node B"
+        del nodes.NODE_CLASS_MAPPINGS["C"]
+        assert "C" not in json.loads(cache.get_payload().body)
+
+    def test_failing_node_is_left_out(self, cache):
+        nodes.NODE_CLASS_MAPPINGS["broken"] = _NodeA
+        body = json.loads(cache.get_payload().body)
+        assert set(body) == {"A", "B"}
+        assert cache.get_node_json("broken") is None
+        assert cache.calls.count("broken") == 1
+
+    def test_etag_matches(self):
+        assert etag_matches('"a", W/"b"', '"b"')
+        assert etag_matches("*", '"b"')
+        assert not etag_matches('"a"', '"b"')
+        assert not etag_matches(None, '"b"')
+
+
+@pytest.mark.asyncio
+class TestObjectInfoResponse:
+    async def test_etag_revalidation(self, client_factory, cache):
+        client = await client_factory()
+        response = await client.get("/object_info", headers={"Accept-Encoding": "identity"})
+        assert response.status == 200
+        etag = response.headers["ETag"]
+        assert set(await response.json()) == {"A", "B"}
+        response = await client.get("/object_info", headers={"If-None-Match": etag})
+        assert response.status == 304
+        nodes.NODE_CLASS_MAPPINGS["C"] = _NodeA
+        response = await client.get("/object_info", headers={"If-None-Match": etag})
+        assert response.status == 200 and response.headers["ETag"] != etag
+
+    async def test_gzip_compressed_once(self, client_factory, cache):
+        client = await client_factory()
+        response = await client.get("/object_info", headers={"Accept-Encoding": "gzip"}, auto_decompress=False)
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(await response.read())) == json.loads(cache.payload.body)
+        compressed = cache.payload.gzip_body
+        await client.get("/object_info", headers={"Accept-Encoding": "gzip"})
+        assert cache.payload.gzip_body is compressed
@@ -0,0 +1,154 @@
+"""Tests for the per-client websocket message stream."""
+
+import asyncio
+
+import pytest
+
+from app import websocket_stream
+from app.websocket_stream import WebSocketStream, get_progress_state_delta
+from protocol import BinaryEventTypes
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+        self.blocked = asyncio.Event()
+        self.blocked.set()
+
+    async def send_json(self, message):
+        await self.blocked.wait()
+        self.sent.append(message)
+
+    async def send_bytes(self, message):
+        await self.blocked.wait()
+        self.sent.append(message)
+
+    async def close(self):
+        self.closed = True
+
+
+def _progress_state(prompt_id, **values):
+    return {
+        "prompt_id": prompt_id,
+        "nodes": {node_id: {"value": value, "max": 10, "state": "running", "node_id": node_id} for node_id, value in values.items()},
+    }
+
+
+async def _drain():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+class TestWebSocketStream:
+    async def test_messages_sent_in_order(self):
+        ws = FakeWebSocket()
+        stream = WebSocketStream(ws)
+        stream.start()
+        for i in range(5):
+            stream.put_json("executed", {"node": str(i)})
+        stream.put_bytes(BinaryEventTypes.TEXT, b"text")
+        await _drain()
+        assert [m["data"]["node"] for m in ws.sent[:5]] == ["0", "1", "2", "3", "4"]
+        assert ws.sent[5] == b"text"
+        stream.close()
+
+    async def test_slow_client_skips_intermediate_updates(self):
+        ws = FakeWebSocket()
+        ws.blocked.clear()
+        stream = WebSocketStream(ws)
+        stream.start()
+        stream.put_json("executing", {"node": "1"})
+        await _drain()
+        for i in range(100):
+            stream.put_json("progress", {"prompt_id": "p", "node": "1", "value": i, "max": 100})
+            stream.put_json("progress_state", _progress_state("p", **{"1": i}))
+            stream.put_bytes(BinaryEventTypes.PREVIEW_IMAGE, bytes([i]))
+        stream.put_json("executed", {"node": "1"})
+        stream.put_json("progress_state", _progress_state("p", **{"1": 100}))
+        assert stream.pending < 10
+        ws.blocked.set()
+        await _drain()
+        assert [m if isinstance(m, bytes) else m["type"] for m in ws.sent] == [
+            "executing", "progress", bytes([99]), "executed", "progress_state"]
+        assert ws.sent[1]["data"]["value"] == 99
+        assert ws.sent[-1]["data"]["nodes"]["1"]["value"] == 100
+        stream.close()
+
+    async def test_previews_of_different_nodes_are_all_sent(self):
+        ws = FakeWebSocket()
+        ws.blocked.clear()
+        stream = WebSocketStream(ws)
+        stream.start()
+        stream.put_json("executing", {"node": "1"})
+        await _drain()
+        event = BinaryEventTypes.PREVIEW_IMAGE_WITH_METADATA
+        stream.put_bytes(event, b"a0", {"prompt_id": "p", "node_id": "a"})
+        stream.put_bytes(event, b"a1", {"prompt_id": "p", "node_id": "a"})
+        stream.put_bytes(event, b"b0", {"prompt_id": "p", "node_id": "b"})
+        stream.put_bytes(event, b"c0", {"prompt_id": "q", "node_id": "a"})
+        ws.blocked.set()
+        await _drain()
+        assert ws.sent[1:] == [b"a1", b"b0", b"c0"]
+        stream.close()
+
+    async def test_interval_limits_update_rate(self):
+        ws = FakeWebSocket()
+        stream = WebSocketStream(ws, interval=0.05)
+        stream.start()
+        for i in range(20):
+            stream.put_json("status", {"queue_remaining": i})
+            await asyncio.sleep(0.005)
+        await asyncio.sleep(0.1)
+        assert 2 <= len(ws.sent) <= 5
+        assert ws.sent[-1]["data"] == {"queue_remaining": 19}
+        stream.close()
+
+    async def test_delta_client(self):
+        ws = FakeWebSocket()
+        stream = WebSocketStream(ws)
+        stream.delta = True
+        stream.start()
+        stream.put_json("progress_state", _progress_state("p", a=1, b=0))
+        await _drain()
+        stream.put_json("progress_state", _progress_state("p", a=2, b=0))
+        await _drain()
+        stream.put_json("progress_state", _progress_state("p", a=2, b=0))
+        await _drain()
+        stream.put_json("progress_state", _progress_state("q", a=0))
+        await _drain()
+        assert [m["type"] for m in ws.sent] == ["progress_state_delta"] * 3
+        assert set(ws.sent[0]["data"]["nodes"]) == {"a", "b"}
+        assert ws.sent[1]["data"] == {"prompt_id": "p", "nodes": {"a": {"value": 2}}}
+        assert ws.sent[2]["data"]["nodes"]["a"]["node_id"] == "a"
+        stream.close()
+
+    async def test_delta_client_skips_unchanged_status(self):
+        ws = FakeWebSocket()
+        stream = WebSocketStream(ws)
+        stream.delta = True
+        stream.start()
+        for remaining in (1, 1, 2):
+            stream.put_json("status", {"status": {"exec_info": {"queue_remaining": remaining}}})
+            await _drain()
+        assert len(ws.sent) == 2
+
+    async def test_client_that_does_not_receive_is_disconnected(self, monkeypatch):
+        monkeypatch.setattr(websocket_stream, "MAX_PENDING_MESSAGES", 10)
+        ws = FakeWebSocket()
+        ws.blocked.clear()
+        stream = WebSocketStream(ws)
+        stream.start()
+        for i in range(20):
+            stream.put_json("executed", {"node": str(i)})
+        await _drain()
+        assert ws.closed and stream.closed
+
+
+class TestProgressStateDelta:
+    def test_new_and_changed_nodes(self):
+        previous = {"a": {"value": 1, "max": 10}, "b": {"value": 5, "max": 10}}
+        nodes = {"a": {"value": 1, "max": 10}, "b": {"value": 6, "max": 10}, "c": {"value": 0, "max": 3}}
+        assert get_progress_state_delta(previous, nodes) == {"b": {"value": 6}, "c": {"value": 0, "max": 3}}
+        assert get_progress_state_delta(None, nodes) is nodes
@@ -196,6 +196,8 @@ class TestExecution:
             '--port', str(args_pytest["port"]),
             '--extra-model-paths-config', 'tests/execution/extra_model_paths.yaml',
             '--cpu',
+            # Job history is kept in the database, start every server with an empty one.
+            '--database-url', 'sqlite:///:memory:',
         ]
         pargs += [ str(param) for param in request.param["extra_args"] ]
         print("Running server with args:", pargs)  # noqa: T201
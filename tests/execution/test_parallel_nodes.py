@@ -0,0 +1,115 @@
+import pytest
+import time
+import torch
+import numpy as np
+import subprocess
+
+from pytest import fixture
+from comfy_execution.graph_utils import GraphBuilder
+from tests.execution.test_execution import ComfyClient, run_warmup
+
+
+@pytest.mark.execution
+class TestThreadSafeNodes:
+    """Nodes marked THREAD_SAFE run on the --parallel-cpu-nodes worker pool."""
+
+    @fixture(scope="class", autouse=True)
+    def _server(self, args_pytest):
+        pargs = [
+            'python','main.py',
+            '--output-directory', args_pytest["output_dir"],
+            '--listen', args_pytest["listen"],
+            '--port', str(args_pytest["port"]),
+            '--extra-model-paths-config', 'tests/execution/extra_model_paths.yaml',
+            '--cpu',
+            '--cache-classic',
+            '--parallel-cpu-nodes', '4',
+        ]
+        p = subprocess.Popen(pargs)
+        yield
+        p.kill()
+        torch.cuda.empty_cache()
+
+    @fixture(scope="class", autouse=True)
+    def shared_client(self, args_pytest, _server):
+        client = ComfyClient()
+        n_tries = 5
+        for i in range(n_tries):
+            time.sleep(4)
+            try:
+                client.connect(listen=args_pytest["listen"], port=args_pytest["port"])
+            except ConnectionRefusedError:
+                # Retrying...
+                pass
+            else:
+                break
+        yield client
+        del client
+        torch.cuda.empty_cache()
+
+    @fixture
+    def client(self, shared_client, request):
+        shared_client.set_test_name(f"parallel_nodes[{request.node.name}]")
+        yield shared_client
+
+    @fixture
+    def builder(self, request):
+        yield GraphBuilder(prefix=request.node.name)
+
+    def test_independent_branches_overlap(self, client: ComfyClient, builder: GraphBuilder, skip_timing_checks):
+        run_warmup(client)
+
+        g = builder
+        image = g.node("StubImage", content="BLACK", height=64, width=64, batch_size=1)
+        sleep1 = g.node("TestThreadSafeSleep", value=image.out(0), seconds=0.4)
+        sleep2 = g.node("TestThreadSafeSleep", value=image.out(0), seconds=0.5)
+        sleep3 = g.node("TestThreadSafeSleep", value=image.out(0), seconds=0.6)
+        g.node("PreviewImage", images=sleep1.out(0))
+        g.node("PreviewImage", images=sleep2.out(0))
+        g.node("PreviewImage", images=sleep3.out(0))
+
+        start_time = time.time()
+        result = client.run(g)
+        elapsed_time = time.time() - start_time
+
+        # Should take ~0.6s (max duration) not 1.5s (sum of durations)
+        if not skip_timing_checks:
+            assert elapsed_time < 1.2, f"Parallel execution took {elapsed_time}s, expected < 1.2s"
+        assert result.did_run(sleep1) and result.did_run(sleep2) and result.did_run(sleep3)
+
+    def test_chained_results_are_passed_through(self, client: ComfyClient, builder: GraphBuilder):
+        g = builder
+        image = g.node("StubImage", content="WHITE", height=64, width=64, batch_size=1)
+        sleep1 = g.node("TestThreadSafeSleep", value=image.out(0), seconds=0.1)
+        invert = g.node("ImageInvert", image=sleep1.out(0))
+        sleep2 = g.node("TestThreadSafeSleep", value=invert.out(0), seconds=0.1)
+        output = g.node("SaveImage", images=sleep2.out(0))
+
+        result = client.run(g)
+
+        result_images = result.get_images(output)
+        assert len(result_images) == 1
+        assert np.array(result_images[0]).max() == 0, "Image should have been inverted to black"
+
+    def test_mixed_with_async_nodes(self, client: ComfyClient, builder: GraphBuilder):
+        g = builder
+        image = g.node("StubImage", content="BLACK", height=64, width=64, batch_size=1)
+        threaded = g.node("TestThreadSafeSleep", value=image.out(0), seconds=0.2)
+        awaited = g.node("TestSleep", value=image.out(0), seconds=0.2)
+        average = g.node("TestVariadicAverage", input1=threaded.out(0), input2=awaited.out(0))
+        output = g.node("SaveImage", images=average.out(0))
+
+        result = client.run(g)
+
+        assert result.did_run(threaded) and result.did_run(awaited)
+        assert len(result.get_images(output)) == 1
+
+    def test_cached_on_rerun(self, client: ComfyClient, builder: GraphBuilder):
+        g = builder
+        image = g.node("StubImage", content="BLACK", height=64, width=64, batch_size=1)
+        sleep = g.node("TestThreadSafeSleep", value=image.out(0), seconds=0.1)
+        g.node("SaveImage", images=sleep.out(0))
+
+        client.run(g)
+        result = client.run(g)
+        assert not result.did_run(sleep), "Thread safe node results should be cached like any other node"
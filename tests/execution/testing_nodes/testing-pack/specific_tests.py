@@ -422,6 +422,30 @@ class TestSleep(ComfyNodeABC):
             await asyncio.sleep(0.01)
         return (value,)
 
+class TestThreadSafeSleep(ComfyNodeABC):
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "value": (IO.ANY, {}),
+                "seconds": ("FLOAT", {"default": 1.0, "min": 0.0, "max": 9999.0, "step": 0.01, "tooltip": "The amount of seconds to block the calling thread."}),
+            },
+            "hidden": {
+                "unique_id": "UNIQUE_ID",
+            },
+        }
+    RETURN_TYPES = (IO.ANY,)
+    FUNCTION = "sleep"
+    THREAD_SAFE = True
+
+    CATEGORY = "experimental"
+
+    def sleep(self, value, seconds, unique_id):
+        pbar = ProgressBar(seconds, node_id=unique_id)
+        time.sleep(seconds)
+        pbar.update_absolute(seconds)
+        return (value,)
+
 class TestParallelSleep(ComfyNodeABC):
     @classmethod
     def INPUT_TYPES(cls):
@@ -496,6 +520,7 @@ TEST_NODE_CLASS_MAPPINGS = {
     "TestMixedExpansionReturns": TestMixedExpansionReturns,
     "TestSamplingInExpansion": TestSamplingInExpansion,
     "TestSleep": TestSleep,
+    "TestThreadSafeSleep": TestThreadSafeSleep,
     "TestParallelSleep": TestParallelSleep,
     "TestOutputNodeWithSocketOutput": TestOutputNodeWithSocketOutput,
 }
@@ -514,6 +539,7 @@ TEST_NODE_DISPLAY_NAME_MAPPINGS = {
     "TestMixedExpansionReturns": "Mixed Expansion Returns",
     "TestSamplingInExpansion": "Sampling In Expansion",
     "TestSleep": "Test Sleep",
+    "TestThreadSafeSleep": "Test Thread Safe Sleep",
     "TestParallelSleep": "Test Parallel Sleep",
     "TestOutputNodeWithSocketOutput": "Test Output Node With Socket Output",
 }